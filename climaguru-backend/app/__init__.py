@@ -51,7 +51,8 @@ def create_app(config_name=None):
 )
     
     # Importar modelos para que SQLAlchemy los registre
-    from app.models import Usuario, APIKey, Consulta, DatosClima, Sesion, LogsActividad, CiudadesFavoritas
+    from app.models import (Usuario, APIKey, Consulta, DatosClima, SerieClima, VersionSerie,
+                            RollupClima, Sesion, LogsActividad, CiudadesFavoritas)
     
     # Inicializar base de datos (MySQL y SQLite)
     with app.app_context():
@@ -61,6 +62,14 @@ def create_app(config_name=None):
         else:
             print("[WARN] La base de datos no esta disponible")
     
+    # Servicio de clima (pool de consultas a proveedores)
+    from app.services.weather_service import init_servicio_clima
+    init_servicio_clima(app)
+    
+    # Caché de estadísticas agregadas
+    from app.services.stats_service import init_estadisticas
+    init_estadisticas(app)
+    
     # Registrar blueprints (rutas)
     register_blueprints(app)
     
@@ -50,6 +50,20 @@ class Config:
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE = os.getenv('LOG_FILE', 'logs/climaguru.log')
 
+    # Servicio de clima (proveedores externos)
+    WEATHER_MAX_WORKERS = int(os.getenv('WEATHER_MAX_WORKERS', 16))
+    WEATHER_MAX_PENDIENTES = int(os.getenv('WEATHER_MAX_PENDIENTES', 64))
+    WEATHER_PLAZO_S = float(os.getenv('WEATHER_PLAZO_S', 8))
+    WEATHER_DATA_DIR = os.getenv('WEATHER_DATA_DIR', 'data')
+    EXPORT_DIR = os.getenv('EXPORT_DIR', 'data/exports')
+
+    # Duración máxima de un flujo SSE (cada flujo ocupa un worker síncrono)
+    SSE_MAX_SEGUNDOS = int(os.getenv('SSE_MAX_SEGUNDOS', 30))
+
+    # Estadísticas agregadas (caché por proceso)
+    STATS_CACHE_ENTRADAS = int(os.getenv('STATS_CACHE_ENTRADAS', 256))
+    STATS_CACHE_TTL_S = int(os.getenv('STATS_CACHE_TTL_S', 3600))
+
 
 class DevelopmentConfig(Config):
     """Configuración para desarrollo"""
@@ -9,6 +9,8 @@ from app.models.sesion import Sesion
 from app.models.api_key import APIKey
 from app.models.consulta import Consulta
 from app.models.dato_meteorologico import DatosClima
+from app.models.serie_clima import SerieClima, VersionSerie
+from app.models.rollup_clima import RollupClima
 from app.models.logs_actividad import LogsActividad
 from app.models.ciudades_favoritas import CiudadesFavoritas
 
@@ -19,6 +21,9 @@ __all__ = [
     'APIKey', 
     'Consulta',
     'DatosClima',
+    'SerieClima',
+    'VersionSerie',
+    'RollupClima',
     'LogsActividad',
     'CiudadesFavoritas'
 ]
@@ -29,11 +29,19 @@ class Consulta(db.Model):
                                name='estado_enum'), 
                        default='pendiente', index=True)
     mensaje_error = db.Column(db.Text)
+    progreso = db.Column(db.SmallInteger, default=0)
+    intentos = db.Column(db.Integer, default=0, nullable=False)
+    actualizada_en = db.Column(db.DateTime)  # Latido del worker que la procesa
     tiempo_respuesta_ms = db.Column(db.Integer)
     ip_origen = db.Column(db.String(45))
     creada_en = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     completada_en = db.Column(db.DateTime)
     
+    # Cola de trabajos: los workers buscan por tipo y estado en orden de llegada
+    __table_args__ = (
+        db.Index('idx_cola', 'tipo_consulta', 'estado', 'creada_en'),
+    )
+    
     # Relación con datos procesados
     datos_clima = db.relationship('DatosClima', backref='consulta', uselist=False,
                                   cascade='all, delete-orphan', lazy='joined')
@@ -52,6 +60,7 @@ class Consulta(db.Model):
             'parametros_solicitados': self.parametros_solicitados,
             'estado': self.estado,
             'mensaje_error': self.mensaje_error,
+            'progreso': self.progreso,
             'tiempo_respuesta_ms': self.tiempo_respuesta_ms,
             'creada_en': self.creada_en.isoformat() if self.creada_en else None,
             'completada_en': self.completada_en.isoformat() if self.completada_en else None
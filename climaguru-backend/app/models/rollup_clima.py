@@ -0,0 +1,332 @@
+"""
+Modelo: RollupClima
+===================
+Agregados de series_clima por ubicación, fuente, variable y día/mes
+(n, suma, mínimo, máximo y suma de cuadrados)
+"""
+import math
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+
+from app import db
+
+
+# Periodos que se mantienen según la frecuencia de la serie. La serie horaria
+# ya tiene un punto por hora y fuente, así que no hay rollup horario; el
+# rollup diario de la serie diaria sería una copia.
+PERIODOS_POR_FRECUENCIA = {
+    'horaria': ('dia', 'mes'),
+    'diaria': ('mes',),
+}
+
+# Paso entre puntos de cada serie
+PASO_FRECUENCIA = {
+    'horaria': timedelta(hours=1),
+    'diaria': timedelta(days=1),
+}
+
+CLAVE_ROLLUP = ['ubicacion', 'frecuencia', 'periodo', 'variable', 'inicio', 'fuente']
+ESTADISTICOS = ['n', 'suma', 'minimo', 'maximo', 'suma_cuadrados']
+
+
+def inicio_periodo(fecha, periodo):
+    """Inicio del día o mes que contiene `fecha`"""
+    dia = fecha.replace(hour=0, minute=0, second=0, microsecond=0)
+    return dia.replace(day=1) if periodo == 'mes' else dia
+
+
+def siguiente_periodo(inicio, periodo):
+    """Inicio del día o mes siguiente"""
+    if periodo == 'mes':
+        return (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return inicio + timedelta(days=1)
+
+
+def _iguales(a, b):
+    # series_clima guarda FLOAT (precisión simple en MySQL)
+    return math.isclose(a, b, rel_tol=1e-6, abs_tol=1e-6)
+
+
+class RollupClima(db.Model):
+    """Modelo de agregados diarios y mensuales de la serie"""
+
+    __tablename__ = 'rollups_clima'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    ubicacion = db.Column(db.String(100), nullable=False)
+    fuente = db.Column(db.String(30), nullable=False)
+    frecuencia = db.Column(db.Enum('horaria', 'diaria', name='frecuencia_enum'), nullable=False)
+    periodo = db.Column(db.Enum('dia', 'mes', name='periodo_rollup_enum'), nullable=False)
+    inicio = db.Column(db.DateTime, nullable=False)  # UTC
+    variable = db.Column(db.String(30), nullable=False)
+
+    n = db.Column(db.BigInteger, nullable=False)
+    suma = db.Column(db.Float(precision=53), nullable=False)
+    minimo = db.Column(db.Float(precision=53), nullable=False)
+    maximo = db.Column(db.Float(precision=53), nullable=False)
+    suma_cuadrados = db.Column(db.Float(precision=53), nullable=False)
+
+    actualizado_en = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Años de una variable en una ubicación son un solo rango del índice
+    __table_args__ = (
+        db.UniqueConstraint(*CLAVE_ROLLUP, name='unique_rollup'),
+    )
+
+    @classmethod
+    def _sentencia(cls, acumular):
+        """
+        INSERT que, si el agregado ya existe, lo combina (acumular=True) o lo
+        reemplaza (acumular=False)
+        """
+        tabla = cls.__table__
+        dialecto = db.engine.dialect.name
+
+        if dialecto == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+            sentencia = insert(tabla)
+            nuevo = sentencia.inserted
+            menor, mayor = func.least, func.greatest
+        elif dialecto in ('sqlite', 'postgresql'):
+            if dialecto == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+                # min()/max() con dos argumentos son escalares en SQLite
+                menor, mayor = func.min, func.max
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+                menor, mayor = func.least, func.greatest
+            sentencia = insert(tabla)
+            nuevo = sentencia.excluded
+        else:
+            return tabla.insert()
+
+        if acumular:
+            valores = {
+                'n': tabla.c.n + nuevo.n,
+                'suma': tabla.c.suma + nuevo.suma,
+                'minimo': menor(tabla.c.minimo, nuevo.minimo),
+                'maximo': mayor(tabla.c.maximo, nuevo.maximo),
+                'suma_cuadrados': tabla.c.suma_cuadrados + nuevo.suma_cuadrados,
+            }
+        else:
+            valores = {c: nuevo[c] for c in ESTADISTICOS}
+        valores['actualizado_en'] = nuevo.actualizado_en
+
+        if dialecto == 'mysql':
+            return sentencia.on_duplicate_key_update(valores)
+        return sentencia.on_conflict_do_update(index_elements=CLAVE_ROLLUP, set_=valores)
+
+    @staticmethod
+    def acumular(filas, anteriores=None, deltas=None, variables=None):
+        """
+        Agregados de los puntos nuevos de la serie y buckets a recalcular
+
+        Args:
+            filas: Filas de series_clima (dicts con la clave natural y las variables)
+            anteriores: dict {(ubicacion, frecuencia, fuente, fecha_hora): {variable: valor}}
+                con los valores que tenían esas filas antes de escribirlas
+            deltas: dict a completar (para acumular varias llamadas)
+            variables: Columnas a agregar
+
+        Returns:
+            (deltas, recalcular): deltas {clave de rollup: [n, suma, min, max, suma²]}
+            con los valores que se suman; recalcular, conjunto de
+            (ubicacion, fuente, frecuencia, variable, periodo, inicio) cuyos
+            valores cambiaron y no pueden combinarse (el mínimo y el máximo no
+            se restan)
+        """
+        from app.models.serie_clima import COLUMNAS_VARIABLES
+
+        variables = variables or COLUMNAS_VARIABLES
+        anteriores = anteriores or {}
+        deltas = {} if deltas is None else deltas
+        recalcular = set()
+
+        for fila in filas:
+            ubicacion, fuente = fila['ubicacion'], fila['fuente']
+            frecuencia, fecha = fila['frecuencia'], fila['fecha_hora']
+            periodos = PERIODOS_POR_FRECUENCIA[frecuencia]
+            previa = anteriores.get((ubicacion, frecuencia, fuente, fecha))
+            inicios = None
+
+            for variable in variables:
+                nuevo = fila.get(variable)
+                viejo = previa.get(variable) if previa else None
+                if viejo is not None:
+                    if nuevo is None or not _iguales(nuevo, viejo):
+                        base = periodos[0]
+                        recalcular.add((ubicacion, fuente, frecuencia, variable,
+                                        base, inicio_periodo(fecha, base)))
+                    continue
+                if nuevo is None:
+                    continue
+
+                if inicios is None:
+                    inicios = [(p, inicio_periodo(fecha, p)) for p in periodos]
+                cuadrado = nuevo * nuevo
+                for periodo, inicio in inicios:
+                    clave = (ubicacion, frecuencia, periodo, variable, inicio, fuente)
+                    acumulado = deltas.get(clave)
+                    if acumulado is None:
+                        deltas[clave] = [1, nuevo, nuevo, nuevo, cuadrado]
+                    else:
+                        acumulado[0] += 1
+                        acumulado[1] += nuevo
+                        acumulado[2] = min(acumulado[2], nuevo)
+                        acumulado[3] = max(acumulado[3], nuevo)
+                        acumulado[4] += cuadrado
+
+        return deltas, recalcular
+
+    @classmethod
+    def combinar(cls, deltas, acumular=True):
+        """Escribe los deltas con executemany; sin commit"""
+        if not deltas:
+            return 0
+        ahora = datetime.utcnow()
+        filas = [
+            dict(zip(CLAVE_ROLLUP, clave), **dict(zip(ESTADISTICOS, valores)),
+                 actualizado_en=ahora)
+            for clave, valores in deltas.items()
+        ]
+        db.session.execute(cls._sentencia(acumular), filas)
+        return len(filas)
+
+    @classmethod
+    def _agregado_serie(cls, ubicacion, fuente, frecuencia, variable, desde, hasta):
+        """n, suma, min, max y suma² de la serie en [desde, hasta)"""
+        from app.models.serie_clima import SerieClima, lectura_confirmada
+
+        tabla = SerieClima.__table__
+        columna = tabla.c[variable]
+        return db.session.execute(lectura_confirmada(
+            select(func.count(columna), func.sum(columna), func.min(columna),
+                   func.max(columna), func.sum(columna * columna))
+            .where(tabla.c.ubicacion == ubicacion, tabla.c.frecuencia == frecuencia,
+                   tabla.c.fuente == fuente,
+                   tabla.c.fecha_hora >= desde, tabla.c.fecha_hora < hasta)
+        )).one()
+
+    @classmethod
+    def _agregado_dias(cls, ubicacion, fuente, frecuencia, variable, desde, hasta):
+        """Combina los rollups diarios con inicio en [desde, hasta)"""
+        from app.models.serie_clima import lectura_confirmada
+
+        tabla = cls.__table__
+        return db.session.execute(lectura_confirmada(
+            select(func.coalesce(func.sum(tabla.c.n), 0), func.sum(tabla.c.suma),
+                   func.min(tabla.c.minimo), func.max(tabla.c.maximo),
+                   func.sum(tabla.c.suma_cuadrados))
+            .where(tabla.c.ubicacion == ubicacion, tabla.c.frecuencia == frecuencia,
+                   tabla.c.periodo == 'dia', tabla.c.variable == variable,
+                   tabla.c.fuente == fuente,
+                   tabla.c.inicio >= desde, tabla.c.inicio < hasta)
+        )).one()
+
+    @classmethod
+    def recalcular(cls, buckets):
+        """
+        Recalcula buckets desde la fuente y reemplaza sus agregados; sin commit
+
+        El periodo base (día de la serie horaria, mes de la diaria) se lee de
+        series_clima con un rango acotado; el mes de la serie horaria se
+        recompone con sus rollups diarios.
+        """
+        if not buckets:
+            return 0
+
+        reemplazos = {}
+        vacios = []
+        meses = set()
+        for ubicacion, fuente, frecuencia, variable, periodo, inicio in sorted(buckets):
+            fin = siguiente_periodo(inicio, periodo)
+            n, suma, minimo, maximo, cuadrados = cls._agregado_serie(
+                ubicacion, fuente, frecuencia, variable, inicio, fin)
+            clave = (ubicacion, frecuencia, periodo, variable, inicio, fuente)
+            if n:
+                reemplazos[clave] = [n, suma, minimo, maximo, cuadrados]
+            else:
+                vacios.append(clave)
+            if periodo != 'mes' and 'mes' in PERIODOS_POR_FRECUENCIA[frecuencia]:
+                meses.add((ubicacion, fuente, frecuencia, variable, inicio_periodo(inicio, 'mes')))
+
+        # Los días deben estar escritos antes de recomponer sus meses
+        cls._reemplazar(reemplazos, vacios)
+
+        reemplazos = {}
+        vacios = []
+        for ubicacion, fuente, frecuencia, variable, inicio in sorted(meses):
+            n, suma, minimo, maximo, cuadrados = cls._agregado_dias(
+                ubicacion, fuente, frecuencia, variable, inicio, siguiente_periodo(inicio, 'mes'))
+            clave = (ubicacion, frecuencia, 'mes', variable, inicio, fuente)
+            if n:
+                reemplazos[clave] = [n, suma, minimo, maximo, cuadrados]
+            else:
+                vacios.append(clave)
+        cls._reemplazar(reemplazos, vacios)
+
+        return len(buckets) + len(meses)
+
+    @classmethod
+    def _reemplazar(cls, reemplazos, vacios):
+        cls.combinar(reemplazos, acumular=False)
+        tabla = cls.__table__
+        for clave in vacios:
+            db.session.execute(tabla.delete().where(
+                *[tabla.c[c] == v for c, v in zip(CLAVE_ROLLUP, clave)]))
+
+    @classmethod
+    def actualizar(cls, filas, anteriores=None):
+        """
+        Mantiene los rollups tras escribir `filas` en series_clima; sin commit
+
+        Los puntos nuevos se suman con un upsert acumulativo; solo los buckets
+        con valores reemplazados por otros distintos se recalculan.
+
+        Returns:
+            set de ubicaciones con algún rollup modificado (vacío si las filas
+            reescriben los mismos valores)
+        """
+        deltas, buckets = cls.acumular(filas, anteriores)
+        cls.combinar(deltas)
+        cls.recalcular(buckets)
+        return {clave[0] for clave in deltas} | {bucket[0] for bucket in buckets}
+
+    @classmethod
+    def rango(cls, ubicaciones, variables, periodo, frecuencia='horaria',
+              desde=None, hasta=None, fuente=None):
+        """
+        Rollups con inicio en [desde, hasta), ordenados por ubicación, fuente e inicio
+
+        Args:
+            ubicaciones: Claves de ubicación
+            variables: Columnas de la serie
+            periodo: 'dia' o 'mes'
+        """
+        query = cls.query.filter(cls.ubicacion.in_(list(ubicaciones)),
+                                 cls.frecuencia == frecuencia,
+                                 cls.periodo == periodo,
+                                 cls.variable.in_(list(variables)))
+        if desde is not None:
+            query = query.filter(cls.inicio >= desde)
+        if hasta is not None:
+            query = query.filter(cls.inicio < hasta)
+        if fuente:
+            query = query.filter(cls.fuente == fuente)
+        return query.order_by(cls.ubicacion, cls.fuente, cls.inicio)
+
+    def estadisticos(self):
+        """n, min, promedio, max y desviación estándar (poblacional)"""
+        promedio = self.suma / self.n
+        varianza = max(self.suma_cuadrados / self.n - promedio * promedio, 0.0)
+        return {
+            'n': self.n,
+            'min': self.minimo,
+            'promedio': promedio,
+            'max': self.maximo,
+            'desviacion': math.sqrt(varianza),
+        }
+
+    def __repr__(self):
+        return f'<RollupClima {self.ubicacion} {self.fuente} {self.variable} {self.periodo} {self.inicio}>'
@@ -0,0 +1,385 @@
+"""
+Modelo: SerieClima
+==================
+Series de tiempo meteorológicas (una fila por ubicación, fuente y hora/día)
+"""
+from app import db
+from datetime import datetime
+
+from sqlalchemy import select
+
+
+# Variables de Open-Meteo -> columnas de la serie
+VARIABLES_OPENMETEO = {
+    'temperature_2m': 'temperatura',
+    'temperature_2m_max': 'temperatura_max',
+    'temperature_2m_min': 'temperatura_min',
+    'relative_humidity_2m': 'humedad_relativa',
+    'pressure_msl': 'presion_atmosferica',
+    'wind_speed_10m': 'velocidad_viento',
+    'wind_speed_10m_max': 'velocidad_viento',
+    'wind_direction_10m': 'direccion_viento',
+    'precipitation': 'precipitacion',
+    'precipitation_sum': 'precipitacion',
+}
+
+COLUMNAS_VARIABLES = ['temperatura', 'temperatura_min', 'temperatura_max', 'humedad_relativa',
+                      'presion_atmosferica', 'velocidad_viento', 'direccion_viento',
+                      'precipitacion']
+
+# Clave natural de una fila (índice único)
+CLAVE_SERIE = ['ubicacion', 'frecuencia', 'fecha_hora', 'fuente']
+
+TAMAÑO_LOTE_INSERCION = 5000
+
+
+def clave_ubicacion(ciudad=None, latitud=None, longitud=None):
+    """Ubicación de la serie: ciudad normalizada o coordenadas a 2 decimales (~1 km)"""
+    if ciudad:
+        return ciudad.strip().lower()
+    return f"{float(latitud):.2f},{float(longitud):.2f}"
+
+
+def lectura_confirmada(sentencia):
+    """
+    SELECT que ve lo último confirmado aunque la transacción ya haya leído
+
+    InnoDB (REPEATABLE READ) lee la instantánea de la primera lectura de la
+    transacción, anterior quizá al commit del escritor que tenía el bloqueo
+    de la ubicación; una lectura con bloqueo compartido lee la versión
+    confirmada. PostgreSQL (READ COMMITTED) y SQLite ya la ven.
+    """
+    if db.engine.dialect.name == 'mysql':
+        return sentencia.with_for_update(read=True)
+    return sentencia
+
+
+class SerieClima(db.Model):
+    """Modelo de series de tiempo meteorológicas"""
+
+    __tablename__ = 'series_clima'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    consulta_id = db.Column(db.Integer, db.ForeignKey('consultas.id', ondelete='SET NULL'),
+                            index=True)
+    ubicacion = db.Column(db.String(100), nullable=False)
+    latitud = db.Column(db.Numeric(10, 8))
+    longitud = db.Column(db.Numeric(11, 8))
+    fuente = db.Column(db.String(30), nullable=False)
+    frecuencia = db.Column(db.Enum('horaria', 'diaria', name='frecuencia_enum'), nullable=False)
+    fecha_hora = db.Column(db.DateTime, nullable=False)  # UTC
+
+    # Variables
+    temperatura = db.Column(db.Float)
+    temperatura_min = db.Column(db.Float)
+    temperatura_max = db.Column(db.Float)
+    humedad_relativa = db.Column(db.Float)
+    presion_atmosferica = db.Column(db.Float)
+    velocidad_viento = db.Column(db.Float)
+    direccion_viento = db.Column(db.Float)
+    precipitacion = db.Column(db.Float)
+
+    guardado_en = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Una semana de una ciudad es un solo rango del índice (ubicación, frecuencia, fecha)
+    __table_args__ = (
+        db.UniqueConstraint(*CLAVE_SERIE, name='unique_serie_punto'),
+        db.Index('idx_serie_fuente', 'fuente', 'frecuencia', 'fecha_hora'),
+    )
+
+    @classmethod
+    def rango(cls, ubicacion, desde=None, hasta=None, fuente=None, frecuencia='horaria'):
+        """
+        Consulta de un rango de tiempo, ordenada por fecha
+
+        Args:
+            ubicacion: Clave de ubicación (ver clave_ubicacion)
+            desde, hasta: datetime UTC (inclusivos)
+            fuente: Filtrar por proveedor
+            frecuencia: 'horaria' o 'diaria'
+        """
+        query = cls.query.filter(cls.ubicacion == ubicacion, cls.frecuencia == frecuencia)
+        if desde is not None:
+            query = query.filter(cls.fecha_hora >= desde)
+        if hasta is not None:
+            query = query.filter(cls.fecha_hora <= hasta)
+        if fuente:
+            query = query.filter(cls.fuente == fuente)
+        return query.order_by(cls.fecha_hora, cls.fuente)
+
+    @classmethod
+    def _sentencia_upsert(cls):
+        """INSERT que actualiza las variables si la fila ya existe"""
+        tabla = cls.__table__
+        actualizables = COLUMNAS_VARIABLES + ['consulta_id', 'latitud', 'longitud', 'guardado_en']
+        dialecto = db.engine.dialect.name
+
+        if dialecto == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+            sentencia = insert(tabla)
+            return sentencia.on_duplicate_key_update(
+                {c: sentencia.inserted[c] for c in actualizables})
+
+        if dialecto in ('sqlite', 'postgresql'):
+            if dialecto == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            sentencia = insert(tabla)
+            return sentencia.on_conflict_do_update(
+                index_elements=CLAVE_SERIE,
+                set_={c: sentencia.excluded[c] for c in actualizables})
+
+        return tabla.insert()
+
+    @classmethod
+    def insertar_lote(cls, filas, tamaño_lote=TAMAÑO_LOTE_INSERCION):
+        """
+        Inserta (o actualiza) filas en lotes con executemany
+
+        Args:
+            filas: Iterable de dicts con la clave natural y las variables
+
+        Returns:
+            int: filas enviadas
+
+        No hace commit; la transacción es la del llamador. Los rollups y la
+        versión de cada ubicación cuyos datos cambiaron se actualizan en la
+        misma transacción; reescribir los mismos valores no cambia la versión.
+        """
+        sentencia = cls._sentencia_upsert()
+        ahora = datetime.utcnow()
+        columnas = ['consulta_id', 'latitud', 'longitud'] + CLAVE_SERIE + COLUMNAS_VARIABLES
+
+        total = 0
+        lote = []
+        modificadas = set()
+        for fila in filas:
+            # executemany requiere las mismas claves en todas las filas
+            normalizada = {c: fila.get(c) for c in columnas}
+            normalizada['guardado_en'] = ahora
+            lote.append(normalizada)
+            if len(lote) >= tamaño_lote:
+                modificadas |= cls._escribir_lote(sentencia, lote)
+                total += len(lote)
+                lote = []
+
+        if lote:
+            modificadas |= cls._escribir_lote(sentencia, lote)
+            total += len(lote)
+
+        VersionSerie.incrementar(modificadas)
+        return total
+
+    @classmethod
+    def _escribir_lote(cls, sentencia, lote):
+        """Escribe un lote y sus rollups; devuelve las ubicaciones modificadas"""
+        from app.models.rollup_clima import RollupClima
+
+        # La fila de versión de cada ubicación serializa a los escritores
+        # desde la lectura de los valores previos hasta el commit; sin el
+        # bloqueo dos transacciones verían la misma clave como nueva y la
+        # sumarían dos veces a los rollups
+        VersionSerie.bloquear(fila['ubicacion'] for fila in lote)
+        # Los valores previos deciden si el rollup se suma o se recalcula
+        anteriores = cls.valores_existentes(lote)
+        db.session.execute(sentencia, lote)
+        modificadas = RollupClima.actualizar(lote, anteriores)
+        # Una fila nueva sin variables no mueve los rollups, pero sí los puntos
+        modificadas.update(
+            fila['ubicacion'] for fila in lote
+            if (fila['ubicacion'], fila['frecuencia'], fila['fuente'], fila['fecha_hora'])
+            not in anteriores)
+        return modificadas
+
+    @classmethod
+    def valores_existentes(cls, filas):
+        """
+        Variables ya guardadas para las claves de `filas`
+
+        Una consulta por (ubicación, frecuencia, fuente), acotada al rango de
+        fechas de las filas.
+
+        Returns:
+            dict {(ubicacion, frecuencia, fuente, fecha_hora): {variable: valor}}
+        """
+        grupos = {}
+        for fila in filas:
+            clave = (fila['ubicacion'], fila['frecuencia'], fila['fuente'])
+            grupos.setdefault(clave, set()).add(fila['fecha_hora'])
+
+        tabla = cls.__table__
+        existentes = {}
+        for (ubicacion, frecuencia, fuente), fechas in grupos.items():
+            resultado = db.session.execute(lectura_confirmada(
+                select(tabla.c.fecha_hora, *[tabla.c[c] for c in COLUMNAS_VARIABLES])
+                .where(tabla.c.ubicacion == ubicacion, tabla.c.frecuencia == frecuencia,
+                       tabla.c.fuente == fuente,
+                       tabla.c.fecha_hora >= min(fechas), tabla.c.fecha_hora <= max(fechas))
+            ))
+            for fila in resultado.mappings():
+                if fila['fecha_hora'] in fechas:
+                    existentes[(ubicacion, frecuencia, fuente, fila['fecha_hora'])] = {
+                        c: fila[c] for c in COLUMNAS_VARIABLES}
+        return existentes
+
+    @staticmethod
+    def filas_desde_dataframe(df, ubicacion, fuente, frecuencia, consulta_id=None,
+                              latitud=None, longitud=None, variables=VARIABLES_OPENMETEO):
+        """
+        Convierte un DataFrame con columna 'date' (UTC) en filas para insertar_lote
+
+        Las columnas que no están en `variables` se ignoran; NaN se guarda como NULL.
+        """
+        import pandas as pd
+
+        if df is None or len(df) == 0:
+            return
+
+        fechas = pd.to_datetime(df['date'], utc=True).dt.tz_convert(None).dt.to_pydatetime()
+        presentes = {variables[c]: df[c] for c in df.columns if c in variables}
+        # float64 -> float de Python (los drivers no aceptan numpy.float32); NaN -> None
+        valores = {
+            columna: [None if v != v else v for v in serie.astype('float64').tolist()]
+            for columna, serie in presentes.items()
+        }
+
+        for i, fecha in enumerate(fechas):
+            fila = {
+                'consulta_id': consulta_id,
+                'ubicacion': ubicacion,
+                'latitud': latitud,
+                'longitud': longitud,
+                'fuente': fuente,
+                'frecuencia': frecuencia,
+                'fecha_hora': fecha,
+            }
+            for columna, lista in valores.items():
+                fila[columna] = lista[i]
+            yield fila
+
+    def to_dict(self):
+        """Convertir a diccionario"""
+        datos = {
+            'ubicacion': self.ubicacion,
+            'fuente': self.fuente,
+            'frecuencia': self.frecuencia,
+            'fecha_hora': self.fecha_hora.isoformat() if self.fecha_hora else None,
+        }
+        for columna in COLUMNAS_VARIABLES:
+            datos[columna] = getattr(self, columna)
+        return datos
+
+    def __repr__(self):
+        return f'<SerieClima {self.ubicacion} {self.fuente} {self.fecha_hora}>'
+
+
+class VersionSerie(db.Model):
+    """
+    Contador de escrituras por ubicación
+
+    Cambia en la misma transacción que los datos, así que los resultados
+    calculados sobre la serie (estadísticas en caché) se validan con una
+    lectura por clave primaria, también desde otros procesos.
+    """
+
+    __tablename__ = 'versiones_serie'
+
+    ubicacion = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=1)
+    actualizada_en = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def incrementar(cls, ubicaciones):
+        """Incrementa (o crea) la versión de cada ubicación; sin commit"""
+        ubicaciones = sorted(u for u in ubicaciones if u)
+        if not ubicaciones:
+            return
+
+        tabla = cls.__table__
+        ahora = datetime.utcnow()
+        filas = [{'ubicacion': u, 'version': 1, 'actualizada_en': ahora} for u in ubicaciones]
+        dialecto = db.engine.dialect.name
+
+        if dialecto == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+            sentencia = insert(tabla).on_duplicate_key_update(
+                version=tabla.c.version + 1, actualizada_en=ahora)
+        elif dialecto in ('sqlite', 'postgresql'):
+            if dialecto == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            sentencia = insert(tabla).on_conflict_do_update(
+                index_elements=['ubicacion'],
+                set_={'version': tabla.c.version + 1, 'actualizada_en': ahora})
+        else:
+            for ubicacion in ubicaciones:
+                fila = db.session.get(cls, ubicacion)
+                if fila is None:
+                    db.session.add(cls(ubicacion=ubicacion, version=1, actualizada_en=ahora))
+                else:
+                    fila.version += 1
+                    fila.actualizada_en = ahora
+            return
+
+        db.session.execute(sentencia, filas)
+
+    @classmethod
+    def bloquear(cls, ubicaciones):
+        """
+        Bloquea la fila de versión de cada ubicación hasta el fin de la transacción
+
+        Crea con versión 0 las que no existen (VersionSerie.actuales ya las
+        trata como 0) y las lee con SELECT ... FOR UPDATE en orden de clave,
+        para que dos escritores no se bloqueen en orden inverso. Sin commit.
+        """
+        ubicaciones = sorted({u for u in ubicaciones if u})
+        if not ubicaciones:
+            return
+
+        tabla = cls.__table__
+        ahora = datetime.utcnow()
+        filas = [{'ubicacion': u, 'version': 0, 'actualizada_en': ahora} for u in ubicaciones]
+        dialecto = db.engine.dialect.name
+
+        if dialecto == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+            sentencia = insert(tabla).on_duplicate_key_update(ubicacion=tabla.c.ubicacion)
+        elif dialecto in ('sqlite', 'postgresql'):
+            if dialecto == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            sentencia = insert(tabla).on_conflict_do_nothing(index_elements=['ubicacion'])
+        else:
+            for ubicacion in ubicaciones:
+                if db.session.get(cls, ubicacion) is None:
+                    db.session.add(cls(ubicacion=ubicacion, version=0, actualizada_en=ahora))
+            db.session.flush()
+            sentencia = None
+
+        if sentencia is not None:
+            db.session.execute(sentencia, filas)
+        # SQLite no tiene FOR UPDATE: la escritura anterior ya toma el
+        # bloqueo de escritura de la base hasta el commit
+        db.session.execute(
+            select(tabla.c.ubicacion)
+            .where(tabla.c.ubicacion.in_(ubicaciones))
+            .order_by(tabla.c.ubicacion)
+            .with_for_update()
+        )
+
+    @classmethod
+    def actuales(cls, ubicaciones):
+        """dict {ubicacion: version} (0 si la ubicación nunca se escribió)"""
+        ubicaciones = list(ubicaciones)
+        versiones = dict(
+            db.session.query(cls.ubicacion, cls.version)
+            .filter(cls.ubicacion.in_(ubicaciones))
+            .all()
+        )
+        return {u: versiones.get(u, 0) for u in ubicaciones}
+
+    def __repr__(self):
+        return f'<VersionSerie {self.ubicacion} v{self.version}>'
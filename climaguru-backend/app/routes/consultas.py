@@ -4,13 +4,23 @@ Rutas de Consultas
 ==================
 Endpoints para realizar consultas meteorológicas
 """
-from flask import Blueprint, request, jsonify
+from flask import (Blueprint, request, jsonify, Response, stream_with_context, send_file,
+                   current_app)
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
+import json
+import time
 from app.extensions import db
 from app.models.consulta import Consulta
 from app.models.dato_meteorologico import DatosClima
+from app.models.serie_clima import SerieClima, clave_ubicacion
 from app.models.logs_actividad import LogsActividad
+from app.services.weather_service import (obtener_servicio_clima, ServicioSaturado,
+                                          SinDatosProveedores, filas_serie)
+from app.services.job_queue import ESTADOS_FINALES
+from app.services.export_service import (PYARROW_AVAILABLE, FORMATOS_SERIE, FRECUENCIAS,
+                                         GENERADORES, ubicacion_serie, lotes_serie, comprimir_gzip,
+                                         guardar_al_vuelo, leer_archivo, ruta_exportacion)
 
 consultas_bp = Blueprint('consultas', __name__)
 
@@ -32,6 +42,7 @@ def consulta_tiempo_real():
         - consulta: datos de la consulta registrada
         - datos: datos climáticos procesados
     """
+    inicio = time.perf_counter()
     usuario_id = get_jwt_identity()
     data = request.get_json()
     
@@ -41,6 +52,21 @@ def consulta_tiempo_real():
             'error': 'Debe proporcionar ciudad o coordenadas (latitud, longitud)'
         }), 400
     
+    servicio = obtener_servicio_clima()
+    
+    # Resolver coordenadas de la ciudad si no se enviaron
+    if not data.get('latitud') or not data.get('longitud'):
+        try:
+            coordenadas = servicio.resolver_ciudad(data['ciudad'])
+        except ServicioSaturado as e:
+            return jsonify({'error': 'Servicio ocupado, intente de nuevo', 'message': str(e)}), 503
+        if not coordenadas:
+            return jsonify({
+                'error': f"No se encontraron coordenadas para '{data['ciudad']}'"
+            }), 400
+        data['latitud'] = coordenadas['lat']
+        data['longitud'] = coordenadas['lon']
+    
     # Crear registro de consulta
     consulta = Consulta(
         usuario_id=usuario_id,
@@ -57,42 +83,47 @@ def consulta_tiempo_real():
     db.session.add(consulta)
     db.session.commit()
     
-    # TODO: Aquí se integrarían los clientes de las APIs externas
-    # Por ahora, simulamos una respuesta
-    
     try:
-        # Simular consulta a APIs externas
-        # En producción: climapi = ClimaAPIManager()
-        # datos = climapi.get_current_weather(lat, lon)
-        
-        datos_simulados = {
-            'temperatura': 24.5,
-            'humedad': 65,
-            'presion': 1013,
-            'viento_velocidad': 12,
-            'viento_direccion': 180,
-            'descripcion': 'Parcialmente nublado'
-        }
+        resultado = servicio.consultar_tiempo_real(float(consulta.latitud),
+                                                   float(consulta.longitud))
+        agregado = resultado['agregado']
         
         # Guardar datos procesados
         datos_clima = DatosClima(
             consulta_id=consulta.id,
-            temperatura_promedio=datos_simulados['temperatura'],
-            humedad_relativa=datos_simulados['humedad'],
-            presion_atmosferica=datos_simulados['presion'],
-            velocidad_viento=datos_simulados['viento_velocidad'],
-            direccion_viento=datos_simulados['viento_direccion'],
-            descripcion_clima=datos_simulados['descripcion'],
-            fuentes_utilizadas=['openweather', 'openmeteo'],
-            datos_completos=datos_simulados
+            temperatura_promedio=agregado['temperatura_promedio'],
+            temperatura_min=agregado['temperatura_min'],
+            temperatura_max=agregado['temperatura_max'],
+            humedad_relativa=agregado['humedad_relativa'],
+            presion_atmosferica=agregado['presion_atmosferica'],
+            velocidad_viento=agregado['velocidad_viento'],
+            direccion_viento=agregado['direccion_viento'],
+            precipitacion=agregado['precipitacion'],
+            visibilidad=agregado['visibilidad'],
+            descripcion_clima=agregado['descripcion_clima'],
+            fuentes_utilizadas=agregado['fuentes_utilizadas'],
+            datos_completos={'por_fuente': resultado['por_fuente'],
+                             'errores': resultado['errores']}
         )
         
         db.session.add(datos_clima)
         
+        # Observación de cada proveedor en la serie de la ubicación (horaria,
+        # o diaria para los proveedores que solo dan valores del día)
+        SerieClima.insertar_lote(filas_serie(
+            resultado['por_fuente'],
+            datetime.utcnow().replace(minute=0, second=0, microsecond=0),
+            consulta_id=consulta.id,
+            ubicacion=clave_ubicacion(consulta.ciudad, consulta.latitud, consulta.longitud),
+            latitud=consulta.latitud,
+            longitud=consulta.longitud
+        ))
+        
         # Actualizar consulta
         consulta.estado = 'completada'
         consulta.completada_en = datetime.utcnow()
-        consulta.tiempo_respuesta_ms = 500  # Simulado
+        consulta.respuesta_api = resultado['por_fuente']
+        consulta.tiempo_respuesta_ms = round((time.perf_counter() - inicio) * 1000)
         
         db.session.commit()
         
@@ -115,9 +146,23 @@ def consulta_tiempo_real():
             'datos': datos_clima.to_dict()
         }), 200
         
+    except (ServicioSaturado, SinDatosProveedores) as e:
+        db.session.rollback()
+        consulta.estado = 'error'
+        consulta.mensaje_error = str(e)
+        consulta.tiempo_respuesta_ms = round((time.perf_counter() - inicio) * 1000)
+        db.session.commit()
+        
+        return jsonify({
+            'error': 'Proveedores de clima no disponibles',
+            'message': str(e)
+        }), 503
+        
     except Exception as e:
+        db.session.rollback()
         consulta.estado = 'error'
         consulta.mensaje_error = str(e)
+        consulta.tiempo_respuesta_ms = round((time.perf_counter() - inicio) * 1000)
         db.session.commit()
         
         return jsonify({
@@ -142,8 +187,12 @@ def consulta_historico():
         - formato: string (json, csv, txt, yaml)
     
     Returns:
-        - consulta: datos de la consulta
-        - datos: datos históricos procesados
+        - consulta: datos de la consulta (estado 'pendiente')
+        - progreso_url: endpoint para consultar el avance
+        - eventos_url: endpoint de eventos (text/event-stream)
+    
+    La descarga se hace en segundo plano (worker.py); la respuesta es
+    inmediata sin importar la longitud del periodo.
     """
     usuario_id = get_jwt_identity()
     data = request.get_json()
@@ -159,35 +208,145 @@ def consulta_historico():
             'error': 'Debe proporcionar fecha_inicio y fecha_fin'
         }), 400
     
-    # Crear consulta
+    try:
+        fecha_inicio = datetime.strptime(data['fecha_inicio'], '%Y-%m-%d').date()
+        fecha_fin = datetime.strptime(data['fecha_fin'], '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({
+            'error': 'Las fechas deben tener el formato YYYY-MM-DD'
+        }), 400
+    
+    if fecha_fin < fecha_inicio:
+        return jsonify({
+            'error': 'fecha_fin debe ser posterior a fecha_inicio'
+        }), 400
+    
+    # Resolver coordenadas de la ciudad si no se enviaron
+    if not data.get('latitud') or not data.get('longitud'):
+        try:
+            coordenadas = obtener_servicio_clima().resolver_ciudad(data['ciudad'])
+        except ServicioSaturado as e:
+            return jsonify({'error': 'Servicio ocupado, intente de nuevo', 'message': str(e)}), 503
+        if not coordenadas:
+            return jsonify({
+                'error': f"No se encontraron coordenadas para '{data['ciudad']}'"
+            }), 400
+        data['latitud'] = coordenadas['lat']
+        data['longitud'] = coordenadas['lon']
+    
+    # Crear consulta: la fila es el trabajo que reclaman los workers
     consulta = Consulta(
         usuario_id=usuario_id,
         tipo_consulta='historico',
         ciudad=data.get('ciudad'),
         latitud=data.get('latitud'),
         longitud=data.get('longitud'),
-        fecha_inicio=data.get('fecha_inicio'),
-        fecha_fin=data.get('fecha_fin'),
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin,
         formato_salida=data.get('formato', 'json'),
         parametros_solicitados=data.get('parametros'),
-        estado='procesando',
+        estado='pendiente',
+        progreso=0,
         ip_origen=request.remote_addr
     )
     
     db.session.add(consulta)
     db.session.commit()
     
-    # TODO: Integrar con APIs históricas
-    # Por ahora, simulamos
+    return jsonify({
+        'message': 'Consulta histórica encolada',
+        'consulta': consulta.to_dict(),
+        'progreso_url': f'/api/consultas/{consulta.id}/progreso',
+        'eventos_url': f'/api/consultas/{consulta.id}/eventos'
+    }), 202
+
+
+@consultas_bp.route('/<int:consulta_id>/progreso', methods=['GET'])
+@jwt_required()
+def get_progreso(consulta_id):
+    """
+    Estado y avance de una consulta (para sondeo)
     
-    consulta.estado = 'completada'
-    consulta.completada_en = datetime.utcnow()
-    db.session.commit()
+    Returns:
+        - id, estado, progreso (0-100), mensaje_error, completada_en
+    """
+    usuario_id = get_jwt_identity()
     
-    return jsonify({
-        'message': 'Consulta histórica registrada',
-        'consulta': consulta.to_dict()
-    }), 200
+    consulta = Consulta.query.filter_by(id=consulta_id, usuario_id=usuario_id).first()
+    
+    if not consulta:
+        return jsonify({'error': 'Consulta no encontrada'}), 404
+    
+    return jsonify(_estado_consulta(consulta)), 200
+
+
+@consultas_bp.route('/<int:consulta_id>/eventos', methods=['GET'])
+@jwt_required()
+def get_eventos(consulta_id):
+    """
+    Avance de una consulta como Server-Sent Events
+    
+    Emite un evento 'progreso' cada vez que cambia el estado o el avance y
+    cierra el flujo al llegar a 'completada' o 'error'.
+    
+    Cada flujo ocupa un worker síncrono de Flask/gunicorn mientras está
+    abierto, así que dura poco (SSE_MAX_SEGUNDOS) y el navegador reconecta
+    solo (EventSource, con el 'retry' indicado) hasta el estado final. Flujos
+    más largos requieren workers asíncronos (gevent/eventlet) y subir
+    SSE_MAX_SEGUNDOS.
+    
+    Query params:
+        - intervalo: float, segundos entre lecturas (default: 2, min: 1)
+        - max_segundos: int, duración máxima del flujo (default y máximo:
+          SSE_MAX_SEGUNDOS, 30)
+    """
+    usuario_id = get_jwt_identity()
+    
+    consulta = Consulta.query.filter_by(id=consulta_id, usuario_id=usuario_id).first()
+    
+    if not consulta:
+        return jsonify({'error': 'Consulta no encontrada'}), 404
+    
+    tope = current_app.config.get('SSE_MAX_SEGUNDOS', 30)
+    intervalo = max(request.args.get('intervalo', 2.0, type=float), 1.0)
+    max_segundos = min(request.args.get('max_segundos', tope, type=int), tope)
+    
+    def generar():
+        limite = time.monotonic() + max_segundos
+        ultimo = None
+        # Espera del navegador antes de reconectar cuando se cierra el flujo
+        yield f"retry: {round(intervalo * 1000)}\n\n"
+        while True:
+            db.session.expire_all()
+            actual = Consulta.query.get(consulta_id)
+            estado = _estado_consulta(actual)
+            
+            if estado != ultimo:
+                yield f"event: progreso\ndata: {json.dumps(estado)}\n\n"
+                ultimo = estado
+            
+            if actual.estado in ESTADOS_FINALES or time.monotonic() >= limite:
+                break
+            
+            # Comentario SSE para mantener viva la conexión a través de proxies
+            yield ": latido\n\n"
+            time.sleep(intervalo)
+        
+        db.session.remove()
+    
+    return Response(stream_with_context(generar()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _estado_consulta(consulta):
+    """Campos de avance de una consulta"""
+    return {
+        'id': consulta.id,
+        'estado': consulta.estado,
+        'progreso': consulta.progreso,
+        'mensaje_error': consulta.mensaje_error,
+        'completada_en': consulta.completada_en.isoformat() if consulta.completada_en else None
+    }
 
 
 @consultas_bp.route('/mis-consultas', methods=['GET'])
@@ -271,8 +430,14 @@ def descargar_consulta(consulta_id):
     Args:
         consulta_id: ID de la consulta
     
+    Query params:
+        - formato: string (json, csv, txt, yaml, ndjson, parquet) - default: el de la consulta
+        - frecuencia: string (horaria, diaria) - solo series históricas, default: horaria
+    
     Returns:
         - Archivo en formato JSON, CSV, TXT o YAML
+        - Para consultas con serie histórica: CSV, NDJSON (json) o Parquet en
+          streaming, con gzip si el cliente lo acepta y reanudación por Range
     """
     usuario_id = get_jwt_identity()
     
@@ -287,7 +452,13 @@ def descargar_consulta(consulta_id):
     if not consulta.datos_clima:
         return jsonify({'error': 'No hay datos disponibles'}), 404
     
-    formato = consulta.formato_salida
+    formato = request.args.get('formato', consulta.formato_salida)
+    
+    # Series históricas: exportación en streaming desde el almacén columnar
+    ubicacion = ubicacion_serie(consulta)
+    if ubicacion and (formato in FORMATOS_SERIE or formato == 'json'):
+        return _descargar_serie(consulta, ubicacion, 'ndjson' if formato == 'json' else formato)
+    
     datos = consulta.datos_clima.to_dict()
     
     if formato == 'json':
@@ -348,3 +519,49 @@ Fuentes: {', '.join(datos['fuentes_utilizadas'] or [])}
             return jsonify({'error': 'Formato YAML no disponible'}), 500
     
     return jsonify({'error': 'Formato no soportado'}), 400
+
+
+def _descargar_serie(consulta, ubicacion, formato):
+    """
+    Serie de una consulta en streaming
+    
+    Si ya existe el archivo de exportación se sirve desde disco (con ETag,
+    If-Range y Range para reanudar); si no, se genera por lotes mientras se
+    envía y se guarda para las descargas siguientes.
+    """
+    frecuencia = request.args.get('frecuencia', 'horaria')
+    if frecuencia not in FRECUENCIAS:
+        return jsonify({
+            'error': f"Frecuencia no soportada. Opciones: {', '.join(FRECUENCIAS)}"
+        }), 400
+    
+    mimetype, extension, comprimible = FORMATOS_SERIE[formato]
+    ruta = ruta_exportacion(consulta, frecuencia, formato, current_app.config['EXPORT_DIR'])
+    nombre = f'consulta_{consulta.id}_{frecuencia}.{extension}'
+    gzip = comprimible and 'gzip' in request.accept_encodings
+    
+    if ruta.exists():
+        if request.range or not gzip:
+            return send_file(ruta.resolve(), mimetype=mimetype, as_attachment=True,
+                             download_name=nombre, conditional=True, etag=ruta.stem,
+                             max_age=0)
+        cuerpo = leer_archivo(ruta)
+    elif not PYARROW_AVAILABLE:
+        # Los archivos ya exportados se sirven igual; generarlos requiere pyarrow
+        return jsonify({
+            'error': 'Exportación de series no disponible: instalar pyarrow en el servidor'
+        }), 503
+    else:
+        lotes = lotes_serie(ubicacion, frecuencia, current_app.config['WEATHER_DATA_DIR'])
+        cuerpo = guardar_al_vuelo(GENERADORES[formato](lotes), ruta)
+    
+    headers = {
+        'Content-Disposition': f'attachment; filename={nombre}',
+        'Vary': 'Accept-Encoding',
+        'X-Accel-Buffering': 'no'
+    }
+    if gzip:
+        cuerpo = comprimir_gzip(cuerpo)
+        headers['Content-Encoding'] = 'gzip'
+    
+    return Response(cuerpo, mimetype=mimetype, headers=headers)
@@ -4,7 +4,12 @@ Rutas de Datos
 ================
 Endpoints para obtener datos históricos y estadísticas
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from datetime import datetime
+from app.models.serie_clima import SerieClima
+from app.services.stats_service import (calcular_estadisticas, obtener_cache_estadisticas,
+                                        PERCENTILES_POR_DEFECTO)
 
 datos_bp = Blueprint('datos', __name__)
 
@@ -12,3 +17,109 @@ datos_bp = Blueprint('datos', __name__)
 def get_historicos():
     """Obtener datos históricos"""
     return jsonify({'message': 'Endpoint de datos históricos'})
+
+
+@datos_bp.route('/serie', methods=['GET'])
+@jwt_required()
+def get_serie():
+    """
+    Serie de tiempo de una ubicación en un rango
+    
+    Query params:
+        - ubicacion: string (ciudad, o "lat,lon" con 2 decimales)
+        - desde: string (ISO 8601, UTC)
+        - hasta: string (ISO 8601, UTC)
+        - fuente: string (opcional, ej: openmeteo)
+        - frecuencia: string (horaria, diaria) - default: horaria
+        - limite: int (default: 5000, max: 50000)
+    
+    Returns:
+        - serie: lista de puntos ordenados por fecha
+        - total: puntos devueltos
+    """
+    ubicacion = request.args.get('ubicacion', '').strip().lower()
+    frecuencia = request.args.get('frecuencia', 'horaria')
+    limite = min(request.args.get('limite', 5000, type=int), 50000)
+    
+    if not ubicacion:
+        return jsonify({'error': 'Debe proporcionar ubicacion'}), 400
+    
+    if frecuencia not in ('horaria', 'diaria'):
+        return jsonify({'error': 'Frecuencia no soportada. Opciones: horaria, diaria'}), 400
+    
+    try:
+        desde = datetime.fromisoformat(request.args['desde']) if request.args.get('desde') else None
+        hasta = datetime.fromisoformat(request.args['hasta']) if request.args.get('hasta') else None
+    except ValueError:
+        return jsonify({'error': 'Las fechas deben estar en formato ISO 8601'}), 400
+    
+    puntos = (SerieClima.rango(ubicacion, desde, hasta, request.args.get('fuente'), frecuencia)
+              .limit(limite)
+              .all())
+    
+    return jsonify({
+        'ubicacion': ubicacion,
+        'frecuencia': frecuencia,
+        'serie': [p.to_dict() for p in puntos],
+        'total': len(puntos)
+    }), 200
+
+
+@datos_bp.route('/estadisticas', methods=['GET'])
+@jwt_required()
+def get_estadisticas():
+    """
+    Mínimo, promedio, máximo y percentiles por ubicación, fuente e intervalo
+    
+    Query params:
+        - ubicacion: string (una o varias separadas por coma)
+        - variables: string (columnas separadas por coma) - default: temperatura
+        - intervalo: string (hora, dia, mes) - default: dia
+        - frecuencia: string (horaria, diaria) - default: horaria
+        - desde: string (ISO 8601, UTC)
+        - hasta: string (ISO 8601, UTC)
+        - fuente: string (opcional, ej: openmeteo)
+        - percentiles: string (ej: 10,50,90) - default: 10,50,90; vacío para
+          leer días y meses completos de los rollups
+    
+    Returns:
+        - grupos: lista de {ubicacion, fuente, inicio, n, variables}
+        - filas: puntos de la serie agregados
+        - rollups: agregados precalculados leídos
+        - cache: true si el resultado vino de caché
+    """
+    ubicaciones = [u.strip().lower() for u in request.args.get('ubicacion', '').split(',') if u.strip()]
+    variables = [v.strip() for v in request.args.get('variables', 'temperatura').split(',') if v.strip()]
+    frecuencia = request.args.get('frecuencia', 'horaria')
+    
+    if not ubicaciones:
+        return jsonify({'error': 'Debe proporcionar ubicacion'}), 400
+    
+    if frecuencia not in ('horaria', 'diaria'):
+        return jsonify({'error': 'Frecuencia no soportada. Opciones: horaria, diaria'}), 400
+    
+    try:
+        desde = datetime.fromisoformat(request.args['desde']) if request.args.get('desde') else None
+        hasta = datetime.fromisoformat(request.args['hasta']) if request.args.get('hasta') else None
+    except ValueError:
+        return jsonify({'error': 'Las fechas deben estar en formato ISO 8601'}), 400
+    
+    try:
+        percentiles = ([float(p) for p in request.args['percentiles'].split(',') if p.strip()]
+                       if 'percentiles' in request.args else PERCENTILES_POR_DEFECTO)
+    except ValueError:
+        return jsonify({'error': 'Los percentiles deben ser números entre 0 y 100'}), 400
+    
+    try:
+        resultado = calcular_estadisticas(
+            ubicaciones, variables,
+            intervalo=request.args.get('intervalo', 'dia'),
+            frecuencia=frecuencia, desde=desde, hasta=hasta,
+            fuente=request.args.get('fuente'),
+            percentiles=percentiles,
+            cache=obtener_cache_estadisticas()
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(dict(resultado, ubicaciones=ubicaciones, frecuencia=frecuencia)), 200
@@ -0,0 +1,183 @@
+"""
+Servicio de Exportación
+=======================
+Descargas en streaming de las series de una consulta
+
+Las series se leen del almacén columnar por lotes Arrow y cada lote se
+serializa (CSV, NDJSON o Parquet) y se envía apenas está listo, de modo que
+la descarga empieza de inmediato y la memoria del servidor no depende del
+tamaño del periodo. La primera descarga completa queda además en un archivo
+de exportación; las siguientes, y las reanudaciones con Range, se sirven
+desde ese archivo.
+"""
+import io
+import os
+import sys
+import uuid
+import zlib
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Raíz del repositorio (donde vive src/) para importar el almacén columnar
+RAIZ_PROYECTO = Path(__file__).resolve().parents[3]
+if str(RAIZ_PROYECTO) not in sys.path:
+    sys.path.insert(0, str(RAIZ_PROYECTO))
+
+try:
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    from src.data_loaders.columnar_store import ColumnarStore
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# formato -> (mimetype, extensión, comprimible con gzip)
+FORMATOS_SERIE = {
+    'csv': ('text/csv', 'csv', True),
+    'ndjson': ('application/x-ndjson', 'ndjson', True),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', False),
+}
+
+FRECUENCIAS = {'horaria': 'hourly', 'diaria': 'daily'}
+
+# Columnas internas del almacén que no se exportan
+COLUMNAS_INTERNAS = {'location', 'source', 'month', 'kind', 'issued_at'}
+
+TAMAÑO_LOTE = 65536
+TAMAÑO_BLOQUE_ARCHIVO = 256 * 1024
+
+
+def ubicacion_serie(consulta):
+    """Ubicación de la serie de la consulta en el almacén, o None si no tiene"""
+    if not consulta.datos_clima or not consulta.datos_clima.datos_completos:
+        return None
+    return consulta.datos_clima.datos_completos.get('ubicacion_almacen')
+
+
+def lotes_serie(ubicacion, frecuencia='horaria', data_dir='data'):
+    """Lotes Arrow de una serie del almacén, sin columnas internas"""
+    store = ColumnarStore(Path(data_dir) / 'columnar')
+    for lote in store.iter_batches(FRECUENCIAS[frecuencia], location=ubicacion,
+                                   batch_size=TAMAÑO_LOTE):
+        columnas = [c for c in lote.schema.names if c not in COLUMNAS_INTERNAS]
+        yield lote.select(columnas)
+
+
+def generar_csv(lotes):
+    """CSV con encabezado solo en el primer lote"""
+    primero = True
+    for lote in lotes:
+        salida = io.BytesIO()
+        pa_csv.write_csv(lote, salida, write_options=pa_csv.WriteOptions(include_header=primero))
+        primero = False
+        yield salida.getvalue()
+
+
+def generar_ndjson(lotes):
+    """Un objeto JSON por fila"""
+    for lote in lotes:
+        texto = lote.to_pandas().to_json(orient='records', lines=True, date_format='iso')
+        if texto:
+            yield (texto.rstrip('\n') + '\n').encode('utf-8')
+
+
+class _Sumidero(io.RawIOBase):
+    """Archivo de solo escritura que acumula lo escrito hasta que se vacía"""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        datos = bytes(datos)
+        self._partes.append(datos)
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def generar_parquet(lotes):
+    """Parquet con un row group por lote (zstd)"""
+    sumidero = _Sumidero()
+    escritor = None
+    for lote in lotes:
+        if escritor is None:
+            escritor = pq.ParquetWriter(sumidero, lote.schema, compression='zstd')
+        escritor.write_batch(lote)
+        datos = sumidero.vaciar()
+        if datos:
+            yield datos
+
+    if escritor is not None:
+        escritor.close()
+        yield sumidero.vaciar()
+
+
+GENERADORES = {
+    'csv': generar_csv,
+    'ndjson': generar_ndjson,
+    'parquet': generar_parquet,
+}
+
+
+def comprimir_gzip(bloques, nivel=6):
+    """Comprime en gzip a medida que llegan los bloques"""
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    for bloque in bloques:
+        datos = compresor.compress(bloque)
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+def guardar_al_vuelo(bloques, ruta):
+    """
+    Reenvía los bloques y los escribe en `ruta`
+
+    Se escribe en un temporal único y se renombra solo si el flujo termina
+    completo; una descarga interrumpida no deja archivo.
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(f"{ruta.name}.{uuid.uuid4().hex}.part")
+
+    completo = False
+    try:
+        with open(temporal, 'wb') as archivo:
+            for bloque in bloques:
+                archivo.write(bloque)
+                yield bloque
+        completo = True
+    finally:
+        if completo:
+            os.replace(temporal, ruta)
+        else:
+            temporal.unlink(missing_ok=True)
+
+
+def leer_archivo(ruta, tamaño=TAMAÑO_BLOQUE_ARCHIVO):
+    with open(ruta, 'rb') as archivo:
+        while True:
+            bloque = archivo.read(tamaño)
+            if not bloque:
+                break
+            yield bloque
+
+
+def ruta_exportacion(consulta, frecuencia, formato, export_dir):
+    """Archivo de exportación; cambia si la consulta se vuelve a completar"""
+    version = int(consulta.completada_en.timestamp()) if consulta.completada_en else 0
+    extension = FORMATOS_SERIE[formato][1]
+    return Path(export_dir) / f"consulta_{consulta.id}_{frecuencia}_{version}.{extension}"
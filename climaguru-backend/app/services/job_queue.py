@@ -0,0 +1,283 @@
+"""
+Cola de Trabajos
+================
+Consultas históricas en procesos de fondo
+
+La tabla `consultas` es la cola: el endpoint solo registra la consulta como
+'pendiente' y responde de inmediato. Los workers (worker.py) reclaman la
+más antigua con un UPDATE condicional, descargan el periodo por bloques con
+OpenMeteoClient.get_historical, guardan cada bloque en el almacén columnar
+(exportaciones) y en la tabla series_clima (consultas por rango) y
+actualizan `progreso` y `actualizada_en` después de cada bloque, de modo
+que el cliente puede consultar o seguir el avance. Una consulta 'procesando'
+cuyo worker dejó de reportar durante más de LEASE_S se vuelve a reclamar.
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import multiprocessing
+from pathlib import Path
+from datetime import datetime, timedelta
+
+from sqlalchemy import update, or_, and_
+
+from app.extensions import db
+from app.models.consulta import Consulta
+from app.models.dato_meteorologico import DatosClima
+from app.models.serie_clima import SerieClima, clave_ubicacion
+
+logger = logging.getLogger(__name__)
+
+# Raíz del repositorio (donde vive src/) para importar los clientes
+RAIZ_PROYECTO = Path(__file__).resolve().parents[3]
+if str(RAIZ_PROYECTO) not in sys.path:
+    sys.path.insert(0, str(RAIZ_PROYECTO))
+
+# Segundos sin latido tras los cuales una consulta 'procesando' se reclama
+LEASE_S = 600
+# Intentos antes de marcar la consulta como 'error'
+MAX_INTENTOS = 3
+# Espera entre sondeos cuando la cola está vacía
+INTERVALO_SONDEO_S = 2.0
+
+ESTADOS_FINALES = ('completada', 'error')
+
+HOURLY_VARS = ["temperature_2m", "relative_humidity_2m", "wind_speed_10m"]
+DAILY_VARS = ["temperature_2m_max", "temperature_2m_min",
+              "precipitation_sum", "wind_speed_10m_max"]
+
+
+def ubicacion_consulta(consulta_id):
+    """Nombre de la ubicación con que se guarda la serie en el almacén columnar"""
+    return f"consulta_{consulta_id}"
+
+
+def reclamar_siguiente(worker_id):
+    """
+    Reclama la consulta histórica pendiente más antigua
+
+    El UPDATE solo afecta la fila si sigue en el estado leído, así que dos
+    workers nunca procesan la misma consulta.
+
+    Returns:
+        Consulta reclamada o None si la cola está vacía
+    """
+    ahora = datetime.utcnow()
+    vencida = ahora - timedelta(seconds=LEASE_S)
+
+    candidatas = (Consulta.query
+                  .filter(Consulta.tipo_consulta == 'historico')
+                  .filter(or_(Consulta.estado == 'pendiente',
+                              and_(Consulta.estado == 'procesando',
+                                   Consulta.actualizada_en < vencida)))
+                  .order_by(Consulta.creada_en)
+                  .limit(5)
+                  .all())
+
+    for candidata in candidatas:
+        condicion = [Consulta.id == candidata.id, Consulta.estado == candidata.estado]
+        if candidata.estado == 'procesando':
+            condicion.append(Consulta.actualizada_en == candidata.actualizada_en)
+
+        resultado = db.session.execute(
+            update(Consulta)
+            .where(*condicion)
+            .values(estado='procesando', progreso=0, actualizada_en=ahora,
+                    intentos=Consulta.intentos + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        if resultado.rowcount == 1:
+            db.session.refresh(candidata)
+            logger.info(f"[{worker_id}] Consulta {candidata.id} reclamada "
+                        f"(intento {candidata.intentos})")
+            return candidata
+
+    return None
+
+
+def _latido(consulta, progreso):
+    consulta.progreso = progreso
+    consulta.actualizada_en = datetime.utcnow()
+    db.session.commit()
+
+
+def _agregar_diario(diarios):
+    """Campos de DatosClima a partir de las series diarias de todos los bloques"""
+    import pandas as pd
+
+    diarios = [d for d in diarios if d is not None and len(d)]
+    if not diarios:
+        return {}
+    df = pd.concat(diarios, ignore_index=True)
+
+    def estadistico(columna, funcion):
+        if columna not in df.columns or df[columna].isna().all():
+            return None
+        return round(float(getattr(df[columna], funcion)()), 2)
+
+    maximos = df.get('temperature_2m_max')
+    minimos = df.get('temperature_2m_min')
+    promedio = None
+    if maximos is not None and minimos is not None:
+        promedio = round(float(((maximos + minimos) / 2).mean()), 2)
+
+    return {
+        'temperatura_promedio': promedio,
+        'temperatura_min': estadistico('temperature_2m_min', 'min'),
+        'temperatura_max': estadistico('temperature_2m_max', 'max'),
+        'precipitacion': estadistico('precipitation_sum', 'sum'),
+        'velocidad_viento': estadistico('wind_speed_10m_max', 'mean'),
+        'dias': len(df),
+    }
+
+
+def procesar_historico(consulta, cliente):
+    """
+    Descarga el periodo de la consulta por bloques y registra el resultado
+
+    Args:
+        consulta: Consulta reclamada (estado 'procesando')
+        cliente: OpenMeteoClient con almacén columnar
+    """
+    from src.data_sources.openmeteo_backfill import planificar_bloques, meses_por_bloque
+
+    inicio = time.perf_counter()
+    bloques = planificar_bloques(consulta.fecha_inicio, consulta.fecha_fin,
+                                 meses_por_bloque(len(HOURLY_VARS)))
+    ubicacion = ubicacion_consulta(consulta.id)
+    ubicacion_serie = clave_ubicacion(consulta.ciudad, consulta.latitud, consulta.longitud)
+
+    diarios = []
+    filas = 0
+    filas_serie = 0
+    for i, (desde, hasta) in enumerate(bloques, start=1):
+        resultado = cliente.get_historical(
+            lat=float(consulta.latitud), lon=float(consulta.longitud),
+            start_date=desde.isoformat(), end_date=hasta.isoformat(),
+            location_name=ubicacion,
+            hourly_vars=HOURLY_VARS, daily_vars=DAILY_VARS,
+            save_data=False
+        )
+        if cliente.store is not None:
+            escritas = cliente.store.append_result(
+                resultado, source='openmeteo', kind='historical',
+                chunk_id=f"historical-{desde}-{hasta}"
+            )
+            filas += sum(escritas.values())
+
+        for frecuencia_almacen, frecuencia in (('hourly', 'horaria'), ('daily', 'diaria')):
+            filas_serie += SerieClima.insertar_lote(SerieClima.filas_desde_dataframe(
+                resultado.get(frecuencia_almacen), ubicacion_serie, 'openmeteo', frecuencia,
+                consulta_id=consulta.id, latitud=consulta.latitud, longitud=consulta.longitud
+            ))
+        diarios.append(resultado.get('daily'))
+
+        _latido(consulta, round(100 * i / len(bloques)))
+
+    agregado = _agregar_diario(diarios)
+    datos_clima = consulta.datos_clima or DatosClima(consulta_id=consulta.id)
+    datos_clima.temperatura_promedio = agregado.get('temperatura_promedio')
+    datos_clima.temperatura_min = agregado.get('temperatura_min')
+    datos_clima.temperatura_max = agregado.get('temperatura_max')
+    datos_clima.precipitacion = agregado.get('precipitacion')
+    datos_clima.velocidad_viento = agregado.get('velocidad_viento')
+    datos_clima.fuentes_utilizadas = ['openmeteo']
+    datos_clima.datos_completos = {
+        'ubicacion_almacen': ubicacion,
+        'ubicacion_serie': ubicacion_serie,
+        'bloques': len(bloques),
+        'filas': filas,
+        'filas_serie': filas_serie,
+        'dias': agregado.get('dias', 0),
+    }
+    db.session.add(datos_clima)
+
+    consulta.estado = 'completada'
+    consulta.progreso = 100
+    consulta.completada_en = datetime.utcnow()
+    consulta.actualizada_en = consulta.completada_en
+    consulta.tiempo_respuesta_ms = round((time.perf_counter() - inicio) * 1000)
+    db.session.commit()
+
+
+def _registrar_fallo(consulta, error):
+    db.session.rollback()
+    db.session.refresh(consulta)
+    consulta.mensaje_error = str(error)
+    consulta.actualizada_en = datetime.utcnow()
+    if consulta.intentos >= MAX_INTENTOS:
+        consulta.estado = 'error'
+    else:
+        # Vuelve a la cola para otro intento
+        consulta.estado = 'pendiente'
+    db.session.commit()
+
+
+def ejecutar_worker(config_name=None, worker_id='worker-1', intervalo_s=INTERVALO_SONDEO_S):
+    """
+    Bucle de un worker: reclama y procesa consultas hasta recibir SIGTERM/SIGINT
+
+    Args:
+        config_name: Configuración de Flask ('development', 'production', ...)
+        worker_id: Nombre del worker en los logs
+        intervalo_s: Espera cuando la cola está vacía
+    """
+    from app import create_app
+    from src.data_sources.open_meteo import OpenMeteoClient
+
+    app = create_app(config_name)
+    detener = {'valor': False}
+
+    def _detener(*_):
+        detener['valor'] = True
+
+    signal.signal(signal.SIGTERM, _detener)
+    signal.signal(signal.SIGINT, _detener)
+
+    with app.app_context():
+        cliente = OpenMeteoClient(app.config.get('WEATHER_DATA_DIR', 'data'))
+        logger.info(f"[{worker_id}] Worker iniciado (pid {os.getpid()})")
+
+        while not detener['valor']:
+            consulta = reclamar_siguiente(worker_id)
+            if consulta is None:
+                db.session.remove()
+                time.sleep(intervalo_s)
+                continue
+
+            try:
+                procesar_historico(consulta, cliente)
+                logger.info(f"[{worker_id}] Consulta {consulta.id} completada "
+                            f"en {consulta.tiempo_respuesta_ms} ms")
+            except Exception as e:
+                logger.error(f"[{worker_id}] Consulta {consulta.id} falló: {e}")
+                _registrar_fallo(consulta, e)
+            finally:
+                db.session.remove()
+
+        logger.info(f"[{worker_id}] Worker detenido")
+
+
+def iniciar_workers(procesos=2, config_name=None):
+    """Lanza `procesos` workers y espera a que terminen"""
+    contexto = multiprocessing.get_context('spawn')
+    workers = [
+        contexto.Process(target=ejecutar_worker, args=(config_name, f"worker-{i}"),
+                         name=f"climaguru-worker-{i}")
+        for i in range(1, procesos + 1)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
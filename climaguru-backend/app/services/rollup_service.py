@@ -0,0 +1,83 @@
+"""
+Servicio de Rollups
+===================
+Reconstrucción de rollups_clima desde series_clima
+
+Las escrituras normales mantienen los rollups de forma incremental
+(SerieClima.insertar_lote). La reconstrucción cubre los datos cargados por
+fuera de ese camino (backfills, importaciones directas, cambios de esquema):
+borra los rollups del alcance, recorre la serie en lotes y escribe los
+agregados de nuevo. Todo ocurre en una transacción; con una ubicación dada
+toma su bloqueo de escritura (VersionSerie.bloquear), sin ella conviene
+ejecutarla sin workers escribiendo.
+"""
+import time
+import logging
+
+from sqlalchemy import select, delete
+
+from app.extensions import db
+from app.models.serie_clima import SerieClima, VersionSerie, COLUMNAS_VARIABLES
+from app.models.rollup_clima import RollupClima
+
+logger = logging.getLogger(__name__)
+
+TAMAÑO_LOTE_LECTURA = 20000
+
+
+def _filtrar(sentencia, tabla, ubicacion=None, fuente=None):
+    if ubicacion:
+        sentencia = sentencia.where(tabla.c.ubicacion == ubicacion)
+    if fuente:
+        sentencia = sentencia.where(tabla.c.fuente == fuente)
+    return sentencia
+
+
+def reconstruir(ubicacion=None, fuente=None, tamaño_lote=TAMAÑO_LOTE_LECTURA):
+    """
+    Recalcula los rollups de una ubicación/fuente (o de toda la serie)
+
+    Args:
+        ubicacion: Clave de ubicación (None = todas)
+        fuente: Proveedor (None = todos)
+        tamaño_lote: Filas de la serie leídas por lote
+
+    Returns:
+        dict con 'puntos' leídos, 'rollups' escritos, 'ubicaciones' y 'tiempo_ms'
+    """
+    inicio = time.perf_counter()
+    serie = SerieClima.__table__
+    columnas = ['ubicacion', 'fuente', 'frecuencia', 'fecha_hora'] + COLUMNAS_VARIABLES
+
+    if ubicacion:
+        VersionSerie.bloquear([ubicacion])
+    db.session.execute(_filtrar(delete(RollupClima.__table__), RollupClima.__table__,
+                                ubicacion, fuente))
+
+    # Los deltas (uno por rollup) se acumulan en memoria y se escriben al
+    # terminar la lectura, así la conexión no alterna cursor y escrituras
+    deltas = {}
+    ubicaciones = set()
+    puntos = 0
+    resultado = db.session.execute(
+        _filtrar(select(*[serie.c[c] for c in columnas]), serie, ubicacion, fuente),
+        execution_options={'yield_per': tamaño_lote}
+    )
+    for particion in resultado.mappings().partitions():
+        RollupClima.acumular(particion, deltas=deltas)
+        ubicaciones.update(fila['ubicacion'] for fila in particion)
+        puntos += len(particion)
+
+    escritos = RollupClima.combinar(deltas)
+    VersionSerie.incrementar(ubicaciones)
+    db.session.commit()
+
+    tiempo_ms = round((time.perf_counter() - inicio) * 1000)
+    logger.info(f"🔁 Rollups reconstruidos: {puntos} puntos -> {escritos} rollups "
+                f"({len(ubicaciones)} ubicaciones) en {tiempo_ms} ms")
+    return {
+        'puntos': puntos,
+        'rollups': escritos,
+        'ubicaciones': sorted(ubicaciones),
+        'tiempo_ms': tiempo_ms,
+    }
@@ -1 +1,321 @@
-# Cálculo de estadísticas y promedios
\ No newline at end of file
+# Cálculo de estadísticas y promedios
+"""
+Servicio de Estadísticas
+========================
+Mínimo, promedio, máximo y percentiles de series_clima por ubicación,
+fuente e intervalo (hora, día o mes)
+
+El filtro por ubicación, frecuencia y rango se resuelve en SQL con el índice
+único de la serie; solo se leen las columnas pedidas y la agregación se hace
+vectorizada con pandas (groupby + quantile), igual en MySQL y SQLite. Sin
+percentiles, los días y meses completos del rango se leen de rollups_clima
+(unas pocas filas por mes) y solo los extremos parciales de la serie. Los
+resultados quedan en una caché LRU por proceso cuya clave incluye la versión
+de cada ubicación (versiones_serie): cualquier escritura en la serie, desde
+la API o desde un worker, cambia la versión y deja la entrada anterior
+inalcanzable.
+"""
+import time
+import logging
+import threading
+from datetime import timedelta
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models.serie_clima import SerieClima, VersionSerie, COLUMNAS_VARIABLES
+from app.models.rollup_clima import (RollupClima, PERIODOS_POR_FRECUENCIA, PASO_FRECUENCIA,
+                                     inicio_periodo, siguiente_periodo)
+
+logger = logging.getLogger(__name__)
+
+# Intervalo -> regla de truncado de pandas
+INTERVALOS = {'hora': 'h', 'dia': 'D', 'mes': 'M'}
+
+PERCENTILES_POR_DEFECTO = (10, 50, 90)
+
+DECIMALES = 2
+
+
+class CacheEstadisticas:
+    """LRU en memoria con TTL para resultados de agregación"""
+
+    def __init__(self, max_entradas=256, ttl_s=3600):
+        self.max_entradas = max_entradas
+        self.ttl_s = ttl_s
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if expira < time.monotonic():
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._entradas[clave] = (time.monotonic() + self.ttl_s, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+def truncar(fechas, intervalo):
+    """Inicio del intervalo de cada fecha (Series de datetime64)"""
+    regla = INTERVALOS[intervalo]
+    if regla == 'M':
+        return fechas.dt.to_period('M').dt.to_timestamp()
+    return fechas.dt.floor(regla)
+
+
+def _leer_serie(ubicaciones, variables, frecuencia, desde=None, hasta=None, fuente=None):
+    """DataFrame con ubicacion, fuente, fecha_hora y las variables pedidas"""
+    import pandas as pd
+
+    columnas = ['ubicacion', 'fuente', 'fecha_hora'] + list(variables)
+    tabla = SerieClima.__table__
+    consulta = (select(*[tabla.c[c] for c in columnas])
+                .where(tabla.c.ubicacion.in_(ubicaciones), tabla.c.frecuencia == frecuencia))
+    if desde is not None:
+        consulta = consulta.where(tabla.c.fecha_hora >= desde)
+    if hasta is not None:
+        consulta = consulta.where(tabla.c.fecha_hora <= hasta)
+    if fuente:
+        consulta = consulta.where(tabla.c.fuente == fuente)
+
+    filas = db.session.execute(consulta).all()
+    df = pd.DataFrame(filas, columns=columnas)
+    df['fecha_hora'] = pd.to_datetime(df['fecha_hora'])
+    for variable in variables:
+        df[variable] = pd.to_numeric(df[variable], errors='coerce').astype('float64')
+    return df
+
+
+def _valor(numero):
+    return None if numero != numero else round(float(numero), DECIMALES)
+
+
+def agregar(df, variables, intervalo, percentiles=PERCENTILES_POR_DEFECTO):
+    """
+    Estadísticos por ubicación, fuente e intervalo
+
+    Args:
+        df: DataFrame de _leer_serie
+        variables: Columnas a resumir
+        intervalo: 'hora', 'dia' o 'mes'
+        percentiles: Percentiles (0-100)
+
+    Returns:
+        list de dicts {ubicacion, fuente, inicio, n, variables: {variable: {...}}}
+        ordenada por ubicación, fuente e inicio; cada variable con n, min,
+        promedio, max, desviacion (poblacional) y los percentiles pedidos
+    """
+    if df.empty:
+        return []
+
+    df = df.assign(inicio=truncar(df['fecha_hora'], intervalo))
+    grupos = df.groupby(['ubicacion', 'fuente', 'inicio'], sort=True)
+
+    # Columnas planas "variable|estadístico" para recorrer filas sin .loc
+    tabla = grupos[list(variables)].agg(['count', 'min', 'mean', 'max'])
+    tabla.columns = [f"{variable}|{estadistico}" for variable, estadistico in tabla.columns]
+    desviaciones = grupos[list(variables)].std(ddof=0)
+    desviaciones.columns = [f"{variable}|desviacion" for variable in desviaciones.columns]
+    tabla = tabla.join(desviaciones)
+    if percentiles:
+        cuantiles = grupos[list(variables)].quantile([p / 100 for p in percentiles]).unstack()
+        cuantiles.columns = [f"{variable}|p{q * 100:g}" for variable, q in cuantiles.columns]
+        tabla = tabla.join(cuantiles)
+    tabla['n'] = grupos.size()
+
+    nombres = {'count': 'n', 'mean': 'promedio'}
+    resultado = []
+    for fila in tabla.reset_index().to_dict('records'):
+        por_variable = {variable: {} for variable in variables}
+        for columna, valor in fila.items():
+            if '|' not in columna:
+                continue
+            variable, estadistico = columna.split('|')
+            if estadistico == 'count':
+                por_variable[variable]['n'] = int(valor)
+            else:
+                por_variable[variable][nombres.get(estadistico, estadistico)] = _valor(valor)
+
+        resultado.append({
+            'ubicacion': fila['ubicacion'],
+            'fuente': fila['fuente'],
+            'inicio': fila['inicio'].isoformat(),
+            'n': int(fila['n']),
+            'variables': por_variable,
+        })
+    return resultado
+
+
+def _rango_completo(desde, hasta, periodo, frecuencia):
+    """
+    Buckets completamente contenidos en [desde, hasta]
+
+    Returns:
+        (primero, fin): los buckets con inicio en [primero, fin) están
+        completos; None en un extremo significa sin límite
+    """
+    primero = None
+    if desde is not None:
+        primero = inicio_periodo(desde, periodo)
+        if primero < desde:
+            primero = siguiente_periodo(primero, periodo)
+    fin = None
+    if hasta is not None:
+        # El último bucket está completo si su último punto es <= hasta
+        fin = inicio_periodo(hasta + PASO_FRECUENCIA[frecuencia], periodo)
+    return primero, fin
+
+
+def _estadisticas_rollups(ubicaciones, variables, intervalo, frecuencia, desde, hasta, fuente):
+    """
+    Estadísticas de los buckets completos desde rollups_clima y de los
+    extremos parciales desde la serie
+
+    Returns:
+        dict como el de calcular_estadisticas, o None si el rango no
+        contiene ningún bucket completo
+    """
+    import pandas as pd
+
+    primero, fin = _rango_completo(desde, hasta, intervalo, frecuencia)
+    if primero is not None and fin is not None and primero >= fin:
+        return None
+
+    rollups = RollupClima.rango(ubicaciones, variables, intervalo, frecuencia,
+                                primero, fin, fuente).all()
+    por_grupo = {}
+    for rollup in rollups:
+        clave = (rollup.ubicacion, rollup.fuente, rollup.inicio)
+        por_grupo.setdefault(clave, {})[rollup.variable] = rollup.estadisticos()
+
+    vacio = {'n': 0, 'min': None, 'promedio': None, 'max': None, 'desviacion': None}
+    grupos = []
+    for (ubicacion, fuente_grupo, inicio), estadisticos in por_grupo.items():
+        por_variable = {}
+        for variable in variables:
+            valores = estadisticos.get(variable)
+            por_variable[variable] = dict(vacio) if valores is None else {
+                nombre: valor if nombre == 'n' else _valor(valor)
+                for nombre, valor in valores.items()
+            }
+        grupos.append({
+            'ubicacion': ubicacion,
+            'fuente': fuente_grupo,
+            'inicio': inicio.isoformat(),
+            'n': max(v['n'] for v in por_variable.values()),
+            'variables': por_variable,
+        })
+
+    # Extremos parciales del rango
+    bordes = []
+    if primero is not None and desde < primero:
+        bordes.append(_leer_serie(ubicaciones, variables, frecuencia,
+                                  desde, primero - timedelta(seconds=1), fuente))
+    if fin is not None and fin <= hasta:
+        bordes.append(_leer_serie(ubicaciones, variables, frecuencia, fin, hasta, fuente))
+    puntos = sum(len(borde) for borde in bordes)
+    if puntos:
+        grupos.extend(agregar(pd.concat(bordes, ignore_index=True), variables, intervalo, ()))
+
+    grupos.sort(key=lambda g: (g['ubicacion'], g['fuente'], g['inicio']))
+    return {'grupos': grupos, 'filas': puntos, 'rollups': len(rollups)}
+
+
+def calcular_estadisticas(ubicaciones, variables=('temperatura',), intervalo='dia',
+                          frecuencia='horaria', desde=None, hasta=None, fuente=None,
+                          percentiles=PERCENTILES_POR_DEFECTO, cache=None):
+    """
+    Estadísticas agregadas de la serie (con caché invalidada por versión)
+
+    Args:
+        ubicaciones: Claves de ubicación (ver clave_ubicacion)
+        variables: Columnas de SerieClima a resumir
+        intervalo: 'hora', 'dia' o 'mes'
+        frecuencia: Serie de origen ('horaria' o 'diaria')
+        desde, hasta: datetime UTC (inclusivos)
+        fuente: Filtrar por proveedor
+        percentiles: Percentiles (0-100)
+        cache: CacheEstadisticas (None = sin caché)
+
+    Returns:
+        dict con 'grupos', 'filas' (puntos de la serie leídos), 'rollups'
+        (agregados leídos) y 'cache' (True si vino de caché)
+
+    Raises:
+        ValueError: variable, intervalo o percentil no soportado
+    """
+    variables = tuple(variables)
+    ubicaciones = tuple(sorted(set(ubicaciones)))
+    percentiles = tuple(sorted(set(percentiles)))
+
+    invalidas = [v for v in variables if v not in COLUMNAS_VARIABLES]
+    if invalidas:
+        raise ValueError(f"Variables no soportadas: {invalidas}. Opciones: {COLUMNAS_VARIABLES}")
+    if intervalo not in INTERVALOS:
+        raise ValueError(f"Intervalo no soportado: {intervalo}. Opciones: {list(INTERVALOS)}")
+    if frecuencia == 'diaria' and intervalo == 'hora':
+        raise ValueError("El intervalo 'hora' requiere la serie horaria")
+    if any(p < 0 or p > 100 for p in percentiles):
+        raise ValueError("Los percentiles deben estar entre 0 y 100")
+
+    versiones = VersionSerie.actuales(ubicaciones)
+    clave = (ubicaciones, tuple(versiones[u] for u in ubicaciones), variables, intervalo,
+             frecuencia, desde, hasta, fuente, percentiles)
+
+    if cache is not None:
+        guardado = cache.obtener(clave)
+        if guardado is not None:
+            return dict(guardado, cache=True)
+
+    inicio = time.perf_counter()
+    resultado = None
+    # Los percentiles no se pueden componer a partir de agregados
+    if not percentiles and intervalo in PERIODOS_POR_FRECUENCIA[frecuencia]:
+        resultado = _estadisticas_rollups(ubicaciones, variables, intervalo, frecuencia,
+                                          desde, hasta, fuente)
+    if resultado is None:
+        df = _leer_serie(ubicaciones, variables, frecuencia, desde, hasta, fuente)
+        resultado = {
+            'grupos': agregar(df, variables, intervalo, percentiles),
+            'filas': len(df),
+            'rollups': 0,
+        }
+    logger.info(f"📊 Estadísticas de {resultado['filas']} puntos y {resultado['rollups']} rollups "
+                f"({', '.join(ubicaciones)}, {intervalo}) "
+                f"en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+    if cache is not None:
+        cache.guardar(clave, resultado)
+    return dict(resultado, cache=False)
+
+
+def init_estadisticas(app):
+    """Crea la caché de estadísticas de la aplicación"""
+    cache = CacheEstadisticas(
+        max_entradas=app.config.get('STATS_CACHE_ENTRADAS', 256),
+        ttl_s=app.config.get('STATS_CACHE_TTL_S', 3600),
+    )
+    app.extensions['cache_estadisticas'] = cache
+    return cache
+
+
+def obtener_cache_estadisticas():
+    """Caché de estadísticas de la aplicación actual"""
+    return current_app.extensions.get('cache_estadisticas')
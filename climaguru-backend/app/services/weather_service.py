@@ -1 +1,442 @@
-# Integración con APIs de clima
\ No newline at end of file
+# Integración con APIs de clima
+"""
+Servicio de Clima
+=================
+Consulta los proveedores de src/data_sources desde el backend
+
+La aplicación es dueña de un pool acotado de hilos. Cada consulta lanza un
+proveedor por hilo y espera como máximo el plazo configurado: los
+proveedores que no respondan a tiempo se omiten del resultado y el worker de
+Flask nunca queda bloqueado más allá del plazo. Si el pool ya tiene el
+máximo de tareas pendientes, la consulta se rechaza de inmediato en lugar
+de encolarse.
+"""
+import os
+import sys
+import math
+import time
+import atexit
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Raíz del repositorio (donde vive src/) para importar los clientes
+RAIZ_PROYECTO = Path(__file__).resolve().parents[3]
+if str(RAIZ_PROYECTO) not in sys.path:
+    sys.path.insert(0, str(RAIZ_PROYECTO))
+
+try:
+    from src.data_sources.spatial_cache import CacheEspacial
+    from src.data_sources.response_cache import CacheRespuestas
+    SPATIAL_CACHE_AVAILABLE = True
+except ImportError:
+    SPATIAL_CACHE_AVAILABLE = False
+
+try:
+    from src.data_sources.http_transport import con_plazo
+except ImportError:
+    from contextlib import nullcontext as con_plazo
+
+# Orden de preferencia para los campos descriptivos (descripción, visibilidad)
+PROVEEDORES = ['openweather', 'openmeteo', 'meteoblue']
+
+# Proveedores que solo entregan valores del día (van a la serie diaria)
+PROVEEDORES_DIARIOS = {'meteoblue'}
+
+# Códigos WMO de Open-Meteo (weather_code) más comunes
+DESCRIPCION_WMO = {
+    0: 'Despejado', 1: 'Mayormente despejado', 2: 'Parcialmente nublado', 3: 'Nublado',
+    45: 'Niebla', 48: 'Niebla con escarcha',
+    51: 'Llovizna ligera', 53: 'Llovizna', 55: 'Llovizna intensa',
+    61: 'Lluvia ligera', 63: 'Lluvia', 65: 'Lluvia intensa',
+    80: 'Chubascos ligeros', 81: 'Chubascos', 82: 'Chubascos fuertes',
+    95: 'Tormenta', 96: 'Tormenta con granizo', 99: 'Tormenta con granizo fuerte',
+}
+
+
+# Campos normalizados por proveedor -> columnas de SerieClima
+CAMPOS_SERIE = {
+    'temperatura': 'temperatura',
+    'temperatura_min': 'temperatura_min',
+    'temperatura_max': 'temperatura_max',
+    'humedad': 'humedad_relativa',
+    'presion': 'presion_atmosferica',
+    'viento_velocidad': 'velocidad_viento',
+    'viento_direccion': 'direccion_viento',
+    'precipitacion': 'precipitacion',
+}
+
+
+class ServicioSaturado(Exception):
+    """El pool de consultas tiene el máximo de tareas pendientes"""
+    pass
+
+
+class SinDatosProveedores(Exception):
+    """Ningún proveedor respondió dentro del plazo"""
+    pass
+
+
+def _float(valor):
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(valor) else valor
+
+
+def _promedio(valores):
+    valores = [v for v in valores if v is not None]
+    return sum(valores) / len(valores) if valores else None
+
+
+def _promedio_direccion(grados):
+    """Promedio circular de direcciones de viento (0-360)"""
+    grados = [g for g in grados if g is not None]
+    if not grados:
+        return None
+    x = sum(math.cos(math.radians(g)) for g in grados)
+    y = sum(math.sin(math.radians(g)) for g in grados)
+    return round(math.degrees(math.atan2(y, x))) % 360
+
+
+def agregar_resultados(por_fuente):
+    """
+    Combina los resultados normalizados de cada proveedor
+
+    Args:
+        por_fuente: dict {proveedor: dict normalizado}
+
+    Returns:
+        dict con los campos de DatosClima
+    """
+    fuentes = [p for p in PROVEEDORES if p in por_fuente] + \
+              [p for p in por_fuente if p not in PROVEEDORES]
+    valores = lambda campo: [por_fuente[p].get(campo) for p in fuentes]
+    primero = lambda campo: next((v for v in valores(campo) if v is not None), None)
+
+    temperaturas = [v for v in valores('temperatura') if v is not None]
+    minimos = [v for v in valores('temperatura_min') if v is not None] or temperaturas
+    maximos = [v for v in valores('temperatura_max') if v is not None] or temperaturas
+    humedad = _promedio(valores('humedad'))
+
+    return {
+        'temperatura_promedio': _promedio(temperaturas),
+        'temperatura_min': min(minimos) if minimos else None,
+        'temperatura_max': max(maximos) if maximos else None,
+        'presion_atmosferica': _promedio(valores('presion')),
+        'humedad_relativa': round(humedad) if humedad is not None else None,
+        'velocidad_viento': _promedio(valores('viento_velocidad')),
+        'direccion_viento': _promedio_direccion(valores('viento_direccion')),
+        'precipitacion': _promedio(valores('precipitacion')),
+        'visibilidad': primero('visibilidad'),
+        'descripcion_clima': primero('descripcion'),
+        'fuentes_utilizadas': fuentes,
+    }
+
+
+def filas_serie(por_fuente, fecha_hora, **clave):
+    """
+    Filas de SerieClima (una por proveedor) a partir de los resultados normalizados
+
+    Las observaciones van a la serie horaria en `fecha_hora`; los proveedores
+    de PROVEEDORES_DIARIOS (media, extremos y lluvia del día) van a la serie
+    diaria en la fecha que reporta el proveedor.
+
+    Args:
+        por_fuente: dict {proveedor: dict normalizado}
+        fecha_hora: Hora de la observación
+        clave: consulta_id, ubicacion, latitud y longitud
+    """
+    for fuente, datos in por_fuente.items():
+        if fuente in PROVEEDORES_DIARIOS:
+            dia = datos.get('fecha')
+            dia = datetime.fromisoformat(dia) if dia else fecha_hora
+            fila = dict(clave, fuente=fuente, frecuencia='diaria',
+                        fecha_hora=dia.replace(hour=0, minute=0, second=0, microsecond=0))
+        else:
+            fila = dict(clave, fuente=fuente, frecuencia='horaria', fecha_hora=fecha_hora)
+        for campo, columna in CAMPOS_SERIE.items():
+            fila[columna] = datos.get(campo)
+        yield fila
+
+
+class ServicioClima:
+    """
+    Consultas de tiempo real a los proveedores con pool acotado y plazo
+
+    Uso:
+        servicio = obtener_servicio_clima()
+        resultado = servicio.consultar_tiempo_real(6.2518, -75.5636)
+    """
+
+    def __init__(self, max_workers=16, max_pendientes=64, plazo_s=8.0, data_dir='data'):
+        """
+        Args:
+            max_workers: Hilos que consultan proveedores a la vez
+            max_pendientes: Tareas en vuelo admitidas (incluye las que
+                siguen corriendo después de vencer su plazo)
+            plazo_s: Plazo por consulta en segundos
+            data_dir: Directorio de datos de los clientes y de la caché espacial
+        """
+        self.plazo_s = plazo_s
+        self.data_dir = data_dir
+        self.max_pendientes = max_pendientes
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix='servicio-clima')
+        self._cupos = threading.BoundedSemaphore(max_pendientes)
+
+        self._clientes = None
+        self._clientes_lock = threading.Lock()
+        self._espacial = None
+        self._espacial_lock = threading.Lock()
+
+    @property
+    def espacial(self):
+        """Caché espacial en data_dir, creada en la primera consulta (None sin el módulo)"""
+        if self._espacial is None and SPATIAL_CACHE_AVAILABLE:
+            with self._espacial_lock:
+                if self._espacial is None:
+                    self._espacial = CacheEspacial(CacheRespuestas(
+                        ruta_db=Path(self.data_dir) / 'response_cache.sqlite'))
+        return self._espacial
+
+    @espacial.setter
+    def espacial(self, espacial):
+        self._espacial = espacial
+
+    def _inicializar_clientes(self):
+        """Crea los clientes configurados (mismas variables de entorno que ClimAPIManager)"""
+        with self._clientes_lock:
+            if self._clientes is not None:
+                return self._clientes
+
+            clientes = {}
+            try:
+                from src.data_sources.openweather import OpenWeatherMapClient
+                if os.getenv('OPENWEATHER_API_KEY'):
+                    clientes['openweather'] = OpenWeatherMapClient(
+                        os.getenv('OPENWEATHER_API_KEY'), data_dir=self.data_dir)
+            except Exception as e:
+                logger.warning(f"OpenWeatherMap no disponible: {e}")
+
+            try:
+                from src.data_sources.open_meteo import OpenMeteoClient
+                clientes['openmeteo'] = OpenMeteoClient(self.data_dir)
+            except Exception as e:
+                logger.warning(f"Open-Meteo no disponible: {e}")
+
+            try:
+                from src.data_sources.meteoblue import MeteoblueClient
+                if os.getenv('METEOBLUE_API_KEY') and os.getenv('METEOBLUE_SHARED_SECRET'):
+                    clientes['meteoblue'] = MeteoblueClient(
+                        os.getenv('METEOBLUE_API_KEY'), os.getenv('METEOBLUE_SHARED_SECRET'),
+                        data_dir=self.data_dir)
+            except Exception as e:
+                logger.warning(f"Meteoblue no disponible: {e}")
+
+            self._clientes = clientes
+            return clientes
+
+    # ------------------------------------------------------------------
+    # Proveedores: cada uno devuelve un dict normalizado (viento en km/h)
+    # ------------------------------------------------------------------
+
+    def _openweather(self, lat, lon):
+        datos = self._clientes['openweather'].get_current_weather(lat, lon, save_data=False)
+        return {
+            'temperatura': _float(datos['temperature']['current']),
+            'temperatura_min': _float(datos['temperature']['min']),
+            'temperatura_max': _float(datos['temperature']['max']),
+            'humedad': _float(datos['humidity']),
+            'presion': _float(datos['pressure']),
+            'viento_velocidad': _float(datos['wind']['speed'] * 3.6),
+            'viento_direccion': _float(datos['wind']['direction']),
+            'precipitacion': _float((datos.get('rain') or {}).get('1h')),
+            'visibilidad': round(datos['visibility'] * 1000) if datos.get('visibility') else None,
+            'descripcion': datos['weather']['description'],
+        }
+
+    def _openmeteo(self, lat, lon):
+        actual = self._clientes['openmeteo'].get_current(lat, lon)['current']
+        codigo = _float(actual.get('weather_code'))
+        return {
+            'temperatura': _float(actual.get('temperature_2m')),
+            'humedad': _float(actual.get('relative_humidity_2m')),
+            'presion': _float(actual.get('pressure_msl')),
+            'viento_velocidad': _float(actual.get('wind_speed_10m')),
+            'viento_direccion': _float(actual.get('wind_direction_10m')),
+            'precipitacion': _float(actual.get('precipitation')),
+            'descripcion': DESCRIPCION_WMO.get(int(codigo)) if codigo is not None else None,
+        }
+
+    def _meteoblue(self, lat, lon):
+        # basic-day es diario: aporta el rango de temperatura y la precipitación de hoy
+        dia = self._clientes['meteoblue'].get_forecast(lat, lon, save_data=False).get('data_day', {})
+        hoy = lambda campo: _float((dia.get(campo) or [None])[0])
+        return {
+            'fecha': (dia.get('time') or [None])[0],
+            'temperatura': hoy('temperature_mean'),
+            'temperatura_min': hoy('temperature_min'),
+            'temperatura_max': hoy('temperature_max'),
+            'precipitacion': hoy('precipitation'),
+        }
+
+    def _desde_cache(self, proveedor, lat, lon):
+        """Resultado vigente de la celda, leído en el hilo de la petición"""
+        if self.espacial is None:
+            return None
+        try:
+            return self.espacial.leer(proveedor, lat, lon, tipo='actual')
+        except Exception as e:
+            logger.warning(f"Caché espacial no disponible para {proveedor}: {e}")
+            return None
+
+    def _consultar_proveedor(self, proveedor, lat, lon, hasta):
+        # El transporte no espera cuota ni cupo del proveedor más allá del
+        # plazo de la consulta: una cuota agotada falla enseguida en lugar de
+        # dormir un hilo del pool
+        descargar = getattr(self, f'_{proveedor}')
+        with con_plazo(hasta):
+            if self.espacial is None:
+                return descargar(lat, lon)
+            datos, _ = self.espacial.obtener(proveedor, lat, lon, descargar, tipo='actual')
+            return datos
+
+    def _con_plazo(self, funcion, hasta, *args):
+        with con_plazo(hasta):
+            return funcion(*args)
+
+    def _enviar(self, funcion, *args):
+        """Envía una tarea al pool si hay cupo; el cupo se libera al terminar"""
+        if not self._cupos.acquire(blocking=False):
+            raise ServicioSaturado(
+                f"Servicio de clima saturado ({self.max_pendientes} consultas en curso)")
+        try:
+            futuro = self._pool.submit(funcion, *args)
+        except Exception:
+            self._cupos.release()
+            raise
+        futuro.add_done_callback(lambda _: self._cupos.release())
+        return futuro
+
+    def resolver_ciudad(self, ciudad, plazo_s=None):
+        """
+        Coordenadas de una ciudad por geocodificación de OpenWeatherMap
+
+        Returns:
+            dict con lat y lon, o None si no se pudo resolver a tiempo
+        """
+        cliente = self._inicializar_clientes().get('openweather')
+        if cliente is None:
+            return None
+
+        plazo = plazo_s or self.plazo_s
+        futuro = self._enviar(self._con_plazo, cliente.get_coordinates,
+                              time.monotonic() + plazo, ciudad)
+        hechos, _ = wait([futuro], timeout=plazo)
+        if not hechos or futuro.exception() is not None:
+            return None
+        return futuro.result()
+
+    def consultar_tiempo_real(self, lat, lon, plazo_s=None):
+        """
+        Consulta todos los proveedores configurados en paralelo
+
+        Args:
+            lat, lon: Coordenadas
+            plazo_s: Plazo de la consulta (por defecto el del servicio)
+
+        Returns:
+            dict con 'agregado' (campos de DatosClima), 'por_fuente',
+            'errores' {proveedor: mensaje} y 'tiempo_ms'
+
+        Raises:
+            ServicioSaturado: si no hay cupo en el pool y ningún proveedor
+                está en caché
+            SinDatosProveedores: si ningún proveedor respondió a tiempo
+        """
+        inicio = time.perf_counter()
+        plazo = plazo_s or self.plazo_s
+        hasta = time.monotonic() + plazo
+        clientes = self._inicializar_clientes()
+        if not clientes:
+            raise SinDatosProveedores("No hay proveedores de clima configurados")
+
+        # Las celdas en caché se sirven sin ocupar cupo ni hilo del pool, así
+        # que siguen respondiendo aunque el pool esté saturado
+        por_fuente = {}
+        errores = {}
+        futuros = {}
+        saturado = None
+        for proveedor in clientes:
+            datos = self._desde_cache(proveedor, lat, lon)
+            if datos:
+                por_fuente[proveedor] = datos
+                continue
+            try:
+                futuros[self._enviar(self._consultar_proveedor, proveedor, lat, lon,
+                                     hasta)] = proveedor
+            except ServicioSaturado as e:
+                saturado = e
+                errores[proveedor] = str(e)
+
+        if saturado is not None and not futuros and not por_fuente:
+            raise saturado
+
+        hechos, pendientes = wait(futuros, timeout=plazo) if futuros else (set(), set())
+
+        for futuro in hechos:
+            proveedor = futuros[futuro]
+            error = futuro.exception()
+            if error is not None:
+                errores[proveedor] = str(error)
+            elif futuro.result():
+                por_fuente[proveedor] = futuro.result()
+
+        # Los que no alcanzaron el plazo terminan poco después: con con_plazo el
+        # transporte no espera cuota ni cupo y recorta el timeout de red a lo
+        # que queda; su resultado, si llega, queda en la caché espacial
+        for futuro in pendientes:
+            futuro.cancel()
+            errores[futuros[futuro]] = f"Sin respuesta en {plazo:g} s"
+
+        if errores:
+            logger.warning(f"Proveedores con error en ({lat}, {lon}): {errores}")
+
+        if not por_fuente:
+            raise SinDatosProveedores(f"Ningún proveedor respondió: {errores}")
+
+        return {
+            'agregado': agregar_resultados(por_fuente),
+            'por_fuente': por_fuente,
+            'errores': errores,
+            'tiempo_ms': round((time.perf_counter() - inicio) * 1000),
+        }
+
+    def cerrar(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def init_servicio_clima(app):
+    """Crea el servicio de clima de la aplicación"""
+    servicio = ServicioClima(
+        max_workers=app.config.get('WEATHER_MAX_WORKERS', 16),
+        max_pendientes=app.config.get('WEATHER_MAX_PENDIENTES', 64),
+        plazo_s=app.config.get('WEATHER_PLAZO_S', 8.0),
+        data_dir=app.config.get('WEATHER_DATA_DIR', 'data'),
+    )
+    app.extensions['servicio_clima'] = servicio
+    atexit.register(servicio.cerrar)
+    return servicio
+
+
+def obtener_servicio_clima():
+    """Servicio de clima de la aplicación actual"""
+    return current_app.extensions['servicio_clima']
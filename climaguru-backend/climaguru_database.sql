@@ -73,6 +73,9 @@ CREATE TABLE consultas (
     respuesta_api JSON,
     estado ENUM('pendiente', 'procesando', 'completada', 'error') DEFAULT 'pendiente',
     mensaje_error TEXT,
+    progreso SMALLINT DEFAULT 0,
+    intentos INT NOT NULL DEFAULT 0,
+    actualizada_en DATETIME,
     tiempo_respuesta_ms INT,
     ip_origen VARCHAR(45),
     creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -83,6 +86,7 @@ CREATE TABLE consultas (
     INDEX idx_tipo (tipo_consulta),
     INDEX idx_estado (estado),
     INDEX idx_creada (creada_en),
+    INDEX idx_cola (tipo_consulta, estado, creada_en),
     INDEX idx_ciudad (ciudad),
     INDEX idx_coordenadas (latitud, longitud)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -116,6 +120,68 @@ CREATE TABLE datos_clima (
     INDEX idx_fecha (guardado_en)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- =====================================================
+-- TABLA: series_clima
+-- Series de tiempo por ubicación, fuente y hora/día
+-- =====================================================
+CREATE TABLE series_clima (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    consulta_id INT,
+    ubicacion VARCHAR(100) NOT NULL,
+    latitud DECIMAL(10, 8),
+    longitud DECIMAL(11, 8),
+    fuente VARCHAR(30) NOT NULL,
+    frecuencia ENUM('horaria', 'diaria') NOT NULL,
+    fecha_hora DATETIME NOT NULL COMMENT 'UTC',
+    temperatura FLOAT,
+    temperatura_min FLOAT,
+    temperatura_max FLOAT,
+    humedad_relativa FLOAT,
+    presion_atmosferica FLOAT,
+    velocidad_viento FLOAT,
+    direccion_viento FLOAT,
+    precipitacion FLOAT,
+    guardado_en DATETIME,
+    
+    FOREIGN KEY (consulta_id) REFERENCES consultas(id) ON DELETE SET NULL,
+    UNIQUE KEY unique_serie_punto (ubicacion, frecuencia, fecha_hora, fuente),
+    INDEX idx_serie_fuente (fuente, frecuencia, fecha_hora),
+    INDEX ix_series_clima_consulta_id (consulta_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- =====================================================
+-- TABLA: rollups_clima
+-- Agregados diarios y mensuales de series_clima
+-- (n, suma, mínimo, máximo y suma de cuadrados)
+-- =====================================================
+CREATE TABLE rollups_clima (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    ubicacion VARCHAR(100) NOT NULL,
+    fuente VARCHAR(30) NOT NULL,
+    frecuencia ENUM('horaria', 'diaria') NOT NULL,
+    periodo ENUM('dia', 'mes') NOT NULL,
+    inicio DATETIME NOT NULL COMMENT 'UTC',
+    variable VARCHAR(30) NOT NULL,
+    n BIGINT NOT NULL,
+    suma DOUBLE NOT NULL,
+    minimo DOUBLE NOT NULL,
+    maximo DOUBLE NOT NULL,
+    suma_cuadrados DOUBLE NOT NULL,
+    actualizado_en DATETIME,
+    
+    UNIQUE KEY unique_rollup (ubicacion, frecuencia, periodo, variable, inicio, fuente)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- =====================================================
+-- TABLA: versiones_serie
+-- Contador de escrituras por ubicación (invalida estadísticas en caché)
+-- =====================================================
+CREATE TABLE versiones_serie (
+    ubicacion VARCHAR(100) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    actualizada_en DATETIME
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- =====================================================
 -- TABLA: logs_actividad
 -- Registro de actividad de usuarios (auditoría)
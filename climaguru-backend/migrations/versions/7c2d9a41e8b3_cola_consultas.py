@@ -0,0 +1,34 @@
+"""Cola de consultas históricas: progreso, intentos y latido
+
+Revision ID: 7c2d9a41e8b3
+Revises: 281e30e1c663
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2d9a41e8b3'
+down_revision = '281e30e1c663'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('consultas', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('progreso', sa.SmallInteger(), nullable=True,
+                                      server_default='0'))
+        batch_op.add_column(sa.Column('intentos', sa.Integer(), nullable=False,
+                                      server_default='0'))
+        batch_op.add_column(sa.Column('actualizada_en', sa.DateTime(), nullable=True))
+        batch_op.create_index('idx_cola', ['tipo_consulta', 'estado', 'creada_en'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('consultas', schema=None) as batch_op:
+        batch_op.drop_index('idx_cola')
+        batch_op.drop_column('actualizada_en')
+        batch_op.drop_column('intentos')
+        batch_op.drop_column('progreso')
@@ -0,0 +1,52 @@
+"""Tabla series_clima para series de tiempo
+
+Revision ID: b4e1f0c7d295
+Revises: 7c2d9a41e8b3
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e1f0c7d295'
+down_revision = '7c2d9a41e8b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('series_clima',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('consulta_id', sa.Integer(), nullable=True),
+    sa.Column('ubicacion', sa.String(length=100), nullable=False),
+    sa.Column('latitud', sa.Numeric(precision=10, scale=8), nullable=True),
+    sa.Column('longitud', sa.Numeric(precision=11, scale=8), nullable=True),
+    sa.Column('fuente', sa.String(length=30), nullable=False),
+    sa.Column('frecuencia', sa.Enum('horaria', 'diaria', name='frecuencia_enum'), nullable=False),
+    sa.Column('fecha_hora', sa.DateTime(), nullable=False),
+    sa.Column('temperatura', sa.Float(), nullable=True),
+    sa.Column('temperatura_min', sa.Float(), nullable=True),
+    sa.Column('temperatura_max', sa.Float(), nullable=True),
+    sa.Column('humedad_relativa', sa.Float(), nullable=True),
+    sa.Column('presion_atmosferica', sa.Float(), nullable=True),
+    sa.Column('velocidad_viento', sa.Float(), nullable=True),
+    sa.Column('direccion_viento', sa.Float(), nullable=True),
+    sa.Column('precipitacion', sa.Float(), nullable=True),
+    sa.Column('guardado_en', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['consulta_id'], ['consultas.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('ubicacion', 'frecuencia', 'fecha_hora', 'fuente', name='unique_serie_punto')
+    )
+    with op.batch_alter_table('series_clima', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_series_clima_consulta_id'), ['consulta_id'], unique=False)
+        batch_op.create_index('idx_serie_fuente', ['fuente', 'frecuencia', 'fecha_hora'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('series_clima', schema=None) as batch_op:
+        batch_op.drop_index('idx_serie_fuente')
+        batch_op.drop_index(batch_op.f('ix_series_clima_consulta_id'))
+
+    op.drop_table('series_clima')
@@ -0,0 +1,29 @@
+"""Tabla versiones_serie para invalidar estadísticas en caché
+
+Revision ID: e8a3c5d1f604
+Revises: b4e1f0c7d295
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a3c5d1f604'
+down_revision = 'b4e1f0c7d295'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('versiones_serie',
+    sa.Column('ubicacion', sa.String(length=100), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('actualizada_en', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('ubicacion')
+    )
+
+
+def downgrade():
+    op.drop_table('versiones_serie')
@@ -0,0 +1,41 @@
+"""Tabla rollups_clima con agregados diarios y mensuales
+
+Revision ID: f2b7d9e4a816
+Revises: e8a3c5d1f604
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b7d9e4a816'
+down_revision = 'e8a3c5d1f604'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rollups_clima',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('ubicacion', sa.String(length=100), nullable=False),
+    sa.Column('fuente', sa.String(length=30), nullable=False),
+    sa.Column('frecuencia', sa.Enum('horaria', 'diaria', name='frecuencia_enum'), nullable=False),
+    sa.Column('periodo', sa.Enum('dia', 'mes', name='periodo_rollup_enum'), nullable=False),
+    sa.Column('inicio', sa.DateTime(), nullable=False),
+    sa.Column('variable', sa.String(length=30), nullable=False),
+    sa.Column('n', sa.BigInteger(), nullable=False),
+    sa.Column('suma', sa.Float(precision=53), nullable=False),
+    sa.Column('minimo', sa.Float(precision=53), nullable=False),
+    sa.Column('maximo', sa.Float(precision=53), nullable=False),
+    sa.Column('suma_cuadrados', sa.Float(precision=53), nullable=False),
+    sa.Column('actualizado_en', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('ubicacion', 'frecuencia', 'periodo', 'variable', 'inicio', 'fuente',
+                        name='unique_rollup')
+    )
+
+
+def downgrade():
+    op.drop_table('rollups_clima')
@@ -0,0 +1,43 @@
+"""
+Rollups de ClimaGuru Backend
+============================
+Reconstruye los agregados diarios y mensuales de series_clima (backfills)
+
+Uso:
+    python rollups.py                                   # toda la serie
+    python rollups.py --ubicacion medellin
+    python rollups.py --ubicacion medellin --fuente openmeteo
+"""
+import argparse
+import logging
+import os
+
+from app import create_app
+from app.services.rollup_service import reconstruir
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reconstrucción de rollups de series_clima')
+    parser.add_argument('--ubicacion', help='Clave de ubicación (ciudad o "lat,lon")')
+    parser.add_argument('--fuente', help='Proveedor (ej: openmeteo)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(levelname)s: %(message)s')
+
+    env = os.getenv('FLASK_ENV', 'development')
+    print(f"\n{'='*60}")
+    print(f"CLIMAGURU ROLLUPS")
+    print(f"{'='*60}")
+    print(f"Entorno: {env}")
+    print(f"Ubicación: {args.ubicacion or 'todas'}")
+    print(f"Fuente: {args.fuente or 'todas'}")
+    print(f"{'='*60}\n")
+
+    app = create_app(env)
+    with app.app_context():
+        resumen = reconstruir(args.ubicacion.strip().lower() if args.ubicacion else None,
+                              args.fuente)
+
+    print(f"Puntos leídos: {resumen['puntos']}")
+    print(f"Rollups escritos: {resumen['rollups']}")
+    print(f"Tiempo: {resumen['tiempo_ms']} ms")
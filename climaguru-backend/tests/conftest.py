@@ -0,0 +1,18 @@
+"""
+Fixtures compartidas de los tests del backend
+"""
+import pytest
+
+from app import create_app
+from app.extensions import db
+
+
+@pytest.fixture
+def app():
+    """Aplicación de testing con la base de datos en memoria creada"""
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,90 @@
+"""
+Tests de la cola de consultas históricas: reclamo, lease y reintentos
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models.consulta import Consulta
+from app.models.usuario import Usuario
+from app.services.job_queue import LEASE_S, MAX_INTENTOS, reclamar_siguiente, _registrar_fallo
+
+
+@pytest.fixture
+def usuario(app):
+    usuario = Usuario('operario', 'operario@climaguru.co', 'clave-segura')
+    db.session.add(usuario)
+    db.session.commit()
+    return usuario
+
+
+def _historica(usuario, **campos):
+    consulta = Consulta(usuario_id=usuario.id, tipo_consulta='historico', ciudad='Medellín',
+                        fecha_inicio=date(2024, 1, 1), fecha_fin=date(2024, 1, 31), **campos)
+    db.session.add(consulta)
+    db.session.commit()
+    return consulta
+
+
+def test_reclama_la_pendiente_mas_antigua(usuario):
+    reciente = _historica(usuario, creada_en=datetime(2024, 2, 2))
+    antigua = _historica(usuario, creada_en=datetime(2024, 2, 1))
+
+    reclamada = reclamar_siguiente('w1')
+
+    assert reclamada.id == antigua.id
+    assert reclamada.estado == 'procesando'
+    assert reclamada.intentos == 1
+    assert reclamada.actualizada_en is not None
+    assert reclamar_siguiente('w2').id == reciente.id
+    # Cola vacía: ambas están en proceso con el lease vigente
+    assert reclamar_siguiente('w3') is None
+
+
+def test_ignora_consultas_de_tiempo_real(usuario):
+    consulta = Consulta(usuario_id=usuario.id, tipo_consulta='tiempo_real', ciudad='Cali')
+    db.session.add(consulta)
+    db.session.commit()
+
+    assert reclamar_siguiente('w1') is None
+
+
+def test_reclama_consulta_con_lease_vencido(usuario):
+    vencida = datetime.utcnow() - timedelta(seconds=LEASE_S + 60)
+    vigente = datetime.utcnow() - timedelta(seconds=LEASE_S // 2)
+    abandonada = _historica(usuario, estado='procesando', intentos=1, actualizada_en=vencida)
+    _historica(usuario, estado='procesando', intentos=1, actualizada_en=vigente)
+
+    reclamada = reclamar_siguiente('w2')
+
+    assert reclamada.id == abandonada.id
+    assert reclamada.intentos == 2
+    assert reclamada.actualizada_en > vencida
+    assert reclamar_siguiente('w3') is None
+
+
+def test_fallo_vuelve_a_la_cola_hasta_agotar_intentos(usuario):
+    _historica(usuario)
+
+    for intento in range(1, MAX_INTENTOS + 1):
+        consulta = reclamar_siguiente('w1')
+        assert consulta.intentos == intento
+        _registrar_fallo(consulta, RuntimeError(f'fallo {intento}'))
+
+        esperado = 'error' if intento == MAX_INTENTOS else 'pendiente'
+        assert consulta.estado == esperado
+        assert consulta.mensaje_error == f'fallo {intento}'
+
+    assert reclamar_siguiente('w1') is None
+
+
+def test_fallo_descarta_cambios_sin_confirmar(usuario):
+    _historica(usuario)
+    consulta = reclamar_siguiente('w1')
+    consulta.progreso = 80
+
+    _registrar_fallo(consulta, ValueError('bloque inválido'))
+
+    assert consulta.progreso == 0
+    assert consulta.estado == 'pendiente'
@@ -0,0 +1,144 @@
+"""
+Tests de la serie: versión por ubicación y rollups incrementales
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models.rollup_clima import RollupClima, PERIODOS_POR_FRECUENCIA, inicio_periodo
+from app.models.serie_clima import SerieClima, VersionSerie, COLUMNAS_VARIABLES
+from app.services.rollup_service import reconstruir
+
+INICIO = datetime(2024, 1, 31, 20)
+
+
+def _filas(horas, ubicacion='medellin', fuente='openmeteo', desde=INICIO, **valores):
+    for i in range(horas):
+        fila = {'ubicacion': ubicacion, 'fuente': fuente, 'frecuencia': 'horaria',
+                'fecha_hora': desde + timedelta(hours=i),
+                'temperatura': 15.0 + (i % 7), 'humedad_relativa': 60.0 + (i % 11)}
+        fila.update(valores)
+        yield fila
+
+
+def _rollups():
+    return {
+        (r.ubicacion, r.frecuencia, r.periodo, r.variable, r.inicio, r.fuente):
+            (r.n, r.suma, r.minimo, r.maximo, r.suma_cuadrados)
+        for r in RollupClima.query.all()
+    }
+
+
+def _agregados_serie():
+    """Los mismos agregados calculados directamente desde series_clima"""
+    agregados = {}
+    for punto in SerieClima.query.all():
+        for variable in COLUMNAS_VARIABLES:
+            valor = getattr(punto, variable)
+            if valor is None:
+                continue
+            for periodo in PERIODOS_POR_FRECUENCIA[punto.frecuencia]:
+                clave = (punto.ubicacion, punto.frecuencia, periodo, variable,
+                         inicio_periodo(punto.fecha_hora, periodo), punto.fuente)
+                n, suma, minimo, maximo, cuadrados = agregados.get(
+                    clave, (0, 0.0, valor, valor, 0.0))
+                agregados[clave] = (n + 1, suma + valor, min(minimo, valor),
+                                    max(maximo, valor), cuadrados + valor * valor)
+    return agregados
+
+
+def _comparar(obtenidos, esperados):
+    assert obtenidos.keys() == esperados.keys()
+    for clave, valores in esperados.items():
+        assert obtenidos[clave] == pytest.approx(valores), clave
+
+
+def _insertar(filas):
+    total = SerieClima.insertar_lote(filas, tamaño_lote=5)
+    db.session.commit()
+    return total
+
+
+def test_version_no_cambia_al_reescribir_los_mismos_valores(app):
+    _insertar(_filas(12))
+    assert VersionSerie.actuales(['medellin']) == {'medellin': 1}
+
+    assert _insertar(_filas(12)) == 12
+    assert VersionSerie.actuales(['medellin']) == {'medellin': 1}
+
+
+def test_version_cambia_con_valores_nuevos_o_distintos(app):
+    _insertar(_filas(12))
+    _insertar(_filas(12, temperatura=30.0))
+    assert VersionSerie.actuales(['medellin']) == {'medellin': 2}
+
+    # Solo cambia la versión de la ubicación escrita
+    _insertar(_filas(3, ubicacion='cali'))
+    assert VersionSerie.actuales(['medellin', 'cali']) == {'medellin': 2, 'cali': 1}
+
+
+def test_version_cambia_con_filas_nuevas_sin_variables(app):
+    _insertar(_filas(2))
+    _insertar(_filas(1, desde=INICIO + timedelta(days=1),
+                     temperatura=None, humedad_relativa=None))
+    assert VersionSerie.actuales(['medellin']) == {'medellin': 2}
+
+
+def test_acumular_suma_puntos_nuevos_y_marca_los_reemplazados():
+    filas = list(_filas(2))
+    anteriores = {('medellin', 'horaria', 'openmeteo', INICIO): {'temperatura': 15.0,
+                                                                'humedad_relativa': 50.0}}
+
+    deltas, recalcular = RollupClima.acumular(filas, anteriores)
+
+    dia, mes = INICIO.replace(hour=0), INICIO.replace(day=1, hour=0)
+    # Temperatura igual: no cuenta; humedad distinta: recalcula su día
+    assert deltas[('medellin', 'horaria', 'dia', 'temperatura', dia, 'openmeteo')] == \
+        [1, 16.0, 16.0, 16.0, 256.0]
+    assert deltas[('medellin', 'horaria', 'mes', 'humedad_relativa', mes, 'openmeteo')] == \
+        [1, 61.0, 61.0, 61.0, 3721.0]
+    assert recalcular == {('medellin', 'openmeteo', 'horaria', 'humedad_relativa', 'dia', dia)}
+
+
+def test_rollups_incrementales_coinciden_con_reconstruir_y_la_serie(app):
+    # Puntos nuevos que cruzan día y mes, en lotes y en varias transacciones
+    _insertar(_filas(60))
+    _insertar(_filas(30, fuente='openweather', desde=INICIO + timedelta(hours=10)))
+    _insertar(_filas(24, ubicacion='cali'))
+    # Reemplazos: valores distintos, iguales y borrados (None)
+    _insertar(_filas(8, desde=INICIO + timedelta(hours=2), temperatura=35.0))
+    _insertar(_filas(6, desde=INICIO + timedelta(hours=26), humedad_relativa=None))
+    _insertar(_filas(12))
+    # Serie diaria: solo rollup mensual
+    _insertar({'ubicacion': 'medellin', 'fuente': 'meteoblue', 'frecuencia': 'diaria',
+               'fecha_hora': datetime(2024, 2, d), 'precipitacion': float(d)}
+              for d in range(1, 10))
+
+    incrementales = _rollups()
+    _comparar(incrementales, _agregados_serie())
+
+    resumen = reconstruir()
+    assert resumen['puntos'] == SerieClima.query.count()
+    _comparar(_rollups(), incrementales)
+
+
+def test_reconstruir_una_ubicacion_no_toca_las_demas(app):
+    _insertar(_filas(30))
+    _insertar(_filas(30, ubicacion='cali'))
+    antes = _rollups()
+
+    resumen = reconstruir(ubicacion='cali')
+
+    assert resumen['ubicaciones'] == ['cali']
+    _comparar(_rollups(), antes)
+    assert VersionSerie.actuales(['medellin', 'cali']) == {'medellin': 1, 'cali': 2}
+
+
+def test_bloquear_crea_la_version_sin_incrementarla(app):
+    _insertar(_filas(2))
+
+    VersionSerie.bloquear(['cali', 'medellin', None])
+
+    assert db.session.get(VersionSerie, 'cali').version == 0
+    assert VersionSerie.actuales(['medellin', 'cali']) == {'medellin': 1, 'cali': 0}
@@ -0,0 +1,156 @@
+"""
+Tests del servicio de clima: agregación, plazo y saturación del pool
+"""
+import time
+import threading
+from datetime import datetime
+
+import pytest
+
+from app.services.weather_service import (ServicioClima, ServicioSaturado, SinDatosProveedores,
+                                          agregar_resultados, filas_serie)
+from src.data_sources.http_transport import TransporteHTTP
+from src.data_sources.rate_limiter import LimitadorTasa
+from src.data_sources.response_cache import CacheRespuestas
+from src.data_sources.spatial_cache import CacheEspacial
+
+LAT, LON = 6.2518, -75.5636
+
+
+@pytest.fixture
+def servicio():
+    servicio = ServicioClima(max_workers=2, max_pendientes=2, plazo_s=0.5)
+    servicio.espacial = CacheEspacial(CacheRespuestas(ruta_db=None))
+    servicio._clientes = {'openweather': object(), 'openmeteo': object()}
+    yield servicio
+    servicio.cerrar()
+
+
+def test_agregar_resultados_promedios_y_extremos():
+    agregado = agregar_resultados({
+        'openmeteo': {'temperatura': 20.0, 'humedad': 70.0, 'presion': 1012.0,
+                      'viento_direccion': 350.0, 'descripcion': 'Nublado'},
+        'openweather': {'temperatura': 24.0, 'temperatura_min': 18.0, 'temperatura_max': 26.0,
+                        'humedad': 81.0, 'presion': 1014.0, 'viento_direccion': 10.0,
+                        'descripcion': 'nubes dispersas', 'visibilidad': 10000},
+    })
+
+    assert agregado['temperatura_promedio'] == pytest.approx(22.0)
+    assert agregado['temperatura_min'] == 18.0
+    assert agregado['temperatura_max'] == 26.0
+    assert agregado['presion_atmosferica'] == pytest.approx(1013.0)
+    assert agregado['humedad_relativa'] == 76
+    # Promedio circular: 350° y 10° dan 0°, no 180°
+    assert agregado['direccion_viento'] == 0
+    # Campos descriptivos en orden de preferencia de proveedores
+    assert agregado['descripcion_clima'] == 'nubes dispersas'
+    assert agregado['fuentes_utilizadas'] == ['openweather', 'openmeteo']
+
+
+def test_agregar_resultados_sin_extremos_usa_temperaturas():
+    agregado = agregar_resultados({'openmeteo': {'temperatura': 21.5}})
+
+    assert agregado['temperatura_min'] == 21.5
+    assert agregado['temperatura_max'] == 21.5
+    assert agregado['direccion_viento'] is None
+
+
+def test_filas_serie_valores_del_dia_van_a_la_serie_diaria():
+    hora = datetime(2024, 3, 10, 4)
+    filas = list(filas_serie({
+        'openmeteo': {'temperatura': 18.0, 'humedad': 80.0},
+        'meteoblue': {'fecha': '2024-03-09', 'temperatura': 21.0, 'temperatura_min': 15.0,
+                      'temperatura_max': 27.0, 'precipitacion': 6.5},
+    }, hora, ubicacion='medellin', consulta_id=1))
+
+    horaria, diaria = filas
+    assert (horaria['fuente'], horaria['frecuencia'], horaria['fecha_hora']) == \
+        ('openmeteo', 'horaria', hora)
+    assert horaria['humedad_relativa'] == 80.0
+    # Fecha local reportada por el proveedor, no la hora UTC de la consulta
+    assert (diaria['fuente'], diaria['frecuencia'], diaria['fecha_hora']) == \
+        ('meteoblue', 'diaria', datetime(2024, 3, 9))
+    assert diaria['precipitacion'] == 6.5
+    assert diaria['ubicacion'] == 'medellin'
+
+
+def test_proveedor_lento_se_omite_al_vencer_el_plazo(servicio):
+    servicio._openweather = lambda lat, lon: {'temperatura': 25.0}
+    servicio._openmeteo = lambda lat, lon: time.sleep(2) or {'temperatura': 10.0}
+
+    inicio = time.perf_counter()
+    resultado = servicio.consultar_tiempo_real(LAT, LON, plazo_s=0.3)
+
+    assert time.perf_counter() - inicio < 1.0
+    assert list(resultado['por_fuente']) == ['openweather']
+    assert 'openmeteo' in resultado['errores']
+    assert resultado['agregado']['temperatura_promedio'] == 25.0
+
+
+def test_sin_respuestas_lanza_sin_datos(servicio):
+    def falla(lat, lon):
+        raise RuntimeError('caído')
+
+    servicio._openweather = falla
+    servicio._openmeteo = falla
+
+    with pytest.raises(SinDatosProveedores):
+        servicio.consultar_tiempo_real(LAT, LON)
+
+
+def test_pool_saturado_rechaza_de_inmediato(servicio):
+    liberar = threading.Event()
+    servicio._enviar(liberar.wait)
+    servicio._enviar(liberar.wait)
+    servicio._openweather = servicio._openmeteo = lambda lat, lon: {'temperatura': 20.0}
+
+    try:
+        with pytest.raises(ServicioSaturado):
+            servicio.consultar_tiempo_real(LAT, LON)
+    finally:
+        liberar.set()
+
+
+def test_celdas_en_cache_se_sirven_con_el_pool_saturado(servicio):
+    for proveedor in servicio._clientes:
+        servicio.espacial.obtener(proveedor, LAT, LON, lambda lat, lon: {'temperatura': 19.0},
+                                  tipo='actual')
+
+    liberar = threading.Event()
+    servicio._enviar(liberar.wait)
+    servicio._enviar(liberar.wait)
+
+    try:
+        resultado = servicio.consultar_tiempo_real(LAT, LON)
+    finally:
+        liberar.set()
+
+    assert set(resultado['por_fuente']) == {'openweather', 'openmeteo'}
+    assert resultado['errores'] == {}
+
+
+def test_cuota_agotada_falla_dentro_del_plazo(servicio, tmp_path):
+    # Cuota diaria agotada: sin plazo el hilo dormiría casi un día
+    limitador = LimitadorTasa(tmp_path / 'limites.sqlite', cuotas={'meteoblue': [(1, 86400)]})
+    limitador.adquirir('meteoblue')
+    transporte = TransporteHTTP(limitador=limitador, usar_cache=False)
+    servicio._clientes = {'meteoblue': object()}
+    servicio._meteoblue = lambda lat, lon: transporte.get('http://127.0.0.1:9/',
+                                                          proveedor='meteoblue')
+
+    inicio = time.perf_counter()
+    with pytest.raises(SinDatosProveedores, match='plazo'):
+        servicio.consultar_tiempo_real(LAT, LON, plazo_s=2.0)
+
+    # Falla de inmediato en lugar de dormir el hilo del pool
+    assert time.perf_counter() - inicio < 0.5
+
+
+def test_cache_espacial_se_crea_en_el_directorio_de_datos(tmp_path):
+    servicio = ServicioClima(data_dir=str(tmp_path / 'datos'))
+    try:
+        assert not (tmp_path / 'datos').exists()
+        assert servicio.espacial.leer('openmeteo', LAT, LON, tipo='actual') is None
+        assert (tmp_path / 'datos' / 'response_cache.sqlite').exists()
+    finally:
+        servicio.cerrar()
@@ -0,0 +1,34 @@
+"""
+Workers de ClimaGuru Backend
+============================
+Procesa en segundo plano las consultas históricas encoladas
+
+Uso:
+    python worker.py              # 2 procesos
+    python worker.py --procesos 4
+"""
+import argparse
+import logging
+import os
+
+from app.services.job_queue import iniciar_workers
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Workers de consultas históricas')
+    parser.add_argument('--procesos', type=int,
+                        default=int(os.getenv('WORKER_PROCESOS', 2)),
+                        help='Número de procesos worker')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(processName)s %(levelname)s: %(message)s')
+
+    env = os.getenv('FLASK_ENV', 'development')
+    print(f"\n{'='*60}")
+    print(f"CLIMAGURU WORKERS")
+    print(f"{'='*60}")
+    print(f"Entorno: {env}")
+    print(f"Procesos: {args.procesos}")
+    print(f"{'='*60}\n")
+
+    iniciar_workers(args.procesos, env)
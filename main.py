@@ -18,7 +18,9 @@ import sys
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import json
+import time
 
 # Añadir el directorio raíz al path
 sys.path.insert(0, str(Path(__file__).parent))
@@ -279,8 +281,24 @@ class ClimAPIManager:
         except Exception as e:
             print(f"❌ Error en SIATA: {e}")
     
-    def consulta_completa(self, lat, lon, location_name, asl=0):
-        """Realiza una consulta completa a todas las APIs disponibles"""
+    def consulta_completa(self, lat, lon, location_name, asl=0,
+                          concurrente=True, timeout_proveedor=30):
+        """
+        Realiza una consulta completa a todas las APIs disponibles
+        
+        Args:
+            lat: Latitud
+            lon: Longitud
+            location_name: Nombre de la ubicación
+            asl: Altitud sobre el nivel del mar (metros)
+            concurrente: Si consultar todos los proveedores en paralelo
+            timeout_proveedor: Plazo máximo en segundos por proveedor (modo concurrente).
+                Puede ser un número o un dict {proveedor: segundos}
+        
+        Returns:
+            Diccionario con los resultados por proveedor. Los proveedores que no
+            respondieron a tiempo quedan en None y se listan en "sin_respuesta"
+        """
         print(f"\n{'='*70}")
         print(f"CONSULTA COMPLETA PARA: {location_name}")
         print(f"Coordenadas: {lat}°N, {lon}°W")
@@ -293,27 +311,95 @@ class ClimAPIManager:
             "meteoblue": None,
             "openmeteo": None,
             "openweather": None,
-            "meteosource": None
+            "meteosource": None,
+            "tiempos_s": {},
+            "sin_respuesta": []
         }
         
-        # Meteoblue
-        resultados["meteoblue"] = self.consultar_meteoblue(lat, lon, location_name, asl)
+        # Meteosource (convertir nombre a place_id)
+        place_id = location_name.lower().replace(' ', '_').replace('í', 'i').replace('ó', 'o').replace('á', 'a')
         
-        # Open-Meteo
-        resultados["openmeteo"] = self.consultar_openmeteo(lat, lon, location_name)
+        tareas = {
+            "meteoblue": (self.consultar_meteoblue, (lat, lon, location_name, asl)),
+            "openmeteo": (self.consultar_openmeteo, (lat, lon, location_name)),
+            "openweather": (self.consultar_openweather, (lat, lon, location_name)),
+            "meteosource": (self.consultar_meteosource, (place_id, location_name)),
+        }
         
-        # OpenWeatherMap
-        resultados["openweather"] = self.consultar_openweather(lat, lon, location_name)
+        inicio = time.perf_counter()
         
-        # Meteosource (convertir nombre a place_id)
-        place_id = location_name.lower().replace(' ', '_').replace('í', 'i').replace('ó', 'o').replace('á', 'a')
-        resultados["meteosource"] = self.consultar_meteosource(place_id, location_name)
+        if concurrente:
+            self._consultar_proveedores_concurrente(tareas, resultados, timeout_proveedor)
+        else:
+            for proveedor, (funcion, args) in tareas.items():
+                t0 = time.perf_counter()
+                resultados[proveedor] = funcion(*args)
+                resultados["tiempos_s"][proveedor] = round(time.perf_counter() - t0, 3)
+        
+        resultados["duracion_total_s"] = round(time.perf_counter() - inicio, 3)
+        print(f"\n⏱️  Consulta completa en {resultados['duracion_total_s']:.2f} s")
         
         # Guardar resumen
         self._guardar_resumen_consulta(resultados)
         
         return resultados
     
+    def _consultar_proveedores_concurrente(self, tareas, resultados, timeout_proveedor):
+        """
+        Ejecuta las consultas de proveedores en paralelo con un plazo por proveedor
+        
+        Cada proveedor corre en su propio hilo. Los que superan su plazo se dejan
+        en None y la consulta retorna con los resultados parciales disponibles;
+        sus hilos terminan en segundo plano sin bloquear al llamador.
+        """
+        inicio = time.perf_counter()
+        
+        if isinstance(timeout_proveedor, dict):
+            plazos = {p: inicio + timeout_proveedor.get(p, 30) for p in tareas}
+        else:
+            plazos = {p: inicio + timeout_proveedor for p in tareas}
+        
+        executor = ThreadPoolExecutor(max_workers=len(tareas),
+                                      thread_name_prefix="climapi")
+        futuros = {
+            executor.submit(funcion, *args): proveedor
+            for proveedor, (funcion, args) in tareas.items()
+        }
+        pendientes = set(futuros)
+        
+        try:
+            while pendientes:
+                ahora = time.perf_counter()
+                
+                # Descartar proveedores cuyo plazo ya venció
+                vencidos = {f for f in pendientes if plazos[futuros[f]] <= ahora}
+                for futuro in vencidos:
+                    proveedor = futuros[futuro]
+                    futuro.cancel()
+                    resultados["sin_respuesta"].append(proveedor)
+                    print(f"⏰ {proveedor}: sin respuesta tras "
+                          f"{plazos[proveedor] - inicio:.0f} s, se omite")
+                pendientes -= vencidos
+                
+                if not pendientes:
+                    break
+                
+                espera = min(plazos[futuros[f]] for f in pendientes) - ahora
+                completados, pendientes = wait(pendientes, timeout=max(espera, 0),
+                                               return_when=FIRST_COMPLETED)
+                
+                for futuro in completados:
+                    proveedor = futuros[futuro]
+                    resultados["tiempos_s"][proveedor] = round(time.perf_counter() - inicio, 3)
+                    try:
+                        resultados[proveedor] = futuro.result()
+                    except Exception as e:
+                        print(f"❌ Error en {proveedor}: {e}")
+                        resultados[proveedor] = None
+        finally:
+            # No esperar a los hilos de proveedores lentos
+            executor.shutdown(wait=False, cancel_futures=True)
+    
     def _guardar_resumen_consulta(self, resultados):
         """Guarda un resumen de la consulta completa"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
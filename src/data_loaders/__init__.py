@@ -4,5 +4,6 @@ Módulo de carga de datos de múltiples fuentes
 from .json_loader import JSONDataLoader
 from .file_loader import FileLoader
 from .unified_loader import UnifiedDataLoader
+from .columnar_store import ColumnarStore
 
-__all__ = ['JSONDataLoader', 'FileLoader', 'UnifiedDataLoader']
+__all__ = ['JSONDataLoader', 'FileLoader', 'UnifiedDataLoader', 'ColumnarStore']
@@ -0,0 +1,295 @@
+"""
+Almacenamiento columnar (Parquet) para series horarias y diarias
+Particionado por fuente / ubicación / mes, con columnas float32 y marcas de
+tiempo UTC, para que las lecturas de años de historia sean lecturas con
+filtros empujados al formato en lugar de parseos de CSV.
+"""
+
+import logging
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.compute as pc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+TIME_COLUMN = 'date'
+FREQUENCIES = ('hourly', 'daily')
+PARTITION_COLUMNS = ['source', 'location', 'month']
+
+
+class ColumnarStore:
+    """
+    Almacén Parquet particionado estilo Hive:
+    <base>/<frecuencia>/source=<fuente>/location=<ubicación>/month=<YYYY-MM>/*.parquet
+
+    Uso:
+        store = ColumnarStore("data/columnar")
+        store.append(df, "hourly", "openmeteo", "Medellin", kind="historical")
+        df = store.load("hourly", location="Medellin", start="2000-01-01")
+    """
+
+    def __init__(self, base_dir: Union[str, Path] = "data/columnar"):
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow no está instalado. Instale con: pip install pyarrow")
+
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self._partitioning = ds.partitioning(
+            pa.schema([(col, pa.string()) for col in PARTITION_COLUMNS]),
+            flavor='hive'
+        )
+        # Por frecuencia, esquema físico de cada archivo por (ruta, mtime):
+        # solo se leen los pies de archivos nuevos o reescritos
+        self._esquemas_archivo: Dict[str, Dict[tuple, 'pa.Schema']] = {}
+
+    def _dataset_dir(self, frequency: str) -> Path:
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"Frecuencia no soportada: {frequency}. Opciones: {FREQUENCIES}")
+        return self.base_dir / frequency
+
+    @staticmethod
+    def _to_utc(value) -> pd.Timestamp:
+        ts = pd.Timestamp(value)
+        return ts.tz_localize('UTC') if ts.tzinfo is None else ts.tz_convert('UTC')
+
+    @staticmethod
+    def to_table(df: pd.DataFrame, kind: str,
+                 issued_at: Optional[datetime] = None) -> 'pa.Table':
+        """
+        Convierte un DataFrame de series a Arrow con tipos del almacén:
+        'date' como timestamp UTC y las variables numéricas como float32
+        """
+        if TIME_COLUMN not in df.columns:
+            raise ValueError(f"El DataFrame no tiene columna '{TIME_COLUMN}'")
+
+        fechas = pd.to_datetime(df[TIME_COLUMN], utc=True)
+        columnas = {TIME_COLUMN: pa.array(fechas.values.astype('datetime64[s]'),
+                                          type=pa.timestamp('s', tz='UTC'))}
+
+        for col in df.columns:
+            if col == TIME_COLUMN:
+                continue
+            serie = df[col]
+            if pd.api.types.is_numeric_dtype(serie):
+                columnas[col] = pa.array(serie.to_numpy(dtype=np.float32, na_value=np.nan),
+                                         type=pa.float32(), from_pandas=True)
+            else:
+                columnas[col] = pa.array(serie.astype(str).to_numpy(), type=pa.string())
+
+        n = len(df)
+        columnas['kind'] = pa.array([kind] * n, type=pa.dictionary(pa.int8(), pa.string()))
+        if issued_at is not None:
+            emitido = ColumnarStore._to_utc(issued_at).floor('s').to_datetime64()
+            columnas['issued_at'] = pa.array(np.full(n, emitido, dtype='datetime64[s]'),
+                                             type=pa.timestamp('s', tz='UTC'))
+
+        return pa.table(columnas)
+
+    def append(self, df: pd.DataFrame, frequency: str, source: str,
+               location: Optional[str] = None,
+               kind: str = 'historical', issued_at: Optional[datetime] = None,
+               chunk_id: Optional[str] = None) -> int:
+        """
+        Agrega un bloque de datos al almacén
+
+        Args:
+            df: DataFrame con columna 'date' y variables numéricas
+            frequency: 'hourly' o 'daily'
+            source: Fuente (p. ej. 'openmeteo')
+            location: Nombre de la ubicación (None = tomarla de la columna
+                'location' del DataFrame, para frames de varias ubicaciones)
+            kind: 'historical' o 'forecast'
+            issued_at: Momento de emisión (pronósticos)
+            chunk_id: Identificador estable del bloque; reescribir el mismo
+                bloque reemplaza sus archivos en lugar de duplicarlos
+
+        Returns:
+            int: Filas escritas
+        """
+        if df is None or df.empty:
+            return 0
+
+        if location is None:
+            if 'location' not in df.columns:
+                raise ValueError("Se requiere location o una columna 'location'")
+            ubicaciones = df['location'].astype(str).to_numpy()
+            df = df.drop(columns=['location'])
+        else:
+            ubicaciones = [location] * len(df)
+
+        tabla = self.to_table(df, kind, issued_at)
+        meses = pd.to_datetime(df[TIME_COLUMN], utc=True).dt.strftime('%Y-%m').to_numpy()
+
+        tabla = tabla.append_column('source', pa.array([source] * len(df), type=pa.string()))
+        tabla = tabla.append_column('location', pa.array(ubicaciones, type=pa.string()))
+        tabla = tabla.append_column('month', pa.array(meses, type=pa.string()))
+
+        if chunk_id is None:
+            chunk_id = f"{kind}-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}"
+
+        ds.write_dataset(
+            tabla,
+            base_dir=str(self._dataset_dir(frequency)),
+            format='parquet',
+            partitioning=self._partitioning,
+            basename_template=f"part-{chunk_id}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+            file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+        )
+
+        logger.info(f"💾 {len(df)} filas {frequency} de {source}/{location or 'varias ubicaciones'} "
+                    f"en almacén columnar")
+        return len(df)
+
+    def append_result(self, result: Dict, source: str = 'openmeteo',
+                      kind: str = 'historical', chunk_id: Optional[str] = None) -> Dict[str, int]:
+        """Guarda el dict de resultado de OpenMeteoClient (hourly/daily)"""
+        issued_at = datetime.now(timezone.utc) if kind == 'forecast' else None
+        return {
+            frequency: self.append(result[frequency], frequency, source, result['location'],
+                                   kind=kind, issued_at=issued_at, chunk_id=chunk_id)
+            for frequency in FREQUENCIES
+            if result.get(frequency) is not None
+        }
+
+    def _dataset(self, frequency: str) -> Optional['ds.Dataset']:
+        ruta = self._dataset_dir(frequency)
+        if not ruta.exists() or not any(ruta.iterdir()):
+            return None
+        dataset = ds.dataset(str(ruta), format='parquet', partitioning=self._partitioning)
+
+        # Sin esquema explícito pyarrow toma el del primer archivo y descarta las
+        # columnas que solo traen otros (issued_at de pronósticos, variables nuevas)
+        conocidos = self._esquemas_archivo.get(frequency, {})
+        vigentes = {}
+        for fragmento in dataset.get_fragments():
+            clave = (fragmento.path, Path(fragmento.path).stat().st_mtime_ns)
+            vigentes[clave] = conocidos.get(clave) or fragmento.physical_schema
+        self._esquemas_archivo[frequency] = vigentes
+
+        return dataset.replace_schema(pa.unify_schemas([dataset.schema, *vigentes.values()]))
+
+    def _filtro(self, source=None, location=None, start=None, end=None, kind=None):
+        filtro = None
+
+        def y(expr):
+            return expr if filtro is None else filtro & expr
+
+        if source:
+            filtro = y(ds.field('source') == source)
+        if location:
+            filtro = y(ds.field('location') == location)
+        if kind:
+            filtro = y(ds.field('kind') == kind)
+        if start is not None:
+            inicio = self._to_utc(start)
+            # Poda de particiones por mes y de row groups por estadísticas de 'date'
+            filtro = y(ds.field('month') >= inicio.strftime('%Y-%m'))
+            filtro = y(ds.field(TIME_COLUMN) >= pa.scalar(inicio.to_pydatetime(),
+                                                          type=pa.timestamp('s', tz='UTC')))
+        if end is not None:
+            fin = self._to_utc(end)
+            filtro = y(ds.field('month') <= fin.strftime('%Y-%m'))
+            filtro = y(ds.field(TIME_COLUMN) <= pa.scalar(fin.to_pydatetime(),
+                                                          type=pa.timestamp('s', tz='UTC')))
+        return filtro
+
+    def load_table(self, frequency: str, source: Optional[str] = None,
+                   location: Optional[str] = None, start=None, end=None,
+                   columns: Optional[List[str]] = None,
+                   kind: Optional[str] = None) -> Optional['pa.Table']:
+        """Lee como tabla Arrow aplicando los filtros en el escaneo"""
+        dataset = self._dataset(frequency)
+        if dataset is None:
+            return None
+
+        if columns is not None:
+            columns = list(dict.fromkeys([TIME_COLUMN, 'location'] + list(columns)))
+            columns = [c for c in columns if c in dataset.schema.names]
+
+        return dataset.to_table(
+            columns=columns,
+            filter=self._filtro(source, location, start, end, kind)
+        )
+
+    def iter_batches(self, frequency: str, source: Optional[str] = None,
+                     location: Optional[str] = None, start=None, end=None,
+                     columns: Optional[List[str]] = None, kind: Optional[str] = None,
+                     batch_size: int = 65536):
+        """
+        Recorre la serie por lotes Arrow sin materializarla completa
+
+        Los archivos se leen en orden de ruta (partición mensual), así que los
+        lotes de una ubicación salen en orden cronológico. No deduplica.
+        """
+        dataset = self._dataset(frequency)
+        if dataset is None:
+            return
+
+        if columns is not None:
+            columns = list(dict.fromkeys([TIME_COLUMN, 'location'] + list(columns)))
+            columns = [c for c in columns if c in dataset.schema.names]
+
+        yield from dataset.to_batches(
+            columns=columns,
+            filter=self._filtro(source, location, start, end, kind),
+            batch_size=batch_size
+        )
+
+    def load(self, frequency: str, source: Optional[str] = None,
+             location: Optional[str] = None, start=None, end=None,
+             columns: Optional[List[str]] = None, kind: Optional[str] = None,
+             deduplicate: bool = True) -> pd.DataFrame:
+        """
+        Lee series del almacén como DataFrame ordenado por fecha
+
+        Args:
+            deduplicate: Si hay varias filas para la misma ubicación y fecha
+                (p. ej. pronósticos de distintas emisiones), conservar la última
+        """
+        tabla = self.load_table(frequency, source, location, start, end, columns, kind)
+        if tabla is None or tabla.num_rows == 0:
+            return pd.DataFrame()
+
+        df = tabla.to_pandas()
+        orden = [c for c in ('location', TIME_COLUMN, 'issued_at') if c in df.columns]
+        df = df.sort_values(orden, kind='stable')
+        if deduplicate:
+            df = df.drop_duplicates(subset=[c for c in ('location', TIME_COLUMN) if c in df.columns],
+                                    keep='last')
+        return df.reset_index(drop=True)
+
+    def coverage(self, frequency: str, source: str, location: str,
+                 kind: Optional[str] = None) -> Optional[tuple]:
+        """Primera y última fecha almacenadas (solo lee la columna 'date')"""
+        tabla = self.load_table(frequency, source, location, columns=[], kind=kind)
+        if tabla is None or tabla.num_rows == 0:
+            return None
+        fechas = tabla.column(TIME_COLUMN)
+        return (pd.Timestamp(pc.min(fechas).as_py()),
+                pd.Timestamp(pc.max(fechas).as_py()))
+
+    def locations(self, frequency: str = 'hourly', source: Optional[str] = None) -> List[str]:
+        """Ubicaciones con datos (desde los nombres de partición, sin leer archivos)"""
+        dataset = self._dataset(frequency)
+        if dataset is None:
+            return []
+
+        ubicaciones = set()
+        for fragmento in dataset.get_fragments(
+                filter=ds.field('source') == source if source else None):
+            valores = ds.get_partition_keys(fragmento.partition_expression)
+            if 'location' in valores:
+                ubicaciones.add(valores['location'])
+        return sorted(ubicaciones)
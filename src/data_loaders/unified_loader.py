@@ -11,6 +11,7 @@ from datetime import datetime
 
 from .json_loader import JSONDataLoader
 from .file_loader import FileLoader
+from .columnar_store import ColumnarStore, PYARROW_AVAILABLE
 
 logger = logging.getLogger(__name__)
 
@@ -122,6 +123,39 @@ class UnifiedDataLoader:
         
         return pd.DataFrame()
     
+    def load_columnar(self, frequency: str = 'hourly',
+                      location: Optional[str] = None,
+                      source: Optional[str] = 'openmeteo',
+                      start=None, end=None,
+                      columns: Optional[list] = None,
+                      kind: Optional[str] = None) -> pd.DataFrame:
+        """
+        Carga series del almacén columnar (data/columnar) con filtros
+        empujados a Parquet: solo se leen las particiones y columnas pedidas
+        
+        Args:
+            frequency: 'hourly' o 'daily'
+            location: Ubicación (None = todas)
+            source: Fuente (None = todas)
+            start, end: Rango de fechas (UTC si no traen zona horaria)
+            columns: Variables a leer (None = todas)
+            kind: 'historical' o 'forecast' (None = ambos)
+        """
+        if not PYARROW_AVAILABLE:
+            logger.warning("pyarrow no disponible: almacén columnar deshabilitado")
+            return pd.DataFrame()
+        
+        store_dir = self.data_dir / "columnar"
+        if not store_dir.exists():
+            return pd.DataFrame()
+        
+        df = ColumnarStore(store_dir).load(frequency, source=source, location=location,
+                                           start=start, end=end, columns=columns, kind=kind)
+        self.metadata['loaded_at'] = datetime.now()
+        self.metadata['total_records'] = len(df)
+        self.metadata['columns'] = list(df.columns)
+        return df
+    
     def get_metadata(self) -> dict:
         """Retorna metadatos de la carga"""
         return self.metadata
@@ -5,12 +5,18 @@ from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
+try:
+    from src.data_sources.http_transport import obtener_transporte
+except ImportError:
+    from http_transport import obtener_transporte
+
 # Cargar variables de entorno
 load_dotenv()
 
 class MeteosourceAPI:
-    def __init__(self):
+    def __init__(self, transporte=None):
         self.api_key = os.getenv('METEOSOURCE_API_KEY')
+        self.http = transporte or obtener_transporte()
         self.base_url = "https://www.meteosource.com/api/v1/free"
         self.data_dir = Path("data/data_meteosource")
         self.data_dir.mkdir(parents=True, exist_ok=True)
@@ -28,7 +34,7 @@ class MeteosourceAPI:
         }
         
         try:
-            response = requests.get(url, params=params)
+            response = self.http.get(url, proveedor='meteosource', params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -45,7 +51,7 @@ class MeteosourceAPI:
         }
         
         try:
-            response = requests.get(url, params=params)
+            response = self.http.get(url, proveedor='meteosource', params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -62,7 +68,7 @@ class MeteosourceAPI:
         }
         
         try:
-            response = requests.get(url, params=params)
+            response = self.http.get(url, proveedor='meteosource', params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -79,7 +85,7 @@ class MeteosourceAPI:
         }
         
         try:
-            response = requests.get(url, params=params)
+            response = self.http.get(url, proveedor='meteosource', params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
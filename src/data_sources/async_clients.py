@@ -0,0 +1,576 @@
+"""
+Clientes asíncronos de los proveedores y fachada AsyncClimAPIManager
+Todos comparten un único httpx.AsyncClient (HTTP/2 si está instalado h2), de
+modo que un solo event loop puede mantener miles de consultas en vuelo para
+refrescar una ciudad completa sin un hilo por petición. El procesamiento y el
+guardado de las respuestas se delegan en los clientes síncronos para que
+ambos caminos produzcan exactamente los mismos resultados.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    from src.data_sources.http_transport import PROVEEDORES, CONFIG_POR_DEFECTO, ESTADOS_REINTENTABLES
+    from src.data_sources.openmeteo_decoder import respuesta_a_dataframes
+    from src.data_sources.rate_limiter import LimitadorTasa, obtener_limitador
+    from src.data_sources.response_cache import CacheRespuestas, obtener_cache
+except ImportError:
+    from http_transport import PROVEEDORES, CONFIG_POR_DEFECTO, ESTADOS_REINTENTABLES
+    from openmeteo_decoder import respuesta_a_dataframes
+    from rate_limiter import LimitadorTasa, obtener_limitador
+    from response_cache import CacheRespuestas, obtener_cache
+
+logger = logging.getLogger(__name__)
+
+
+class TransporteAsync:
+    """
+    Cliente httpx.AsyncClient compartido con límites por proveedor
+
+    Uso:
+        async with TransporteAsync() as http:
+            response = await http.get(url, proveedor='openweather', params=params)
+    """
+
+    def __init__(self, max_conexiones: int = 200, max_keepalive: int = 50,
+                 reintentos: int = 3, backoff: float = 0.5, jitter: float = 0.5,
+                 proveedores: Optional[Dict[str, Dict]] = None, http2: Optional[bool] = None,
+                 transport=None, limitador: Optional[LimitadorTasa] = None,
+                 cache: Optional[CacheRespuestas] = None, usar_cache: bool = True):
+        """
+        Args:
+            max_conexiones: Conexiones simultáneas totales
+            max_keepalive: Conexiones inactivas que se mantienen abiertas
+            reintentos: Reintentos ante errores de red y respuestas 429/5xx
+            backoff: Factor de backoff exponencial
+            jitter: Aleatoriedad máxima (s) sumada a cada espera
+            proveedores: Configuración adicional o sobrescrita por proveedor
+            http2: Forzar/deshabilitar HTTP/2 (None = usarlo si h2 está instalado)
+            transport: Transporte httpx alternativo (p. ej. httpx.MockTransport)
+            limitador: Limitador de tasa (por defecto el compartido)
+            cache: Caché de respuestas (por defecto la compartida)
+            usar_cache: False para no cachear ninguna respuesta
+        """
+        if not HTTPX_AVAILABLE:
+            raise ImportError("httpx no está instalado. Instale con: pip install httpx[http2]")
+
+        self.proveedores = {**PROVEEDORES, **(proveedores or {})}
+        self.limitador = limitador or obtener_limitador()
+        self.cache = (cache or obtener_cache()) if usar_cache else None
+        self.reintentos = reintentos
+        self.backoff = backoff
+        self.jitter = jitter
+        self._semaforos = {}
+
+        self.client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE if http2 is None else http2,
+            limits=httpx.Limits(max_connections=max_conexiones,
+                                max_keepalive_connections=max_keepalive),
+            headers={'User-Agent': 'ClimaGuru/1.0'},
+            follow_redirects=True,
+            transport=transport,
+        )
+
+    def configuracion(self, proveedor: Optional[str]) -> Dict:
+        return self.proveedores.get(proveedor, CONFIG_POR_DEFECTO)
+
+    def _semaforo(self, proveedor: Optional[str]) -> asyncio.Semaphore:
+        # Sin lock: el event loop es de un solo hilo
+        if proveedor not in self._semaforos:
+            self._semaforos[proveedor] = asyncio.Semaphore(
+                self.configuracion(proveedor)['max_concurrencia']
+            )
+        return self._semaforos[proveedor]
+
+    def _espera(self, intento: int) -> float:
+        return self.backoff * (2 ** intento) + random.uniform(0, self.jitter)
+
+    async def get(self, url: str, proveedor: Optional[str] = None, cache: bool = True,
+                  **kwargs) -> 'httpx.Response':
+        """
+        GET con caché, cuota y límite de concurrencia del proveedor y reintentos
+
+        Las consultas idénticas simultáneas comparten una sola petición. El
+        cupo del proveedor se libera durante las esperas entre reintentos;
+        un 429 pausa al proveedor en el limitador compartido y el reintento
+        espera a que la pausa venza.
+        """
+        conexion, lectura = self.configuracion(proveedor)['timeout']
+        kwargs.setdefault('timeout', httpx.Timeout(lectura, connect=conexion))
+
+        if not cache or self.cache is None:
+            return await self._get_red(url, proveedor, **kwargs)
+
+        async def descargar():
+            response = await self._get_red(url, proveedor, **kwargs)
+            return {'estado': response.status_code, 'headers': dict(response.headers),
+                    'contenido': response.content, 'url': str(response.url)}
+
+        entrada = await self.cache.obtener_async(proveedor, url, kwargs.get('params'), descargar)
+        return httpx.Response(entrada['estado'], headers=entrada['headers'],
+                              content=entrada['contenido'],
+                              request=httpx.Request('GET', entrada.get('url') or url))
+
+    async def _get_red(self, url: str, proveedor: Optional[str], **kwargs) -> 'httpx.Response':
+        """Petición real: cuota del limitador, cupo del proveedor y reintentos"""
+        for intento in range(self.reintentos + 1):
+            await self.limitador.adquirir_async(proveedor)
+            try:
+                async with self._semaforo(proveedor):
+                    response = await self.client.get(url, **kwargs)
+            except httpx.TransportError:
+                if intento == self.reintentos:
+                    raise
+                await asyncio.sleep(self._espera(intento))
+                continue
+
+            # La pausa se escribe en el SQLite compartido: fuera del event loop
+            limitado = await asyncio.to_thread(
+                self.limitador.registrar_respuesta, proveedor, response.status_code,
+                response.headers) is not None
+            if intento == self.reintentos:
+                return response
+            if limitado:
+                continue
+            if response.status_code not in ESTADOS_REINTENTABLES:
+                return response
+            await asyncio.sleep(self._espera(intento))
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+class AsyncOpenWeatherMapClient:
+    """Variante asíncrona de OpenWeatherMapClient"""
+
+    def __init__(self, api_key: str, transporte: TransporteAsync, data_dir: str = "data"):
+        try:
+            from src.data_sources.openweather import OpenWeatherMapClient
+        except ImportError:
+            from openweather import OpenWeatherMapClient
+
+        self.base = OpenWeatherMapClient(api_key, data_dir)
+        self.http = transporte
+
+    async def _consultar(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self.http.get(f"{self.base.base_url}/{endpoint}",
+                                       proveedor='openweather', params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def _params(self, lat: float, lon: float, unidades: bool = True) -> Dict[str, Any]:
+        params = {"lat": lat, "lon": lon, "appid": self.base.api_key}
+        if unidades:
+            params.update({"units": "metric", "lang": "es"})
+        return params
+
+    async def get_current_weather(self, lat: float, lon: float,
+                                  location_name: str = "location",
+                                  save_data: bool = True) -> Dict[str, Any]:
+        data = await self._consultar("weather", self._params(lat, lon))
+        result = self.base._procesar_actual(data, lat, lon, location_name)
+        if save_data:
+            self.base._save_data(result, location_name, "current")
+        return result
+
+    async def get_forecast_5day(self, lat: float, lon: float,
+                                location_name: str = "location",
+                                save_data: bool = True) -> Dict[str, Any]:
+        data = await self._consultar("forecast", self._params(lat, lon))
+        result = self.base._procesar_pronostico_5dias(data, lat, lon, location_name)
+        if save_data:
+            self.base._save_data(result, location_name, "forecast_5day")
+        return result
+
+    async def get_air_pollution(self, lat: float, lon: float,
+                                location_name: str = "location",
+                                save_data: bool = True) -> Dict[str, Any]:
+        data = await self._consultar("air_pollution", self._params(lat, lon, unidades=False))
+        result = self.base._procesar_contaminacion(data, lat, lon, location_name)
+        if save_data:
+            self.base._save_data(result, location_name, "air_pollution")
+        return result
+
+    async def get_complete_report(self, lat: float, lon: float,
+                                  location_name: str = "location",
+                                  save_data: bool = True) -> Dict[str, Any]:
+        """Las tres consultas van en paralelo; un fallo parcial deja su sección en None"""
+        current, forecast, air = await asyncio.gather(
+            self.get_current_weather(lat, lon, location_name, save_data=False),
+            self.get_forecast_5day(lat, lon, location_name, save_data=False),
+            self.get_air_pollution(lat, lon, location_name, save_data=False),
+            return_exceptions=True
+        )
+
+        report = {
+            "location": location_name,
+            "coordinates": {"lat": lat, "lon": lon},
+            "timestamp": datetime.now().isoformat(),
+        }
+        for clave, valor in (("current", current), ("forecast", forecast), ("air_quality", air)):
+            if isinstance(valor, Exception):
+                print(f"⚠️  Error obteniendo {clave}: {valor}")
+                valor = None
+            report[clave] = valor
+
+        if save_data:
+            self.base._save_data(report, location_name, "complete_report")
+        return report
+
+
+class AsyncMeteoblueClient:
+    """Variante asíncrona de MeteoblueClient (pronóstico basic-day)"""
+
+    def __init__(self, api_key: str, transporte: TransporteAsync,
+                 shared_secret: Optional[str] = None, data_dir: str = "data"):
+        try:
+            from src.data_sources.meteoblue import MeteoblueClient
+        except ImportError:
+            from meteoblue import MeteoblueClient
+
+        self.base = MeteoblueClient(api_key, shared_secret, data_dir)
+        self.http = transporte
+
+    async def get_forecast(self, lat: float, lon: float, asl: int = 0,
+                           expire: Optional[int] = None, save_data: bool = True,
+                           location_name: str = "location") -> Dict[str, Any]:
+        response = await self.http.get(self.base._forecast_url(lat, lon, asl, expire),
+                                       proveedor='meteoblue')
+        response.raise_for_status()
+        data = response.json()
+        if save_data:
+            self.base._save_forecast(data, location_name)
+        return data
+
+
+class AsyncMeteosourceAPI:
+    """Variante asíncrona de MeteosourceAPI"""
+
+    def __init__(self, transporte: TransporteAsync):
+        try:
+            from src.data_sources.Meteosource import MeteosourceAPI
+        except ImportError:
+            from Meteosource import MeteosourceAPI
+
+        self.base = MeteosourceAPI()
+        self.http = transporte
+
+    async def _point(self, place_id: str, sections: str) -> Optional[Dict[str, Any]]:
+        params = {'key': self.base.api_key, 'place_id': place_id, 'sections': sections}
+        try:
+            response = await self.http.get(f"{self.base.base_url}/point",
+                                           proveedor='meteosource', params=params)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            print(f"Error al obtener datos ({sections}): {e}")
+            return None
+
+    async def get_current_weather(self, place_id):
+        return await self._point(place_id, 'current')
+
+    async def get_hourly_forecast(self, place_id):
+        return await self._point(place_id, 'hourly')
+
+    async def get_daily_forecast(self, place_id):
+        return await self._point(place_id, 'daily')
+
+    async def get_all_data(self, place_id):
+        return await self._point(place_id, 'all')
+
+    def save_data(self, data, place_id, data_type):
+        self.base.save_data(data, place_id, data_type)
+
+
+class AsyncOpenMeteoClient:
+    """
+    Variante asíncrona de OpenMeteoClient
+
+    Pide el formato FlatBuffers directamente y lo decodifica con el mismo
+    decodificador compartido que usa el cliente síncrono.
+    """
+
+    def __init__(self, transporte: TransporteAsync, data_dir: str = "data",
+                 storage: str = "columnar"):
+        try:
+            from src.data_sources.open_meteo import OpenMeteoClient
+        except ImportError:
+            from open_meteo import OpenMeteoClient
+
+        self.base = OpenMeteoClient(data_dir, storage=storage)
+        self.http = transporte
+
+    @staticmethod
+    def _respuestas(contenido: bytes) -> List[Any]:
+        """Separa el cuerpo en mensajes (prefijo de longitud de 4 bytes little-endian)"""
+        from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+
+        mensajes = []
+        pos = 0
+        while pos < len(contenido):
+            longitud = int.from_bytes(contenido[pos:pos + 4], byteorder="little")
+            mensajes.append(WeatherApiResponse.GetRootAs(contenido, pos + 4))
+            pos += longitud + 4
+        return mensajes
+
+    async def _weather_api(self, url: str, params: Dict[str, Any]) -> List[Any]:
+        params = {**params, "format": "flatbuffers"}
+        # Las listas se envían separadas por comas, como en openmeteo_requests
+        params = {k: ",".join(map(str, v)) if isinstance(v, (list, tuple)) else v
+                  for k, v in params.items()}
+        response = await self.http.get(url, proveedor='openmeteo', params=params)
+        response.raise_for_status()
+        return self._respuestas(response.content)
+
+    async def get_forecast(self, lat: float, lon: float, location_name: str = "location",
+                           days: int = 7, hourly_vars: Optional[List[str]] = None,
+                           daily_vars: Optional[List[str]] = None,
+                           save_data: bool = True) -> Dict[str, Any]:
+        hourly_vars = hourly_vars or ["temperature_2m", "relative_humidity_2m", "wind_speed_10m"]
+        daily_vars = daily_vars or ["temperature_2m_max", "temperature_2m_min",
+                                    "precipitation_sum", "wind_speed_10m_max"]
+
+        respuestas = await self._weather_api(self.base.forecast_url, {
+            "latitude": lat, "longitude": lon,
+            "hourly": hourly_vars, "daily": daily_vars,
+            "forecast_days": days, "timezone": "auto"
+        })
+        decodificado = respuesta_a_dataframes(respuestas[0], hourly_vars, daily_vars)
+        result = {"location": location_name, **decodificado}
+
+        if save_data:
+            await asyncio.to_thread(self.base._save_forecast_data, result, location_name)
+        return result
+
+    async def get_historical(self, lat: float, lon: float, start_date: str, end_date: str,
+                             location_name: str = "location",
+                             hourly_vars: Optional[List[str]] = None,
+                             daily_vars: Optional[List[str]] = None,
+                             save_data: bool = True) -> Dict[str, Any]:
+        hourly_vars = hourly_vars or ["temperature_2m", "relative_humidity_2m", "wind_speed_10m"]
+        daily_vars = daily_vars or ["temperature_2m_max", "temperature_2m_min",
+                                    "precipitation_sum", "wind_speed_10m_max"]
+
+        respuestas = await self._weather_api(self.base.historical_url, {
+            "latitude": lat, "longitude": lon,
+            "start_date": start_date, "end_date": end_date,
+            "hourly": hourly_vars, "daily": daily_vars, "timezone": "auto"
+        })
+        decodificado = respuesta_a_dataframes(respuestas[0], hourly_vars, daily_vars)
+        result = {"location": location_name, **decodificado,
+                  "period": {"start": start_date, "end": end_date}}
+
+        if save_data:
+            await asyncio.to_thread(self.base._save_historical_data, result,
+                                    location_name, start_date, end_date)
+        return result
+
+
+class AsyncClimAPIManager:
+    """
+    Fachada asíncrona equivalente a ClimAPIManager.consulta_completa
+
+    Uso:
+        async with AsyncClimAPIManager() as manager:
+            resultados = await manager.consulta_ciudades(ciudades)
+    """
+
+    def __init__(self, transporte: Optional[TransporteAsync] = None,
+                 data_dir: str = "data", max_consultas: int = 1000):
+        """
+        Args:
+            transporte: Transporte asíncrono (se crea uno si es None)
+            data_dir: Directorio base de datos
+            max_consultas: Consultas completas en vuelo a la vez en consulta_ciudades
+        """
+        self.http = transporte or TransporteAsync()
+        self.data_dir = data_dir
+        self.max_consultas = max_consultas
+
+        self.meteoblue = None
+        self.openmeteo = None
+        self.openweather = None
+        self.meteosource = None
+        self._initialize_clients()
+
+    def _initialize_clients(self):
+        """Inicializa los clientes configurados (mismas variables de entorno que ClimAPIManager)"""
+        meteoblue_key = os.getenv("METEOBLUE_API_KEY")
+        meteoblue_secret = os.getenv("METEOBLUE_SHARED_SECRET")
+        if meteoblue_key and meteoblue_secret:
+            self.meteoblue = AsyncMeteoblueClient(meteoblue_key, self.http,
+                                                  meteoblue_secret, self.data_dir)
+
+        try:
+            self.openmeteo = AsyncOpenMeteoClient(self.http, self.data_dir)
+        except Exception as e:
+            logger.warning(f"⚠️  Open-Meteo asíncrono no disponible: {e}")
+
+        openweather_key = os.getenv("OPENWEATHER_API_KEY")
+        if openweather_key:
+            self.openweather = AsyncOpenWeatherMapClient(openweather_key, self.http, self.data_dir)
+
+        if os.getenv("METEOSOURCE_API_KEY"):
+            self.meteosource = AsyncMeteosourceAPI(self.http)
+
+    async def _con_plazo(self, proveedor: str, corutina, plazo: float, resultados: Dict):
+        inicio = time.perf_counter()
+        try:
+            resultados[proveedor] = await asyncio.wait_for(corutina, timeout=plazo)
+        except asyncio.TimeoutError:
+            resultados["sin_respuesta"].append(proveedor)
+            print(f"⏰ {proveedor}: sin respuesta tras {plazo:.0f} s, se omite")
+        except Exception as e:
+            print(f"❌ Error en {proveedor}: {e}")
+        resultados["tiempos_s"][proveedor] = round(time.perf_counter() - inicio, 3)
+
+    async def consulta_completa(self, lat: float, lon: float, location_name: str,
+                                asl: int = 0, timeout_proveedor=30,
+                                save_data: bool = True) -> Dict[str, Any]:
+        """
+        Consulta todos los proveedores configurados en paralelo
+
+        Args:
+            timeout_proveedor: Plazo en segundos (número o dict {proveedor: segundos})
+
+        Returns:
+            Mismo formato que ClimAPIManager.consulta_completa
+        """
+        resultados = {
+            "location": location_name,
+            "coordinates": {"lat": lat, "lon": lon, "asl": asl},
+            "timestamp": datetime.now().isoformat(),
+            "meteoblue": None,
+            "openmeteo": None,
+            "openweather": None,
+            "meteosource": None,
+            "tiempos_s": {},
+            "sin_respuesta": []
+        }
+
+        place_id = location_name.lower().replace(' ', '_').replace('í', 'i').replace('ó', 'o').replace('á', 'a')
+
+        tareas = {}
+        if self.meteoblue:
+            tareas["meteoblue"] = self.meteoblue.get_forecast(
+                lat, lon, asl, location_name=location_name, save_data=save_data)
+        if self.openmeteo:
+            tareas["openmeteo"] = self.openmeteo.get_forecast(
+                lat, lon, location_name=location_name, save_data=save_data)
+        if self.openweather:
+            tareas["openweather"] = self.openweather.get_complete_report(
+                lat, lon, location_name, save_data=save_data)
+        if self.meteosource:
+            tareas["meteosource"] = self.meteosource.get_all_data(place_id)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(
+            self._con_plazo(
+                proveedor, corutina,
+                timeout_proveedor.get(proveedor, 30) if isinstance(timeout_proveedor, dict)
+                else timeout_proveedor,
+                resultados
+            )
+            for proveedor, corutina in tareas.items()
+        ))
+        resultados["duracion_total_s"] = round(time.perf_counter() - inicio, 3)
+        return resultados
+
+    async def consulta_ciudades(self, ciudades: Iterable[Dict[str, Any]],
+                                **kwargs) -> List[Dict[str, Any]]:
+        """
+        Consulta completa para muchas ciudades en un mismo event loop
+
+        Args:
+            ciudades: Dicts con 'name', 'lat', 'lon' (y opcionalmente 'asl')
+            **kwargs: Argumentos de consulta_completa
+
+        Returns:
+            Resultados en el mismo orden que las ciudades
+        """
+        limite = asyncio.Semaphore(self.max_consultas)
+
+        async def una(ciudad):
+            async with limite:
+                return await self.consulta_completa(ciudad['lat'], ciudad['lon'], ciudad['name'],
+                                                    asl=ciudad.get('asl', 0), **kwargs)
+
+        return await asyncio.gather(*(una(ciudad) for ciudad in ciudades))
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+# Banco de pruebas local: un proveedor simulado con latencia fija
+if __name__ == "__main__":
+    import json
+    from pathlib import Path
+
+    async def _benchmark(n_ciudades=2000, latencia_s=0.05):
+        async def proveedor_local(request):
+            await asyncio.sleep(latencia_s)
+            cuerpo = {
+                "dt": 0, "visibility": 10000, "clouds": {"all": 0},
+                "weather": [{"description": "despejado", "main": "Clear", "icon": "01d"}],
+                "main": {"temp": 20, "feels_like": 20, "temp_min": 18, "temp_max": 22,
+                         "pressure": 1013, "humidity": 70, "aqi": 1},
+                "wind": {"speed": 1.0}, "sys": {"sunrise": 0, "sunset": 0},
+                "city": {"name": "X", "country": "CO", "timezone": -18000},
+                "list": [{"dt": 0, "main": {"aqi": 1},
+                          "components": dict.fromkeys(
+                              ["co", "no", "no2", "o3", "so2", "pm2_5", "pm10", "nh3"], 0.0)}],
+            }
+            return httpx.Response(200, content=json.dumps(cuerpo).encode())
+
+        # Sin cuota: se mide la orquestación, no el limitador
+        import tempfile
+        limitador = LimitadorTasa(Path(tempfile.mkdtemp()) / "limites.sqlite",
+                                  cuotas={'openweather': []})
+        http = TransporteAsync(transport=httpx.MockTransport(proveedor_local),
+                               proveedores={'openweather': {'timeout': (3.05, 15),
+                                                            'max_concurrencia': 1000}},
+                               limitador=limitador, usar_cache=False)
+        cliente = AsyncOpenWeatherMapClient("clave-local", http)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(
+            cliente.get_current_weather(4.0 + i * 1e-3, -74.0, f"c{i}", save_data=False)
+            for i in range(n_ciudades)
+        ))
+        duracion = time.perf_counter() - inicio
+        await http.aclose()
+
+        print(f"{n_ciudades} consultas con {latencia_s * 1000:.0f} ms de latencia: "
+              f"{duracion:.2f} s ({n_ciudades / duracion:.0f} consultas/s)")
+
+    asyncio.run(_benchmark())
@@ -0,0 +1,294 @@
+"""
+Capa de transporte HTTP compartida por los clientes de src/data_sources
+Una única requests.Session con pools keep-alive por host, timeouts por
+proveedor, reintentos con backoff exponencial + jitter, un límite de
+peticiones simultáneas por proveedor, la cuota del limitador de tasa
+compartido y la caché de respuestas, para que las consultas repetidas
+reutilicen conexiones TCP/TLS (o no salgan a la red) en lugar de abrir una
+nueva conexión cada vez.
+"""
+
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from src.data_sources.rate_limiter import LimitadorTasa, obtener_limitador
+    from src.data_sources.response_cache import CacheRespuestas, obtener_cache
+except ImportError:
+    from rate_limiter import LimitadorTasa, obtener_limitador
+    from response_cache import CacheRespuestas, obtener_cache
+
+logger = logging.getLogger(__name__)
+
+# Configuración por proveedor: timeout (conexión, lectura) en segundos y
+# máximo de peticiones simultáneas
+PROVEEDORES = {
+    'openweather': {'timeout': (3.05, 15), 'max_concurrencia': 10},
+    'meteoblue': {'timeout': (3.05, 30), 'max_concurrencia': 5},
+    'meteosource': {'timeout': (3.05, 15), 'max_concurrencia': 5},
+    'openmeteo': {'timeout': (3.05, 60), 'max_concurrencia': 10},
+    'siata': {'timeout': (5, 30), 'max_concurrencia': 2},
+}
+
+CONFIG_POR_DEFECTO = {'timeout': (3.05, 30), 'max_concurrencia': 8}
+
+# Errores transitorios del servidor que vale la pena reintentar. Los 429 no
+# se reintentan aquí: los gestiona el limitador para que la pausa la
+# respeten todos los hilos y procesos
+ESTADOS_REINTENTABLES = (500, 502, 503, 504)
+
+# Los que reintenta urllib3 dentro del pool. El 503 queda fuera: con
+# Retry-After lo gestiona el limitador (pausa compartida) y sin él
+# _request_red reintenta con backoff, de modo que nunca se duerme
+# ocupando el turno del proveedor ni se reintenta dos veces
+ESTADOS_REINTENTABLES_POOL = (500, 502, 504)
+
+# Plazo (time.monotonic) de las peticiones del hilo actual; ver con_plazo
+_plazos = threading.local()
+
+
+class SinCupoEnPlazo(requests.exceptions.RequestException):
+    """La cuota o el cupo del proveedor no se liberan antes del plazo"""
+    pass
+
+
+@contextmanager
+def con_plazo(hasta: Optional[float]):
+    """
+    Acota las peticiones del hilo hasta el instante `hasta` (time.monotonic())
+
+    Dentro del bloque el transporte no espera cuota del limitador ni cupo del
+    proveedor más allá del plazo (lanza SinCupoEnPlazo) y recorta el timeout
+    de lectura a lo que queda, así que un hilo del pool nunca se duerme
+    minutos por una cuota diaria agotada o una pausa de Retry-After.
+    """
+    anterior = getattr(_plazos, 'hasta', None)
+    _plazos.hasta = hasta
+    try:
+        yield
+    finally:
+        _plazos.hasta = anterior
+
+
+def _restante() -> Optional[float]:
+    hasta = getattr(_plazos, 'hasta', None)
+    return None if hasta is None else max(hasta - time.monotonic(), 0.0)
+
+
+class TransporteHTTP:
+    """
+    Sesión HTTP compartida entre hilos
+
+    Uso:
+        http = obtener_transporte()
+        response = http.get(url, proveedor='openweather', params=params)
+    """
+
+    def __init__(self, pool_hosts: int = 16, conexiones_por_host: int = 32,
+                 reintentos: int = 3, backoff: float = 0.5, jitter: float = 0.5,
+                 proveedores: Optional[Dict[str, Dict]] = None,
+                 limitador: Optional[LimitadorTasa] = None,
+                 cache: Optional[CacheRespuestas] = None, usar_cache: bool = True):
+        """
+        Args:
+            pool_hosts: Número de hosts con pool de conexiones abierto
+            conexiones_por_host: Conexiones keep-alive por host
+            reintentos: Reintentos ante errores de conexión, respuestas 5xx y 429
+            backoff: Factor de backoff exponencial (0.5 -> 0.5s, 1s, 2s...)
+            jitter: Aleatoriedad máxima (s) sumada a cada espera, para que los
+                hilos no reintenten todos a la vez
+            proveedores: Configuración adicional o sobrescrita por proveedor
+            limitador: Limitador de tasa (por defecto el compartido)
+            cache: Caché de respuestas (por defecto la compartida)
+            usar_cache: False para no cachear ninguna respuesta
+        """
+        self.proveedores = {**PROVEEDORES, **(proveedores or {})}
+        self.limitador = limitador or obtener_limitador()
+        self.cache = (cache or obtener_cache()) if usar_cache else None
+        self.reintentos = reintentos
+        self.backoff = backoff
+        self.jitter = jitter
+        self._semaforos = {}
+        self._lock = threading.Lock()
+
+        retry = Retry(
+            total=reintentos,
+            connect=reintentos,
+            read=reintentos,
+            status=reintentos,
+            backoff_factor=backoff,
+            backoff_jitter=jitter,
+            status_forcelist=ESTADOS_REINTENTABLES_POOL,
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_hosts,
+                              pool_maxsize=conexiones_por_host,
+                              max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'User-Agent': 'ClimaGuru/1.0'})
+
+    def configuracion(self, proveedor: Optional[str]) -> Dict:
+        return self.proveedores.get(proveedor, CONFIG_POR_DEFECTO)
+
+    def _semaforo(self, proveedor: Optional[str]) -> threading.BoundedSemaphore:
+        with self._lock:
+            if proveedor not in self._semaforos:
+                self._semaforos[proveedor] = threading.BoundedSemaphore(
+                    self.configuracion(proveedor)['max_concurrencia']
+                )
+            return self._semaforos[proveedor]
+
+    @contextmanager
+    def turno(self, proveedor: Optional[str]):
+        """Reserva uno de los cupos de concurrencia del proveedor (dentro del plazo del hilo)"""
+        semaforo = self._semaforo(proveedor)
+        restante = _restante()
+        if not semaforo.acquire(timeout=restante):
+            raise SinCupoEnPlazo(f"{proveedor}: sin cupo de concurrencia antes del plazo")
+        try:
+            yield
+        finally:
+            semaforo.release()
+
+    def request(self, method: str, url: str, proveedor: Optional[str] = None,
+                cache: bool = True, **kwargs) -> requests.Response:
+        """
+        Petición HTTP por la sesión compartida
+
+        Args:
+            method: Método HTTP
+            url: URL completa
+            proveedor: Clave en PROVEEDORES (timeout y límite de concurrencia)
+            cache: Si un GET puede responderse desde la caché de respuestas
+            **kwargs: Argumentos de requests (params, headers, stream, timeout...)
+        """
+        kwargs.setdefault('timeout', self.configuracion(proveedor)['timeout'])
+        
+        if method.upper() == 'GET' and cache and self.cache is not None \
+                and not kwargs.get('stream'):
+            entrada = self.cache.obtener(
+                proveedor, url, kwargs.get('params'),
+                lambda: self._a_entrada(self._request_red(method, url, proveedor, **kwargs))
+            )
+            return self._a_response(entrada)
+        
+        return self._request_red(method, url, proveedor, **kwargs)
+    
+    def _request_red(self, method: str, url: str, proveedor: Optional[str],
+                     **kwargs) -> requests.Response:
+        """Petición real: cuota del limitador, cupo del proveedor y reintentos por 429/503"""
+        for intento in range(self.reintentos + 1):
+            if not self.limitador.adquirir(proveedor, timeout=_restante()):
+                raise SinCupoEnPlazo(
+                    f"{proveedor}: cuota agotada o en pausa hasta después del plazo")
+            with self.turno(proveedor):
+                response = self.session.request(method, url,
+                                                **self._acotar_timeout(kwargs))
+            
+            # 429 / Retry-After: pausa compartida y reintento cuando vence
+            limitado = self.limitador.registrar_respuesta(proveedor, response.status_code,
+                                                          response.headers) is not None
+            if intento == self.reintentos or (not limitado and response.status_code != 503):
+                return response
+            response.close()
+            if not limitado:
+                # 503 sin Retry-After: backoff fuera del turno del proveedor
+                espera = self._espera(intento)
+                restante = _restante()
+                if restante is not None and espera >= restante:
+                    raise SinCupoEnPlazo(f"{proveedor}: 503 sin tiempo para reintentar")
+                time.sleep(espera)
+        
+        return response
+
+    @staticmethod
+    def _acotar_timeout(kwargs: Dict) -> Dict:
+        """Recorta el timeout de lectura al plazo del hilo, si lo hay"""
+        restante = _restante()
+        timeout = kwargs.get('timeout')
+        if restante is None or timeout is None:
+            return kwargs
+        conexion, lectura = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        restante = max(restante, 0.01)
+        return {**kwargs, 'timeout': (min(conexion, restante), min(lectura, restante))}
+
+    def _espera(self, intento: int) -> float:
+        return self.backoff * (2 ** intento) + random.uniform(0, self.jitter)
+
+    @staticmethod
+    def _a_entrada(response: requests.Response) -> Dict:
+        return {'estado': response.status_code, 'headers': dict(response.headers),
+                'contenido': response.content, 'url': response.url}
+
+    @staticmethod
+    def _a_response(entrada: Dict) -> requests.Response:
+        """Reconstruye un requests.Response a partir de una entrada de caché"""
+        response = requests.Response()
+        response.status_code = entrada['estado']
+        response.headers.update(entrada['headers'])
+        response._content = entrada['contenido']
+        response.url = entrada.get('url')
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def get(self, url: str, proveedor: Optional[str] = None, **kwargs) -> requests.Response:
+        return self.request('GET', url, proveedor=proveedor, **kwargs)
+
+    def sesion(self, proveedor: str) -> 'SesionProveedor':
+        """Objeto tipo requests.Session fijado a un proveedor (para SDKs de terceros)"""
+        return SesionProveedor(self, proveedor)
+
+    def cerrar(self):
+        """Cierra todas las conexiones del pool"""
+        self.session.close()
+
+
+class SesionProveedor:
+    """
+    Adaptador con la interfaz de requests.Session que enruta por el transporte
+
+    Permite que clientes de terceros que esperan una sesión (p. ej.
+    openmeteo_requests.Client) usen el pool, el limitador y la caché compartidos.
+    """
+
+    def __init__(self, transporte: TransporteHTTP, proveedor: str):
+        self.transporte = transporte
+        self.proveedor = proveedor
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.transporte.request(method, url, proveedor=self.proveedor, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        pass
+
+
+_transporte = None
+_transporte_lock = threading.Lock()
+
+
+def obtener_transporte() -> TransporteHTTP:
+    """Transporte compartido por todos los clientes del proceso"""
+    global _transporte
+    with _transporte_lock:
+        if _transporte is None:
+            _transporte = TransporteHTTP()
+        return _transporte
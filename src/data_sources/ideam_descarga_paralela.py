@@ -0,0 +1,159 @@
+"""
+Motor de descarga concurrente para el bucket público de radares IDEAM
+Reparte las descargas en un pool de hilos que comparte un único cliente S3
+(y por tanto un único pool de conexiones) y usa transferencias por rangos
+para los objetos grandes.
+"""
+import os
+import time
+import logging
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore import UNSIGNED
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def crear_cliente_s3(max_conexiones=32, region_name='us-east-1'):
+    """
+    Crea un cliente S3 anónimo con un pool de conexiones dimensionado
+    para ser compartido entre todos los hilos de descarga
+    """
+    return boto3.client(
+        's3',
+        config=Config(
+            signature_version=UNSIGNED,
+            max_pool_connections=max_conexiones,
+            retries={'max_attempts': 5, 'mode': 'adaptive'}
+        ),
+        region_name=region_name
+    )
+
+
+class DescargadorParaleloS3:
+    """Descarga en paralelo una lista de objetos S3 con concurrencia acotada"""
+
+    def __init__(self, bucket_name, s3_client=None, max_workers=16,
+                 umbral_multiparte_mb=8, tamaño_parte_mb=8, hilos_por_objeto=4):
+        """
+        Args:
+            bucket_name: Nombre del bucket
+            s3_client: Cliente S3 (o un sustituto local como moto o un cliente falso).
+                Si es None se crea uno anónimo con pool de conexiones compartido
+            max_workers: Número máximo de objetos descargándose a la vez
+            umbral_multiparte_mb: Tamaño a partir del cual se descarga por rangos
+            tamaño_parte_mb: Tamaño de cada rango en descargas multiparte
+            hilos_por_objeto: Rangos simultáneos por objeto grande
+        """
+        self.bucket_name = bucket_name
+        self.max_workers = max_workers
+
+        if s3_client is None:
+            s3_client = crear_cliente_s3(max_conexiones=max_workers * hilos_por_objeto)
+        self.s3_client = s3_client
+
+        self.transfer_config = TransferConfig(
+            multipart_threshold=int(umbral_multiparte_mb * MB),
+            multipart_chunksize=int(tamaño_parte_mb * MB),
+            max_concurrency=hilos_por_objeto,
+            use_threads=hilos_por_objeto > 1
+        )
+
+    def _descargar_uno(self, tarea):
+        """Descarga un objeto a un archivo temporal y lo renombra al terminar"""
+        destino = Path(tarea['destino'])
+        tamaño_esperado = tarea.get('size')
+
+        if destino.exists() and (tamaño_esperado is None or
+                                 destino.stat().st_size == tamaño_esperado):
+            return {**tarea, 'estado': 'existente', 'bytes': 0}
+
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporal = destino.with_name(destino.name + '.part')
+
+        try:
+            self.s3_client.download_file(
+                self.bucket_name,
+                tarea['key'],
+                str(temporal),
+                Config=self.transfer_config
+            )
+            os.replace(temporal, destino)
+            return {**tarea, 'estado': 'descargado', 'bytes': destino.stat().st_size}
+        except Exception as e:
+            if temporal.exists():
+                temporal.unlink()
+            return {**tarea, 'estado': 'error', 'bytes': 0, 'error': str(e)}
+
+    def descargar(self, tareas, intervalo_reporte=25):
+        """
+        Descarga todas las tareas con un pool de hilos acotado
+
+        Args:
+            tareas: Lista de dicts con al menos 'key' y 'destino' (y opcionalmente 'size')
+            intervalo_reporte: Cada cuántos archivos registrar el progreso
+
+        Returns:
+            tuple: (lista de resultados por tarea, dict de estadísticas de throughput)
+        """
+        resultados = []
+        estadisticas = {
+            'archivos_totales': len(tareas),
+            'descargados': 0,
+            'existentes': 0,
+            'errores': 0,
+            'bytes': 0,
+            'duracion_s': 0.0,
+            'mb_por_s': 0.0,
+            'archivos_por_s': 0.0
+        }
+
+        if not tareas:
+            return resultados, estadisticas
+
+        inicio = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="ideam_s3") as executor:
+            futuros = [executor.submit(self._descargar_uno, tarea) for tarea in tareas]
+
+            for n, futuro in enumerate(as_completed(futuros), 1):
+                resultado = futuro.result()
+                resultados.append(resultado)
+
+                if resultado['estado'] == 'descargado':
+                    estadisticas['descargados'] += 1
+                    estadisticas['bytes'] += resultado['bytes']
+                elif resultado['estado'] == 'existente':
+                    estadisticas['existentes'] += 1
+                else:
+                    estadisticas['errores'] += 1
+                    logger.error(f"❌ Error descargando {resultado['key']}: {resultado['error']}")
+
+                if n % intervalo_reporte == 0 or n == len(tareas):
+                    transcurrido = time.perf_counter() - inicio
+                    logger.info(
+                        f"⬇️  {n}/{len(tareas)} archivos | "
+                        f"{estadisticas['bytes'] / MB / transcurrido:.2f} MB/s | "
+                        f"{estadisticas['descargados'] / transcurrido:.2f} archivos/s"
+                    )
+
+        duracion = time.perf_counter() - inicio
+        estadisticas['duracion_s'] = round(duracion, 3)
+        if duracion > 0:
+            estadisticas['mb_por_s'] = round(estadisticas['bytes'] / MB / duracion, 3)
+            estadisticas['archivos_por_s'] = round(estadisticas['descargados'] / duracion, 3)
+
+        logger.info(
+            f"✅ Descarga paralela: {estadisticas['descargados']} nuevos, "
+            f"{estadisticas['existentes']} existentes, {estadisticas['errores']} errores | "
+            f"{estadisticas['mb_por_s']:.2f} MB/s, {estadisticas['archivos_por_s']:.2f} archivos/s"
+        )
+
+        return resultados, estadisticas
@@ -0,0 +1,235 @@
+"""
+Índice local persistente (SQLite) de las claves del bucket s3-radaresideam
+Guarda ETag, tamaño y LastModified de cada objeto para responder consultas
+de disponibilidad sin volver a listar S3.
+"""
+import os
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+# Días posteriores a la fecha de los datos en que el listado se considera final
+# (el archivo de IDEAM se publica con 24h de retraso)
+DIAS_HASTA_COMPLETO = 2
+
+
+def _inicio_dia(fecha):
+    """datetime a medianoche para una fecha (date o datetime)"""
+    return datetime(fecha.year, fecha.month, fecha.day)
+
+
+class IndiceS3Radar:
+    """Índice de objetos S3 por radar y día, llenado con listados paginados y concurrentes"""
+
+    def __init__(self, ruta_db, s3_client, bucket_name, crear_prefijo, max_workers=8):
+        """
+        Args:
+            ruta_db: Ruta del archivo SQLite del índice
+            s3_client: Cliente S3 compartido
+            bucket_name: Bucket a indexar
+            crear_prefijo: Función (radar, fecha) -> prefijo S3 del día
+            max_workers: Listados simultáneos
+        """
+        self.ruta_db = Path(ruta_db)
+        self.ruta_db.parent.mkdir(parents=True, exist_ok=True)
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.crear_prefijo = crear_prefijo
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.ruta_db), check_same_thread=False)
+        self._crear_esquema()
+
+        # Caché en memoria de (radar, fecha) -> (n_objetos, completo)
+        self._dias = {}
+        for radar, fecha, n, completo in self._conn.execute(
+                "SELECT radar, fecha, n_objetos, completo FROM dias_indexados"):
+            self._dias[(radar, fecha)] = (n, bool(completo))
+
+    def _crear_esquema(self):
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS objetos (
+                    key TEXT PRIMARY KEY,
+                    radar TEXT NOT NULL,
+                    fecha TEXT NOT NULL,
+                    archivo TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT
+                );
+                CREATE INDEX IF NOT EXISTS ix_objetos_radar_fecha ON objetos (radar, fecha);
+                CREATE TABLE IF NOT EXISTS dias_indexados (
+                    radar TEXT NOT NULL,
+                    fecha TEXT NOT NULL,
+                    n_objetos INTEGER NOT NULL,
+                    completo INTEGER NOT NULL,
+                    indexado_en TEXT NOT NULL,
+                    PRIMARY KEY (radar, fecha)
+                );
+            """)
+
+    @staticmethod
+    def _clave_fecha(fecha):
+        return fecha.strftime("%Y-%m-%d")
+
+    def listar_prefijo(self, prefix):
+        """Lista todas las claves bajo un prefijo, recorriendo todas las páginas"""
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        objetos = []
+        for pagina in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in pagina.get('Contents', []):
+                objetos.append({
+                    'key': obj['Key'],
+                    'size': obj['Size'],
+                    'etag': obj.get('ETag', '').strip('"'),
+                    'last_modified': obj['LastModified'],
+                    'filename': os.path.basename(obj['Key'])
+                })
+        return objetos
+
+    def registrar_dia(self, radar, fecha, objetos):
+        """Reemplaza en el índice el listado completo de un día"""
+        clave = self._clave_fecha(fecha)
+        completo = datetime.now() - _inicio_dia(fecha) >= timedelta(days=DIAS_HASTA_COMPLETO)
+        filas = [
+            (o['key'], radar, clave, o['filename'], o['size'], o['etag'],
+             o['last_modified'].isoformat() if hasattr(o['last_modified'], 'isoformat')
+             else str(o['last_modified']))
+            for o in objetos
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM objetos WHERE radar = ? AND fecha = ?", (radar, clave))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO objetos VALUES (?, ?, ?, ?, ?, ?, ?)", filas
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dias_indexados VALUES (?, ?, ?, ?, ?)",
+                (radar, clave, len(filas), int(completo), datetime.now().isoformat())
+            )
+            self._dias[(radar, clave)] = (len(filas), completo)
+
+    def indexar_dias(self, radar, fechas):
+        """
+        Lista concurrentemente los prefijos de los días indicados y los guarda en el índice
+
+        Returns:
+            int: Total de objetos indexados
+        """
+        total = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="ideam_ls") as executor:
+            futuros = {
+                executor.submit(self.listar_prefijo, self.crear_prefijo(radar, fecha)): fecha
+                for fecha in fechas
+            }
+            for futuro in as_completed(futuros):
+                fecha = futuros[futuro]
+                try:
+                    objetos = futuro.result()
+                except Exception as e:
+                    logger.error(f"❌ Error listando {radar} {self._clave_fecha(fecha)}: {e}")
+                    continue
+                self.registrar_dia(radar, fecha, objetos)
+                total += len(objetos)
+
+        logger.info(f"🗂️  Indexados {total} objetos de {radar} en {len(fechas)} días")
+        return total
+
+    def ultima_fecha_completa(self, radar):
+        """Última fecha indexada con listado definitivo para un radar"""
+        fechas = [f for (r, f), (_, completo) in self._dias.items() if r == radar and completo]
+        return datetime.strptime(max(fechas), "%Y-%m-%d") if fechas else None
+
+    def primera_fecha_indexada(self, radar):
+        """Primera fecha con algún listado en el índice para un radar"""
+        fechas = [f for (r, f) in self._dias if r == radar]
+        return datetime.strptime(min(fechas), "%Y-%m-%d") if fechas else None
+
+    def actualizar(self, radar, fecha_inicio=None, fecha_fin=None, dias_iniciales=30):
+        """
+        Actualiza el índice de forma incremental: lista solo los días del rango
+        que no tienen listado definitivo
+
+        Los huecos (días cuyo listado falló o quedó parcial) se vuelven a
+        listar aunque haya días posteriores completos.
+
+        Args:
+            radar: Nombre del radar
+            fecha_inicio: Primera fecha del rango (por defecto la primera
+                indexada del radar)
+            fecha_fin: Última fecha a indexar (por defecto ayer)
+            dias_iniciales: Días hacia atrás a indexar si no hay índice ni fecha_inicio
+        """
+        if fecha_fin is None:
+            fecha_fin = datetime.now() - timedelta(days=1)
+        fecha_fin = _inicio_dia(fecha_fin)
+
+        if fecha_inicio is not None:
+            desde = _inicio_dia(fecha_inicio)
+        else:
+            desde = self.primera_fecha_indexada(radar) or fecha_fin - timedelta(days=dias_iniciales)
+
+        fechas = []
+        while desde <= fecha_fin:
+            if not self.dia_indexado(radar, desde):
+                fechas.append(desde)
+            desde += timedelta(days=1)
+
+        if not fechas:
+            logger.info(f"🗂️  Índice de {radar} al día")
+            return 0
+
+        return self.indexar_dias(radar, fechas)
+
+    def dia_indexado(self, radar, fecha):
+        """Indica si el día tiene un listado definitivo en el índice"""
+        estado = self._dias.get((radar, self._clave_fecha(fecha)))
+        return estado is not None and estado[1]
+
+    def disponible(self, radar, fecha):
+        """
+        Consulta de disponibilidad desde memoria
+
+        Returns:
+            bool o None: None si el día no está indexado (o su listado parcial está vacío)
+        """
+        estado = self._dias.get((radar, self._clave_fecha(fecha)))
+        if estado is None:
+            return None
+        n_objetos, completo = estado
+        if n_objetos == 0 and not completo:
+            return None
+        return n_objetos > 0
+
+    def archivos(self, radar, fecha, limite=None):
+        """Objetos indexados de un radar en una fecha, ordenados por clave"""
+        query = ("SELECT key, size, etag, last_modified, archivo FROM objetos "
+                 "WHERE radar = ? AND fecha = ? ORDER BY key")
+        params = [radar, self._clave_fecha(fecha)]
+        if limite:
+            query += " LIMIT ?"
+            params.append(limite)
+
+        with self._lock:
+            filas = self._conn.execute(query, params).fetchall()
+
+        return [
+            {
+                'key': key,
+                'size': size,
+                'etag': etag,
+                'last_modified': datetime.fromisoformat(last_modified),
+                'filename': archivo
+            }
+            for key, size, etag, last_modified, archivo in filas
+        ]
+
+    def cerrar(self):
+        self._conn.close()
@@ -0,0 +1,233 @@
+"""
+Inventario incremental (SQLite) de los archivos de radar descargados
+Solo vuelve a recorrer los directorios radar/fecha cuyo mtime cambió y
+mantiene un registro por archivo (ruta, tamaño, mtime) para responder
+consultas de disponibilidad sin reescanear el disco ni leer CSV.
+"""
+import os
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Archivos del directorio de datos que no son volúmenes de radar
+EXTENSIONES_IGNORADAS = ('.txt', '.csv', '.part', '.sqlite', '.sqlite-journal')
+
+
+class InventarioRadares:
+    """Inventario persistente de data/Radar_IDEAM/<radar>/<fecha>/<archivo>"""
+
+    def __init__(self, base_dir="data/Radar_IDEAM", info_radares=None, ruta_db=None):
+        """
+        Args:
+            base_dir: Directorio raíz de los datos de radar
+            info_radares: Dict radar -> info (ubicacion, distancia_medellin_km, ...)
+            ruta_db: Archivo SQLite (por defecto base_dir/inventario.sqlite)
+        """
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.info_radares = info_radares or {}
+        self.ruta_db = Path(ruta_db) if ruta_db else self.base_dir / 'inventario.sqlite'
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.ruta_db), check_same_thread=False)
+        self._crear_esquema()
+
+    def _crear_esquema(self):
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS directorios (
+                    ruta TEXT PRIMARY KEY,
+                    radar TEXT NOT NULL,
+                    fecha_directorio TEXT NOT NULL,
+                    mtime_ns INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS archivos (
+                    ruta TEXT PRIMARY KEY,
+                    directorio TEXT NOT NULL,
+                    radar TEXT NOT NULL,
+                    fecha_directorio TEXT NOT NULL,
+                    archivo TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_archivos_radar_fecha
+                    ON archivos (radar, fecha_directorio);
+                CREATE INDEX IF NOT EXISTS ix_archivos_directorio ON archivos (directorio);
+            """)
+
+    @staticmethod
+    def _subdirectorios(ruta):
+        try:
+            with os.scandir(ruta) as entradas:
+                return [e for e in entradas
+                        if e.is_dir(follow_symlinks=False) and not e.name.startswith('.')]
+        except FileNotFoundError:
+            return []
+
+    def actualizar(self, radar=None):
+        """
+        Sincroniza el inventario con el disco
+
+        Solo se listan los directorios de fecha cuyo mtime difiere del registrado
+        (crear, borrar o renombrar archivos cambia el mtime del directorio; las
+        descargas escriben a .part y renombran, por lo que siempre lo actualizan).
+
+        Returns:
+            int: Número de directorios reescaneados o eliminados
+        """
+        if radar:
+            radares = [e for e in self._subdirectorios(self.base_dir) if e.name == radar]
+        else:
+            radares = self._subdirectorios(self.base_dir)
+
+        with self._lock:
+            conocidos = {
+                ruta: (mtime_ns, r)
+                for ruta, r, mtime_ns in self._conn.execute(
+                    "SELECT ruta, radar, mtime_ns FROM directorios"
+                )
+            }
+
+        vistos = set()
+        reescaneados = 0
+
+        for entrada_radar in radares:
+            for entrada_fecha in self._subdirectorios(entrada_radar.path):
+                ruta_dir = entrada_fecha.path
+                vistos.add(ruta_dir)
+                mtime_ns = entrada_fecha.stat().st_mtime_ns
+
+                registrado = conocidos.get(ruta_dir)
+                if registrado is not None and registrado[0] == mtime_ns:
+                    continue
+
+                self._reescanear(entrada_radar.name, entrada_fecha.name, ruta_dir, mtime_ns)
+                reescaneados += 1
+
+        # Directorios que ya no existen
+        eliminados = [
+            ruta for ruta, (_, r) in conocidos.items()
+            if ruta not in vistos and (radar is None or r == radar)
+        ]
+        if eliminados:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM archivos WHERE directorio = ?",
+                                       [(r,) for r in eliminados])
+                self._conn.executemany("DELETE FROM directorios WHERE ruta = ?",
+                                       [(r,) for r in eliminados])
+
+        if reescaneados or eliminados:
+            logger.info(f"📋 Inventario actualizado: {reescaneados} directorios reescaneados, "
+                        f"{len(eliminados)} eliminados")
+
+        return reescaneados + len(eliminados)
+
+    def _reescanear(self, radar, fecha_directorio, ruta_dir, mtime_ns):
+        """Reemplaza los registros de un directorio de fecha"""
+        filas = []
+        with os.scandir(ruta_dir) as entradas:
+            for entrada in entradas:
+                if not entrada.is_file() or entrada.name.endswith(EXTENSIONES_IGNORADAS):
+                    continue
+                st = entrada.stat()
+                filas.append((entrada.path, ruta_dir, radar, fecha_directorio,
+                              entrada.name, st.st_size, st.st_mtime))
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM archivos WHERE directorio = ?", (ruta_dir,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO archivos VALUES (?, ?, ?, ?, ?, ?, ?)", filas
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO directorios VALUES (?, ?, ?, ?)",
+                (ruta_dir, radar, fecha_directorio, mtime_ns)
+            )
+
+    def _consultar(self, query, params=()):
+        with self._lock:
+            return pd.read_sql_query(query, self._conn, params=params)
+
+    def dataframe(self, radar=None):
+        """Inventario completo con las mismas columnas de inventario_radares.csv"""
+        query = ("SELECT radar, fecha_directorio, archivo, ruta AS ruta_completa, "
+                 "size / ? AS tamaño_mb, mtime FROM archivos")
+        params = [float(MB)]
+        if radar:
+            query += " WHERE radar = ?"
+            params.append(radar)
+        query += " ORDER BY radar, fecha_directorio, archivo"
+
+        df = self._consultar(query, params)
+
+        df.insert(1, 'ubicacion', df['radar'].map(
+            lambda r: self.info_radares.get(r, {}).get('ubicacion', 'N/A')))
+        df.insert(2, 'distancia_medellin_km', df['radar'].map(
+            lambda r: self.info_radares.get(r, {}).get('distancia_medellin_km', 0)))
+        df['fecha_modificacion'] = df.pop('mtime').map(datetime.fromtimestamp)
+
+        return df
+
+    def radares(self):
+        """Radares con al menos un archivo en el inventario"""
+        with self._lock:
+            return [r for (r,) in self._conn.execute(
+                "SELECT DISTINCT radar FROM archivos ORDER BY radar")]
+
+    def disponibilidad(self, radar):
+        """Archivos y MB por fecha de un radar"""
+        df = self._consultar(
+            "SELECT fecha_directorio AS fecha, COUNT(*) AS num_archivos, "
+            "SUM(size) / ? AS tamaño_total_mb FROM archivos WHERE radar = ? "
+            "GROUP BY fecha_directorio ORDER BY fecha_directorio",
+            (float(MB), radar)
+        )
+        df['fecha'] = pd.to_datetime(df['fecha'])
+        return df
+
+    def resumen(self, radar):
+        """
+        Estadísticas agregadas de un radar calculadas en SQL
+
+        Returns:
+            dict o None si el radar no tiene archivos
+        """
+        with self._lock:
+            total, suma, promedio, maximo, minimo = self._conn.execute(
+                "SELECT COUNT(*), SUM(size), AVG(size), MAX(size), MIN(size) "
+                "FROM archivos WHERE radar = ?", (radar,)
+            ).fetchone()
+            if not total:
+                return None
+            n_fechas, primera, ultima, prom_fecha, max_fecha, min_fecha = self._conn.execute(
+                "SELECT COUNT(*), MIN(fecha_directorio), MAX(fecha_directorio), "
+                "AVG(n), MAX(n), MIN(n) FROM ("
+                "  SELECT fecha_directorio, COUNT(*) AS n FROM archivos "
+                "  WHERE radar = ? GROUP BY fecha_directorio)", (radar,)
+            ).fetchone()
+
+        return {
+            'radar': radar,
+            'total_archivos': total,
+            'espacio_total_mb': suma / MB,
+            'tamaño_promedio_mb': promedio / MB,
+            'tamaño_maximo_mb': maximo / MB,
+            'tamaño_minimo_mb': minimo / MB,
+            'fechas_disponibles': n_fechas,
+            'primera_fecha': primera,
+            'ultima_fecha': ultima,
+            'archivos_por_fecha_promedio': prom_fecha,
+            'archivos_por_fecha_maximo': max_fecha,
+            'archivos_por_fecha_minimo': min_fecha,
+            'distancia_medellin_km': self.info_radares.get(radar, {}).get('distancia_medellin_km')
+        }
+
+    def cerrar(self):
+        self._conn.close()
@@ -3,17 +3,22 @@ Script para descargar datos de radares meteorológicos IDEAM desde AWS Open Data
 Guarda datos en data/Radar_IDEAM y logs en logs/ideam
 """
 import os
-import boto3
 import gzip
 import numpy as np
-import pandas as pd
 from pathlib import Path
 from datetime import datetime, timedelta
 import logging
-from botocore import UNSIGNED
-from botocore.config import Config
 import json
 
+try:
+    from src.data_sources.ideam_descarga_paralela import DescargadorParaleloS3, crear_cliente_s3
+    from src.data_sources.ideam_indice_s3 import IndiceS3Radar
+    from src.data_sources.ideam_inventario import InventarioRadares
+except ImportError:
+    from ideam_descarga_paralela import DescargadorParaleloS3, crear_cliente_s3
+    from ideam_indice_s3 import IndiceS3Radar
+    from ideam_inventario import InventarioRadares
+
 # Configuración de logging
 log_dir = Path("logs/ideam")
 log_dir.mkdir(parents=True, exist_ok=True)
@@ -73,20 +78,34 @@ class IDEAMRadarDownloader:
         }
     }
     
-    def __init__(self, base_dir="data/Radar_IDEAM"):
+    def __init__(self, base_dir="data/Radar_IDEAM", s3_client=None, max_workers=16):
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers
         
-        # Configurar cliente S3 sin credenciales (bucket público)
-        self.s3_client = boto3.client(
-            's3',
-            config=Config(signature_version=UNSIGNED),
-            region_name='us-east-1'
-        )
+        # Configurar cliente S3 sin credenciales (bucket público).
+        # Un solo cliente con pool de conexiones compartido por todos los hilos
+        if s3_client is None:
+            s3_client = crear_cliente_s3(max_conexiones=max_workers * 4)
+        self.s3_client = s3_client
         
         # Bucket correcto según documentación oficial
         self.bucket_name = 's3-radaresideam'
         
+        # Estadísticas de la última descarga por lotes
+        self.ultima_estadistica = None
+        
+        # Inventario incremental de archivos descargados (se abre al primer uso)
+        self.inventario = None
+        
+        # Índice local de claves S3 (evita re-listar días ya publicados)
+        self.indice = IndiceS3Radar(
+            self.base_dir / 'indice_s3.sqlite',
+            self.s3_client,
+            self.bucket_name,
+            crear_prefijo=self.crear_query_prefix
+        )
+        
         logger.info("IDEAMRadarDownloader inicializado")
         logger.info(f"Bucket AWS: s3://{self.bucket_name}")
         logger.info(f"Directorio de datos: {self.base_dir}")
@@ -155,44 +174,46 @@ class IDEAMRadarDownloader:
         prefix = f"l2_data/{fecha.year}/{fecha.month:02d}/{fecha.day:02d}/{radar}/{prefijo_radar}{fecha:%y%m%d}"
         return prefix
     
-    def listar_archivos_disponibles(self, radar, fecha=None, limite=1000):
-        """Lista archivos disponibles en S3 para un radar específico"""
+    def listar_archivos_disponibles(self, radar, fecha=None, limite=1000, usar_indice=True):
+        """
+        Lista archivos disponibles en S3 para un radar específico
+        
+        Si el día ya tiene un listado definitivo en el índice local se responde
+        desde allí; si no, se lista S3 con paginación completa y se indexa.
+        """
         if fecha is None:
             # Por defecto, buscar ayer (los datos tienen 24h de delay)
             fecha = datetime.now() - timedelta(days=1)
         
+        if usar_indice and self.indice.dia_indexado(radar, fecha):
+            archivos = self.indice.archivos(radar, fecha, limite)
+            logger.info(f"🗂️  {len(archivos)} archivos para {radar} en {fecha.date()} (índice local)")
+            return archivos
+        
         prefix = self.crear_query_prefix(radar, fecha)
         
         logger.info(f"Buscando archivos en: s3://{self.bucket_name}/{prefix}")
         
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=prefix,
-                MaxKeys=limite
-            )
+            archivos = self.indice.listar_prefijo(prefix)
+            self.indice.registrar_dia(radar, fecha, archivos)
             
-            archivos = []
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    archivos.append({
-                        'key': obj['Key'],
-                        'size': obj['Size'],
-                        'last_modified': obj['LastModified'],
-                        'filename': os.path.basename(obj['Key'])
-                    })
-                
+            if archivos:
                 logger.info(f"✅ Encontrados {len(archivos)} archivos para {radar} en {fecha.date()}")
             else:
                 logger.warning(f"⚠️  No se encontraron archivos para {radar} en {fecha.date()}")
                 logger.info(f"💡 Sugerencia: Los datos tienen 24h de delay. Intente con fechas anteriores.")
             
-            return archivos
+            return archivos[:limite] if limite else archivos
             
         except Exception as e:
             logger.error(f"❌ Error listando archivos: {e}")
             return []
     
+    def actualizar_indice(self, radar, fecha_inicio=None, fecha_fin=None):
+        """Actualiza incrementalmente el índice local de claves S3 de un radar"""
+        return self.indice.actualizar(radar, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    
     def descargar_archivo(self, radar, archivo_key, fecha=None):
         """Descarga un archivo específico del radar"""
         if fecha is None:
@@ -225,8 +246,15 @@ class IDEAMRadarDownloader:
             logger.error(f"❌ Error descargando {filename}: {e}")
             return None
     
-    def descargar_rango_fechas(self, radar, fecha_inicio, fecha_fin, max_archivos=None):
-        """Descarga archivos de un radar en un rango de fechas"""
+    def descargar_rango_fechas(self, radar, fecha_inicio, fecha_fin, max_archivos=None,
+                               max_workers=None):
+        """
+        Descarga archivos de un radar en un rango de fechas
+        
+        Primero lista todas las claves del rango y luego las descarga con un
+        pool de hilos acotado que comparte el cliente S3 (descargas por rangos
+        para objetos grandes). El throughput queda en self.ultima_estadistica.
+        """
         logger.info(f"📡 Iniciando descarga para {radar}")
         logger.info(f"📅 Rango: {fecha_inicio.date()} a {fecha_fin.date()}")
         
@@ -236,81 +264,91 @@ class IDEAMRadarDownloader:
             logger.warning(f"⚠️  Los datos tienen 24h de delay. Ajustando fecha fin a {fecha_limite.date()}")
             fecha_fin = fecha_limite
         
-        archivos_descargados = []
+        # Listar en paralelo los días que aún no están en el índice local
+        dias_sin_indice = []
+        fecha_actual = fecha_inicio
+        while fecha_actual <= fecha_fin:
+            if not self.indice.dia_indexado(radar, fecha_actual):
+                dias_sin_indice.append(fecha_actual)
+            fecha_actual += timedelta(days=1)
+        if dias_sin_indice:
+            self.indice.indexar_dias(radar, dias_sin_indice)
+        
+        # Reunir las claves de todos los días del rango
+        tareas = []
         fecha_actual = fecha_inicio
-        total_archivos = 0
         
         while fecha_actual <= fecha_fin:
             logger.info(f"📅 Procesando fecha: {fecha_actual.date()}")
             
-            # Listar archivos disponibles
-            archivos = self.listar_archivos_disponibles(radar, fecha_actual)
+            for archivo in self.indice.archivos(radar, fecha_actual):
+                if max_archivos and len(tareas) >= max_archivos:
+                    break
+                
+                radar_dir = self.base_dir / radar / fecha_actual.strftime("%Y%m%d")
+                tareas.append({
+                    'key': archivo['key'],
+                    'size': archivo['size'],
+                    'destino': radar_dir / archivo['filename'],
+                    'fecha': fecha_actual,
+                    'archivo': archivo['filename']
+                })
             
-            if archivos:
-                for archivo in archivos:
-                    if max_archivos and total_archivos >= max_archivos:
-                        logger.info(f"🛑 Límite de {max_archivos} archivos alcanzado")
-                        return archivos_descargados
-                    
-                    # Descargar archivo
-                    local_path = self.descargar_archivo(radar, archivo['key'], fecha_actual)
-                    if local_path:
-                        archivos_descargados.append({
-                            'radar': radar,
-                            'fecha': fecha_actual,
-                            'archivo': archivo['filename'],
-                            'ruta_local': str(local_path),
-                            'tamaño_mb': archivo['size'] / (1024 * 1024)
-                        })
-                        total_archivos += 1
+            if max_archivos and len(tareas) >= max_archivos:
+                logger.info(f"🛑 Límite de {max_archivos} archivos alcanzado")
+                break
             
             fecha_actual += timedelta(days=1)
         
+        motor = DescargadorParaleloS3(
+            self.bucket_name,
+            s3_client=self.s3_client,
+            max_workers=max_workers or self.max_workers
+        )
+        resultados, self.ultima_estadistica = motor.descargar(tareas)
+        
+        # Mantener el orden cronológico de las claves
+        orden = {tarea['key']: i for i, tarea in enumerate(tareas)}
+        resultados.sort(key=lambda r: orden[r['key']])
+        
+        archivos_descargados = [
+            {
+                'radar': radar,
+                'fecha': r['fecha'],
+                'archivo': r['archivo'],
+                'ruta_local': str(r['destino']),
+                'tamaño_mb': r['size'] / (1024 * 1024)
+            }
+            for r in resultados if r['estado'] != 'error'
+        ]
+        
         logger.info(f"✅ Descarga completada. Total archivos: {len(archivos_descargados)}")
         return archivos_descargados
     
     def generar_inventario(self, radar=None):
-        """Genera un inventario de todos los archivos descargados"""
+        """
+        Genera un inventario de todos los archivos descargados
+        Usa el inventario incremental: solo se reescanean los directorios que
+        cambiaron y el CSV se reescribe únicamente si hubo cambios
+        """
         logger.info("📋 Generando inventario de archivos descargados")
         
-        inventario = []
+        if self.inventario is None:
+            self.inventario = InventarioRadares(self.base_dir, self.RADARES_DISPONIBLES)
         
-        # Si se especifica radar, solo ese
-        if radar:
-            radares_a_inventariar = [radar]
-        else:
-            radares_a_inventariar = [d.name for d in self.base_dir.iterdir() if d.is_dir()]
+        cambios = self.inventario.actualizar(radar)
+        inventario_path = self.base_dir / 'inventario_radares.csv'
         
-        for radar_nombre in radares_a_inventariar:
-            radar_path = self.base_dir / radar_nombre
-            
-            if not radar_path.exists():
-                continue
-            
-            for fecha_dir in radar_path.iterdir():
-                if fecha_dir.is_dir():
-                    for archivo in fecha_dir.iterdir():
-                        if archivo.is_file() and not archivo.name.endswith('.txt'):
-                            info_radar = self.RADARES_DISPONIBLES.get(radar_nombre, {})
-                            inventario.append({
-                                'radar': radar_nombre,
-                                'ubicacion': info_radar.get('ubicacion', 'N/A'),
-                                'distancia_medellin_km': info_radar.get('distancia_medellin_km', 0),
-                                'fecha_directorio': fecha_dir.name,
-                                'archivo': archivo.name,
-                                'ruta_completa': str(archivo),
-                                'tamaño_mb': archivo.stat().st_size / (1024 * 1024),
-                                'fecha_modificacion': datetime.fromtimestamp(archivo.stat().st_mtime)
-                            })
-        
-        df_inventario = pd.DataFrame(inventario)
-        
-        if not df_inventario.empty:
-            # Guardar inventario
-            inventario_path = self.base_dir / 'inventario_radares.csv'
-            df_inventario.to_csv(inventario_path, index=False)
+        df_inventario = self.inventario.dataframe(radar)
+        escribir = cambios or not inventario_path.exists()
+        
+        if escribir:
+            # Exportar inventario (compatibilidad con herramientas que leen el CSV);
+            # también tras borrados, aunque el radar haya quedado sin archivos
+            self.inventario.dataframe().to_csv(inventario_path, index=False)
             logger.info(f"💾 Inventario guardado en: {inventario_path}")
-            
+        
+        if not df_inventario.empty and escribir:
             # Generar resumen
             resumen_path = self.base_dir / 'resumen_radares.txt'
             with open(resumen_path, 'w', encoding='utf-8') as f:
@@ -378,8 +416,10 @@ class IDEAMRadarDownloader:
     
     def verificar_disponibilidad(self, radar, fecha):
         """Verifica si hay datos disponibles para una fecha específica"""
-        archivos = self.listar_archivos_disponibles(radar, fecha)
-        return len(archivos) > 0
+        disponible = self.indice.disponible(radar, fecha)
+        if disponible is None:
+            disponible = len(self.listar_archivos_disponibles(radar, fecha, usar_indice=False)) > 0
+        return disponible
 
 
 def menu_interactivo():
@@ -9,12 +9,17 @@ from pathlib import Path
 from urllib.parse import quote
 from dotenv import load_dotenv
 
+try:
+    from src.data_sources.http_transport import TransporteHTTP, obtener_transporte
+except ImportError:
+    from http_transport import TransporteHTTP, obtener_transporte
+
 
 class MeteoblueClient:
     """Cliente para consumir los datos de la API de Meteoblue"""
     
     def __init__(self, api_key: str, shared_secret: Optional[str] = None, 
-                 data_dir: str = "data"):
+                 data_dir: str = "data", transporte: Optional[TransporteHTTP] = None):
         """
         Inicializa el cliente de Meteoblue
         
@@ -22,9 +27,11 @@ class MeteoblueClient:
             api_key: Tu API key de Meteoblue
             shared_secret: Secret compartido para firmar requests (opcional)
             data_dir: Directorio base para guardar datos e imágenes
+            transporte: Transporte HTTP (por defecto el compartido del proceso)
         """
         self.api_key = api_key
         self.shared_secret = shared_secret
+        self.http = transporte or obtener_transporte()
         self.base_url = "https://my.meteoblue.com"
         self.data_dir = Path(data_dir)
         
@@ -76,34 +83,43 @@ class MeteoblueClient:
         Returns:
             Diccionario con los datos del pronóstico
         """
-        # Generar expire si no se proporciona
-        if expire is None:
-            expire = int((datetime.now() + timedelta(days=365)).timestamp())
-        
-        # Construir query string (ORDEN EXACTO según documentación de Meteoblue)
-        query = f"/packages/basic-day?lat={lat}&lon={lon}&asl={asl}&format=json&apikey={self.api_key}&expire={expire}"
-        
-        # Firmar URL
-        url = self._sign_url(query, expire=expire)
+        url = self._forecast_url(lat, lon, asl, expire)
         
         # Hacer request
-        response = requests.get(url)
+        response = self.http.get(url, proveedor='meteoblue')
         response.raise_for_status()
         
         data = response.json()
         
         # Guardar datos si se solicita
         if save_data:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"forecast_{location_name.lower().replace(' ', '_')}_{timestamp}.json"
-            filepath = self.meteoblue_dir / filename
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            print(f"📊 Datos guardados en: {filepath}")
+            self._save_forecast(data, location_name)
         
         return data
     
+    def _forecast_url(self, lat: float, lon: float, asl: int = 0,
+                      expire: Optional[int] = None) -> str:
+        """URL firmada del paquete basic-day"""
+        # Generar expire si no se proporciona
+        if expire is None:
+            expire = int((datetime.now() + timedelta(days=365)).timestamp())
+        
+        # Construir query string (ORDEN EXACTO según documentación de Meteoblue)
+        query = f"/packages/basic-day?lat={lat}&lon={lon}&asl={asl}&format=json&apikey={self.api_key}&expire={expire}"
+        
+        # Firmar URL
+        return self._sign_url(query, expire=expire)
+    
+    def _save_forecast(self, data: Dict[str, Any], location_name: str):
+        """Guarda el pronóstico en JSON"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"forecast_{location_name.lower().replace(' ', '_')}_{timestamp}.json"
+        filepath = self.meteoblue_dir / filename
+        
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        print(f"📊 Datos guardados en: {filepath}")
+    
     def get_meteogram_image(self, lat: float, lon: float, asl: int = 0,
                            location_name: str = "Location",
                            timezone: str = "America/Bogota",
@@ -153,7 +169,7 @@ class MeteoblueClient:
         url = self._sign_url(query, expire=expire)
         
         # Hacer request
-        response = requests.get(url)
+        response = self.http.get(url, proveedor='meteoblue')
         response.raise_for_status()
         
         image_data = response.content
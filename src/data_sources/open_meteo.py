@@ -1,29 +1,72 @@
 import openmeteo_requests
 import pandas as pd
-import requests_cache
-from retry_requests import retry
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import json
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterable
 from dotenv import load_dotenv
 import os
+import numpy as np
+
+try:
+    from src.data_sources.openmeteo_decoder import (decodificar_actual, decodificar_respuesta,
+                                                    respuesta_a_dataframes)
+    from src.data_sources.http_transport import TransporteHTTP, obtener_transporte
+except ImportError:
+    from openmeteo_decoder import decodificar_actual, decodificar_respuesta, respuesta_a_dataframes
+    from http_transport import TransporteHTTP, obtener_transporte
+
+try:
+    from src.data_loaders.columnar_store import ColumnarStore, PYARROW_AVAILABLE
+except ImportError:
+    import sys
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.data_loaders.columnar_store import ColumnarStore, PYARROW_AVAILABLE
+
+# Ubicaciones por petición en las consultas masivas: Open-Meteo devuelve una
+# respuesta por coordenada en el mismo cuerpo FlatBuffers
+TAMAÑO_LOTE_UBICACIONES = 100
+
+
+def _normalizar_ubicacion(ubicacion) -> Dict[str, Any]:
+    """
+    Acepta dicts {'name', 'lat', 'lon'}, dicts/filas de CiudadesFavoritas
+    ({'nombre_ciudad', 'latitud', 'longitud'}) u objetos con esos atributos
+    """
+    if not isinstance(ubicacion, dict):
+        ubicacion = {
+            'nombre_ciudad': getattr(ubicacion, 'nombre_ciudad', None),
+            'latitud': getattr(ubicacion, 'latitud', None),
+            'longitud': getattr(ubicacion, 'longitud', None),
+        }
+
+    nombre = ubicacion.get('name', ubicacion.get('nombre_ciudad'))
+    lat = ubicacion.get('lat', ubicacion.get('latitud'))
+    lon = ubicacion.get('lon', ubicacion.get('longitud'))
+    if lat is None or lon is None:
+        raise ValueError(f"Ubicación sin coordenadas: {ubicacion}")
+
+    lat, lon = float(lat), float(lon)
+    return {'name': nombre or f"{lat:.4f},{lon:.4f}", 'lat': lat, 'lon': lon}
 
 
 class OpenMeteoClient:
     """Cliente para consumir datos de Open-Meteo API (Forecast y Historical)"""
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", storage: str = "columnar",
+                 transporte: Optional[TransporteHTTP] = None):
         """
         Inicializa el cliente de Open-Meteo
         
         Args:
             data_dir: Directorio base para guardar datos
+            storage: 'columnar' (Parquet en data/columnar, requiere pyarrow)
+                o 'csv' (archivos CSV + metadatos JSON por respuesta)
+            transporte: Transporte HTTP (por defecto el compartido del proceso,
+                con reintentos, cuota 'openmeteo' y caché de respuestas)
         """
-        # Setup con cache y retry
-        cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
-        retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-        self.client = openmeteo_requests.Client(session=retry_session)
+        self.http = transporte or obtener_transporte()
+        self.client = openmeteo_requests.Client(session=self.http.sesion("openmeteo"))
         
         # URLs de las APIs
         self.forecast_url = "https://api.open-meteo.com/v1/forecast"
@@ -33,6 +76,14 @@ class OpenMeteoClient:
         self.data_dir = Path(data_dir)
         self.openmeteo_dir = self.data_dir / "data_openmeteo"
         self.openmeteo_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Almacén columnar (con respaldo a CSV si pyarrow no está instalado)
+        self.store = None
+        if storage == "columnar":
+            if PYARROW_AVAILABLE:
+                self.store = ColumnarStore(self.data_dir / "columnar")
+            else:
+                print("⚠️  pyarrow no disponible, se guardará en CSV")
     
     def get_forecast(self, lat: float, lon: float,
                      location_name: str = "location",
@@ -78,58 +129,64 @@ class OpenMeteoClient:
         response = responses[0]
         
         # Procesar respuesta
+        decodificado = respuesta_a_dataframes(response, hourly_vars, daily_vars)
         result = {
             "location": location_name,
-            "coordinates": {
-                "latitude": response.Latitude(),
-                "longitude": response.Longitude(),
-                "elevation": response.Elevation()
-            },
-            "timezone": response.UtcOffsetSeconds(),
-            "hourly": None,
-            "daily": None
+            "coordinates": decodificado["coordinates"],
+            "timezone": decodificado["timezone"],
+            "hourly": decodificado["hourly"],
+            "daily": decodificado["daily"]
         }
         
-        # Procesar datos horarios
-        if hourly_vars:
-            hourly = response.Hourly()
-            hourly_data = {
-                "date": pd.date_range(
-                    start=pd.to_datetime(hourly.Time(), unit="s", utc=True),
-                    end=pd.to_datetime(hourly.TimeEnd(), unit="s", utc=True),
-                    freq=pd.Timedelta(seconds=hourly.Interval()),
-                    inclusive="left"
-                )
-            }
-            
-            for i, var in enumerate(hourly_vars):
-                hourly_data[var] = hourly.Variables(i).ValuesAsNumpy()
-            
-            result["hourly"] = pd.DataFrame(data=hourly_data)
-        
-        # Procesar datos diarios
-        if daily_vars:
-            daily = response.Daily()
-            daily_data = {
-                "date": pd.date_range(
-                    start=pd.to_datetime(daily.Time(), unit="s", utc=True),
-                    end=pd.to_datetime(daily.TimeEnd(), unit="s", utc=True),
-                    freq=pd.Timedelta(seconds=daily.Interval()),
-                    inclusive="left"
-                )
-            }
-            
-            for i, var in enumerate(daily_vars):
-                daily_data[var] = daily.Variables(i).ValuesAsNumpy()
-            
-            result["daily"] = pd.DataFrame(data=daily_data)
-        
         # Guardar datos
         if save_data:
             self._save_forecast_data(result, location_name)
         
         return result
     
+    def get_current(self, lat: float, lon: float,
+                    location_name: str = "location",
+                    current_vars: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Obtiene las condiciones actuales (bloque 'current' del pronóstico)
+        
+        Args:
+            lat: Latitud
+            lon: Longitud
+            location_name: Nombre de la ubicación
+            current_vars: Variables a consultar
+            
+        Returns:
+            Diccionario con coordenadas, hora (ISO, UTC) y valores actuales
+        """
+        if current_vars is None:
+            current_vars = ["temperature_2m", "relative_humidity_2m", "pressure_msl",
+                            "wind_speed_10m", "wind_direction_10m", "precipitation",
+                            "weather_code"]
+        
+        params = {
+            "latitude": lat,
+            "longitude": lon,
+            "current": current_vars,
+            "timezone": "auto"
+        }
+        
+        responses = self.client.weather_api(self.forecast_url, params=params)
+        response = responses[0]
+        
+        actual = decodificar_actual(response.Current(), current_vars)
+        return {
+            "location": location_name,
+            "coordinates": {
+                "latitude": response.Latitude(),
+                "longitude": response.Longitude(),
+                "elevation": response.Elevation()
+            },
+            "time": (datetime.fromtimestamp(actual["time"], timezone.utc).isoformat()
+                     if actual else None),
+            "current": actual["values"] if actual else {}
+        }
+    
     def get_historical(self, lat: float, lon: float,
                       start_date: str, end_date: str,
                       location_name: str = "location",
@@ -175,62 +232,152 @@ class OpenMeteoClient:
         responses = self.client.weather_api(self.historical_url, params=params)
         response = responses[0]
         
-        # Procesar respuesta (similar a forecast)
+        # Procesar respuesta
+        decodificado = respuesta_a_dataframes(response, hourly_vars, daily_vars)
         result = {
             "location": location_name,
-            "coordinates": {
-                "latitude": response.Latitude(),
-                "longitude": response.Longitude(),
-                "elevation": response.Elevation()
-            },
-            "timezone": response.UtcOffsetSeconds(),
+            "coordinates": decodificado["coordinates"],
+            "timezone": decodificado["timezone"],
             "period": {"start": start_date, "end": end_date},
-            "hourly": None,
-            "daily": None
+            "hourly": decodificado["hourly"],
+            "daily": decodificado["daily"]
         }
         
-        # Procesar datos horarios
-        if hourly_vars:
-            hourly = response.Hourly()
-            hourly_data = {
-                "date": pd.date_range(
-                    start=pd.to_datetime(hourly.Time(), unit="s", utc=True),
-                    end=pd.to_datetime(hourly.TimeEnd(), unit="s", utc=True),
-                    freq=pd.Timedelta(seconds=hourly.Interval()),
-                    inclusive="left"
-                )
-            }
-            
-            for i, var in enumerate(hourly_vars):
-                hourly_data[var] = hourly.Variables(i).ValuesAsNumpy()
+        # Guardar datos
+        if save_data:
+            self._save_historical_data(result, location_name, start_date, end_date)
+        
+        return result
+    
+    def get_forecast_bulk(self, ubicaciones: Iterable,
+                          days: int = 7,
+                          hourly_vars: Optional[List[str]] = None,
+                          daily_vars: Optional[List[str]] = None,
+                          batch_size: int = TAMAÑO_LOTE_UBICACIONES,
+                          save_data: bool = True) -> Dict[str, Any]:
+        """
+        Pronóstico para muchas ubicaciones con pocas peticiones HTTP
+        
+        Las coordenadas se agrupan en lotes de `batch_size` por petición y las
+        coordenadas repetidas (p. ej. la misma ciudad favorita de varios
+        usuarios) se consultan una sola vez.
+        
+        Args:
+            ubicaciones: Dicts {'name', 'lat', 'lon'} o filas de CiudadesFavoritas
+            days: Días de pronóstico (1-16)
+            hourly_vars: Variables horarias a consultar
+            daily_vars: Variables diarias a consultar
+            batch_size: Ubicaciones por petición
+            save_data: Si guardar los datos
             
-            result["hourly"] = pd.DataFrame(data=hourly_data)
-        
-        # Procesar datos diarios
-        if daily_vars:
-            daily = response.Daily()
-            daily_data = {
-                "date": pd.date_range(
-                    start=pd.to_datetime(daily.Time(), unit="s", utc=True),
-                    end=pd.to_datetime(daily.TimeEnd(), unit="s", utc=True),
-                    freq=pd.Timedelta(seconds=daily.Interval()),
-                    inclusive="left"
-                )
+        Returns:
+            Diccionario con 'hourly' y 'daily' en formato largo (una fila por
+            ubicación y fecha, columnas location/latitude/longitude/date + variables)
+            y 'requests' con el número de peticiones realizadas
+        """
+        if hourly_vars is None:
+            hourly_vars = ["temperature_2m", "relative_humidity_2m", "wind_speed_10m"]
+        
+        if daily_vars is None:
+            daily_vars = ["temperature_2m_max", "temperature_2m_min", 
+                         "precipitation_sum", "wind_speed_10m_max"]
+        
+        # Agrupar nombres por coordenada (4 decimales ~ 11 m)
+        coordenadas = {}
+        for ubicacion in ubicaciones:
+            ubicacion = _normalizar_ubicacion(ubicacion)
+            clave = (round(ubicacion['lat'], 4), round(ubicacion['lon'], 4))
+            coordenadas.setdefault(clave, []).append(ubicacion['name'])
+        
+        claves = list(coordenadas)
+        partes = {"hourly": [], "daily": []}
+        peticiones = 0
+        
+        for i in range(0, len(claves), batch_size):
+            lote = claves[i:i + batch_size]
+            params = {
+                "latitude": [lat for lat, _ in lote],
+                "longitude": [lon for _, lon in lote],
+                "hourly": hourly_vars,
+                "daily": daily_vars,
+                "forecast_days": days,
+                "timezone": "auto"
             }
             
-            for i, var in enumerate(daily_vars):
-                daily_data[var] = daily.Variables(i).ValuesAsNumpy()
+            responses = self.client.weather_api(self.forecast_url, params=params)
+            peticiones += 1
             
-            result["daily"] = pd.DataFrame(data=daily_data)
+            # Las respuestas llegan en el mismo orden que las coordenadas
+            for clave, response in zip(lote, responses):
+                decodificado = decodificar_respuesta(response, hourly_vars, daily_vars)
+                lat = decodificado["coordinates"]["latitude"]
+                lon = decodificado["coordinates"]["longitude"]
+                for frecuencia in ("hourly", "daily"):
+                    if decodificado[frecuencia] is None:
+                        continue
+                    for nombre in coordenadas[clave]:
+                        partes[frecuencia].append((nombre, lat, lon, decodificado[frecuencia]))
+        
+        result = {
+            "locations": sum(len(nombres) for nombres in coordenadas.values()),
+            "requests": peticiones,
+            "hourly": self._unir_largo(partes["hourly"], hourly_vars),
+            "daily": self._unir_largo(partes["daily"], daily_vars)
+        }
+        print(f"📡 {result['locations']} ubicaciones en {peticiones} peticiones")
         
-        # Guardar datos
         if save_data:
-            self._save_historical_data(result, location_name, start_date, end_date)
+            self._save_bulk_data(result)
         
         return result
     
+    @staticmethod
+    def _unir_largo(partes: List[tuple], variables: List[str]) -> Optional[pd.DataFrame]:
+        """Concatena los bloques decodificados en un único frame largo"""
+        if not partes:
+            return None
+        
+        longitudes = [len(bloque) for _, _, _, bloque in partes]
+        codigos, nombres = pd.factorize(pd.Index([p[0] for p in partes]))
+        
+        data = {
+            "location": pd.Categorical.from_codes(np.repeat(codigos, longitudes),
+                                                  categories=nombres),
+            "latitude": np.repeat(np.float32([p[1] for p in partes]), longitudes),
+            "longitude": np.repeat(np.float32([p[2] for p in partes]), longitudes),
+            "date": pd.to_datetime(np.concatenate([p[3].tiempos for p in partes]), utc=True),
+        }
+        for var in variables:
+            data[var] = np.concatenate([p[3].valores[var] for p in partes])
+        
+        return pd.DataFrame(data)
+    
+    def _save_bulk_data(self, data: Dict[str, Any]):
+        """Guarda un pronóstico masivo (todas las ubicaciones en un solo bloque)"""
+        if self.store is not None:
+            emitido = datetime.now().astimezone()
+            filas = {}
+            for frecuencia in ("hourly", "daily"):
+                if data[frecuencia] is not None:
+                    filas[frecuencia] = self.store.append(data[frecuencia], frecuencia, "openmeteo",
+                                                          kind="forecast", issued_at=emitido)
+            print(f"📊 Pronóstico masivo guardado en almacén columnar: {filas}")
+            return
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        for frecuencia in ("hourly", "daily"):
+            if data[frecuencia] is not None:
+                archivo = self.openmeteo_dir / f"forecast_bulk_{timestamp}_{frecuencia}.csv"
+                data[frecuencia].to_csv(archivo, index=False)
+                print(f"📊 Datos {frecuencia} guardados: {archivo}")
+    
     def _save_forecast_data(self, data: Dict[str, Any], location_name: str):
         """Guarda datos de pronóstico"""
+        if self.store is not None:
+            filas = self.store.append_result(data, source="openmeteo", kind="forecast")
+            print(f"📊 Pronóstico guardado en almacén columnar: {filas}")
+            return
+        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # Guardar metadatos
@@ -260,6 +407,15 @@ class OpenMeteoClient:
     def _save_historical_data(self, data: Dict[str, Any], location_name: str, 
                              start_date: str, end_date: str):
         """Guarda datos históricos"""
+        if self.store is not None:
+            # Mismo bloque (ubicación + periodo) -> mismos archivos: re-descargar no duplica
+            filas = self.store.append_result(
+                data, source="openmeteo", kind="historical",
+                chunk_id=f"historical-{start_date}-{end_date}"
+            )
+            print(f"📊 Datos históricos guardados en almacén columnar: {filas}")
+            return
+        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # Guardar metadatos
@@ -0,0 +1,293 @@
+"""
+Planificador de descargas históricas (backfill) de Open-Meteo por bloques
+Divide rangos largos en bloques alineados a meses, omite los bloques ya
+descargados (manifiesto JSONL), descarga varios bloques en paralelo sin
+exceder el presupuesto de llamadas de la API y escribe cada bloque al almacén
+columnar apenas llega, de modo que la memoria queda acotada por el número de
+hilos y no por la longitud del periodo.
+"""
+
+import json
+import time
+import logging
+from pathlib import Path
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+try:
+    from src.data_sources.open_meteo import OpenMeteoClient
+    from src.data_sources.rate_limiter import LimitadorTasa, obtener_limitador
+except ImportError:
+    from open_meteo import OpenMeteoClient
+    from rate_limiter import LimitadorTasa, obtener_limitador
+
+logger = logging.getLogger(__name__)
+
+# Open-Meteo contabiliza una consulta como varias llamadas si pide más de
+# 10 variables o más de 2 semanas de datos
+VARIABLES_POR_LLAMADA = 10
+DIAS_POR_LLAMADA = 14
+
+# Tamaño máximo de un bloque horario (valores por variable x variables);
+# ~1 año de 10 variables, unos 350 KB en float32
+MAX_VALORES_BLOQUE = 24 * 366 * 10
+
+
+def peso_llamada(n_variables: int, dias: int) -> float:
+    """Número de llamadas que Open-Meteo descuenta por una consulta"""
+    return (max(1.0, n_variables / VARIABLES_POR_LLAMADA) *
+            max(1.0, dias / DIAS_POR_LLAMADA))
+
+
+def meses_por_bloque(n_variables_horarias: int) -> int:
+    """
+    Meses por bloque para no exceder MAX_VALORES_BLOQUE
+
+    El peso de una consulta crece linealmente con los días, así que bloques
+    más grandes no ahorran presupuesto; solo reducen el número de peticiones.
+    Se usa el mayor bloque (hasta un año) que mantiene acotada la memoria.
+    """
+    if n_variables_horarias <= 0:
+        return 12
+    meses = MAX_VALORES_BLOQUE // (n_variables_horarias * 24 * 31)
+    return int(max(1, min(12, meses)))
+
+
+def planificar_bloques(inicio, fin, meses: int = 12) -> List[tuple]:
+    """
+    Divide [inicio, fin] en bloques alineados al inicio de mes
+
+    Los bordes de los bloques intermedios no dependen de cuándo se ejecuta el
+    backfill, por lo que una re-ejecución reconoce los bloques ya hechos.
+
+    Returns:
+        Lista de tuplas (fecha_inicio, fecha_fin) como date, inclusivas
+    """
+    inicio = _a_fecha(inicio)
+    fin = _a_fecha(fin)
+    if fin < inicio:
+        raise ValueError(f"Rango inválido: {inicio} > {fin}")
+
+    bloques = []
+    actual = inicio
+    while actual <= fin:
+        # Siguiente borde: primer día del mes múltiplo de `meses` desde enero
+        indice = actual.year * 12 + (actual.month - 1)
+        siguiente = (indice // meses + 1) * meses
+        borde = date(siguiente // 12, siguiente % 12 + 1, 1)
+        fin_bloque = min(fin, borde - timedelta(days=1))
+        bloques.append((actual, fin_bloque))
+        actual = fin_bloque + timedelta(days=1)
+
+    return bloques
+
+
+def _a_fecha(valor) -> date:
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(str(valor), "%Y-%m-%d").date()
+
+
+class BackfillOpenMeteo:
+    """
+    Descarga histórica por bloques para muchas ubicaciones
+
+    Uso:
+        backfill = BackfillOpenMeteo(OpenMeteoClient("data"))
+        stats = backfill.ejecutar(
+            [{"name": "Medellin", "lat": 6.245, "lon": -75.5715}],
+            "1985-01-01", "2024-12-31"
+        )
+    """
+
+    def __init__(self, client: Optional[OpenMeteoClient] = None,
+                 max_workers: int = 4,
+                 limitador: Optional[LimitadorTasa] = None,
+                 reintentos: int = 3,
+                 manifiesto: Optional[str] = None):
+        """
+        Args:
+            client: OpenMeteoClient con almacén columnar (se crea uno si es None)
+            max_workers: Bloques descargándose a la vez (acota la memoria)
+            limitador: Limitador de tasa con la cuota 'openmeteo' (por defecto
+                el compartido, así varios backfills en paralelo no la exceden)
+            reintentos: Intentos por bloque ante errores de red/servidor
+            manifiesto: Ruta del registro JSONL de bloques completados
+                (por defecto <almacén>/backfill_openmeteo.jsonl)
+        """
+        self.client = client or OpenMeteoClient()
+        if self.client.store is None:
+            raise RuntimeError("El backfill requiere el almacén columnar (pyarrow)")
+
+        self.store = self.client.store
+        self.max_workers = max_workers
+        self.limitador = limitador or obtener_limitador()
+        self.reintentos = reintentos
+        self.manifiesto = Path(manifiesto) if manifiesto else \
+            self.store.base_dir / "backfill_openmeteo.jsonl"
+
+    @staticmethod
+    def _clave(ubicacion: str, inicio, fin, hourly_vars, daily_vars) -> str:
+        return "|".join([ubicacion, str(inicio), str(fin),
+                         ",".join(sorted(hourly_vars)), ",".join(sorted(daily_vars))])
+
+    def bloques_completados(self) -> set:
+        """Claves de bloques registrados en el manifiesto"""
+        hechos = set()
+        if not self.manifiesto.exists():
+            return hechos
+
+        with open(self.manifiesto, encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    hechos.add(json.loads(linea)['clave'])
+                except (json.JSONDecodeError, KeyError):
+                    # Última línea truncada por una interrupción
+                    continue
+        return hechos
+
+    def planificar(self, ubicaciones: List[Dict], start_date, end_date,
+                   hourly_vars: List[str], daily_vars: List[str]) -> List[Dict]:
+        """Lista de bloques pendientes (ubicación x periodo)"""
+        meses = meses_por_bloque(len(hourly_vars))
+        hechos = self.bloques_completados()
+
+        pendientes = []
+        for ubicacion in ubicaciones:
+            for inicio, fin in planificar_bloques(start_date, end_date, meses):
+                clave = self._clave(ubicacion['name'], inicio, fin, hourly_vars, daily_vars)
+                if clave in hechos:
+                    continue
+                pendientes.append({
+                    'clave': clave,
+                    'ubicacion': ubicacion,
+                    'inicio': inicio,
+                    'fin': fin,
+                    'peso': peso_llamada(len(hourly_vars) + len(daily_vars),
+                                         (fin - inicio).days + 1),
+                })
+        return pendientes
+
+    def _descargar_bloque(self, bloque: Dict, hourly_vars, daily_vars) -> Dict:
+        ubicacion = bloque['ubicacion']
+        inicio = bloque['inicio'].isoformat()
+        fin = bloque['fin'].isoformat()
+
+        for intento in range(1, self.reintentos + 1):
+            # El transporte descuenta 1 llamada por petición; aquí el resto del peso
+            self.limitador.adquirir('openmeteo', max(0.0, bloque['peso'] - 1))
+            try:
+                resultado = self.client.get_historical(
+                    lat=ubicacion['lat'], lon=ubicacion['lon'],
+                    start_date=inicio, end_date=fin,
+                    location_name=ubicacion['name'],
+                    hourly_vars=hourly_vars, daily_vars=daily_vars,
+                    save_data=False
+                )
+                break
+            except Exception as e:
+                if intento == self.reintentos:
+                    raise
+                espera = 2 ** intento
+                logger.warning(f"⚠️  {ubicacion['name']} {inicio}..{fin}: {e} "
+                               f"(reintento en {espera}s)")
+                time.sleep(espera)
+
+        # Se escribe aquí, en el hilo, para no retener el bloque en memoria
+        filas = self.store.append_result(
+            resultado, source="openmeteo", kind="historical",
+            chunk_id=f"historical-{inicio}-{fin}"
+        )
+        return {'clave': bloque['clave'], 'ubicacion': ubicacion['name'],
+                'inicio': inicio, 'fin': fin, 'filas': filas}
+
+    def ejecutar(self, ubicaciones: List[Dict], start_date, end_date,
+                 hourly_vars: Optional[List[str]] = None,
+                 daily_vars: Optional[List[str]] = None) -> Dict:
+        """
+        Descarga los bloques pendientes de todas las ubicaciones
+
+        Args:
+            ubicaciones: Lista de dicts con 'name', 'lat' y 'lon'
+            start_date, end_date: Periodo completo (YYYY-MM-DD)
+            hourly_vars, daily_vars: Variables (por defecto las de get_historical)
+
+        Returns:
+            Dict con estadísticas: bloques, completados, omitidos, fallidos, filas
+        """
+        if hourly_vars is None:
+            hourly_vars = ["temperature_2m", "relative_humidity_2m", "wind_speed_10m"]
+        if daily_vars is None:
+            daily_vars = ["temperature_2m_max", "temperature_2m_min",
+                          "precipitation_sum", "wind_speed_10m_max"]
+
+        meses = meses_por_bloque(len(hourly_vars))
+        total = len(ubicaciones) * len(planificar_bloques(start_date, end_date, meses))
+        pendientes = self.planificar(ubicaciones, start_date, end_date, hourly_vars, daily_vars)
+
+        stats = {
+            'bloques': total,
+            'completados': 0,
+            'omitidos': total - len(pendientes),
+            'fallidos': [],
+            'filas': 0,
+            'tiempo_s': 0.0,
+        }
+        logger.info(f"📋 Backfill: {total} bloques, {stats['omitidos']} ya descargados, "
+                    f"{len(pendientes)} pendientes ({meses} meses por bloque)")
+
+        if not pendientes:
+            return stats
+
+        inicio_t = time.time()
+        self.manifiesto.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(self.manifiesto, 'a', encoding='utf-8') as salida, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futuros = {
+                executor.submit(self._descargar_bloque, bloque, hourly_vars, daily_vars): bloque
+                for bloque in pendientes
+            }
+
+            for futuro in as_completed(futuros):
+                bloque = futuros[futuro]
+                try:
+                    registro = futuro.result()
+                except Exception as e:
+                    logger.error(f"❌ {bloque['ubicacion']['name']} "
+                                 f"{bloque['inicio']}..{bloque['fin']}: {e}")
+                    stats['fallidos'].append(bloque['clave'])
+                    continue
+
+                # Solo después de escribir el bloque se marca como completado
+                salida.write(json.dumps(registro, ensure_ascii=False) + '\n')
+                salida.flush()
+
+                stats['completados'] += 1
+                stats['filas'] += sum(registro['filas'].values())
+                logger.info(f"✅ [{stats['completados']}/{len(pendientes)}] "
+                            f"{registro['ubicacion']} {registro['inicio']}..{registro['fin']}")
+
+        stats['tiempo_s'] = time.time() - inicio_t
+        return stats
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    ubicaciones = [
+        {"name": "Medellin", "lat": 6.245, "lon": -75.5715},
+        {"name": "Bogota", "lat": 4.711, "lon": -74.0721},
+        {"name": "Cartagena", "lat": 10.391, "lon": -75.4794},
+    ]
+
+    fin = (datetime.now() - timedelta(days=6)).strftime("%Y-%m-%d")
+    stats = BackfillOpenMeteo(max_workers=4).ejecutar(ubicaciones, "1985-01-01", fin)
+
+    print(f"\nBloques: {stats['bloques']} | Completados: {stats['completados']} | "
+          f"Omitidos: {stats['omitidos']} | Fallidos: {len(stats['fallidos'])} | "
+          f"Filas: {stats['filas']} | Tiempo: {stats['tiempo_s']:.1f}s")
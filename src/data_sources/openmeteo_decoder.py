@@ -0,0 +1,131 @@
+"""
+Decodificador compartido de respuestas FlatBuffers de Open-Meteo
+Convierte un WeatherApiResponse en arreglos NumPy float32 que apuntan al
+buffer de la respuesta (sin copias intermedias) y construye el eje de tiempo
+solo cuando se pide, a partir de Time()/TimeEnd()/Interval().
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+class BloqueSerie:
+    """
+    Bloque horario o diario decodificado
+
+    Guarda inicio, intervalo y número de pasos; el eje de tiempo se genera
+    bajo demanda y las variables son vistas float32 sobre la respuesta.
+    """
+
+    __slots__ = ('inicio', 'intervalo', 'n', 'valores', '_tiempos')
+
+    def __init__(self, inicio: int, intervalo: int, n: int, valores: Dict[str, np.ndarray]):
+        self.inicio = int(inicio)
+        self.intervalo = int(intervalo)
+        self.n = int(n)
+        self.valores = valores
+        self._tiempos = None
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def tiempos(self) -> np.ndarray:
+        """Eje de tiempo UTC como datetime64[s] (se calcula una vez)"""
+        if self._tiempos is None:
+            segundos = self.inicio + self.intervalo * np.arange(self.n, dtype=np.int64)
+            self._tiempos = segundos.view('datetime64[s]')
+        return self._tiempos
+
+    def a_dataframe(self) -> pd.DataFrame:
+        """DataFrame con columna 'date' (UTC) y variables float32"""
+        data = {"date": pd.DatetimeIndex(self.tiempos).tz_localize("UTC")}
+        data.update(self.valores)
+        return pd.DataFrame(data)
+
+    def a_arrow(self) -> 'pa.Table':
+        """Tabla Arrow; las columnas float32 comparten memoria con la respuesta"""
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow no está instalado. Instale con: pip install pyarrow")
+
+        columnas = {"date": pa.array(self.tiempos, type=pa.timestamp('s', tz='UTC'))}
+        for nombre, valores in self.valores.items():
+            columnas[nombre] = pa.array(valores, type=pa.float32())
+        return pa.table(columnas)
+
+
+def decodificar_bloque(bloque, variables: List[str]) -> Optional[BloqueSerie]:
+    """
+    Decodifica response.Hourly() o response.Daily()
+
+    Args:
+        bloque: VariablesWithTime de la respuesta (o None)
+        variables: Nombres de las variables en el orden en que se pidieron
+    """
+    if bloque is None or not variables:
+        return None
+
+    intervalo = bloque.Interval()
+    n = (bloque.TimeEnd() - bloque.Time()) // intervalo if intervalo else 0
+
+    valores = {}
+    for i, nombre in enumerate(variables):
+        # ValuesAsNumpy ya es una vista float32 del buffer; astype no copia
+        valores[nombre] = bloque.Variables(i).ValuesAsNumpy().astype(np.float32, copy=False)
+
+    return BloqueSerie(bloque.Time(), intervalo, n, valores)
+
+
+def decodificar_actual(bloque, variables: List[str]) -> Optional[Dict]:
+    """
+    Decodifica response.Current() (un valor por variable)
+
+    Returns:
+        Dict con 'time' (epoch s) y 'values' {variable: float}, o None
+    """
+    if bloque is None or not variables:
+        return None
+
+    return {
+        "time": bloque.Time(),
+        "values": {nombre: float(bloque.Variables(i).Value())
+                   for i, nombre in enumerate(variables)},
+    }
+
+
+def decodificar_respuesta(response, hourly_vars: Optional[List[str]] = None,
+                          daily_vars: Optional[List[str]] = None) -> Dict:
+    """
+    Decodifica una respuesta completa
+
+    Returns:
+        Dict con 'coordinates', 'timezone', 'hourly' y 'daily' (BloqueSerie o None)
+    """
+    return {
+        "coordinates": {
+            "latitude": response.Latitude(),
+            "longitude": response.Longitude(),
+            "elevation": response.Elevation()
+        },
+        "timezone": response.UtcOffsetSeconds(),
+        "hourly": decodificar_bloque(response.Hourly(), hourly_vars) if hourly_vars else None,
+        "daily": decodificar_bloque(response.Daily(), daily_vars) if daily_vars else None,
+    }
+
+
+def respuesta_a_dataframes(response, hourly_vars: Optional[List[str]] = None,
+                           daily_vars: Optional[List[str]] = None) -> Dict:
+    """Igual que decodificar_respuesta, pero con 'hourly'/'daily' como DataFrame"""
+    resultado = decodificar_respuesta(response, hourly_vars, daily_vars)
+    for frecuencia in ("hourly", "daily"):
+        if resultado[frecuencia] is not None:
+            resultado[frecuencia] = resultado[frecuencia].a_dataframe()
+    return resultado
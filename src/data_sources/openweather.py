@@ -1,27 +1,34 @@
-import requests
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 import os
-import time
+
+try:
+    from src.data_sources.http_transport import TransporteHTTP, obtener_transporte
+except ImportError:
+    from http_transport import TransporteHTTP, obtener_transporte
 
 
 class OpenWeatherMapClient:
     """Cliente para consumir datos de OpenWeatherMap API (servicios gratuitos)"""
     
-    def __init__(self, api_key: str, data_dir: str = "data"):
+    def __init__(self, api_key: str, data_dir: str = "data",
+                 transporte: Optional[TransporteHTTP] = None):
         """
         Inicializa el cliente de OpenWeatherMap
         
         Args:
             api_key: Tu API key de OpenWeatherMap
             data_dir: Directorio base para guardar datos
+            transporte: Transporte HTTP (por defecto el compartido del proceso)
         """
         self.api_key = api_key
+        self.http = transporte or obtener_transporte()
         self.base_url = "https://api.openweathermap.org/data/2.5"
-        self.geo_url = "http://api.openweathermap.org/geo/1.0"
+        # HTTPS también en geocoding: mismo host y mismo pool de conexiones
+        self.geo_url = "https://api.openweathermap.org/geo/1.0"
         
         # Directorios para datos
         self.data_dir = Path(data_dir)
@@ -48,7 +55,7 @@ class OpenWeatherMapClient:
         }
         
         try:
-            response = requests.get(url, params=params)
+            response = self.http.get(url, proveedor='openweather', params=params)
             response.raise_for_status()
             data = response.json()
             
@@ -88,43 +95,11 @@ class OpenWeatherMapClient:
             "lang": "es"
         }
         
-        response = requests.get(url, params=params)
+        response = self.http.get(url, proveedor='openweather', params=params)
         response.raise_for_status()
         data = response.json()
         
-        # Procesar datos
-        result = {
-            "location": location_name,
-            "coordinates": {"lat": lat, "lon": lon},
-            "timestamp": datetime.fromtimestamp(data["dt"]).isoformat(),
-            "weather": {
-                "description": data["weather"][0]["description"],
-                "main": data["weather"][0]["main"],
-                "icon": data["weather"][0]["icon"]
-            },
-            "temperature": {
-                "current": data["main"]["temp"],
-                "feels_like": data["main"]["feels_like"],
-                "min": data["main"]["temp_min"],
-                "max": data["main"]["temp_max"]
-            },
-            "pressure": data["main"]["pressure"],
-            "humidity": data["main"]["humidity"],
-            "visibility": data.get("visibility", 0) / 1000,  # Convertir a km
-            "wind": {
-                "speed": data["wind"]["speed"],
-                "direction": data["wind"].get("deg", 0),
-                "gust": data["wind"].get("gust", None)
-            },
-            "clouds": data["clouds"]["all"],
-            "sunrise": datetime.fromtimestamp(data["sys"]["sunrise"]).strftime("%H:%M:%S"),
-            "sunset": datetime.fromtimestamp(data["sys"]["sunset"]).strftime("%H:%M:%S")
-        }
-        
-        if "rain" in data:
-            result["rain"] = data["rain"]
-        if "snow" in data:
-            result["snow"] = data["snow"]
+        result = self._procesar_actual(data, lat, lon, location_name)
         
         if save_data:
             self._save_data(result, location_name, "current")
@@ -155,51 +130,11 @@ class OpenWeatherMapClient:
             "lang": "es"
         }
         
-        response = requests.get(url, params=params)
+        response = self.http.get(url, proveedor='openweather', params=params)
         response.raise_for_status()
         data = response.json()
         
-        # Procesar datos
-        result = {
-            "location": location_name,
-            "coordinates": {"lat": lat, "lon": lon},
-            "city": data["city"]["name"],
-            "country": data["city"]["country"],
-            "timezone": data["city"]["timezone"],
-            "forecast": []
-        }
-        
-        for item in data["list"]:
-            forecast_item = {
-                "datetime": datetime.fromtimestamp(item["dt"]).isoformat(),
-                "date": datetime.fromtimestamp(item["dt"]).strftime("%Y-%m-%d"),
-                "time": datetime.fromtimestamp(item["dt"]).strftime("%H:%M"),
-                "weather": {
-                    "description": item["weather"][0]["description"],
-                    "main": item["weather"][0]["main"]
-                },
-                "temperature": {
-                    "temp": item["main"]["temp"],
-                    "feels_like": item["main"]["feels_like"],
-                    "min": item["main"]["temp_min"],
-                    "max": item["main"]["temp_max"]
-                },
-                "pressure": item["main"]["pressure"],
-                "humidity": item["main"]["humidity"],
-                "wind": {
-                    "speed": item["wind"]["speed"],
-                    "direction": item["wind"].get("deg", 0)
-                },
-                "clouds": item["clouds"]["all"],
-                "precipitation_probability": item.get("pop", 0) * 100  # Probabilidad de precipitación
-            }
-            
-            if "rain" in item:
-                forecast_item["rain_3h"] = item["rain"].get("3h", 0)
-            if "snow" in item:
-                forecast_item["snow_3h"] = item["snow"].get("3h", 0)
-            
-            result["forecast"].append(forecast_item)
+        result = self._procesar_pronostico_5dias(data, lat, lon, location_name)
         
         if save_data:
             self._save_data(result, location_name, "forecast_5day")
@@ -228,39 +163,11 @@ class OpenWeatherMapClient:
             "appid": self.api_key
         }
         
-        response = requests.get(url, params=params)
+        response = self.http.get(url, proveedor='openweather', params=params)
         response.raise_for_status()
         data = response.json()
         
-        # Índice de calidad del aire (AQI)
-        aqi_labels = {
-            1: "Bueno",
-            2: "Aceptable",
-            3: "Moderado",
-            4: "Malo",
-            5: "Muy Malo"
-        }
-        
-        item = data["list"][0]
-        result = {
-            "location": location_name,
-            "coordinates": {"lat": lat, "lon": lon},
-            "timestamp": datetime.fromtimestamp(item["dt"]).isoformat(),
-            "aqi": {
-                "value": item["main"]["aqi"],
-                "label": aqi_labels.get(item["main"]["aqi"], "Desconocido")
-            },
-            "components": {
-                "co": item["components"]["co"],  # Monóxido de carbono (μg/m3)
-                "no": item["components"]["no"],  # Monóxido de nitrógeno (μg/m3)
-                "no2": item["components"]["no2"],  # Dióxido de nitrógeno (μg/m3)
-                "o3": item["components"]["o3"],  # Ozono (μg/m3)
-                "so2": item["components"]["so2"],  # Dióxido de azufre (μg/m3)
-                "pm2_5": item["components"]["pm2_5"],  # Partículas finas (μg/m3)
-                "pm10": item["components"]["pm10"],  # Partículas gruesas (μg/m3)
-                "nh3": item["components"]["nh3"]  # Amoníaco (μg/m3)
-            }
-        }
+        result = self._procesar_contaminacion(data, lat, lon, location_name)
         
         if save_data:
             self._save_data(result, location_name, "air_pollution")
@@ -295,19 +202,16 @@ class OpenWeatherMapClient:
         
         try:
             report["current"] = self.get_current_weather(lat, lon, location_name, save_data=False)
-            time.sleep(0.5)  # Evitar rate limiting
         except Exception as e:
             print(f"⚠️  Error obteniendo clima actual: {e}")
         
         try:
             report["forecast"] = self.get_forecast_5day(lat, lon, location_name, save_data=False)
-            time.sleep(0.5)
         except Exception as e:
             print(f"⚠️  Error obteniendo pronóstico: {e}")
         
         try:
             report["air_quality"] = self.get_air_pollution(lat, lon, location_name, save_data=False)
-            time.sleep(0.5)
         except Exception as e:
             print(f"⚠️  Error obteniendo calidad del aire: {e}")
         
@@ -316,6 +220,130 @@ class OpenWeatherMapClient:
         
         return report
     
+    @staticmethod
+    def _procesar_actual(data: Dict[str, Any], lat: float, lon: float,
+                         location_name: str) -> Dict[str, Any]:
+        """Convierte la respuesta de /weather al formato del cliente"""
+        # Procesar datos
+        result = {
+            "location": location_name,
+            "coordinates": {"lat": lat, "lon": lon},
+            "timestamp": datetime.fromtimestamp(data["dt"]).isoformat(),
+            "weather": {
+                "description": data["weather"][0]["description"],
+                "main": data["weather"][0]["main"],
+                "icon": data["weather"][0]["icon"]
+            },
+            "temperature": {
+                "current": data["main"]["temp"],
+                "feels_like": data["main"]["feels_like"],
+                "min": data["main"]["temp_min"],
+                "max": data["main"]["temp_max"]
+            },
+            "pressure": data["main"]["pressure"],
+            "humidity": data["main"]["humidity"],
+            "visibility": data.get("visibility", 0) / 1000,  # Convertir a km
+            "wind": {
+                "speed": data["wind"]["speed"],
+                "direction": data["wind"].get("deg", 0),
+                "gust": data["wind"].get("gust", None)
+            },
+            "clouds": data["clouds"]["all"],
+            "sunrise": datetime.fromtimestamp(data["sys"]["sunrise"]).strftime("%H:%M:%S"),
+            "sunset": datetime.fromtimestamp(data["sys"]["sunset"]).strftime("%H:%M:%S")
+        }
+        
+        if "rain" in data:
+            result["rain"] = data["rain"]
+        if "snow" in data:
+            result["snow"] = data["snow"]
+        
+        return result
+    
+    @staticmethod
+    def _procesar_pronostico_5dias(data: Dict[str, Any], lat: float, lon: float,
+                                   location_name: str) -> Dict[str, Any]:
+        """Convierte la respuesta de /forecast al formato del cliente"""
+        # Procesar datos
+        result = {
+            "location": location_name,
+            "coordinates": {"lat": lat, "lon": lon},
+            "city": data["city"]["name"],
+            "country": data["city"]["country"],
+            "timezone": data["city"]["timezone"],
+            "forecast": []
+        }
+        
+        for item in data["list"]:
+            forecast_item = {
+                "datetime": datetime.fromtimestamp(item["dt"]).isoformat(),
+                "date": datetime.fromtimestamp(item["dt"]).strftime("%Y-%m-%d"),
+                "time": datetime.fromtimestamp(item["dt"]).strftime("%H:%M"),
+                "weather": {
+                    "description": item["weather"][0]["description"],
+                    "main": item["weather"][0]["main"]
+                },
+                "temperature": {
+                    "temp": item["main"]["temp"],
+                    "feels_like": item["main"]["feels_like"],
+                    "min": item["main"]["temp_min"],
+                    "max": item["main"]["temp_max"]
+                },
+                "pressure": item["main"]["pressure"],
+                "humidity": item["main"]["humidity"],
+                "wind": {
+                    "speed": item["wind"]["speed"],
+                    "direction": item["wind"].get("deg", 0)
+                },
+                "clouds": item["clouds"]["all"],
+                "precipitation_probability": item.get("pop", 0) * 100  # Probabilidad de precipitación
+            }
+            
+            if "rain" in item:
+                forecast_item["rain_3h"] = item["rain"].get("3h", 0)
+            if "snow" in item:
+                forecast_item["snow_3h"] = item["snow"].get("3h", 0)
+            
+            result["forecast"].append(forecast_item)
+        
+        return result
+    
+    @staticmethod
+    def _procesar_contaminacion(data: Dict[str, Any], lat: float, lon: float,
+                                location_name: str) -> Dict[str, Any]:
+        """Convierte la respuesta de /air_pollution al formato del cliente"""
+        # Índice de calidad del aire (AQI)
+        aqi_labels = {
+            1: "Bueno",
+            2: "Aceptable",
+            3: "Moderado",
+            4: "Malo",
+            5: "Muy Malo"
+        }
+        
+        item = data["list"][0]
+        result = {
+            "location": location_name,
+            "coordinates": {"lat": lat, "lon": lon},
+            "timestamp": datetime.fromtimestamp(item["dt"]).isoformat(),
+            "aqi": {
+                "value": item["main"]["aqi"],
+                "label": aqi_labels.get(item["main"]["aqi"], "Desconocido")
+            },
+            "components": {
+                "co": item["components"]["co"],  # Monóxido de carbono (μg/m3)
+                "no": item["components"]["no"],  # Monóxido de nitrógeno (μg/m3)
+                "no2": item["components"]["no2"],  # Dióxido de nitrógeno (μg/m3)
+                "o3": item["components"]["o3"],  # Ozono (μg/m3)
+                "so2": item["components"]["so2"],  # Dióxido de azufre (μg/m3)
+                "pm2_5": item["components"]["pm2_5"],  # Partículas finas (μg/m3)
+                "pm10": item["components"]["pm10"],  # Partículas gruesas (μg/m3)
+                "nh3": item["components"]["nh3"]  # Amoníaco (μg/m3)
+            }
+        }
+        
+        return result
+    
     def _save_data(self, data: Dict[str, Any], location_name: str, data_type: str):
         """Guarda datos en JSON"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
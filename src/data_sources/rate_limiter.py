@@ -0,0 +1,230 @@
+"""
+Limitador de tasa por proveedor (cubetas de fichas en SQLite)
+El estado de las cubetas vive en un archivo SQLite, así que lo comparten
+todos los hilos y procesos de la máquina: un lote con varios procesos y el
+backend consumen de la misma cuota. Una respuesta 429 (o un Retry-After)
+bloquea al proveedor para todos hasta que vence la espera indicada.
+"""
+
+import time
+import random
+import sqlite3
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Cuotas publicadas por cada proveedor: lista de (llamadas, periodo en segundos).
+# Todas las ventanas deben tener fichas para que una llamada pase.
+CUOTAS = {
+    # Plan gratuito: 60 llamadas/min y 1.000.000/mes
+    'openweather': [(60, 60), (1_000_000, 30 * 86400)],
+    # Uso no comercial: 600/min, 5.000/hora, 10.000/día
+    'openmeteo': [(600, 60), (5_000, 3600), (10_000, 86400)],
+    # Plan gratuito: 400 llamadas/día
+    'meteosource': [(400, 86400)],
+    # Plan de prueba: 500 llamadas/día (las imágenes cuentan igual)
+    'meteoblue': [(500, 86400)],
+    # Servidor público sin cuota publicada: ráfagas cortas, ~2 peticiones/s
+    'siata': [(4, 2)],
+}
+
+# Espera cuando un 429 no trae Retry-After
+ESPERA_429_S = 60
+
+
+def segundos_retry_after(valor: Optional[str]) -> Optional[float]:
+    """Interpreta Retry-After en segundos o como fecha HTTP"""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LimitadorTasa:
+    """
+    Cubetas de fichas compartidas entre hilos y procesos
+
+    Uso:
+        limitador = obtener_limitador()
+        limitador.adquirir('openweather')
+        response = session.get(...)
+        limitador.registrar_respuesta('openweather', response.status_code, response.headers)
+    """
+
+    def __init__(self, ruta_db='data/rate_limits.sqlite',
+                 cuotas: Optional[Dict[str, List[Tuple[float, float]]]] = None):
+        """
+        Args:
+            ruta_db: Archivo SQLite compartido (misma ruta = misma cuota)
+            cuotas: Cuotas adicionales o sobrescritas por proveedor
+        """
+        self.ruta_db = Path(ruta_db)
+        self.ruta_db.parent.mkdir(parents=True, exist_ok=True)
+        self.cuotas = {**CUOTAS, **(cuotas or {})}
+
+        self._lock = threading.Lock()
+        # isolation_level=None: las transacciones se abren explícitamente con
+        # BEGIN IMMEDIATE, que toma el bloqueo de escritura entre procesos
+        self._conn = sqlite3.connect(str(self.ruta_db), timeout=30,
+                                     check_same_thread=False, isolation_level=None)
+        self._crear_esquema()
+
+    def _crear_esquema(self):
+        with self._lock:
+            self._conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                CREATE TABLE IF NOT EXISTS cubetas (
+                    proveedor TEXT NOT NULL,
+                    periodo REAL NOT NULL,
+                    fichas REAL NOT NULL,
+                    actualizado REAL NOT NULL,
+                    PRIMARY KEY (proveedor, periodo)
+                );
+                CREATE TABLE IF NOT EXISTS bloqueos (
+                    proveedor TEXT PRIMARY KEY,
+                    hasta REAL NOT NULL
+                );
+            """)
+
+    def intentar(self, proveedor: str, peso: float = 1.0) -> float:
+        """
+        Intenta consumir `peso` fichas de todas las ventanas del proveedor
+
+        Returns:
+            0.0 si se consumieron; si no, segundos a esperar antes de reintentar
+        """
+        ventanas = self.cuotas.get(proveedor)
+        if not ventanas:
+            return 0.0
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                ahora = time.time()
+
+                fila = self._conn.execute(
+                    "SELECT hasta FROM bloqueos WHERE proveedor = ?", (proveedor,)
+                ).fetchone()
+                if fila and fila[0] > ahora:
+                    self._conn.execute("COMMIT")
+                    return fila[0] - ahora
+
+                estados = []
+                espera = 0.0
+                for capacidad, periodo in ventanas:
+                    fila = self._conn.execute(
+                        "SELECT fichas, actualizado FROM cubetas WHERE proveedor = ? AND periodo = ?",
+                        (proveedor, periodo)
+                    ).fetchone()
+                    tasa = capacidad / periodo
+                    fichas = capacidad if fila is None else \
+                        min(capacidad, fila[0] + (ahora - fila[1]) * tasa)
+                    estados.append((periodo, fichas))
+
+                    # Una llamada más pesada que la cubeta espera a tenerla llena
+                    necesario = min(peso, capacidad)
+                    if fichas < necesario:
+                        espera = max(espera, (necesario - fichas) / tasa)
+
+                if espera == 0.0:
+                    estados = [(periodo, fichas - peso) for periodo, fichas in estados]
+
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO cubetas (proveedor, periodo, fichas, actualizado) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(proveedor, periodo, fichas, ahora) for periodo, fichas in estados]
+                )
+                self._conn.execute("COMMIT")
+                return espera
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def adquirir(self, proveedor: str, peso: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        Bloquea hasta poder hacer una llamada de `peso` al proveedor
+
+        Returns:
+            False si se agotó `timeout` sin obtener cupo
+        """
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            espera = self.intentar(proveedor, peso)
+            if espera == 0.0:
+                return True
+            if limite is not None and time.monotonic() + espera > limite:
+                return False
+            # Jitter pequeño para que los procesos en espera no despierten a la vez
+            time.sleep(espera + random.uniform(0, 0.05))
+
+    async def adquirir_async(self, proveedor: str, peso: float = 1.0) -> None:
+        """
+        Como adquirir, sin bloquear el event loop: la transacción SQLite (que
+        puede esperar el lock de otro proceso) corre en un hilo y la espera
+        por fichas se hace con asyncio.sleep
+        """
+        if not self.cuotas.get(proveedor):
+            return
+        while True:
+            espera = await asyncio.to_thread(self.intentar, proveedor, peso)
+            if espera == 0.0:
+                return
+            await asyncio.sleep(espera + random.uniform(0, 0.05))
+
+    def bloquear(self, proveedor: str, segundos: float):
+        """Suspende las llamadas al proveedor para todos los procesos"""
+        hasta = time.time() + segundos
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO bloqueos (proveedor, hasta) VALUES (?, ?) "
+                "ON CONFLICT(proveedor) DO UPDATE SET hasta = MAX(hasta, excluded.hasta)",
+                (proveedor, hasta)
+            )
+        logger.warning(f"⏳ {proveedor}: cuota agotada, en pausa {segundos:.0f} s")
+
+    def registrar_respuesta(self, proveedor: str, status_code: int, headers=None) -> Optional[float]:
+        """
+        Aplica 429 / Retry-After de una respuesta
+
+        Returns:
+            Segundos de bloqueo aplicados (None si la respuesta no limita)
+        """
+        retry_after = segundos_retry_after((headers or {}).get('Retry-After'))
+        if status_code == 429:
+            segundos = retry_after if retry_after is not None else ESPERA_429_S
+        elif status_code == 503 and retry_after is not None:
+            segundos = retry_after
+        else:
+            return None
+
+        self.bloquear(proveedor, segundos)
+        return segundos
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+
+_limitador = None
+_limitador_lock = threading.Lock()
+
+
+def obtener_limitador() -> LimitadorTasa:
+    """Limitador compartido del proceso (estado compartido con otros procesos vía SQLite)"""
+    global _limitador
+    with _limitador_lock:
+        if _limitador is None:
+            _limitador = LimitadorTasa()
+        return _limitador
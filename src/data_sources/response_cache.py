@@ -0,0 +1,315 @@
+"""
+Caché de respuestas HTTP compartida por todos los proveedores
+Dos niveles: un LRU en memoria delante de un archivo SQLite compartido entre
+procesos. La clave se normaliza (proveedor, endpoint, lat/lon redondeadas,
+parámetros ordenados y sin credenciales) y cada endpoint tiene su propio TTL
+según la cadencia de actualización del modelo. Las consultas idénticas
+simultáneas se agrupan: solo una llega al proveedor y las demás esperan su
+resultado.
+"""
+
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import urlsplit, parse_qsl
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# TTL en segundos por proveedor y fragmento del endpoint (primera coincidencia)
+TTLS = {
+    'openweather': [
+        ('/weather', 600),           # Observación actual, cada ~10 min
+        ('/forecast', 3 * 3600),     # Pronóstico a 5 días en pasos de 3 h
+        ('/air_pollution', 3600),
+        ('/geo/', 30 * 86400),       # Geocodificación: prácticamente estática
+    ],
+    'openmeteo': [
+        ('/v1/forecast', 3600),      # Los modelos se actualizan cada 1-3 h
+        ('/v1/archive', 86400),      # Reanálisis: se extiende una vez al día
+    ],
+    'meteosource': [
+        ('/point', 600),
+    ],
+    'meteoblue': [
+        ('/packages/', 3600),
+        ('/images/', 3600),
+    ],
+    'siata': [
+        ('', 3600),
+    ],
+}
+TTL_POR_DEFECTO = 600
+
+# Parámetros que no cambian la respuesta y no deben quedar en la clave
+PARAMETROS_EXCLUIDOS = {'appid', 'key', 'apikey', 'sig', 'expire'}
+PARAMETROS_COORDENADAS = {'lat', 'lon', 'latitude', 'longitude'}
+
+# 2 decimales ~ 1.1 km, por debajo de la resolución de los modelos
+DECIMALES_COORDENADAS = 2
+
+
+def _redondear(valor):
+    try:
+        return f"{round(float(valor), DECIMALES_COORDENADAS):.{DECIMALES_COORDENADAS}f}"
+    except (TypeError, ValueError):
+        return str(valor)
+
+
+class CacheRespuestas:
+    """
+    Caché de dos niveles con TTL por endpoint y agrupación de consultas
+
+    Una entrada es un dict {'estado', 'headers', 'contenido', 'url', 'expira'}.
+    Solo se almacenan respuestas 200.
+    """
+
+    def __init__(self, ruta_db='data/response_cache.sqlite', max_entradas_memoria: int = 512,
+                 ttls: Optional[Dict] = None, max_bytes_entrada: int = 2 * MB):
+        """
+        Args:
+            ruta_db: Archivo SQLite del nivel en disco (None = solo memoria)
+            max_entradas_memoria: Tamaño del LRU en memoria
+            ttls: TTLs adicionales o sobrescritos por proveedor
+            max_bytes_entrada: Respuestas más grandes no se guardan
+                (p. ej. descargas históricas que ya van al almacén columnar)
+        """
+        self.ttls = {**TTLS, **(ttls or {})}
+        self.max_entradas_memoria = max_entradas_memoria
+        self.max_bytes_entrada = max_bytes_entrada
+
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self._en_vuelo = {}
+        self._en_vuelo_async = {}
+        self.estadisticas = {'memoria': 0, 'disco': 0, 'agrupadas': 0, 'descargas': 0}
+
+        self._conn = None
+        if ruta_db is not None:
+            ruta = Path(ruta_db)
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(ruta), timeout=30, check_same_thread=False)
+            self._crear_esquema()
+
+    def _crear_esquema(self):
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                CREATE TABLE IF NOT EXISTS respuestas (
+                    clave TEXT PRIMARY KEY,
+                    estado INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    contenido BLOB NOT NULL,
+                    url TEXT,
+                    expira REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_respuestas_expira ON respuestas (expira);
+            """)
+
+    def ttl(self, proveedor: Optional[str], endpoint: str) -> float:
+        for fragmento, segundos in self.ttls.get(proveedor, []):
+            if fragmento in endpoint:
+                return segundos
+        return TTL_POR_DEFECTO
+
+    @staticmethod
+    def clave(proveedor: Optional[str], url: str, params=None) -> tuple:
+        """
+        Clave normalizada de una consulta
+
+        Returns:
+            (clave, endpoint)
+        """
+        partes = urlsplit(url)
+        endpoint = f"{partes.netloc}{partes.path}"
+
+        pares = parse_qsl(partes.query, keep_blank_values=True)
+        if params:
+            items = params.items() if isinstance(params, dict) else params
+            for nombre, valor in items:
+                if isinstance(valor, (list, tuple)):
+                    pares.extend((nombre, v) for v in valor)
+                elif valor is not None:
+                    pares.append((nombre, valor))
+
+        normalizados = sorted(
+            (nombre, _redondear(valor) if nombre in PARAMETROS_COORDENADAS else str(valor))
+            for nombre, valor in pares
+            if nombre not in PARAMETROS_EXCLUIDOS
+        )
+        texto = json.dumps([proveedor, endpoint, normalizados], ensure_ascii=False)
+        return hashlib.sha1(texto.encode('utf-8')).hexdigest(), endpoint
+
+    def leer(self, clave: str) -> Optional[Dict[str, Any]]:
+        """Entrada vigente desde memoria o, si no está, desde disco"""
+        ahora = time.time()
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is not None:
+                if entrada['expira'] > ahora:
+                    self._memoria.move_to_end(clave)
+                    self.estadisticas['memoria'] += 1
+                    return entrada
+                del self._memoria[clave]
+
+            if self._conn is None:
+                return None
+
+            fila = self._conn.execute(
+                "SELECT estado, headers, contenido, url, expira FROM respuestas "
+                "WHERE clave = ? AND expira > ?", (clave, ahora)
+            ).fetchone()
+            if fila is None:
+                return None
+
+            entrada = {'estado': fila[0], 'headers': json.loads(fila[1]),
+                       'contenido': fila[2], 'url': fila[3], 'expira': fila[4]}
+            self._guardar_memoria(clave, entrada)
+            self.estadisticas['disco'] += 1
+            return entrada
+
+    def _guardar_memoria(self, clave: str, entrada: Dict[str, Any]):
+        self._memoria[clave] = entrada
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.max_entradas_memoria:
+            self._memoria.popitem(last=False)
+
+    def guardar(self, clave: str, entrada: Dict[str, Any], ttl: float):
+        if entrada['estado'] != 200 or len(entrada['contenido']) > self.max_bytes_entrada:
+            return
+
+        entrada['expira'] = time.time() + ttl
+        with self._lock:
+            self._guardar_memoria(clave, entrada)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO respuestas "
+                        "(clave, estado, headers, contenido, url, expira) VALUES (?, ?, ?, ?, ?, ?)",
+                        (clave, entrada['estado'], json.dumps(entrada['headers']),
+                         entrada['contenido'], entrada.get('url'), entrada['expira'])
+                    )
+
+    def obtener(self, proveedor: Optional[str], url: str, params,
+                descargar: Callable[[], Dict[str, Any]],
+                ttl: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Entrada en caché o descargada con `descargar()`
+
+        Si otra hebra ya está descargando la misma clave, se espera su
+        resultado en lugar de hacer una segunda petición. `ttl` sobrescribe
+        el TTL del endpoint.
+        """
+        clave, endpoint = self.clave(proveedor, url, params)
+
+        entrada = self.leer(clave)
+        if entrada is not None:
+            return entrada
+
+        with self._lock:
+            futuro = self._en_vuelo.get(clave)
+            lider = futuro is None
+            if lider:
+                futuro = Future()
+                self._en_vuelo[clave] = futuro
+            else:
+                self.estadisticas['agrupadas'] += 1
+
+        if not lider:
+            return futuro.result()
+
+        try:
+            entrada = descargar()
+            self.estadisticas['descargas'] += 1
+            self.guardar(clave, entrada, ttl if ttl is not None else self.ttl(proveedor, endpoint))
+            futuro.set_result(entrada)
+            return entrada
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._en_vuelo.pop(clave, None)
+
+    async def obtener_async(self, proveedor: Optional[str], url: str, params,
+                            descargar, ttl: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Como obtener, con `descargar` corutina y agrupación dentro del event loop
+
+        La lectura y la escritura del nivel en disco (SQLite, con el lock
+        compartido con los hilos síncronos) corren en un hilo para no
+        bloquear el event loop.
+        """
+        clave, endpoint = self.clave(proveedor, url, params)
+
+        entrada = await asyncio.to_thread(self.leer, clave)
+        if entrada is not None:
+            return entrada
+
+        futuro = self._en_vuelo_async.get(clave)
+        if futuro is not None:
+            self.estadisticas['agrupadas'] += 1
+            return await asyncio.shield(futuro)
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._en_vuelo_async[clave] = futuro
+        try:
+            entrada = await descargar()
+            self.estadisticas['descargas'] += 1
+            await asyncio.to_thread(self.guardar, clave, entrada,
+                                    ttl if ttl is not None else self.ttl(proveedor, endpoint))
+            futuro.set_result(entrada)
+            return entrada
+        except BaseException as e:
+            futuro.set_exception(e)
+            # Evitar el aviso "exception was never retrieved" si nadie esperaba
+            futuro.exception()
+            raise
+        finally:
+            self._en_vuelo_async.pop(clave, None)
+
+    def purgar_expirados(self) -> int:
+        """Elimina del disco las entradas vencidas"""
+        if self._conn is None:
+            return 0
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM respuestas WHERE expira <= ?", (time.time(),)
+            ).rowcount
+
+    def limpiar(self):
+        """Vacía ambos niveles"""
+        with self._lock:
+            self._memoria.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM respuestas")
+
+    def cerrar(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache() -> CacheRespuestas:
+    """Caché compartida del proceso (el nivel en disco se comparte con otros procesos)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheRespuestas()
+        return _cache
@@ -10,10 +10,14 @@ from urllib.parse import urljoin, urlparse
 import pandas as pd
 import io
 from datetime import datetime
-import time
 from pathlib import Path
 import logging
 
+try:
+    from src.data_sources.http_transport import obtener_transporte
+except ImportError:
+    from http_transport import obtener_transporte
+
 # Configuración de logging
 log_dir = Path("logs/siata")
 log_dir.mkdir(parents=True, exist_ok=True)
@@ -37,7 +41,8 @@ class SIATADownloader:
         self.base_url = "https://www.siata.gov.co/operacional/Meteorologia/"
         self.base_dir = Path(base_dir)
         self.timeout = 30
-        self.delay = 1  # Segundos entre peticiones para no sobrecargar el servidor
+        # El ritmo de peticiones lo impone la cuota 'siata' del limitador de tasa
+        self.http = obtener_transporte()
         
         # Extensiones de archivos de datos
         self.data_extensions = ['.txt', '.csv', '.xlsx', '.json', '.zip', '.xml', '.kmz', '.tgz', '.gz']
@@ -49,9 +54,8 @@ class SIATADownloader:
         """Obtiene el contenido HTML de una URL"""
         try:
             logger.info(f"Consultando: {url}")
-            response = requests.get(url, allow_redirects=True, timeout=self.timeout)
+            response = self.http.get(url, proveedor='siata', allow_redirects=True, timeout=self.timeout)
             response.raise_for_status()
-            time.sleep(self.delay)  # Respetar el servidor
             return response
         except requests.exceptions.RequestException as e:
             logger.error(f"Error al consultar {url}: {e}")
@@ -0,0 +1,261 @@
+"""
+Caché espacial de pronósticos por celda de la malla del modelo
+Los modelos de pronóstico tienen resoluciones de varios km, así que dos
+usuarios a unos cientos de metros reciben el mismo dato. Las coordenadas se
+ajustan al nodo más cercano de la malla del proveedor (o a una celda geohash
+cuando la malla no se conoce) y cualquier consulta dentro de la celda se
+sirve desde un único pronóstico en la caché de respuestas compartida.
+"""
+
+import json
+import math
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    from src.data_sources.response_cache import CacheRespuestas, obtener_cache
+except ImportError:
+    from response_cache import CacheRespuestas, obtener_cache
+
+logger = logging.getLogger(__name__)
+
+# Separación en grados de la malla del modelo por proveedor
+RESOLUCION_GRADOS = {
+    'openmeteo': 0.1,      # best_match: ICON/GFS/IFS globales de 9-25 km
+    'meteoblue': 0.05,     # NEMS y modelos regionales, ~5 km
+    'openweather': 0.05,
+}
+
+# Precisión geohash para proveedores sin malla conocida (5 = celdas de ~4.9 km)
+PRECISION_GEOHASH = 5
+
+# TTL en segundos por tipo de dato servido desde la celda
+TTL_POR_TIPO = {
+    'actual': 600,
+    'pronostico': 3600,
+    'calidad_aire': 3600,
+}
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_INDICE_BASE32 = {c: i for i, c in enumerate(_BASE32)}
+
+
+def _validar(lat: float, lon: float) -> Tuple[float, float]:
+    lat, lon = float(lat), float(lon)
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        raise ValueError(f"Coordenadas fuera de rango: {lat}, {lon}")
+    return lat, lon
+
+
+def geohash_codificar(lat: float, lon: float, precision: int = PRECISION_GEOHASH) -> str:
+    """Geohash de la coordenada con `precision` caracteres"""
+    lat, lon = _validar(lat, lon)
+    rango_lat = [-90.0, 90.0]
+    rango_lon = [-180.0, 180.0]
+
+    caracteres = []
+    bits = 0
+    n_bits = 0
+    es_lon = True
+    while len(caracteres) < precision:
+        rango, valor = (rango_lon, lon) if es_lon else (rango_lat, lat)
+        medio = (rango[0] + rango[1]) / 2
+        if valor >= medio:
+            bits = (bits << 1) | 1
+            rango[0] = medio
+        else:
+            bits <<= 1
+            rango[1] = medio
+        es_lon = not es_lon
+
+        n_bits += 1
+        if n_bits == 5:
+            caracteres.append(_BASE32[bits])
+            bits = 0
+            n_bits = 0
+
+    return "".join(caracteres)
+
+
+def geohash_decodificar(geohash: str) -> Dict[str, float]:
+    """
+    Centro y semiancho de una celda geohash
+
+    Returns:
+        Dict con lat, lon, error_lat y error_lon (grados)
+    """
+    rango_lat = [-90.0, 90.0]
+    rango_lon = [-180.0, 180.0]
+    es_lon = True
+
+    for caracter in geohash.lower():
+        valor = _INDICE_BASE32[caracter]
+        for desplazamiento in range(4, -1, -1):
+            rango = rango_lon if es_lon else rango_lat
+            medio = (rango[0] + rango[1]) / 2
+            if (valor >> desplazamiento) & 1:
+                rango[0] = medio
+            else:
+                rango[1] = medio
+            es_lon = not es_lon
+
+    return {
+        'lat': (rango_lat[0] + rango_lat[1]) / 2,
+        'lon': (rango_lon[0] + rango_lon[1]) / 2,
+        'error_lat': (rango_lat[1] - rango_lat[0]) / 2,
+        'error_lon': (rango_lon[1] - rango_lon[0]) / 2,
+    }
+
+
+def celda(lat: float, lon: float, proveedor: Optional[str] = None,
+          resolucion: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Celda que contiene la coordenada
+
+    Con resolución de malla, la celda es el nodo más cercano (el punto que
+    el modelo devolvería de todas formas); sin ella, la celda geohash.
+
+    Returns:
+        Dict con id, lat y lon del punto representativo, geohash y resolucion
+    """
+    lat, lon = _validar(lat, lon)
+    if resolucion is None:
+        resolucion = RESOLUCION_GRADOS.get(proveedor)
+
+    if resolucion:
+        i = math.floor(lat / resolucion + 0.5)
+        j = math.floor(lon / resolucion + 0.5)
+        decimales = max(0, -math.floor(math.log10(resolucion))) + 1
+        lat_nodo = round(i * resolucion, decimales)
+        lon_nodo = round(j * resolucion, decimales)
+        return {
+            'id': f"{resolucion:g}:{i}:{j}",
+            'lat': lat_nodo,
+            'lon': lon_nodo,
+            'geohash': geohash_codificar(lat_nodo, lon_nodo, PRECISION_GEOHASH + 2),
+            'resolucion': resolucion,
+        }
+
+    geohash = geohash_codificar(lat, lon, PRECISION_GEOHASH)
+    centro = geohash_decodificar(geohash)
+    return {
+        'id': geohash,
+        'lat': round(centro['lat'], 5),
+        'lon': round(centro['lon'], 5),
+        'geohash': geohash,
+        'resolucion': None,
+    }
+
+
+class CacheEspacial:
+    """
+    Pronósticos por celda sobre la caché de respuestas compartida
+
+    Uso:
+        espacial = CacheEspacial()
+        datos, celda = espacial.obtener(
+            'openmeteo', 6.2518, -75.5636,
+            lambda lat, lon: client.get_current(lat, lon), tipo='actual'
+        )
+
+    `descargar(lat, lon)` recibe el punto representativo de la celda y debe
+    devolver datos serializables a JSON; None no se guarda.
+    """
+
+    def __init__(self, cache: Optional[CacheRespuestas] = None,
+                 resoluciones: Optional[Dict[str, float]] = None,
+                 ttls: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            cache: Caché de respuestas (por defecto la compartida del proceso)
+            resoluciones: Resoluciones de malla adicionales o sobrescritas
+            ttls: TTLs por tipo adicionales o sobrescritos
+        """
+        self.cache = cache or obtener_cache()
+        self.resoluciones = {**RESOLUCION_GRADOS, **(resoluciones or {})}
+        self.ttls = {**TTL_POR_TIPO, **(ttls or {})}
+
+    def celda(self, proveedor: str, lat: float, lon: float) -> Dict[str, Any]:
+        return celda(lat, lon, proveedor, self.resoluciones.get(proveedor))
+
+    def _argumentos(self, proveedor: str, lat: float, lon: float, tipo: str,
+                    ttl: Optional[float]):
+        c = self.celda(proveedor, lat, lon)
+        url = f"celda://{proveedor}/{tipo}"
+        params = {'celda': c['id']}
+        ttl = ttl if ttl is not None else self.ttls.get(tipo, self.cache.ttl(proveedor, tipo))
+        return c, url, params, ttl
+
+    @staticmethod
+    def _a_entrada(datos, url: str) -> Dict[str, Any]:
+        if datos is None:
+            return {'estado': 204, 'headers': {}, 'contenido': b'', 'url': url}
+        contenido = json.dumps(datos, ensure_ascii=False, default=str).encode('utf-8')
+        return {'estado': 200, 'headers': {'Content-Type': 'application/json'},
+                'contenido': contenido, 'url': url}
+
+    @staticmethod
+    def _a_datos(entrada: Dict[str, Any]):
+        if entrada['estado'] != 200:
+            return None
+        return json.loads(entrada['contenido'])
+
+    def leer(self, proveedor: str, lat: float, lon: float,
+             tipo: str = 'pronostico') -> Optional[Any]:
+        """Datos vigentes de la celda sin descargar (None si no hay)"""
+        c, url, params, _ = self._argumentos(proveedor, lat, lon, tipo, None)
+        clave, _ = self.cache.clave(proveedor, url, params)
+        entrada = self.cache.leer(clave)
+        return self._a_datos(entrada) if entrada is not None else None
+
+    def obtener(self, proveedor: str, lat: float, lon: float,
+                descargar: Callable[[float, float], Any],
+                tipo: str = 'pronostico', ttl: Optional[float] = None) -> Tuple[Any, Dict]:
+        """
+        Datos de la celda que contiene (lat, lon), descargándolos una sola vez
+
+        Returns:
+            (datos, celda)
+        """
+        c, url, params, ttl = self._argumentos(proveedor, lat, lon, tipo, ttl)
+        entrada = self.cache.obtener(
+            proveedor, url, params,
+            lambda: self._a_entrada(descargar(c['lat'], c['lon']), url),
+            ttl=ttl
+        )
+        return self._a_datos(entrada), c
+
+    async def obtener_async(self, proveedor: str, lat: float, lon: float, descargar,
+                            tipo: str = 'pronostico',
+                            ttl: Optional[float] = None) -> Tuple[Any, Dict]:
+        """Como obtener, con `descargar(lat, lon)` corutina"""
+        c, url, params, ttl = self._argumentos(proveedor, lat, lon, tipo, ttl)
+
+        async def descarga():
+            return self._a_entrada(await descargar(c['lat'], c['lon']), url)
+
+        entrada = await self.cache.obtener_async(proveedor, url, params, descarga, ttl=ttl)
+        return self._a_datos(entrada), c
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    import random
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    espacial = CacheEspacial(CacheRespuestas(ruta_db=None))
+    descargas = []
+
+    def descargar(lat, lon):
+        descargas.append((lat, lon))
+        return {'lat': lat, 'lon': lon, 'temperatura': 22.0}
+
+    # Usuarios dispersos en el Valle de Aburrá
+    for _ in range(5000):
+        lat = 6.25 + random.uniform(-0.12, 0.12)
+        lon = -75.57 + random.uniform(-0.08, 0.08)
+        espacial.obtener('openmeteo', lat, lon, descargar, tipo='actual')
+
+    print(f"Consultas: 5000 | Descargas: {len(descargas)} | "
+          f"Aciertos: {5000 - len(descargas)}")
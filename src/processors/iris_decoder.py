@@ -0,0 +1,614 @@
+"""
+Decodificador nativo de archivos RAW IRIS/Sigmet (radares IDEAM)
+Lee product_hdr / ingest_header con dtypes estructurados y descomprime
+los rayos de cada sweep a arreglos NumPy (rayos x gates) por momento,
+sin depender de PyART.
+
+Referencia de formato: IRIS Programmer's Manual (Vaisala), capítulos
+"Raw Product Format" y "Data Types".
+"""
+
+import os
+import gzip
+import shutil
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Los archivos RAW se componen de registros de 6144 bytes
+RECORD_BYTES = 6144
+RECORD_WORDS = RECORD_BYTES // 2
+
+# Identificadores de estructura
+ID_PRODUCT_HDR = 27
+ID_INGEST_HEADER = 23
+ID_INGEST_DATA_HEADER = 24
+
+STRUCTURE_HEADER = np.dtype([
+    ('structure_identifier', '<i2'),
+    ('format_version', '<i2'),
+    ('bytes_in_structure', '<i4'),
+    ('reserved', '<i2'),
+    ('flag', '<i2'),
+])
+
+YMDS_TIME = np.dtype([
+    ('seconds', '<i4'),
+    ('milliseconds', '<u2'),
+    ('year', '<i2'),
+    ('month', '<i2'),
+    ('day', '<i2'),
+])
+
+# Encabezado de cada registro de datos (raw_prod_bhdr)
+RAW_PROD_BHDR = np.dtype([
+    ('record_number', '<i2'),
+    ('sweep_number', '<i2'),
+    ('first_ray_byte_offset', '<i2'),
+    ('sweep_ray_number', '<i2'),
+    ('flags', '<u2'),
+    ('spare', '<i2'),
+])
+
+# Un ingest_data_header por tipo de dato al inicio de cada sweep (76 bytes)
+INGEST_DATA_HEADER = np.dtype([
+    ('structure_header', STRUCTURE_HEADER),
+    ('sweep_start_time', YMDS_TIME),
+    ('sweep_number', '<i2'),
+    ('number_rays_per_sweep', '<i2'),
+    ('first_ray_index', '<i2'),
+    ('number_rays_file_expected', '<i2'),
+    ('number_rays_file_written', '<i2'),
+    ('fixed_angle', '<u2'),
+    ('bits_per_bin', '<i2'),
+    ('data_type', '<u2'),
+    ('spare', 'V36'),
+])
+
+# Campos usados de product_end (offset 332 dentro de product_hdr)
+PRODUCT_END = np.dtype({
+    'names': ['site_name', 'ingest_time', 'prf', 'wavelength'],
+    'formats': ['S16', YMDS_TIME, '<i4', '<i4'],
+    'offsets': [0, 32, 120, 148],
+    'itemsize': 308,
+})
+
+# Campos usados de ingest_configuration (offset 12 dentro de ingest_header)
+INGEST_CONFIGURATION = np.dtype({
+    'names': ['number_sweeps_completed', 'volume_scan_start_time', 'site_name',
+              'latitude_radar', 'longitude_radar', 'height_site', 'height_radar',
+              'number_rays_sweep'],
+    'formats': ['<i2', YMDS_TIME, 'S16', '<u4', '<u4', '<i2', '<i2', '<u2'],
+    'offsets': [82, 88, 150, 168, 172, 176, 178, 184],
+    'itemsize': 480,
+})
+
+# task_range_info (offset 1264 dentro de ingest_header)
+TASK_RANGE_INFO = np.dtype({
+    'names': ['range_first_bin', 'range_last_bin', 'number_input_bins',
+              'number_output_bins', 'step_input_bins', 'step_output_bins'],
+    'formats': ['<i4', '<i4', '<i2', '<i2', '<i4', '<i4'],
+    'offsets': [0, 4, 8, 10, 12, 16],
+    'itemsize': 160,
+})
+
+OFFSET_PRODUCT_END = 12 + 320
+OFFSET_INGEST_CONFIGURATION = 12
+OFFSET_TASK_RANGE_INFO = 12 + 480 + 12 + 120 + 320 + 320
+
+# Tipos de datos IRIS: código -> (nombre IRIS, momento, bytes por bin)
+TIPOS_DATOS = {
+    1: ('DBT', 'DBT', 1),
+    2: ('DBZ', 'DBZ', 1),
+    3: ('VEL', 'VEL', 1),
+    4: ('WIDTH', 'WIDTH', 1),
+    5: ('ZDR', 'ZDR', 1),
+    7: ('DBZC', 'DBZC', 1),
+    8: ('DBT2', 'DBT', 2),
+    9: ('DBZ2', 'DBZ', 2),
+    10: ('VEL2', 'VEL', 2),
+    11: ('WIDTH2', 'WIDTH', 2),
+    12: ('ZDR2', 'ZDR', 2),
+    14: ('KDP', 'KDP', 1),
+    15: ('KDP2', 'KDP', 2),
+    16: ('PHIDP', 'PHIDP', 1),
+    17: ('VELC', 'VELC', 1),
+    18: ('SQI', 'SQI', 1),
+    19: ('RHOHV', 'RHOHV', 1),
+    20: ('RHOHV2', 'RHOHV', 2),
+    21: ('DBZC2', 'DBZC', 2),
+    22: ('VELC2', 'VELC', 2),
+    23: ('SQI2', 'SQI', 2),
+    24: ('PHIDP2', 'PHIDP', 2),
+}
+
+# Tipo 0: encabezado extendido de rayo (no es un momento)
+TIPO_XHDR = 0
+
+
+def bin2_a_grados(valor):
+    """Convierte ángulos binarios de 16 bits (BIN2) a grados"""
+    return np.asarray(valor, dtype=np.float64) * (360.0 / 65536.0)
+
+
+def bin4_a_grados(valor):
+    """Convierte ángulos binarios de 32 bits (BIN4) a grados en [-180, 180)"""
+    grados = float(valor) * (360.0 / 4294967296.0)
+    return grados - 360.0 if grados >= 180.0 else grados
+
+
+def ymds_a_datetime(ymds):
+    """Convierte una estructura ymds_time a datetime"""
+    try:
+        return (datetime(int(ymds['year']), int(ymds['month']), int(ymds['day']))
+                + timedelta(seconds=int(ymds['seconds']),
+                            milliseconds=int(ymds['milliseconds']) & 0x3FF))
+    except (ValueError, OverflowError):
+        return None
+
+
+def ruta_descomprimida(ruta, dir_cache=None):
+    """Ruta del archivo sidecar descomprimido de un RAW .gz"""
+    ruta = Path(ruta)
+    directorio = Path(dir_cache) if dir_cache else ruta.parent / '.raw_cache'
+    return directorio / ruta.name[:-3]
+
+
+def abrir_mapeado(ruta, dir_cache=None):
+    """
+    Mapea en memoria (solo lectura) el contenido de un archivo RAW
+
+    Los .gz se descomprimen una sola vez a un archivo sidecar que se reutiliza
+    mientras sea más reciente que el original; así las lecturas siguientes
+    también son mapeadas y no cargan el volumen completo en memoria.
+
+    Returns:
+        np.memmap de uint8 (o arreglo vacío si el archivo no tiene datos)
+    """
+    ruta = Path(ruta)
+
+    if ruta.suffix.lower() == '.gz':
+        sidecar = ruta_descomprimida(ruta, dir_cache)
+        if not sidecar.exists() or sidecar.stat().st_mtime < ruta.stat().st_mtime:
+            sidecar.parent.mkdir(parents=True, exist_ok=True)
+            temporal = sidecar.with_name(sidecar.name + '.part')
+            with gzip.open(ruta, 'rb') as origen, open(temporal, 'wb') as destino:
+                shutil.copyfileobj(origen, destino, 1024 * 1024)
+            os.replace(temporal, sidecar)
+            logger.debug(f"Descomprimido {ruta.name} -> {sidecar}")
+        ruta = sidecar
+
+    if ruta.stat().st_size == 0:
+        return np.zeros(0, dtype=np.uint8)
+
+    return np.memmap(ruta, dtype=np.uint8, mode='r')
+
+
+def tabla_conversion(tipo, nyquist=None, longitud_onda_cm=None):
+    """
+    Tabla de conversión código crudo -> valor físico (float32, NaN = sin dato)
+
+    Se construye una vez por tipo de dato (256 o 65536 entradas) y se aplica
+    con un solo gather vectorizado sobre el sweep completo.
+    """
+    nombre, _, nbytes = TIPOS_DATOS[tipo]
+    n = np.arange(256 if nbytes == 1 else 65536, dtype=np.float64)
+
+    if nbytes == 2:
+        if nombre in ('WIDTH2',):
+            valores = n / 100.0
+        elif nombre in ('RHOHV2', 'SQI2'):
+            valores = (n - 1) / 65533.0
+        elif nombre == 'PHIDP2':
+            valores = 360.0 * (n - 1) / 65534.0
+        else:
+            valores = (n - 32768) / 100.0
+        valores[[0, 65535]] = np.nan
+    else:
+        if nombre in ('DBT', 'DBZ', 'DBZC'):
+            valores = (n - 64) / 2.0
+        elif nombre in ('VEL', 'VELC'):
+            valores = (n - 128) / 127.0 * (nyquist if nyquist else np.nan)
+        elif nombre == 'WIDTH':
+            valores = n / 256.0 * (nyquist if nyquist else np.nan)
+        elif nombre == 'ZDR':
+            valores = (n - 128) / 16.0
+        elif nombre == 'KDP':
+            lam = longitud_onda_cm if longitud_onda_cm else np.nan
+            valores = np.zeros_like(n)
+            pos = n > 128
+            neg = n < 128
+            valores[pos] = 0.25 * np.power(600.0, (n[pos] - 129) / 126.0) / lam
+            valores[neg] = -0.25 * np.power(600.0, (127 - n[neg]) / 126.0) / lam
+        elif nombre == 'PHIDP':
+            valores = 180.0 * (n - 1) / 254.0
+        else:  # RHOHV, SQI
+            valores = np.sqrt(np.clip(n - 1, 0, None) / 253.0)
+        valores[[0, 255]] = np.nan
+
+    return valores.astype(np.float32)
+
+
+class SweepIRIS:
+    """Un sweep decodificado: geometría de rayos y momentos crudos (rayos x gates)"""
+
+    def __init__(self, numero, angulo_fijo, inicio, azimut, elevacion, tiempo_s,
+                 rango_m, crudo, tipos, decodificador):
+        self.numero = numero
+        self.angulo_fijo = angulo_fijo
+        self.inicio = inicio
+        self.azimut = azimut
+        self.elevacion = elevacion
+        self.tiempo_s = tiempo_s
+        self.rango_m = rango_m
+        self.crudo = crudo
+        self.tipos = tipos
+        self._decodificador = decodificador
+
+    @property
+    def forma(self):
+        return (len(self.azimut), len(self.rango_m))
+
+    @property
+    def longitud_onda_cm(self):
+        return self._decodificador.longitud_onda_cm
+
+    @property
+    def momentos_disponibles(self):
+        return list(self.crudo.keys())
+
+    def tabla_conversion(self, nombre):
+        """Tabla código crudo -> valor físico de un momento"""
+        return self._decodificador.tabla(self.tipos[nombre])
+
+    def momento(self, nombre):
+        """Momento en unidades físicas (float32, NaN donde no hay dato)"""
+        return self.tabla_conversion(nombre)[self.crudo[nombre]]
+
+    def momentos(self):
+        return {nombre: self.momento(nombre) for nombre in self.crudo}
+
+
+class DecodificadorIRIS:
+    """Decodificador de volúmenes RAW IRIS/Sigmet"""
+
+    def __init__(self, buffer):
+        """
+        Args:
+            buffer: Contenido del archivo (bytes, bytearray, memmap o arreglo uint8)
+        """
+        datos = np.frombuffer(buffer, dtype=np.uint8) if not isinstance(buffer, np.ndarray) \
+            else buffer.view(np.uint8).reshape(-1)
+
+        n_registros = datos.size // RECORD_BYTES
+        if n_registros < 2:
+            raise ValueError("Archivo demasiado corto para ser un RAW IRIS")
+
+        self._registros = datos[:n_registros * RECORD_BYTES].reshape(n_registros, RECORD_BYTES)
+        self._palabras = self._registros.view('<u2')
+
+        product_hdr = self._registros[0]
+        ingest_header = self._registros[1]
+
+        sh_prod = product_hdr[:STRUCTURE_HEADER.itemsize].view(STRUCTURE_HEADER)[0]
+        sh_ing = ingest_header[:STRUCTURE_HEADER.itemsize].view(STRUCTURE_HEADER)[0]
+        if (sh_prod['structure_identifier'] != ID_PRODUCT_HDR or
+                sh_ing['structure_identifier'] != ID_INGEST_HEADER):
+            raise ValueError("El archivo no tiene encabezados IRIS (product_hdr/ingest_header)")
+
+        self.product_end = product_hdr[
+            OFFSET_PRODUCT_END:OFFSET_PRODUCT_END + PRODUCT_END.itemsize
+        ].view(PRODUCT_END)[0]
+        self.ingest_configuration = ingest_header[
+            OFFSET_INGEST_CONFIGURATION:OFFSET_INGEST_CONFIGURATION + INGEST_CONFIGURATION.itemsize
+        ].view(INGEST_CONFIGURATION)[0]
+        self.task_range_info = ingest_header[
+            OFFSET_TASK_RANGE_INFO:OFFSET_TASK_RANGE_INFO + TASK_RANGE_INFO.itemsize
+        ].view(TASK_RANGE_INFO)[0]
+
+        # Parámetros de conversión de velocidad y KDP
+        longitud_onda_m = int(self.product_end['wavelength']) / 10000.0
+        prf = int(self.product_end['prf'])
+        self.longitud_onda_cm = longitud_onda_m * 100 if longitud_onda_m > 0 else None
+        self.nyquist = longitud_onda_m * prf / 4.0 if longitud_onda_m > 0 and prf > 0 else None
+
+        self._tablas = {}
+        self._sweeps = self._indexar_sweeps()
+
+    @classmethod
+    def desde_archivo(cls, ruta, dir_cache=None):
+        """Crea un decodificador sobre el archivo RAW mapeado en memoria (ver abrir_mapeado)"""
+        return cls(abrir_mapeado(ruta, dir_cache))
+
+    @staticmethod
+    def es_iris(buffer):
+        """Indica si un buffer comienza con un product_hdr IRIS"""
+        cabecera = np.frombuffer(bytes(buffer[:STRUCTURE_HEADER.itemsize]), dtype=STRUCTURE_HEADER)
+        return cabecera.size == 1 and cabecera[0]['structure_identifier'] == ID_PRODUCT_HDR
+
+    def _indexar_sweeps(self):
+        """Agrupa los registros de datos por número de sweep (sin decodificar)"""
+        bhdr = self._registros[2:, :RAW_PROD_BHDR.itemsize].copy().view(RAW_PROD_BHDR)[:, 0]
+        numeros = bhdr['sweep_number']
+
+        if numeros.size == 0:
+            return []
+
+        cortes = np.flatnonzero(np.diff(numeros)) + 1
+        inicios = np.concatenate(([0], cortes))
+        finales = np.concatenate((cortes, [numeros.size]))
+
+        return [
+            (int(numeros[i]), i + 2, f + 2)
+            for i, f in zip(inicios, finales) if numeros[i] > 0
+        ]
+
+    @property
+    def n_sweeps(self):
+        return len(self._sweeps)
+
+    @property
+    def metadata(self):
+        ic = self.ingest_configuration
+        tri = self.task_range_info
+        return {
+            'formato': 'IRIS/Sigmet RAW',
+            'sitio': ic['site_name'].decode('ascii', 'ignore').strip('\x00 '),
+            'latitud': bin4_a_grados(ic['latitude_radar']),
+            'longitud': bin4_a_grados(ic['longitude_radar']),
+            # height_site: terreno sobre el nivel del mar; height_radar: antena sobre el terreno
+            'altura_m': int(ic['height_site']) + int(ic['height_radar']),
+            'altura_sitio_m': int(ic['height_site']),
+            'altura_antena_m': int(ic['height_radar']),
+            'inicio_volumen': ymds_a_datetime(ic['volume_scan_start_time']),
+            'numero_sweeps': self.n_sweeps,
+            'rayos_por_sweep': int(ic['number_rays_sweep']),
+            'numero_gates': int(tri['number_output_bins']),
+            'rango_primer_gate_m': tri['range_first_bin'] / 100.0,
+            'paso_gate_m': tri['step_output_bins'] / 100.0,
+            'nyquist_ms': self.nyquist,
+            'longitud_onda_cm': self.longitud_onda_cm,
+        }
+
+    def tabla(self, tipo):
+        """Tabla de conversión cacheada para un tipo de dato"""
+        if tipo not in self._tablas:
+            self._tablas[tipo] = tabla_conversion(tipo, self.nyquist, self.longitud_onda_cm)
+        return self._tablas[tipo]
+
+    def leer_sweep(self, indice, momentos=None):
+        """
+        Decodifica un sweep completo
+
+        Args:
+            indice: Índice del sweep dentro del volumen (0 = más bajo)
+            momentos: Lista de momentos a conservar (None = todos)
+
+        Returns:
+            SweepIRIS
+        """
+        numero, reg_ini, reg_fin = self._sweeps[indice]
+        primero = self._registros[reg_ini]
+
+        # Encabezados de datos (uno por tipo) al inicio del primer registro
+        headers = []
+        offset = RAW_PROD_BHDR.itemsize
+        while offset + INGEST_DATA_HEADER.itemsize <= RECORD_BYTES:
+            idh = primero[offset:offset + INGEST_DATA_HEADER.itemsize].view(INGEST_DATA_HEADER)[0]
+            if idh['structure_header']['structure_identifier'] != ID_INGEST_DATA_HEADER:
+                break
+            headers.append(idh)
+            offset += INGEST_DATA_HEADER.itemsize
+
+        if not headers:
+            raise ValueError(f"Sweep {numero} sin ingest_data_header")
+
+        tipos = [int(h['data_type']) for h in headers]
+        n_rayos = max(int(h['number_rays_file_expected']) for h in headers)
+        n_gates = int(self.task_range_info['number_output_bins'])
+
+        # Flujo comprimido del sweep: cuerpo de todos sus registros, sin encabezados
+        bhdr_palabras = RAW_PROD_BHDR.itemsize // 2
+        flujo = np.concatenate((
+            self._palabras[reg_ini, offset // 2:],
+            self._palabras[reg_ini + 1:reg_fin, bhdr_palabras:].reshape(-1)
+        ))
+
+        # Ancho en palabras de cada rayo por tipo (6 de encabezado + datos)
+        anchos = []
+        for tipo in tipos:
+            nbytes = TIPOS_DATOS[tipo][2] if tipo in TIPOS_DATOS else 2
+            anchos.append(6 + (n_gates * nbytes + 1) // 2)
+        anchos = np.array(anchos, dtype=np.int64)
+        bloques = np.concatenate(([0], np.cumsum(anchos * n_rayos)))
+
+        salida = np.zeros(int(bloques[-1]), dtype=np.uint16)
+        origenes, destinos, longitudes = self._plan_descompresion(
+            flujo, n_rayos, bloques, anchos
+        )
+        self._copiar_tramos(flujo, salida, origenes, destinos, longitudes)
+
+        # Geometría a partir de los encabezados de rayo del primer tipo
+        rayos_ref = salida[bloques[0]:bloques[1]].reshape(n_rayos, anchos[0])
+        encabezado = rayos_ref[:, :6]
+        az_ini = bin2_a_grados(encabezado[:, 0])
+        az_fin = bin2_a_grados(encabezado[:, 2])
+        # Diferencia angular con signo más corta: vale para barridos en
+        # ambos sentidos y para rayos que cruzan 0°
+        delta = ((az_fin - az_ini + 180.0) % 360.0) - 180.0
+        azimut = (az_ini + delta / 2.0) % 360.0
+        el_ini = bin2_a_grados(encabezado[:, 1])
+        el_fin = bin2_a_grados(encabezado[:, 3])
+        elevacion = np.where(el_ini > 180, el_ini - 360, el_ini) / 2.0 + \
+            np.where(el_fin > 180, el_fin - 360, el_fin) / 2.0
+
+        crudo = {}
+        tipos_momento = {}
+        for k, tipo in enumerate(tipos):
+            if tipo == TIPO_XHDR or tipo not in TIPOS_DATOS:
+                continue
+            _, momento, nbytes = TIPOS_DATOS[tipo]
+            if momentos is not None and momento not in momentos:
+                continue
+            # Preferir la versión de 2 bytes si el volumen trae ambas
+            if momento in tipos_momento and TIPOS_DATOS[tipos_momento[momento]][2] >= nbytes:
+                continue
+
+            rayos = salida[bloques[k]:bloques[k + 1]].reshape(n_rayos, anchos[k])
+            datos = rayos[:, 6:]
+            if nbytes == 1:
+                datos = datos.view(np.uint8)
+            crudo[momento] = datos[:, :n_gates]
+            tipos_momento[momento] = tipo
+
+        rango_m = (self.task_range_info['range_first_bin']
+                   + np.arange(n_gates) * self.task_range_info['step_output_bins']) / 100.0
+
+        idh = headers[0]
+        return SweepIRIS(
+            numero=numero,
+            angulo_fijo=float(bin2_a_grados(idh['fixed_angle'])),
+            inicio=ymds_a_datetime(idh['sweep_start_time']),
+            azimut=azimut.astype(np.float32),
+            elevacion=elevacion.astype(np.float32),
+            tiempo_s=encabezado[:, 5].astype(np.int32),
+            rango_m=rango_m.astype(np.float32),
+            crudo=crudo,
+            tipos=tipos_momento,
+            decodificador=self,
+        )
+
+    @staticmethod
+    def _plan_descompresion(flujo, n_rayos, bloques, anchos):
+        """
+        Recorre solo las palabras de control del flujo comprimido
+
+        Esquema IRIS: palabra con bit 15 activo -> siguen N palabras de datos;
+        palabra == 1 -> fin de rayo; otra palabra -> N palabras en cero.
+        Devuelve los tramos (origen, destino, longitud) a copiar; la copia se
+        hace después con un único gather vectorizado.
+        """
+        palabras = memoryview(np.ascontiguousarray(flujo, dtype=np.uint16))
+        total = len(palabras)
+        n_tipos = len(anchos)
+        origenes, destinos, longitudes = [], [], []
+        pos = 0
+
+        for rayo in range(n_rayos):
+            for k in range(n_tipos):
+                ancho = int(anchos[k])
+                inicio = int(bloques[k]) + rayo * ancho
+                limite = inicio + ancho
+                destino = inicio
+                while pos < total:
+                    control = palabras[pos]
+                    pos += 1
+                    if control & 0x8000:
+                        n = control & 0x7FFF
+                        n_util = max(0, min(n, limite - destino, total - pos))
+                        if n_util:
+                            origenes.append(pos)
+                            destinos.append(destino)
+                            longitudes.append(n_util)
+                        pos += n
+                        destino += n
+                    elif control == 1:
+                        break
+                    else:
+                        destino += control
+                if pos >= total:
+                    return origenes, destinos, longitudes
+
+        return origenes, destinos, longitudes
+
+    @staticmethod
+    def _copiar_tramos(flujo, salida, origenes, destinos, longitudes):
+        """Copia todos los tramos de datos con un único gather/scatter"""
+        if not longitudes:
+            return
+        longitudes = np.asarray(longitudes, dtype=np.int64)
+        inicio_tramo = np.cumsum(longitudes) - longitudes
+        total = int(longitudes.sum())
+        desplazamiento = np.arange(total, dtype=np.int64) - np.repeat(inicio_tramo, longitudes)
+        salida[np.repeat(np.asarray(destinos, dtype=np.int64), longitudes) + desplazamiento] = \
+            flujo[np.repeat(np.asarray(origenes, dtype=np.int64), longitudes) + desplazamiento]
+
+    def leer_volumen(self, momentos=None):
+        """Decodifica todos los sweeps del volumen"""
+        return [self.leer_sweep(i, momentos) for i in range(self.n_sweeps)]
+
+
+class VolumenIRIS:
+    """
+    Acceso perezoso a un volumen RAW IRIS
+
+    El archivo queda mapeado en memoria; los sweeps se descomprimen solo
+    cuando se piden y se conservan en una pequeña caché LRU, de modo que
+    recorrer cientos de volúmenes mantiene un consumo de memoria estable.
+    """
+
+    def __init__(self, ruta, dir_cache=None, sweeps_en_cache=2):
+        """
+        Args:
+            ruta: Archivo RAW o RAW.gz
+            dir_cache: Directorio para los sidecar descomprimidos de los .gz
+            sweeps_en_cache: Sweeps decodificados que se mantienen en memoria
+        """
+        self.ruta = Path(ruta)
+        self.buffer = abrir_mapeado(self.ruta, dir_cache)
+        self.decodificador = DecodificadorIRIS(self.buffer)
+        self.sweeps_en_cache = sweeps_en_cache
+        self._cache = OrderedDict()
+
+    @property
+    def metadata(self):
+        return self.decodificador.metadata
+
+    @property
+    def n_sweeps(self):
+        return self.decodificador.n_sweeps
+
+    def __len__(self):
+        return self.n_sweeps
+
+    def sweep(self, indice, momentos=None):
+        """Sweep decodificado (desde la caché si ya se pidió)"""
+        clave = (indice, tuple(momentos) if momentos else None)
+        if clave in self._cache:
+            self._cache.move_to_end(clave)
+            return self._cache[clave]
+
+        sweep = self.decodificador.leer_sweep(indice, momentos)
+        self._cache[clave] = sweep
+        while len(self._cache) > self.sweeps_en_cache:
+            self._cache.popitem(last=False)
+        return sweep
+
+    def crudo(self, momento, indice=0):
+        """Códigos crudos de un momento (vista rayos x gates, sin copia)"""
+        return self.sweep(indice).crudo[momento]
+
+    def momento(self, momento, indice=0):
+        """Momento en unidades físicas para un sweep"""
+        return self.sweep(indice).momento(momento)
+
+    def __iter__(self):
+        for indice in range(self.n_sweeps):
+            yield self.sweep(indice)
+
+    def cerrar(self):
+        """Libera la caché de sweeps y el mapeo del archivo"""
+        self._cache.clear()
+        self.decodificador = None
+        self.buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
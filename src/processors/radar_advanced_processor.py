@@ -10,6 +10,13 @@ from pathlib import Path
 from datetime import datetime
 import logging
 
+try:
+    from src.processors.radar_precipitacion import MotorPrecipitacion
+    from src.processors.radar_cappi import obtener_tabla
+except ImportError:
+    from radar_precipitacion import MotorPrecipitacion
+    from radar_cappi import obtener_tabla
+
 logger = logging.getLogger(__name__)
 
 # Configuración de logging
@@ -40,6 +47,8 @@ class RadarAdvancedProcessor:
         else:
             self.pyart_enabled = True
         
+        self._motores_precipitacion = {}
+        
         # Productos y sus configuraciones
         self.productos_config = {
             'reflectivity': {
@@ -168,19 +177,21 @@ class RadarAdvancedProcessor:
             logger.error(f"Error generando PPI: {e}")
             return None
     
-    def generar_cappi(self, radar, campo='reflectivity', altura=3000, output_path=None):
+    def generar_cappi(self, radar, campo='reflectivity', altura=3000, output_path=None,
+                      limite_m=150000, resolucion_m=1250, interpolar=True):
         """
         Genera CAPPI (Constant Altitude PPI)
+        
+        Usa una tabla gate -> celda precalculada por geometría de escaneo
+        (radar_cappi); solo se interpola la altura pedida y las llamadas
+        siguientes con la misma estrategia de escaneo reutilizan la tabla.
         """
         if not self.pyart_enabled or radar is None:
             return None
         
         try:
-            # Crear grid
-            grid = pyart.map.grid_from_radars(
-                radar,
-                grid_shape=(20, 241, 241),
-                grid_limits=((0, 20000), (-150000, 150000), (-150000, 150000))
+            datos, x, y = self.calcular_cappi(
+                radar, campo, altura, limite_m, resolucion_m, interpolar
             )
             
             config = self.productos_config.get(campo, {
@@ -190,20 +201,13 @@ class RadarAdvancedProcessor:
                 'cmap': 'viridis'
             })
             
-            # Encontrar índice de altura más cercano
-            alturas = grid.z['data']
-            idx_altura = np.argmin(np.abs(alturas - altura))
-            
-            # Extraer datos en esa altura
-            datos = grid.fields[campo]['data'][idx_altura, :, :]
-            
             # Plotear
             fig, ax = plt.subplots(figsize=(12, 10))
             
             im = ax.pcolormesh(
-                grid.x['data'][0] / 1000,  # Convertir a km
-                grid.y['data'][0] / 1000,
-                datos,
+                x / 1000,  # Convertir a km
+                y / 1000,
+                np.ma.masked_invalid(datos),
                 vmin=config['vmin'],
                 vmax=config['vmax'],
                 cmap=config['cmap']
@@ -227,10 +231,40 @@ class RadarAdvancedProcessor:
             logger.error(f"Error generando CAPPI: {e}")
             return None
     
-    def calcular_precipitacion(self, radar, campo='reflectivity'):
+    def calcular_cappi(self, radar, campo='reflectivity', altura=3000, limite_m=150000,
+                       resolucion_m=1250, interpolar=True):
+        """
+        Interpola un campo PyART a una altura constante
+        
+        Returns:
+            tuple: (datos (ny, nx) con NaN sin dato, x_m, y_m)
+        """
+        sweeps = range(radar.nsweeps)
+        inicios = radar.sweep_start_ray_index['data']
+        finales = radar.sweep_end_ray_index['data']
+        
+        campo_datos = np.ma.filled(radar.fields[campo]['data'].astype(np.float32), np.nan)
+        datos_por_sweep = [campo_datos[inicios[k]:finales[k] + 1] for k in sweeps]
+        azimuts = [radar.azimuth['data'][inicios[k]:finales[k] + 1] for k in sweeps]
+        n_azimuts = max(len(a) for a in azimuts)
+        
+        tabla = obtener_tabla(radar.fixed_angle['data'], radar.range['data'], n_azimuts,
+                              limite_m, resolucion_m)
+        
+        datos = tabla.aplicar(datos_por_sweep, azimuts, altura, interpolar=interpolar)
+        return datos, tabla.x, tabla.y
+    
+    def calcular_precipitacion(self, radar, campo='reflectivity', relacion='marshall_palmer',
+                               relacion_convectiva=None, umbral_convectivo=40.0,
+                               dbz_min=None, dbz_max=None):
         """
         Calcula tasa de precipitación usando relación Z-R
         Z = aR^b, típicamente Z = 200R^1.6
+        
+        La conversión se hace con una tabla precalculada (ver MotorPrecipitacion):
+        la reflectividad se cuantiza a 0.01 dB y se aplica un único gather.
+        Por defecto no se aplica umbral de eco débil ni límite de granizo
+        (dbz_min/dbz_max); pasarlos explícitamente para activarlos.
         """
         if not self.pyart_enabled or radar is None:
             return None
@@ -243,18 +277,12 @@ class RadarAdvancedProcessor:
             
             z_data = radar.fields[campo]['data']
             
-            # Convertir dBZ a Z (lineal)
-            z_linear = 10 ** (z_data / 10.0)
-            
-            # Aplicar relación Z-R: Z = 200R^1.6
-            a = 200
-            b = 1.6
-            
-            # R = (Z/a)^(1/b)
-            rain_rate = (z_linear / a) ** (1 / b)
+            motor = self._motor_precipitacion(relacion, relacion_convectiva, umbral_convectivo,
+                                              dbz_min, dbz_max)
+            tasa = motor.tasa_desde_dbz(z_data)
             
             # Enmascarar valores inválidos
-            rain_rate = np.ma.masked_where(z_data.mask, rain_rate)
+            rain_rate = np.ma.masked_invalid(tasa, copy=False)
             
             # Crear campo de precipitación
             rain_dict = {
@@ -275,6 +303,20 @@ class RadarAdvancedProcessor:
             logger.error(f"Error calculando precipitación: {e}")
             return None
     
+    def _motor_precipitacion(self, relacion, relacion_convectiva, umbral_convectivo,
+                             dbz_min=None, dbz_max=None):
+        """Motor Z-R cacheado por configuración (las tablas se construyen una vez)"""
+        clave = (str(relacion), str(relacion_convectiva), umbral_convectivo, dbz_min, dbz_max)
+        if clave not in self._motores_precipitacion:
+            self._motores_precipitacion[clave] = MotorPrecipitacion(
+                relacion=relacion,
+                relacion_convectiva=relacion_convectiva,
+                umbral_convectivo=umbral_convectivo,
+                dbz_min=dbz_min,
+                dbz_max=dbz_max
+            )
+        return self._motores_precipitacion[clave]
+    
     def exportar_a_netcdf(self, radar, output_path):
         """Exporta datos de radar a formato NetCDF"""
         if not self.pyart_enabled or radar is None:
@@ -0,0 +1,308 @@
+"""
+Motor de CAPPI / interpolación a malla cartesiana con tablas precalculadas
+Para cada geometría de escaneo (elevaciones, gates, rayos nominales y malla)
+se calcula una sola vez qué gate de qué sweep alimenta cada celda en cada
+altura pedida; los CAPPI siguientes del mismo radar son solo un gather.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RADIO_TIERRA_M = 6371000.0
+FACTOR_TIERRA_EFECTIVA = 4.0 / 3.0
+
+# Tablas de geometría en memoria (una por radar/estrategia de escaneo)
+MAX_TABLAS_EN_CACHE = 16
+_tablas = OrderedDict()
+_lock_tablas = threading.Lock()
+
+
+def altura_haz(rango_suelo_m, elevacion_grados, ke=FACTOR_TIERRA_EFECTIVA):
+    """
+    Altura del haz sobre el radar y rango oblicuo para una distancia sobre el suelo
+
+    Modelo de tierra efectiva (4/3): con φ = s / (ke·R),
+    r = ke·R·sin φ / cos(θ + φ) y h = ke·R·(cos θ / cos(θ + φ) - 1)
+
+    Returns:
+        tuple: (altura_m, rango_oblicuo_m)
+    """
+    radio = ke * RADIO_TIERRA_M
+    theta = np.radians(elevacion_grados)
+    phi = np.asarray(rango_suelo_m, dtype=np.float64) / radio
+    cos_total = np.cos(theta + phi)
+    return radio * (np.cos(theta) / cos_total - 1.0), radio * np.sin(phi) / cos_total
+
+
+def rayos_nominales(n_rayos):
+    """Rayos nominales por sweep: múltiplo de 360 más cercano (361 rayos -> 360)"""
+    return 360 * max(1, int(round(n_rayos / 360.0)))
+
+
+class TablaCAPPI:
+    """Correspondencia precalculada gate -> celda para una geometría de radar"""
+
+    def __init__(self, elevaciones, rango_m, n_azimuts, limite_m=150000.0,
+                 resolucion_m=1250.0, pseudo=True, ke=FACTOR_TIERRA_EFECTIVA,
+                 rango_suelo_m=None, azimut_grados=None):
+        """
+        Args:
+            elevaciones: Ángulo fijo de cada sweep (grados, en el orden del volumen)
+            rango_m: Rango al centro de cada gate (m); se asume paso constante
+            n_azimuts: Rayos nominales por sweep (p. ej. 360)
+            limite_m: Semiancho de la malla (la malla cubre ±limite_m en x e y)
+            resolucion_m: Tamaño de celda
+            pseudo: Si True, las celdas por debajo del sweep más bajo o por
+                encima del más alto toman el sweep más cercano (pseudo-CAPPI)
+            ke: Factor de radio terrestre efectivo
+            rango_suelo_m, azimut_grados: Puntos destino arbitrarios (p. ej. una
+                malla lat/lon compartida por varios radares) en lugar de la
+                malla cartesiana centrada en el radar
+        """
+        self.elevaciones = np.asarray(elevaciones, dtype=np.float64)
+        self.n_sweeps = len(self.elevaciones)
+        self.rango_m = np.asarray(rango_m, dtype=np.float64)
+        self.n_gates = len(self.rango_m)
+        self.n_azimuts = int(n_azimuts)
+        self.pseudo = pseudo
+        self.ke = ke
+
+        paso = self.rango_m[1] - self.rango_m[0] if self.n_gates > 1 else 1.0
+        self.primer_gate_m = self.rango_m[0]
+        self.paso_gate_m = paso
+
+        if rango_suelo_m is None:
+            n_celdas = int(round(2 * limite_m / resolucion_m)) + 1
+            self.x = np.linspace(-limite_m, limite_m, n_celdas)
+            self.y = np.linspace(-limite_m, limite_m, n_celdas)
+            xx, yy = np.meshgrid(self.x, self.y)
+            rango_suelo_m = np.hypot(xx, yy)
+            azimut_grados = np.degrees(np.arctan2(xx, yy)) % 360.0
+        else:
+            self.x = self.y = None
+            rango_suelo_m = np.asarray(rango_suelo_m, dtype=np.float64)
+            azimut_grados = np.asarray(azimut_grados, dtype=np.float64) % 360.0
+
+        self._rango_suelo = rango_suelo_m.ravel()
+        ancho_bin = 360.0 / self.n_azimuts
+        self._bin_azimut = (np.rint(azimut_grados.ravel() / ancho_bin).astype(np.int64)
+                            % self.n_azimuts)
+
+        self.forma = rango_suelo_m.shape
+        self._niveles = {}
+        self._geometria = None
+        self._lock = threading.Lock()
+
+        # Fila centinela (sin dato) al final de cada mapa de rayos
+        self.fila_nula = self.n_sweeps * self.n_azimuts
+
+    def _indices_sweep(self, k):
+        """Fila nominal y gate de cada celda sobre el sweep k"""
+        altura, rango = altura_haz(self._rango_suelo, self.elevaciones[k], self.ke)
+        gate = np.rint((rango - self.primer_gate_m) / self.paso_gate_m).astype(np.int64)
+        valido = (gate >= 0) & (gate < self.n_gates)
+        fila = np.where(valido, k * self.n_azimuts + self._bin_azimut, self.fila_nula)
+        return altura, fila, np.where(valido, gate, 0)
+
+    def _geometria_sweeps(self):
+        """Altura del haz, fila y gate por celda para cada sweep (ordenados por elevación)"""
+        if self._geometria is None:
+            por_sweep = [self._indices_sweep(k) for k in np.argsort(self.elevaciones)]
+            self._geometria = tuple(np.stack(v) for v in zip(*por_sweep))
+        return self._geometria
+
+    def nivel(self, altura_m):
+        """
+        Índices de un nivel de altura (se calculan una vez y quedan en caché)
+
+        Returns:
+            dict con fila/gate del sweep inferior y superior y el peso del inferior
+        """
+        clave = round(float(altura_m), 1)
+        with self._lock:
+            if clave in self._niveles:
+                return self._niveles[clave]
+
+        alturas, filas, gates = self._geometria_sweeps()
+
+        # Número de sweeps cuyo haz pasa por debajo de la altura pedida
+        n_bajo = (alturas <= altura_m).sum(axis=0)
+        celdas = np.arange(alturas.shape[1])
+
+        inf = np.clip(n_bajo - 1, 0, self.n_sweeps - 1)
+        sup = np.clip(n_bajo, 0, self.n_sweeps - 1)
+
+        h_inf = alturas[inf, celdas]
+        h_sup = alturas[sup, celdas]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            peso = np.where(sup == inf, 1.0, (h_sup - altura_m) / (h_sup - h_inf))
+
+        fila_inf = filas[inf, celdas]
+        fila_sup = filas[sup, celdas]
+
+        if not self.pseudo:
+            fuera = (n_bajo == 0) | (n_bajo == self.n_sweeps)
+            fila_inf = np.where(fuera, self.fila_nula, fila_inf)
+            fila_sup = np.where(fuera, self.fila_nula, fila_sup)
+
+        nivel = {
+            'fila_inf': fila_inf.astype(np.int32),
+            'gate_inf': gates[inf, celdas].astype(np.int32),
+            'fila_sup': fila_sup.astype(np.int32),
+            'gate_sup': gates[sup, celdas].astype(np.int32),
+            'peso_inf': np.clip(peso, 0.0, 1.0).astype(np.float32),
+        }
+
+        with self._lock:
+            self._niveles[clave] = nivel
+        return nivel
+
+    def mapa_rayos(self, azimuts_por_sweep, max_desvio_bins=1.5):
+        """
+        Fila real (en los datos concatenados) de cada rayo nominal
+
+        Es lo único que depende de los azimuts reales del volumen y cuesta
+        O(sweeps x rayos), no O(celdas).
+        """
+        ancho_bin = 360.0 / self.n_azimuts
+        centros = np.arange(self.n_azimuts) * ancho_bin
+        mapa = np.empty(self.fila_nula + 1, dtype=np.int64)
+        desplazamiento = 0
+
+        for k, azimuts in enumerate(azimuts_por_sweep):
+            azimuts = np.asarray(azimuts, dtype=np.float64) % 360.0
+            orden = np.argsort(azimuts)
+            ordenados = azimuts[orden]
+
+            pos = np.searchsorted(ordenados, centros) % len(ordenados)
+            previo = (pos - 1) % len(ordenados)
+            d_pos = np.abs((ordenados[pos] - centros + 180.0) % 360.0 - 180.0)
+            d_prev = np.abs((ordenados[previo] - centros + 180.0) % 360.0 - 180.0)
+            cercano = np.where(d_prev < d_pos, previo, pos)
+            desvio = np.minimum(d_pos, d_prev)
+
+            filas = desplazamiento + orden[cercano]
+            filas[desvio > max_desvio_bins * ancho_bin] = -1
+            mapa[k * self.n_azimuts:(k + 1) * self.n_azimuts] = filas
+            desplazamiento += len(azimuts)
+
+        # La fila nula apunta a una fila extra sin dato añadida a los datos
+        mapa[mapa < 0] = desplazamiento
+        mapa[self.fila_nula] = desplazamiento
+        return mapa
+
+    def aplicar(self, datos_por_sweep, azimuts_por_sweep, altura_m, conversion=None,
+                interpolar=True, valor_nulo=None):
+        """
+        CAPPI a una altura
+
+        Args:
+            datos_por_sweep: Arreglos (rayos x gates) por sweep, en el orden de
+                `elevaciones` (valores físicos o códigos crudos)
+            azimuts_por_sweep: Azimut de cada rayo por sweep
+            altura_m: Altura sobre el radar
+            conversion: Tabla código -> valor físico si los datos son crudos;
+                se aplica solo a las celdas extraídas
+            interpolar: Interpolar linealmente entre los dos sweeps que rodean
+                la altura (False = sweep más cercano, un solo gather)
+            valor_nulo: Valor de la fila sin dato (por defecto 0, el código nulo
+                IRIS, para datos enteros y NaN para datos en float)
+
+        Returns:
+            np.ndarray float32 (ny, nx) con NaN donde no hay dato
+        """
+        nivel = self.nivel(altura_m)
+        mapa = self.mapa_rayos(azimuts_por_sweep)
+
+        primero = np.asarray(datos_por_sweep[0])
+        if valor_nulo is None:
+            valor_nulo = np.nan if np.issubdtype(primero.dtype, np.floating) else 0
+        relleno = np.full((1, self.n_gates), valor_nulo, dtype=primero.dtype)
+        plano = np.concatenate(
+            [np.asarray(d)[:, :self.n_gates] for d in datos_por_sweep] + [relleno]
+        ).ravel()
+
+        def extraer(fila, gate):
+            valores = plano[mapa[fila] * self.n_gates + gate]
+            if conversion is not None:
+                return conversion[valores]
+            return valores.astype(np.float32, copy=False)
+
+        if interpolar:
+            inferior = extraer(nivel['fila_inf'], nivel['gate_inf'])
+            superior = extraer(nivel['fila_sup'], nivel['gate_sup'])
+            peso = nivel['peso_inf']
+            resultado = inferior * peso + superior * (1.0 - peso)
+            # Si falta uno de los dos sweeps, usar el disponible
+            resultado = np.where(np.isnan(inferior), superior, resultado)
+            resultado = np.where(np.isnan(superior), inferior, resultado)
+        else:
+            usar_sup = nivel['peso_inf'] < 0.5
+            fila = np.where(usar_sup, nivel['fila_sup'], nivel['fila_inf'])
+            gate = np.where(usar_sup, nivel['gate_sup'], nivel['gate_inf'])
+            resultado = extraer(fila, gate)
+
+        return resultado.reshape(self.forma).astype(np.float32, copy=False)
+
+
+def obtener_tabla(elevaciones, rango_m, n_azimuts, limite_m=150000.0, resolucion_m=1250.0,
+                  pseudo=True):
+    """Tabla CAPPI para una geometría, reutilizada entre llamadas y volúmenes"""
+    rango_m = np.asarray(rango_m, dtype=np.float64)
+    n_azimuts = rayos_nominales(n_azimuts)
+    clave = (
+        tuple(np.round(np.asarray(elevaciones, dtype=np.float64), 1)),
+        round(float(rango_m[0]), 1),
+        round(float(rango_m[1] - rango_m[0]), 1) if len(rango_m) > 1 else 0.0,
+        len(rango_m),
+        int(n_azimuts),
+        float(limite_m),
+        float(resolucion_m),
+        bool(pseudo),
+    )
+
+    with _lock_tablas:
+        if clave in _tablas:
+            _tablas.move_to_end(clave)
+            return _tablas[clave]
+
+    tabla = TablaCAPPI(np.round(elevaciones, 1), rango_m, n_azimuts,
+                       limite_m, resolucion_m, pseudo)
+    logger.info(f"🗺️  Tabla CAPPI creada: {tabla.n_sweeps} sweeps, "
+                f"malla {tabla.forma[0]}x{tabla.forma[1]}")
+
+    with _lock_tablas:
+        _tablas[clave] = tabla
+        while len(_tablas) > MAX_TABLAS_EN_CACHE:
+            _tablas.popitem(last=False)
+    return tabla
+
+
+def cappi_volumen(volumen, altura_m, momento='DBZ', limite_m=150000.0, resolucion_m=1250.0,
+                  interpolar=True, pseudo=True):
+    """
+    CAPPI de un momento a partir de un VolumenIRIS (o lista de SweepIRIS)
+
+    Se extraen los códigos crudos y solo las celdas resultantes se convierten
+    a unidades físicas.
+
+    Returns:
+        tuple: (cappi, x_m, y_m)
+    """
+    sweeps = [s for s in volumen if momento in s.crudo]
+    if not sweeps:
+        raise ValueError(f"El volumen no contiene el momento {momento}")
+
+    n_azimuts = max(len(s.azimut) for s in sweeps)
+    tabla = obtener_tabla([s.angulo_fijo for s in sweeps], sweeps[0].rango_m, n_azimuts,
+                          limite_m, resolucion_m, pseudo)
+
+    conversion = sweeps[0].tabla_conversion(momento)
+    cappi = tabla.aplicar([s.crudo[momento] for s in sweeps], [s.azimut for s in sweeps],
+                          altura_m, conversion=conversion, interpolar=interpolar)
+    return cappi, tabla.x, tabla.y
@@ -0,0 +1,357 @@
+"""
+Mosaico nacional de reflectividad con los radares IDEAM
+Combina volúmenes casi simultáneos de Guaviare, Munchique, Barrancabermeja
+y Carimagua sobre una malla lat/lon común. Cada radar se proyecta con una
+tabla precalculada (radar_cappi.TablaCAPPI sobre los puntos de la malla) y
+los radares se procesan en paralelo en un pool de procesos persistente.
+"""
+
+import time
+import logging
+from pathlib import Path
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+try:
+    from src.processors.iris_decoder import VolumenIRIS
+    from src.processors.radar_cappi import TablaCAPPI, RADIO_TIERRA_M, rayos_nominales
+except ImportError:
+    from iris_decoder import VolumenIRIS
+    from radar_cappi import TablaCAPPI, RADIO_TIERRA_M, rayos_nominales
+
+logger = logging.getLogger(__name__)
+
+# Malla por defecto: territorio continental cubierto por los cuatro radares
+LIMITES_COLOMBIA = {
+    'lat_min': -1.5,
+    'lat_max': 10.5,
+    'lon_min': -79.5,
+    'lon_max': -68.0,
+}
+
+METODOS_COMBINACION = ('maximo', 'distancia')
+
+# Proyecciones radar -> malla en cada proceso (se reutilizan entre ciclos)
+_proyecciones = {}
+
+
+class MallaLatLon:
+    """Malla regular lat/lon del mosaico"""
+
+    def __init__(self, lat_min, lat_max, lon_min, lon_max, resolucion_grados=0.02):
+        self.lat = np.arange(lat_min, lat_max + resolucion_grados / 2, resolucion_grados)
+        self.lon = np.arange(lon_min, lon_max + resolucion_grados / 2, resolucion_grados)
+        self.resolucion_grados = resolucion_grados
+        self.forma = (len(self.lat), len(self.lon))
+
+    @property
+    def clave(self):
+        return (round(float(self.lat[0]), 4), round(float(self.lon[0]), 4),
+                self.forma, self.resolucion_grados)
+
+    def distancia_azimut(self, lat0, lon0):
+        """
+        Distancia sobre el suelo (m, gran círculo) y azimut desde un punto a
+        cada celda de la malla
+        """
+        lat = np.radians(self.lat)[:, None]
+        lon = np.radians(self.lon)[None, :]
+        phi0 = np.radians(lat0)
+        dlon = lon - np.radians(lon0)
+
+        a = (np.sin((lat - phi0) / 2) ** 2
+             + np.cos(phi0) * np.cos(lat) * np.sin(dlon / 2) ** 2)
+        distancia = 2 * RADIO_TIERRA_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+        azimut = np.degrees(np.arctan2(
+            np.sin(dlon) * np.cos(lat),
+            np.cos(phi0) * np.sin(lat) - np.sin(phi0) * np.cos(lat) * np.cos(dlon)
+        )) % 360.0
+
+        return distancia, azimut
+
+
+def _proyeccion(radar, metadata, sweeps, malla, alcance_m):
+    """
+    Tabla de proyección de un radar sobre la malla (cacheada por proceso)
+
+    Solo se incluyen las celdas dentro del alcance del radar, de modo que el
+    gather de cada ciclo es proporcional a su área de cobertura.
+    """
+    rango_m = sweeps[0].rango_m
+    clave = (
+        radar,
+        round(metadata['latitud'], 3), round(metadata['longitud'], 3),
+        tuple(round(s.angulo_fijo, 1) for s in sweeps),
+        round(float(rango_m[0]), 1), len(rango_m),
+        rayos_nominales(max(len(s.azimut) for s in sweeps)),
+        malla.clave, alcance_m,
+    )
+    if clave in _proyecciones:
+        return _proyecciones[clave]
+
+    distancia, azimut = malla.distancia_azimut(metadata['latitud'], metadata['longitud'])
+    alcance = min(alcance_m or np.inf, float(rango_m[-1]))
+    celdas = np.flatnonzero(distancia.ravel() <= alcance)
+
+    tabla = TablaCAPPI(
+        [s.angulo_fijo for s in sweeps], rango_m, clave[6],
+        pseudo=True,
+        rango_suelo_m=distancia.ravel()[celdas],
+        azimut_grados=azimut.ravel()[celdas],
+    )
+    proyeccion = {
+        'tabla': tabla,
+        'celdas': celdas.astype(np.int64),
+        'distancia_m': distancia.ravel()[celdas].astype(np.float32),
+    }
+    _proyecciones[clave] = proyeccion
+    logger.info(f"🗺️  Proyección de {radar} sobre la malla: {len(celdas)} celdas")
+    return proyeccion
+
+
+def _procesar_radar(radar, ruta, malla, altura_msl, alcance_m, dir_cache, momento):
+    """
+    CAPPI de un radar sobre las celdas de la malla que cubre (se ejecuta en un worker)
+
+    Returns:
+        dict con celdas, valores, distancia e inicio del volumen
+    """
+    with VolumenIRIS(ruta, dir_cache) as volumen:
+        metadata = volumen.metadata
+        sweeps = [s for s in volumen.decodificador.leer_volumen([momento]) if momento in s.crudo]
+        if not sweeps:
+            raise ValueError(f"{Path(ruta).name} no contiene {momento}")
+
+        proyeccion = _proyeccion(radar, metadata, sweeps, malla, alcance_m)
+        # Altura de la antena sobre el nivel del mar: terreno del sitio + mástil
+        altura_antena_msl = metadata['altura_sitio_m'] + metadata['altura_antena_m']
+        altura_sobre_radar = altura_msl - altura_antena_msl
+
+        valores = proyeccion['tabla'].aplicar(
+            [s.crudo[momento] for s in sweeps],
+            [s.azimut for s in sweeps],
+            altura_sobre_radar,
+            conversion=sweeps[0].tabla_conversion(momento),
+        )
+
+    return {
+        'radar': radar,
+        'inicio': metadata['inicio_volumen'],
+        'celdas': proyeccion['celdas'],
+        'valores': valores,
+        'distancia_m': proyeccion['distancia_m'],
+    }
+
+
+class MosaicoNacional:
+    """Compone mosaicos de reflectividad de varios radares sobre una malla común"""
+
+    def __init__(self, resolucion_grados=0.02, altura_msl=4000.0, metodo='maximo',
+                 alcance_km=240.0, escala_distancia_km=100.0, max_workers=4,
+                 dir_cache=None, momento='DBZ', limites=None):
+        """
+        Args:
+            resolucion_grados: Tamaño de celda de la malla lat/lon
+            altura_msl: Altura del CAPPI sobre el nivel del mar (m); se ajusta
+                por la altura de cada radar (Munchique está a ~3000 m)
+            metodo: 'maximo' (máxima reflectividad) o 'distancia' (promedio
+                ponderado por cercanía al radar)
+            alcance_km: Alcance máximo usado de cada radar
+            escala_distancia_km: Escala del peso gaussiano del método 'distancia'
+            max_workers: Procesos del pool (uno por radar es suficiente)
+            dir_cache: Directorio de sidecars descomprimidos de .gz
+            momento: Momento a combinar
+            limites: Dict lat_min/lat_max/lon_min/lon_max (por defecto Colombia)
+        """
+        if metodo not in METODOS_COMBINACION:
+            raise ValueError(f"Método desconocido: {metodo}. Opciones: {METODOS_COMBINACION}")
+
+        self.malla = MallaLatLon(**(limites or LIMITES_COLOMBIA),
+                                 resolucion_grados=resolucion_grados)
+        self.altura_msl = altura_msl
+        self.metodo = metodo
+        self.alcance_m = alcance_km * 1000.0 if alcance_km else None
+        self.escala_distancia_m = escala_distancia_km * 1000.0
+        self.max_workers = max_workers
+        self.dir_cache = dir_cache
+        self.momento = momento
+
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _pool(self):
+        # Pool persistente: las proyecciones quedan cacheadas en cada worker
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def componer(self, volumenes):
+        """
+        Compone un mosaico a partir de un volumen por radar
+
+        Args:
+            volumenes: Dict radar -> ruta del volumen RAW
+
+        Returns:
+            dict con 'datos' (lat x lon, NaN sin dato), 'lat', 'lon',
+            'radares', 'inicio' y 'duracion_s'
+        """
+        inicio = time.perf_counter()
+        args = (self.malla, self.altura_msl, self.alcance_m, self.dir_cache, self.momento)
+
+        if self.max_workers and self.max_workers > 1:
+            pool = self._pool()
+            futuros = {
+                pool.submit(_procesar_radar, radar, str(ruta), *args): radar
+                for radar, ruta in volumenes.items()
+            }
+            pendientes = as_completed(futuros)
+        else:
+            futuros = None
+            pendientes = list(volumenes.items())
+
+        n_celdas = self.malla.forma[0] * self.malla.forma[1]
+        if self.metodo == 'maximo':
+            mosaico = np.full(n_celdas, np.nan, dtype=np.float32)
+        else:
+            suma = np.zeros(n_celdas, dtype=np.float64)
+            pesos = np.zeros(n_celdas, dtype=np.float64)
+
+        radares, inicios = [], []
+
+        for item in pendientes:
+            try:
+                if futuros is not None:
+                    radar = futuros[item]
+                    parcial = item.result()
+                else:
+                    radar, ruta = item
+                    parcial = _procesar_radar(radar, str(ruta), *args)
+            except Exception as e:
+                logger.error(f"❌ Error procesando {radar} para el mosaico: {e}")
+                continue
+
+            celdas = parcial['celdas']
+            valores = parcial['valores']
+
+            if self.metodo == 'maximo':
+                mosaico[celdas] = np.fmax(mosaico[celdas], valores)
+            else:
+                validos = ~np.isnan(valores)
+                peso = np.exp(-(parcial['distancia_m'][validos] / self.escala_distancia_m) ** 2)
+                np.add.at(suma, celdas[validos], peso * valores[validos])
+                np.add.at(pesos, celdas[validos], peso)
+
+            radares.append(radar)
+            if parcial['inicio'] is not None:
+                inicios.append(parcial['inicio'])
+
+        if self.metodo == 'distancia':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mosaico = np.where(pesos > 0, suma / pesos, np.nan).astype(np.float32)
+
+        duracion = time.perf_counter() - inicio
+        logger.info(f"🧩 Mosaico con {len(radares)} radares en {duracion:.2f}s")
+
+        return {
+            'datos': mosaico.reshape(self.malla.forma),
+            'lat': self.malla.lat,
+            'lon': self.malla.lon,
+            'radares': sorted(radares),
+            'inicio': min(inicios) if inicios else None,
+            'duracion_s': round(duracion, 3),
+        }
+
+    @staticmethod
+    def agrupar_ciclos(volumenes_por_radar, intervalo_min=10, dir_cache=None):
+        """
+        Agrupa volúmenes casi simultáneos en ciclos de escaneo
+
+        Solo se leen los encabezados (el archivo queda mapeado, no se
+        decodifica ningún sweep).
+
+        Args:
+            volumenes_por_radar: Dict radar -> lista de rutas RAW
+            intervalo_min: Duración del ciclo de escaneo
+
+        Returns:
+            list de (inicio_ciclo, {radar: ruta}) ordenada por tiempo
+        """
+        ciclos = {}
+        intervalo = timedelta(minutes=intervalo_min)
+
+        for radar, rutas in volumenes_por_radar.items():
+            for ruta in rutas:
+                try:
+                    with VolumenIRIS(ruta, dir_cache) as volumen:
+                        inicio = volumen.metadata['inicio_volumen']
+                except Exception as e:
+                    logger.warning(f"⚠️  No se pudo leer {Path(ruta).name}: {e}")
+                    continue
+                if inicio is None:
+                    continue
+
+                base = inicio.replace(minute=0, second=0, microsecond=0)
+                ciclo = base + ((inicio - base) // intervalo) * intervalo
+                desfase = abs((inicio - ciclo).total_seconds())
+
+                por_radar = ciclos.setdefault(ciclo, {})
+                # Si hay varios volúmenes del mismo radar en el ciclo, el más cercano al inicio
+                if radar not in por_radar or desfase < por_radar[radar][0]:
+                    por_radar[radar] = (desfase, ruta)
+
+        return [
+            (ciclo, {radar: ruta for radar, (_, ruta) in por_radar.items()})
+            for ciclo, por_radar in sorted(ciclos.items())
+        ]
+
+    def componer_serie(self, volumenes_por_radar, output_dir, intervalo_min=10,
+                       min_radares=1):
+        """
+        Backfill: compone y guarda un mosaico por ciclo (npz comprimido)
+
+        Returns:
+            list de dicts con ciclo, archivo, radares y duración
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        resultados = []
+        for ciclo, volumenes in self.agrupar_ciclos(volumenes_por_radar, intervalo_min,
+                                                    self.dir_cache):
+            if len(volumenes) < min_radares:
+                continue
+
+            salida = output_dir / f"mosaico_{ciclo.strftime('%Y%m%d_%H%M')}.npz"
+            if salida.exists():
+                continue
+
+            mosaico = self.componer(volumenes)
+            np.savez_compressed(
+                salida,
+                datos=mosaico['datos'],
+                lat=mosaico['lat'],
+                lon=mosaico['lon'],
+                radares=np.array(mosaico['radares']),
+            )
+            resultados.append({
+                'ciclo': ciclo,
+                'archivo': str(salida),
+                'radares': mosaico['radares'],
+                'duracion_s': mosaico['duracion_s'],
+            })
+
+        logger.info(f"✅ {len(resultados)} mosaicos generados en {output_dir}")
+        return resultados
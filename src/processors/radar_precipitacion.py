@@ -0,0 +1,191 @@
+"""
+Motor de tasa de precipitación (Z-R y R(KDP)) basado en tablas de consulta
+Precalcula, para cada código crudo posible (256 o 65536 entradas), la tasa
+en mm/h; convertir un sweep completo es un único gather sobre los gates
+uint8/uint16 sin temporales del tamaño del volumen.
+"""
+
+import logging
+
+import numpy as np
+
+try:
+    from src.processors.iris_decoder import tabla_conversion
+except ImportError:
+    from iris_decoder import tabla_conversion
+
+logger = logging.getLogger(__name__)
+
+# Relaciones Z = a R^b de uso común
+RELACIONES_ZR = {
+    'marshall_palmer': (200.0, 1.6),
+    'estratiforme': (200.0, 1.6),
+    'convectiva': (300.0, 1.4),      # WSR-88D
+    'tropical': (250.0, 1.2),        # Rosenfeld et al. (1993)
+}
+
+# Código DBZ2 (2 bytes, 0.01 dB) usado para cuantizar reflectividad en float
+TIPO_DBZ2 = 9
+
+
+class MotorPrecipitacion:
+    """Convierte reflectividad (y KDP) cruda a tasa de precipitación con LUTs"""
+
+    def __init__(self, relacion='marshall_palmer', relacion_convectiva=None,
+                 umbral_convectivo=40.0, dbz_min=5.0, dbz_max=55.0,
+                 coef_kdp=21.0, exp_kdp=0.72, umbral_kdp_dbz=40.0, kdp_min=0.3,
+                 nyquist=None, longitud_onda_cm=None):
+        """
+        Args:
+            relacion: Nombre en RELACIONES_ZR o tupla (a, b) para Z = a R^b
+            relacion_convectiva: Relación para gates con dBZ >= umbral_convectivo
+                (None = usar la misma relación en todo el volumen)
+            umbral_convectivo: dBZ a partir del cual un gate se trata como convectivo
+            dbz_min: Por debajo de este valor la tasa es 0 (ruido / eco débil);
+                None = sin umbral
+            dbz_max: Límite superior de Z para evitar sobreestimar con granizo;
+                None = sin límite
+            coef_kdp, exp_kdp: R(KDP) = coef * KDP^exp (valores de banda C)
+            umbral_kdp_dbz: dBZ a partir del cual se prefiere R(KDP) si hay KDP válido
+            kdp_min: KDP mínimo (°/km) para usar R(KDP)
+            nyquist, longitud_onda_cm: Parámetros de conversión de los códigos
+                de 1 byte (necesarios para KDP de 8 bits)
+        """
+        self.a, self.b = self._resolver(relacion)
+        self.relacion_convectiva = (
+            self._resolver(relacion_convectiva) if relacion_convectiva else None
+        )
+        self.umbral_convectivo = umbral_convectivo
+        self.dbz_min = dbz_min
+        self.dbz_max = dbz_max
+        self.coef_kdp = coef_kdp
+        self.exp_kdp = exp_kdp
+        self.umbral_kdp_dbz = umbral_kdp_dbz
+        self.kdp_min = kdp_min
+        self.nyquist = nyquist
+        self.longitud_onda_cm = longitud_onda_cm
+
+        self._tablas = {}
+
+    @staticmethod
+    def _resolver(relacion):
+        if isinstance(relacion, str):
+            if relacion not in RELACIONES_ZR:
+                raise ValueError(f"Relación Z-R desconocida: {relacion}. "
+                                 f"Opciones: {list(RELACIONES_ZR)}")
+            return RELACIONES_ZR[relacion]
+        a, b = relacion
+        return float(a), float(b)
+
+    def _tabla_fisica(self, tipo, longitud_onda_cm=None):
+        return tabla_conversion(
+            tipo, self.nyquist, longitud_onda_cm or self.longitud_onda_cm
+        ).astype(np.float64)
+
+    def tabla_zr(self, tipo):
+        """
+        LUT código crudo de reflectividad -> mm/h
+
+        La conmutación convectiva/estratiforme depende solo de Z, así que se
+        resuelve al construir la tabla y no cuesta nada al aplicarla.
+        """
+        clave = ('zr', tipo)
+        if clave in self._tablas:
+            return self._tablas[clave]
+
+        dbz = self._tabla_fisica(tipo)
+        dbz_z = dbz if self.dbz_max is None else np.minimum(dbz, self.dbz_max)
+        z = np.power(10.0, dbz_z / 10.0)
+        tasa = np.power(z / self.a, 1.0 / self.b)
+
+        if self.relacion_convectiva is not None:
+            a_c, b_c = self.relacion_convectiva
+            convectivo = dbz >= self.umbral_convectivo
+            tasa[convectivo] = np.power(z[convectivo] / a_c, 1.0 / b_c)
+
+        if self.dbz_min is not None:
+            tasa[dbz < self.dbz_min] = 0.0
+        tasa[np.isnan(dbz)] = np.nan
+
+        tabla = tasa.astype(np.float32)
+        self._tablas[clave] = tabla
+        return tabla
+
+    def tabla_kdp(self, tipo, longitud_onda_cm=None):
+        """LUT código crudo de KDP -> mm/h (NaN donde R(KDP) no aplica)"""
+        clave = ('kdp', tipo, longitud_onda_cm or self.longitud_onda_cm)
+        if clave in self._tablas:
+            return self._tablas[clave]
+
+        kdp = self._tabla_fisica(tipo, longitud_onda_cm)
+        tasa = np.full(kdp.shape, np.nan)
+        validos = kdp >= self.kdp_min
+        tasa[validos] = self.coef_kdp * np.power(kdp[validos], self.exp_kdp)
+
+        tabla = tasa.astype(np.float32)
+        self._tablas[clave] = tabla
+        return tabla
+
+    def tasa(self, crudo, tipo, out=None):
+        """
+        Tasa de precipitación a partir de códigos crudos de reflectividad
+
+        Args:
+            crudo: Arreglo uint8/uint16 de gates (cualquier forma)
+            tipo: Código de tipo de dato IRIS (2 = DBZ, 9 = DBZ2, ...)
+            out: Arreglo float32 preasignado para reutilizar entre sweeps
+        """
+        if out is None:
+            out = np.empty(crudo.shape, dtype=np.float32)
+        return np.take(self.tabla_zr(tipo), crudo, out=out)
+
+    def tasa_sweep(self, sweep, out=None, usar_kdp=True):
+        """
+        Tasa de precipitación de un SweepIRIS
+
+        Donde hay KDP confiable y la reflectividad supera umbral_kdp_dbz se usa
+        R(KDP), que es inmune a la atenuación y menos sensible al granizo.
+        """
+        if 'DBZ' not in sweep.crudo:
+            raise ValueError("El sweep no contiene reflectividad (DBZ)")
+
+        tipo_dbz = sweep.tipos['DBZ']
+        tasa = self.tasa(sweep.crudo['DBZ'], tipo_dbz, out=out)
+
+        if usar_kdp and 'KDP' in sweep.crudo:
+            r_kdp = np.take(self.tabla_kdp(sweep.tipos['KDP'], sweep.longitud_onda_cm),
+                            sweep.crudo['KDP'])
+            intenso = np.take(self.tabla_dbz_umbral(tipo_dbz), sweep.crudo['DBZ'])
+            intenso &= ~np.isnan(r_kdp)
+            np.copyto(tasa, r_kdp, where=intenso)
+
+        return tasa
+
+    def tabla_dbz_umbral(self, tipo):
+        """LUT booleana: código de reflectividad >= umbral_kdp_dbz"""
+        clave = ('umbral', tipo)
+        if clave not in self._tablas:
+            with np.errstate(invalid='ignore'):
+                self._tablas[clave] = self._tabla_fisica(tipo) >= self.umbral_kdp_dbz
+        return self._tablas[clave]
+
+    def tasa_volumen(self, volumen, usar_kdp=True):
+        """Tasa de precipitación de cada sweep de un VolumenIRIS"""
+        return [self.tasa_sweep(sweep, usar_kdp=usar_kdp) for sweep in volumen]
+
+    def tasa_desde_dbz(self, dbz, out=None):
+        """
+        Tasa de precipitación para reflectividad en float (p. ej. campos PyART)
+
+        Se cuantiza a códigos DBZ2 (0.01 dB) en un arreglo uint16 y se aplica
+        la misma tabla; los valores enmascarados o NaN quedan como NaN.
+        """
+        datos = np.ma.getdata(dbz)
+        mascara = np.ma.getmaskarray(dbz) | ~np.isfinite(datos)
+
+        codigos = np.empty(datos.shape, dtype=np.uint16)
+        np.clip(np.nan_to_num(datos, nan=0.0) * 100.0 + 32768.5, 1, 65534,
+                out=codigos, casting='unsafe')
+        codigos[mascara] = 0
+
+        return self.tasa(codigos, TIPO_DBZ2, out=out)
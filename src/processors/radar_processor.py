@@ -13,6 +13,12 @@ from datetime import datetime
 import logging
 import sys
 
+try:
+    from src.data_sources.ideam_inventario import InventarioRadares
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.data_sources.ideam_inventario import InventarioRadares
+
 logger = logging.getLogger(__name__)
 
 # Información de radares (copiada para independencia del módulo)
@@ -68,45 +74,43 @@ class RadarDataProcessor:
             'RAIN': 'Acumulado de Precipitación',
             'VIL': 'Vertically Integrated Liquid'
         }
+        self._inventario = None
+    
+    @property
+    def inventario(self):
+        """Inventario incremental sincronizado con el disco (solo reescanea lo que cambió)"""
+        if self._inventario is None:
+            self._inventario = InventarioRadares(self.data_dir, RADARES_IDEAM)
+        self._inventario.actualizar()
+        return self._inventario
     
     def leer_inventario(self):
         """Lee el inventario de archivos disponibles"""
-        inventario_path = self.data_dir / 'inventario_radares.csv'
-        
-        if not inventario_path.exists():
+        if not self.data_dir.exists():
             logger.warning("No se encuentra inventario. Ejecute primero el descargador.")
             return None
         
-        return pd.read_csv(inventario_path)
+        return self.inventario.dataframe()
     
     def analizar_disponibilidad(self, radar='Barrancabermeja'):
         """Analiza la disponibilidad de datos por fecha"""
-        inventario = self.leer_inventario()
-        
-        if inventario is None or inventario.empty:
+        if not self.data_dir.exists():
             print("⚠️  No hay datos disponibles")
             return None
         
-        # Filtrar por radar
-        datos_radar = inventario[inventario['radar'] == radar].copy()
+        inventario = self.inventario
+        radares = inventario.radares()
         
-        if datos_radar.empty:
-            print(f"⚠️  No hay datos para el radar {radar}")
-            print(f"Radares disponibles: {inventario['radar'].unique().tolist()}")
+        if not radares:
+            print("⚠️  No hay datos disponibles")
             return None
         
-        # Convertir fechas
-        datos_radar['fecha'] = pd.to_datetime(datos_radar['fecha_directorio'])
-        
-        # Resumen
-        resumen = datos_radar.groupby('fecha').agg({
-            'archivo': 'count',
-            'tamaño_mb': 'sum'
-        }).reset_index()
-        
-        resumen.columns = ['fecha', 'num_archivos', 'tamaño_total_mb']
+        if radar not in radares:
+            print(f"⚠️  No hay datos para el radar {radar}")
+            print(f"Radares disponibles: {radares}")
+            return None
         
-        return resumen
+        return inventario.disponibilidad(radar)
     
     def visualizar_disponibilidad(self, radar='Barrancabermeja'):
         """Crea visualización de disponibilidad de datos"""
@@ -231,60 +235,56 @@ class RadarDataProcessor:
     
     def resumen_estadistico(self, radar='Barrancabermeja'):
         """Genera resumen estadístico de los datos"""
-        inventario = self.leer_inventario()
-        
-        if inventario is None:
+        if not self.data_dir.exists():
             return None
         
-        datos_radar = inventario[inventario['radar'] == radar]
+        inventario = self.inventario
+        resumen = inventario.resumen(radar)
         
         print("\n" + "="*80)
         print(f"RESUMEN ESTADÍSTICO - RADAR {radar}")
         print("="*80)
         
-        if datos_radar.empty:
+        if resumen is None:
             print("⚠️  No hay datos disponibles para este radar")
-            print(f"Radares con datos: {inventario['radar'].unique().tolist()}")
+            print(f"Radares con datos: {inventario.radares()}")
             return None
         
         print(f"\n📊 Estadísticas Generales:")
-        print(f"   Total de archivos: {len(datos_radar)}")
-        print(f"   Espacio total: {datos_radar['tamaño_mb'].sum():.2f} MB")
-        print(f"   Tamaño promedio: {datos_radar['tamaño_mb'].mean():.2f} MB")
-        print(f"   Tamaño máximo: {datos_radar['tamaño_mb'].max():.2f} MB")
-        print(f"   Tamaño mínimo: {datos_radar['tamaño_mb'].min():.2f} MB")
+        print(f"   Total de archivos: {resumen['total_archivos']}")
+        print(f"   Espacio total: {resumen['espacio_total_mb']:.2f} MB")
+        print(f"   Tamaño promedio: {resumen['tamaño_promedio_mb']:.2f} MB")
+        print(f"   Tamaño máximo: {resumen['tamaño_maximo_mb']:.2f} MB")
+        print(f"   Tamaño mínimo: {resumen['tamaño_minimo_mb']:.2f} MB")
         
         # Fechas disponibles
-        fechas_unicas = datos_radar['fecha_directorio'].unique()
         print(f"\n📅 Cobertura Temporal:")
-        print(f"   Fechas disponibles: {len(fechas_unicas)}")
-        print(f"   Primera fecha: {min(fechas_unicas)}")
-        print(f"   Última fecha: {max(fechas_unicas)}")
+        print(f"   Fechas disponibles: {resumen['fechas_disponibles']}")
+        print(f"   Primera fecha: {resumen['primera_fecha']}")
+        print(f"   Última fecha: {resumen['ultima_fecha']}")
         
         # Archivos por fecha
-        archivos_por_fecha = datos_radar.groupby('fecha_directorio').size()
         print(f"\n📁 Archivos por Fecha:")
-        print(f"   Promedio: {archivos_por_fecha.mean():.1f}")
-        print(f"   Máximo: {archivos_por_fecha.max()}")
-        print(f"   Mínimo: {archivos_por_fecha.min()}")
+        print(f"   Promedio: {resumen['archivos_por_fecha_promedio']:.1f}")
+        print(f"   Máximo: {resumen['archivos_por_fecha_maximo']}")
+        print(f"   Mínimo: {resumen['archivos_por_fecha_minimo']}")
         
         # Información del radar
-        if 'distancia_medellin_km' in datos_radar.columns:
-            dist = datos_radar['distancia_medellin_km'].iloc[0]
+        if resumen['distancia_medellin_km'] is not None:
             print(f"\n📍 Ubicación:")
-            print(f"   Distancia a Medellín: ~{dist} km")
+            print(f"   Distancia a Medellín: ~{resumen['distancia_medellin_km']} km")
         
-        return datos_radar
+        return inventario.dataframe(radar)
     
     def listar_radares_con_datos(self):
         """Lista los radares que tienen datos descargados"""
-        inventario = self.leer_inventario()
-        
-        if inventario is None or inventario.empty:
+        if not self.data_dir.exists():
             print("⚠️  No hay datos descargados")
             return []
         
-        radares = inventario['radar'].unique().tolist()
+        radares = self.inventario.radares()
+        if not radares:
+            print("⚠️  No hay datos descargados")
         return radares
 
 
@@ -9,12 +9,30 @@ import matplotlib.pyplot as plt
 import plotly.graph_objects as go
 from pathlib import Path
 from datetime import datetime
-import struct
-import gzip
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import os
+import json
 import logging
 
+try:
+    from src.processors.iris_decoder import DecodificadorIRIS, abrir_mapeado
+except ImportError:
+    from iris_decoder import DecodificadorIRIS, abrir_mapeado
+
+try:
+    from src.data_sources.ideam_inventario import InventarioRadares
+except ImportError:
+    import sys
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.data_sources.ideam_inventario import InventarioRadares
+
 logger = logging.getLogger(__name__)
 
+# Memoria estimada por proceso de lote: base del intérprete + numpy/pandas,
+# más un múltiplo del tamaño del archivo (sweep comprimido + decodificado)
+MEMORIA_BASE_WORKER_MB = 150
+FACTOR_MEMORIA_ARCHIVO = 4
+
 # Configuración de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -25,9 +43,13 @@ logging.basicConfig(
 class RadarRawProcessor:
     """Procesador de archivos RAW de radar meteorológico"""
     
-    def __init__(self, data_dir="data/Radar_IDEAM"):
+    def __init__(self, data_dir="data/Radar_IDEAM", dir_cache=None):
         self.data_dir = Path(data_dir)
         
+        # Sidecars descomprimidos de los .gz (se mapean en memoria al leer)
+        self.dir_cache = Path(dir_cache) if dir_cache else self.data_dir / '.raw_cache'
+        self._inventario = None
+        
         # Productos de radar disponibles
         self.productos = {
             'dBZ': {'nombre': 'Reflectividad', 'unidad': 'dBZ', 'cmap': 'jet'},
@@ -41,36 +63,34 @@ class RadarRawProcessor:
         logger.info(f"RadarRawProcessor inicializado para: {self.data_dir}")
     
     def listar_archivos_raw(self, radar=None):
-        """Lista todos los archivos RAW disponibles"""
-        archivos = []
-        
-        if radar:
-            radar_dirs = [self.data_dir / radar]
-        else:
-            radar_dirs = [d for d in self.data_dir.iterdir() if d.is_dir()]
-        
-        for radar_dir in radar_dirs:
-            if not radar_dir.exists():
-                continue
-                
-            for fecha_dir in radar_dir.iterdir():
-                if fecha_dir.is_dir():
-                    for archivo in fecha_dir.iterdir():
-                        if archivo.suffix.upper() in ['.RAW', '.GZ', ''] and archivo.is_file():
-                            archivos.append({
-                                'radar': radar_dir.name,
-                                'fecha': fecha_dir.name,
-                                'archivo': archivo.name,
-                                'ruta': archivo,
-                                'tamaño_mb': archivo.stat().st_size / (1024 * 1024)
-                            })
-        
-        return pd.DataFrame(archivos)
+        """Lista todos los archivos RAW disponibles (desde el inventario incremental)"""
+        if not self.data_dir.exists():
+            return pd.DataFrame()
+        
+        if self._inventario is None:
+            self._inventario = InventarioRadares(self.data_dir)
+        self._inventario.actualizar(radar)
+        
+        inventario = self._inventario.dataframe(radar)
+        if inventario.empty:
+            return pd.DataFrame()
+        
+        sufijos = inventario['archivo'].map(lambda a: Path(a).suffix.upper())
+        inventario = inventario[sufijos.isin(['.RAW', '.GZ', ''])]
+        
+        return pd.DataFrame({
+            'radar': inventario['radar'],
+            'fecha': inventario['fecha_directorio'],
+            'archivo': inventario['archivo'],
+            'ruta': inventario['ruta_completa'].map(Path),
+            'tamaño_mb': inventario['tamaño_mb']
+        }).reset_index(drop=True)
     
     def leer_archivo_raw(self, ruta_archivo):
         """
         Lee un archivo RAW de radar
-        Intenta diferentes métodos de lectura
+        El contenido se mapea en memoria (los .gz se descomprimen una vez a un
+        sidecar en dir_cache), así que 'datos_raw' es una vista sin copia
         """
         ruta = Path(ruta_archivo)
         
@@ -81,21 +101,24 @@ class RadarRawProcessor:
         logger.info(f"Leyendo archivo: {ruta.name}")
         
         try:
-            # Verificar si está comprimido
-            if ruta.suffix == '.gz':
-                with gzip.open(ruta, 'rb') as f:
-                    datos = f.read()
-            else:
-                with open(ruta, 'rb') as f:
-                    datos = f.read()
+            datos = abrir_mapeado(ruta, self.dir_cache)
             
-            logger.info(f"Archivo leído exitosamente: {len(datos)} bytes")
+            logger.info(f"Archivo mapeado exitosamente: {len(datos)} bytes")
             
-            # Intentar parsear header básico
-            metadata = self.extraer_metadata_basica(datos)
+            # Decodificador IRIS nativo (solo lee encabezados; los sweeps se
+            # descomprimen bajo demanda)
+            decodificador = None
+            if DecodificadorIRIS.es_iris(datos):
+                try:
+                    decodificador = DecodificadorIRIS(datos)
+                except ValueError as e:
+                    logger.warning(f"Encabezados IRIS inválidos: {e}")
+            
+            metadata = self.extraer_metadata_basica(datos, decodificador)
             
             return {
                 'datos_raw': datos,
+                'decodificador': decodificador,
                 'metadata': metadata,
                 'ruta': ruta,
                 'tamaño': len(datos)
@@ -105,10 +128,10 @@ class RadarRawProcessor:
             logger.error(f"Error leyendo archivo: {e}")
             return None
     
-    def extraer_metadata_basica(self, datos):
+    def extraer_metadata_basica(self, datos, decodificador=None):
         """
         Extrae metadata básica del archivo RAW
-        Formato IRIS tiene estructura específica
+        Si el archivo es IRIS/Sigmet se leen product_hdr e ingest_header
         """
         metadata = {
             'formato': 'Desconocido',
@@ -118,20 +141,16 @@ class RadarRawProcessor:
         }
         
         try:
-            # Los primeros bytes suelen contener información del formato
-            # Formato IRIS típicamente empieza con identificadores específicos
-            
-            # Buscar patrones comunes en nombres de archivo
-            # Ejemplo: BAR241211010000.RAW
-            # Donde: BAR = radar, 241211 = YYMMDD, 010000 = HHMMSS
-            
-            header_bytes = datos[:100]
-            
-            # Intentar detectar timestamp en los primeros bytes
-            # (esto depende del formato específico IRIS/Sigmet)
+            if decodificador is None and DecodificadorIRIS.es_iris(datos):
+                decodificador = DecodificadorIRIS(datos)
             
-            metadata['formato'] = 'IRIS/Sigmet (tentativo)'
-            metadata['header_sample'] = header_bytes.hex()[:50]
+            if decodificador is not None:
+                info = decodificador.metadata
+                metadata.update(info)
+                metadata['timestamp'] = info['inicio_volumen']
+                metadata['radar'] = info['sitio']
+            else:
+                metadata['header_sample'] = bytes(datos[:100]).hex()[:50]
             
         except Exception as e:
             logger.debug(f"Error extrayendo metadata: {e}")
@@ -187,7 +206,7 @@ class RadarRawProcessor:
         
         analisis = {
             'tamaño_total': len(datos),
-            'primeros_bytes': datos[:50].hex(),
+            'primeros_bytes': bytes(datos[:50]).hex(),
             'patron_detectado': None,
             'bloques_posibles': []
         }
@@ -195,8 +214,13 @@ class RadarRawProcessor:
         # Buscar patrones comunes en archivos de radar
         # Los archivos IRIS suelen tener estructuras repetitivas
         
-        # Analizar cada 512 bytes (tamaño común de bloques)
-        tamaño_bloque = 512
+        # Los archivos IRIS se organizan en registros de 6144 bytes
+        if archivo_raw.get('decodificador') is not None:
+            analisis['patron_detectado'] = 'IRIS/Sigmet RAW'
+            tamaño_bloque = 6144
+        else:
+            # Analizar cada 512 bytes (tamaño común de bloques)
+            tamaño_bloque = 512
         num_bloques = len(datos) // tamaño_bloque
         
         analisis['bloques_detectados'] = num_bloques
@@ -204,46 +228,48 @@ class RadarRawProcessor:
         
         return analisis
     
-    def extraer_reflectividad_simple(self, archivo_raw, max_intentos=10):
+    def extraer_reflectividad_simple(self, archivo_raw, momento='DBZ'):
         """
-        Intenta extraer datos de reflectividad de forma simple
-        Busca patrones típicos de datos de radar
+        Decodifica un momento de todos los sweeps del volumen y resume cada sweep
+        
+        Returns:
+            DataFrame con una fila por sweep (ángulo, forma rayos x gates y
+            estadísticas del momento) o None si no se pudo decodificar
         """
-        datos = archivo_raw['datos_raw']
+        decodificador = archivo_raw.get('decodificador')
         
-        # Los datos de reflectividad típicamente están en rangos específicos
-        # Valores típicos: -32 a 95 dBZ
+        if decodificador is None:
+            logger.warning("El archivo no tiene formato IRIS/Sigmet reconocible")
+            return None
         
-        reflectividad = []
+        resumen = []
         
         try:
-            # Intentar leer como valores de 8 bits o 16 bits
-            for offset in range(0, min(len(datos), 10000), 100):
-                try:
-                    # Leer como unsigned byte
-                    valor = struct.unpack('B', datos[offset:offset+1])[0]
-                    
-                    # Convertir a dBZ (factor de escala típico)
-                    dbz = (valor - 32) / 2.0  # Ejemplo de conversión común
-                    
-                    if -32 <= dbz <= 95:  # Rango válido
-                        reflectividad.append({
-                            'offset': offset,
-                            'valor_raw': valor,
-                            'dbz': dbz
-                        })
-                        
-                        if len(reflectividad) >= max_intentos:
-                            break
-                            
-                except:
+            for i in range(decodificador.n_sweeps):
+                sweep = decodificador.leer_sweep(i, momentos=[momento])
+                if momento not in sweep.crudo:
                     continue
+                
+                valores = sweep.momento(momento)
+                validos = valores[np.isfinite(valores)]
+                
+                resumen.append({
+                    'sweep': sweep.numero,
+                    'angulo_fijo': round(sweep.angulo_fijo, 2),
+                    'inicio': sweep.inicio,
+                    'rayos': sweep.forma[0],
+                    'gates': sweep.forma[1],
+                    'pixeles_validos': int(validos.size),
+                    f'{momento.lower()}_min': float(validos.min()) if validos.size else np.nan,
+                    f'{momento.lower()}_max': float(validos.max()) if validos.size else np.nan,
+                    f'{momento.lower()}_medio': float(validos.mean()) if validos.size else np.nan
+                })
             
-            if reflectividad:
-                logger.info(f"Extraídos {len(reflectividad)} valores de reflectividad")
-                return pd.DataFrame(reflectividad)
+            if resumen:
+                logger.info(f"Decodificados {len(resumen)} sweeps de {momento}")
+                return pd.DataFrame(resumen)
             else:
-                logger.warning("No se pudieron extraer valores de reflectividad")
+                logger.warning(f"No se encontró el momento {momento} en el volumen")
                 return None
                 
         except Exception as e:
@@ -274,32 +300,212 @@ class RadarRawProcessor:
             'metadata': archivo_raw['metadata'],
             'estructura': estructura,
             'reflectividad_extraida': reflectividad is not None,
-            'num_valores_reflectividad': len(reflectividad) if reflectividad is not None else 0
+            'num_sweeps_reflectividad': len(reflectividad) if reflectividad is not None else 0,
+            'num_valores_reflectividad': int(reflectividad['pixeles_validos'].sum())
+                if reflectividad is not None else 0
         }
         
         return reporte
     
-    def procesar_lote(self, radar=None, limite=10):
-        """Procesa un lote de archivos RAW"""
+    def procesar_lote(self, radar=None, limite=10, max_workers=None, memoria_mb=None,
+                      tamaño_bloque=None, checkpoint=None):
+        """
+        Procesa un lote de archivos RAW en paralelo
+        
+        Returns:
+            DataFrame con un reporte por archivo (incluye los ya registrados en
+            el checkpoint si se reanuda un lote interrumpido)
+        """
         archivos = self.listar_archivos_raw(radar)
         
         if archivos.empty:
             logger.warning("No se encontraron archivos RAW")
             return None
         
-        logger.info(f"Procesando {min(len(archivos), limite)} archivos...")
+        rutas = [str(r) for r in archivos.head(limite)['ruta']]
         
+        # Solo los reportes del checkpoint que pertenecen a este lote
         reportes = []
-        
-        for idx, row in archivos.head(limite).iterrows():
-            logger.info(f"Procesando archivo {idx+1}/{min(len(archivos), limite)}: {row['archivo']}")
-            
-            reporte = self.generar_reporte_archivo(row['ruta'])
-            
-            if reporte:
-                reportes.append(reporte)
+        if checkpoint:
+            hechos = _leer_checkpoint(checkpoint)
+            reportes = [hechos[r] for r in rutas if r in hechos]
+        reportes.extend(self.procesar_lote_iter(
+            rutas,
+            max_workers=max_workers,
+            memoria_mb=memoria_mb,
+            tamaño_bloque=tamaño_bloque,
+            checkpoint=checkpoint
+        ))
         
         return pd.DataFrame(reportes)
+    
+    def calcular_workers(self, rutas, max_workers=None, memoria_mb=None):
+        """Número de procesos según núcleos disponibles y presupuesto de memoria"""
+        workers = max_workers or os.cpu_count() or 1
+        
+        if memoria_mb and rutas:
+            mayor_mb = max(Path(r).stat().st_size for r in rutas) / (1024 * 1024)
+            por_worker = MEMORIA_BASE_WORKER_MB + FACTOR_MEMORIA_ARCHIVO * mayor_mb
+            workers = min(workers, max(1, int(memoria_mb // por_worker)))
+        
+        return max(1, min(workers, len(rutas)))
+    
+    def procesar_lote_iter(self, rutas, max_workers=None, memoria_mb=None,
+                           tamaño_bloque=None, checkpoint=None):
+        """
+        Procesa archivos RAW en un pool de procesos y entrega los reportes a
+        medida que terminan (en orden de finalización)
+        
+        Args:
+            rutas: Archivos a procesar
+            max_workers: Procesos máximos (por defecto, núcleos disponibles)
+            memoria_mb: Presupuesto de memoria total; limita el número de procesos
+            tamaño_bloque: Archivos por tarea enviada al pool (por defecto se
+                reparten ~4 bloques por proceso)
+            checkpoint: Archivo JSONL donde se registra cada reporte; al
+                reanudar se omiten los archivos ya registrados
+        
+        Yields:
+            dict: Reporte de cada archivo (o {'ruta', 'error'} si falló)
+        """
+        rutas = [str(r) for r in rutas]
+        
+        if checkpoint:
+            hechos = _leer_checkpoint(checkpoint)
+            if hechos:
+                logger.info(f"Reanudando lote: {len(hechos)} archivos ya procesados")
+            rutas = [r for r in rutas if r not in hechos]
+        
+        if not rutas:
+            return
+        
+        workers = self.calcular_workers(rutas, max_workers, memoria_mb)
+        if not tamaño_bloque:
+            tamaño_bloque = max(1, len(rutas) // (workers * 4))
+        bloques = [rutas[i:i + tamaño_bloque] for i in range(0, len(rutas), tamaño_bloque)]
+        
+        logger.info(f"Procesando {len(rutas)} archivos con {workers} procesos "
+                    f"({len(bloques)} bloques de hasta {tamaño_bloque})")
+        
+        salida = None
+        if checkpoint:
+            Path(checkpoint).parent.mkdir(parents=True, exist_ok=True)
+            salida = open(checkpoint, 'a', encoding='utf-8')
+        procesados = 0
+        
+        try:
+            if workers == 1:
+                resultados = (_procesar_bloque(b, self) for b in bloques)
+                for resultado in resultados:
+                    for reporte in resultado:
+                        procesados += 1
+                        _registrar_checkpoint(salida, reporte)
+                        yield reporte
+                return
+            
+            executor = ProcessPoolExecutor(max_workers=workers,
+                                           initializer=_inicializar_worker,
+                                           initargs=(str(self.data_dir), str(self.dir_cache)))
+            try:
+                pendientes = iter(bloques)
+                en_curso = set()
+                
+                # Mantener acotado el número de bloques en vuelo
+                for bloque in pendientes:
+                    en_curso.add(executor.submit(_procesar_bloque, bloque))
+                    if len(en_curso) >= workers * 2:
+                        break
+                
+                while en_curso:
+                    listos, en_curso = wait(en_curso, return_when=FIRST_COMPLETED)
+                    
+                    for futuro in listos:
+                        for reporte in futuro.result():
+                            procesados += 1
+                            _registrar_checkpoint(salida, reporte)
+                            yield reporte
+                        
+                        siguiente = next(pendientes, None)
+                        if siguiente is not None:
+                            en_curso.add(executor.submit(_procesar_bloque, siguiente))
+                    
+                    logger.info(f"Lote: {procesados}/{len(rutas)} archivos procesados")
+            finally:
+                # Si el consumidor abandona el iterador, no seguir con bloques en cola
+                executor.shutdown(wait=True, cancel_futures=True)
+        finally:
+            if salida:
+                salida.close()
+
+
+# Procesador de cada proceso del pool (se crea una vez por worker)
+_processor_worker = None
+
+
+def _inicializar_worker(data_dir, dir_cache):
+    global _processor_worker
+    _processor_worker = RadarRawProcessor(data_dir, dir_cache)
+
+
+def _procesar_bloque(rutas, processor=None):
+    """Genera los reportes de un bloque de archivos dentro de un worker"""
+    processor = processor or _processor_worker
+    reportes = []
+    
+    for ruta in rutas:
+        try:
+            reporte = processor.generar_reporte_archivo(ruta)
+            if reporte is None:
+                reporte = {'ruta': str(ruta), 'error': 'No se pudo leer el archivo'}
+        except Exception as e:
+            reporte = {'ruta': str(ruta), 'error': str(e)}
+        reporte['ruta'] = str(ruta)
+        reportes.append(reporte)
+    
+    return reportes
+
+
+# Campos datetime de los reportes; en el checkpoint JSONL quedan como texto
+CAMPOS_FECHA_REPORTE = (('info_nombre', 'timestamp'), ('metadata', 'inicio_volumen'))
+
+
+def _restaurar_fechas(reporte):
+    """Convierte a datetime las fechas de un reporte leído del checkpoint"""
+    for seccion, campo in CAMPOS_FECHA_REPORTE:
+        valores = reporte.get(seccion)
+        if isinstance(valores, dict) and isinstance(valores.get(campo), str):
+            try:
+                valores[campo] = datetime.fromisoformat(valores[campo])
+            except ValueError:
+                pass
+    return reporte
+
+
+def _leer_checkpoint(checkpoint):
+    """Reportes registrados en un checkpoint JSONL, indexados por ruta"""
+    hechos = {}
+    ruta = Path(checkpoint)
+    
+    if not ruta.exists():
+        return hechos
+    
+    with open(ruta, encoding='utf-8') as f:
+        for linea in f:
+            try:
+                reporte = json.loads(linea)
+            except json.JSONDecodeError:
+                # Última línea truncada por una interrupción
+                continue
+            hechos[reporte['ruta']] = _restaurar_fechas(reporte)
+    
+    return hechos
+
+
+def _registrar_checkpoint(salida, reporte):
+    if salida is None:
+        return
+    salida.write(json.dumps(reporte, default=str, ensure_ascii=False) + '\n')
+    salida.flush()
 
 
 class RadarVisualizador:
@@ -354,7 +560,8 @@ class RadarVisualizador:
         
         if reporte['reflectividad_extraida']:
             print(f"\n📊 Datos Extraídos:")
-            print(f"   Valores de reflectividad: {reporte['num_valores_reflectividad']}")
+            print(f"   Sweeps decodificados: {reporte['num_sweeps_reflectividad']}")
+            print(f"   Valores de reflectividad: {reporte['num_valores_reflectividad']:,}")
         else:
             print(f"\n⚠️  No se pudieron extraer datos de reflectividad")
         
@@ -424,7 +631,8 @@ def menu_analisis():
             limite = int(limite) if limite.isdigit() else 5
             
             print(f"\n⏳ Procesando {limite} archivos...")
-            reportes = processor.procesar_lote(radar, limite)
+            checkpoint = Path("analisis") / f"lote_checkpoint_{radar or 'todos'}.jsonl"
+            reportes = processor.procesar_lote(radar, limite, checkpoint=checkpoint)
             
             if reportes is not None:
                 print(f"\n✅ Procesados {len(reportes)} archivos")
@@ -438,6 +646,9 @@ def menu_analisis():
                 
                 reportes.to_csv(output_file, index=False)
                 print(f"💾 Reportes guardados en: {output_file}")
+                
+                # Lote completo: el próximo no debe reanudar desde este checkpoint
+                checkpoint.unlink(missing_ok=True)
             
             input("\nPresione Enter para continuar...")
         
@@ -0,0 +1,31 @@
+"""
+Configuración compartida de los tests de src/: ruta del proyecto y
+generador de volúmenes IRIS RAW sintéticos
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+if str(RAIZ_PROYECTO) not in sys.path:
+    sys.path.insert(0, str(RAIZ_PROYECTO))
+
+from iris_sintetico import escribir_raw_iris  # noqa: E402
+
+
+@pytest.fixture
+def volumen_sintetico(tmp_path):
+    """Volumen de 2 sweeps (36 rayos x 50 gates de 1 km) con reflectividad conocida"""
+    generador = np.random.default_rng(7)
+    sweeps = []
+    for angulo in (0.5, 1.5):
+        crudo = generador.integers(64, 200, size=(36, 50), dtype=np.uint8)
+        crudo[:, 40:] = 0  # gates lejanos sin dato: tramos comprimidos de ceros
+        sweeps.append((angulo, crudo))
+
+    ruta = escribir_raw_iris(tmp_path / 'SIN240501120000.RAWABCD', sweeps,
+                             latitud=2.2, longitud=-76.9,
+                             altura_sitio_m=2980, altura_antena_m=20)
+    return ruta, sweeps
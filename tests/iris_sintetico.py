@@ -0,0 +1,151 @@
+"""
+Generador de volúmenes IRIS RAW sintéticos para los tests
+"""
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from src.processors.iris_decoder import (
+    RECORD_BYTES, ID_PRODUCT_HDR, ID_INGEST_HEADER, ID_INGEST_DATA_HEADER,
+    STRUCTURE_HEADER, RAW_PROD_BHDR, INGEST_DATA_HEADER, PRODUCT_END,
+    INGEST_CONFIGURATION, TASK_RANGE_INFO, OFFSET_PRODUCT_END,
+    OFFSET_INGEST_CONFIGURATION, OFFSET_TASK_RANGE_INFO, TIPOS_DATOS,
+)
+
+
+def _grados_a_bin(grados, bits):
+    return int(round((grados % 360.0) / 360.0 * (1 << bits))) % (1 << bits)
+
+
+def _estructura(dtype, **campos):
+    """Bytes de una estructura IRIS con los campos dados (el resto en cero)"""
+    registro = np.zeros(1, dtype=dtype)
+    for nombre, valor in campos.items():
+        if isinstance(valor, dict):
+            for subcampo, subvalor in valor.items():
+                registro[nombre][subcampo] = subvalor
+        else:
+            registro[nombre] = valor
+    return registro.tobytes()
+
+
+def _ymds(momento):
+    return {
+        'seconds': momento.hour * 3600 + momento.minute * 60 + momento.second,
+        'milliseconds': momento.microsecond // 1000,
+        'year': momento.year, 'month': momento.month, 'day': momento.day,
+    }
+
+
+def _comprimir(palabras):
+    """Codifica un rayo con el esquema IRIS (tramos de datos y de ceros)"""
+    salida, i, n = [], 0, len(palabras)
+    while i < n:
+        j = i
+        while j < n and palabras[j] == 0:
+            j += 1
+        # Un tramo de una sola palabra en cero se confundiría con fin de rayo
+        if j - i > 1:
+            salida.append(j - i)
+            i = j
+            continue
+        j = i + 1
+        while j < n and not (palabras[j] == 0 and j + 1 < n and palabras[j + 1] == 0):
+            j += 1
+        salida.append(0x8000 | (j - i))
+        salida.extend(int(p) for p in palabras[i:j])
+        i = j
+    salida.append(1)
+    return salida
+
+
+def escribir_raw_iris(ruta, sweeps, *, tipo=2, latitud=4.6, longitud=-74.1,
+                      altura_sitio_m=0, altura_antena_m=0, primer_gate_m=0.0,
+                      paso_gate_m=1000.0, inicio=datetime(2024, 5, 1, 12, 0),
+                      sitio='SINTETICO'):
+    """
+    Escribe un volumen IRIS RAW mínimo con un solo tipo de dato
+
+    Args:
+        ruta: Archivo de salida
+        sweeps: Lista de (ángulo fijo, crudo) con crudo (rayos x gates); el
+            rayo i cubre los azimuts [i, i + 1) * 360 / rayos
+
+    Returns:
+        Path del archivo escrito
+    """
+    nbytes = TIPOS_DATOS[tipo][2]
+    n_rayos, n_gates = sweeps[0][1].shape
+
+    product_hdr = bytearray(RECORD_BYTES)
+    product_hdr[:STRUCTURE_HEADER.itemsize] = _estructura(
+        STRUCTURE_HEADER, structure_identifier=ID_PRODUCT_HDR)
+    product_hdr[OFFSET_PRODUCT_END:OFFSET_PRODUCT_END + PRODUCT_END.itemsize] = _estructura(
+        PRODUCT_END, site_name=sitio.encode(), prf=1000, wavelength=530)
+
+    ingest_header = bytearray(RECORD_BYTES)
+    ingest_header[:STRUCTURE_HEADER.itemsize] = _estructura(
+        STRUCTURE_HEADER, structure_identifier=ID_INGEST_HEADER)
+    ingest_header[OFFSET_INGEST_CONFIGURATION:
+                  OFFSET_INGEST_CONFIGURATION + INGEST_CONFIGURATION.itemsize] = _estructura(
+        INGEST_CONFIGURATION,
+        number_sweeps_completed=len(sweeps),
+        volume_scan_start_time=_ymds(inicio),
+        site_name=sitio.encode(),
+        latitude_radar=_grados_a_bin(latitud, 32),
+        longitude_radar=_grados_a_bin(longitud, 32),
+        height_site=altura_sitio_m,
+        height_radar=altura_antena_m,
+        number_rays_sweep=n_rayos,
+    )
+    primer_gate_cm = int(round(primer_gate_m * 100))
+    paso_gate_cm = int(round(paso_gate_m * 100))
+    ingest_header[OFFSET_TASK_RANGE_INFO:OFFSET_TASK_RANGE_INFO + TASK_RANGE_INFO.itemsize] = \
+        _estructura(TASK_RANGE_INFO,
+                    range_first_bin=primer_gate_cm,
+                    range_last_bin=primer_gate_cm + (n_gates - 1) * paso_gate_cm,
+                    number_input_bins=n_gates, number_output_bins=n_gates,
+                    step_input_bins=paso_gate_cm, step_output_bins=paso_gate_cm)
+
+    registros = [bytes(product_hdr), bytes(ingest_header)]
+
+    for numero, (angulo, crudo) in enumerate(sweeps, 1):
+        crudo = np.asarray(crudo, dtype=np.uint8 if nbytes == 1 else np.uint16)
+        elevacion = _grados_a_bin(angulo, 16)
+
+        flujo = []
+        for i, fila in enumerate(crudo):
+            datos = fila.tobytes() + b'\x00' * (len(fila) * nbytes % 2)
+            encabezado = [_grados_a_bin(i * 360.0 / n_rayos, 16), elevacion,
+                          _grados_a_bin((i + 1) * 360.0 / n_rayos, 16), elevacion,
+                          n_gates, i]
+            flujo.extend(_comprimir(encabezado + np.frombuffer(datos, '<u2').tolist()))
+
+        idh = _estructura(
+            INGEST_DATA_HEADER,
+            structure_header={'structure_identifier': ID_INGEST_DATA_HEADER},
+            sweep_start_time=_ymds(inicio),
+            sweep_number=numero,
+            number_rays_per_sweep=n_rayos,
+            number_rays_file_expected=n_rayos,
+            number_rays_file_written=n_rayos,
+            fixed_angle=elevacion,
+            bits_per_bin=8 * nbytes,
+            data_type=tipo,
+        )
+
+        cabecera = idh
+        while True:
+            bhdr = _estructura(RAW_PROD_BHDR, record_number=len(registros), sweep_number=numero)
+            capacidad = (RECORD_BYTES - len(bhdr) - len(cabecera)) // 2
+            tramo, flujo = flujo[:capacidad], flujo[capacidad:]
+            cuerpo = bhdr + cabecera + np.array(tramo, dtype='<u2').tobytes()
+            registros.append(cuerpo.ljust(RECORD_BYTES, b'\x00'))
+            cabecera = b''
+            if not flujo:
+                break
+
+    ruta = Path(ruta)
+    ruta.write_bytes(b''.join(registros))
+    return ruta
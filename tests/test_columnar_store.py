@@ -0,0 +1,116 @@
+"""
+Tests del almacén columnar Parquet
+"""
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_loaders.columnar_store import ColumnarStore
+
+
+def _horaria(inicio, horas, **columnas):
+    fechas = pd.date_range(inicio, periods=horas, freq='h')
+    datos = {'date': fechas,
+             'temperature_2m': np.arange(horas, dtype=np.float64) + 10.0}
+    datos.update(columnas)
+    return pd.DataFrame(datos)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ColumnarStore(tmp_path / 'columnar')
+
+
+def test_append_y_load_con_filtros(store):
+    # El bloque cruza de enero a febrero: queda en dos particiones mensuales
+    assert store.append(_horaria('2024-01-31 12:00', 24), 'hourly', 'openmeteo', 'Medellin') == 24
+    store.append(_horaria('2024-01-31 12:00', 24), 'hourly', 'openmeteo', 'Cali')
+
+    df = store.load('hourly', location='Medellin')
+
+    assert len(df) == 24
+    assert df['location'].unique().tolist() == ['Medellin']
+    assert df['temperature_2m'].dtype == np.float32
+    assert str(df['date'].dt.tz) == 'UTC'
+    assert df['date'].is_monotonic_increasing
+    np.testing.assert_allclose(df['temperature_2m'], np.arange(24) + 10.0)
+
+    febrero = store.load('hourly', location='Medellin', start='2024-02-01')
+    assert len(febrero) == 12
+    assert febrero['date'].min() == pd.Timestamp('2024-02-01', tz='UTC')
+
+    assert store.locations('hourly') == ['Cali', 'Medellin']
+    assert store.coverage('hourly', 'openmeteo', 'Cali') == (
+        pd.Timestamp('2024-01-31 12:00', tz='UTC'), pd.Timestamp('2024-02-01 11:00', tz='UTC'))
+
+
+def test_reescribir_el_mismo_bloque_no_duplica(store):
+    df = _horaria('2024-03-01', 48)
+    store.append(df, 'hourly', 'openmeteo', 'Bogota', chunk_id='2024-03')
+    store.append(df.assign(temperature_2m=df['temperature_2m'] + 1), 'hourly', 'openmeteo',
+                 'Bogota', chunk_id='2024-03')
+
+    tabla = store.load_table('hourly', location='Bogota')
+
+    assert tabla.num_rows == 48
+    assert store.load('hourly', location='Bogota')['temperature_2m'].iloc[0] == 11.0
+
+
+def test_pronosticos_conservan_la_ultima_emision(store):
+    primera = datetime(2024, 4, 1, 0, tzinfo=timezone.utc)
+    segunda = datetime(2024, 4, 1, 6, tzinfo=timezone.utc)
+    df = _horaria('2024-04-01 06:00', 6)
+    store.append(df.assign(temperature_2m=1.0), 'hourly', 'openmeteo', 'Cali',
+                 kind='forecast', issued_at=primera)
+    store.append(df.assign(temperature_2m=2.0), 'hourly', 'openmeteo', 'Cali',
+                 kind='forecast', issued_at=segunda)
+
+    ultimo = store.load('hourly', location='Cali', kind='forecast')
+    todos = store.load('hourly', location='Cali', kind='forecast', deduplicate=False)
+
+    assert len(todos) == 12
+    assert len(ultimo) == 6
+    assert (ultimo['temperature_2m'] == 2.0).all()
+    assert store.load('hourly', location='Cali', kind='historical').empty
+
+
+def test_iter_batches_por_lotes(store):
+    store.append(_horaria('2024-01-01', 100), 'hourly', 'openmeteo', 'Pasto')
+
+    lotes = list(store.iter_batches('hourly', location='Pasto', columns=['temperature_2m'],
+                                    batch_size=30))
+
+    assert sum(lote.num_rows for lote in lotes) == 100
+    assert set(lotes[0].schema.names) == {'date', 'location', 'temperature_2m'}
+
+
+def test_almacen_vacio(store):
+    assert store.load('daily').empty
+    assert store.coverage('daily', 'openmeteo', 'Cali') is None
+    with pytest.raises(ValueError):
+        store.load('minutely')
+
+
+def test_columnas_ausentes_en_el_primer_archivo(store):
+    # 'Bogota' (histórico, sin issued_at ni pressure_msl) se descubre antes que 'Cali'
+    store.append(_horaria('2024-04-01', 6), 'hourly', 'openmeteo', 'Bogota')
+    df = _horaria('2024-04-01 06:00', 6, pressure_msl=np.full(6, 1010.0))
+    store.append(df.assign(temperature_2m=1.0), 'hourly', 'openmeteo', 'Cali', kind='forecast',
+                 issued_at=datetime(2024, 4, 1, 0, tzinfo=timezone.utc))
+    store.append(df.assign(temperature_2m=2.0), 'hourly', 'openmeteo', 'Cali', kind='forecast',
+                 issued_at=datetime(2024, 4, 1, 6, tzinfo=timezone.utc))
+
+    pronostico = store.load('hourly', location='Cali', columns=['temperature_2m', 'pressure_msl',
+                                                                 'issued_at'])
+    todo = store.load('hourly')
+
+    assert len(pronostico) == 6
+    assert (pronostico['temperature_2m'] == 2.0).all()
+    assert (pronostico['pressure_msl'] == 1010.0).all()
+    assert (pronostico['issued_at'] == pd.Timestamp('2024-04-01 06:00', tz='UTC')).all()
+    historico = todo[todo['location'] == 'Bogota']
+    assert len(historico) == 6
+    assert historico['pressure_msl'].isna().all()
+    assert historico['issued_at'].isna().all()
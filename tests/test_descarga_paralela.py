@@ -0,0 +1,96 @@
+"""
+Tests del motor de descarga concurrente con un cliente S3 falso
+"""
+import threading
+
+from src.data_sources.ideam_descarga_paralela import DescargadorParaleloS3
+
+
+class ClienteS3Falso:
+    """Sirve objetos desde un dict y registra las descargas pedidas"""
+
+    def __init__(self, objetos, fallar=()):
+        self.objetos = objetos
+        self.fallar = set(fallar)
+        self.pedidos = []
+        self._lock = threading.Lock()
+
+    def download_file(self, bucket, key, filename, Config=None):
+        with self._lock:
+            self.pedidos.append((bucket, key))
+        with open(filename, 'wb') as destino:
+            destino.write(self.objetos[key][:3])
+            if key in self.fallar:
+                raise ConnectionError(f'conexión cortada en {key}')
+            destino.write(self.objetos[key][3:])
+
+
+def _tareas(objetos, directorio):
+    return [{'key': key, 'destino': str(directorio / key), 'size': len(datos)}
+            for key, datos in objetos.items()]
+
+
+def test_descarga_todos_los_objetos(tmp_path):
+    objetos = {f'2024/05/01/RAW{i:03d}.gz': bytes([i]) * (100 + i) for i in range(20)}
+    cliente = ClienteS3Falso(objetos)
+    descargador = DescargadorParaleloS3('radaresideam', s3_client=cliente, max_workers=4)
+
+    resultados, estadisticas = descargador.descargar(_tareas(objetos, tmp_path))
+
+    assert len(resultados) == 20
+    assert {r['estado'] for r in resultados} == {'descargado'}
+    assert estadisticas['descargados'] == 20
+    assert estadisticas['bytes'] == sum(len(d) for d in objetos.values())
+    assert {b for b, _ in cliente.pedidos} == {'radaresideam'}
+    for key, datos in objetos.items():
+        assert (tmp_path / key).read_bytes() == datos
+    assert not list(tmp_path.rglob('*.part'))
+
+
+def test_reanudar_omite_los_completos_y_repite_los_truncados(tmp_path):
+    objetos = {'a.gz': b'a' * 50, 'b.gz': b'b' * 60, 'c.gz': b'c' * 70}
+    (tmp_path / 'a.gz').write_bytes(objetos['a.gz'])
+    (tmp_path / 'b.gz').write_bytes(b'b' * 10)  # descarga anterior incompleta
+    cliente = ClienteS3Falso(objetos)
+    descargador = DescargadorParaleloS3('radaresideam', s3_client=cliente, max_workers=2)
+
+    resultados, estadisticas = descargador.descargar(_tareas(objetos, tmp_path))
+
+    estados = {r['key']: r['estado'] for r in resultados}
+    assert estados == {'a.gz': 'existente', 'b.gz': 'descargado', 'c.gz': 'descargado'}
+    assert sorted(key for _, key in cliente.pedidos) == ['b.gz', 'c.gz']
+    assert estadisticas['existentes'] == 1
+    assert estadisticas['descargados'] == 2
+    assert (tmp_path / 'b.gz').read_bytes() == objetos['b.gz']
+
+
+def test_error_no_deja_archivos_parciales(tmp_path):
+    objetos = {'ok.gz': b'x' * 40, 'falla.gz': b'y' * 40}
+    cliente = ClienteS3Falso(objetos, fallar=['falla.gz'])
+    descargador = DescargadorParaleloS3('radaresideam', s3_client=cliente, max_workers=2)
+
+    resultados, estadisticas = descargador.descargar(_tareas(objetos, tmp_path))
+
+    fallido = next(r for r in resultados if r['key'] == 'falla.gz')
+    assert fallido['estado'] == 'error'
+    assert 'conexión cortada' in fallido['error']
+    assert estadisticas['errores'] == 1
+    assert estadisticas['descargados'] == 1
+    assert not (tmp_path / 'falla.gz').exists()
+    assert not (tmp_path / 'falla.gz.part').exists()
+
+    # El reintento sin fallos completa el objeto
+    cliente.fallar.clear()
+    resultados, estadisticas = descargador.descargar(_tareas(objetos, tmp_path))
+    assert estadisticas['existentes'] == 1
+    assert estadisticas['descargados'] == 1
+    assert (tmp_path / 'falla.gz').read_bytes() == objetos['falla.gz']
+
+
+def test_sin_tareas(tmp_path):
+    descargador = DescargadorParaleloS3('radaresideam', s3_client=ClienteS3Falso({}))
+
+    resultados, estadisticas = descargador.descargar([])
+
+    assert resultados == []
+    assert estadisticas['archivos_totales'] == 0
@@ -0,0 +1,87 @@
+"""
+Tests del decodificador IRIS RAW sobre volúmenes sintéticos
+"""
+import gzip
+
+import numpy as np
+import pytest
+
+from iris_sintetico import escribir_raw_iris
+from src.processors.iris_decoder import DecodificadorIRIS, VolumenIRIS, ruta_descomprimida
+
+
+def test_metadata_del_volumen(volumen_sintetico):
+    ruta, _ = volumen_sintetico
+
+    metadata = DecodificadorIRIS.desde_archivo(ruta).metadata
+
+    assert metadata['sitio'] == 'SINTETICO'
+    assert metadata['latitud'] == pytest.approx(2.2, abs=1e-6)
+    assert metadata['longitud'] == pytest.approx(-76.9, abs=1e-6)
+    # Altura sobre el nivel del mar = terreno + antena
+    assert metadata['altura_m'] == 3000
+    assert metadata['altura_sitio_m'] == 2980
+    assert metadata['altura_antena_m'] == 20
+    assert metadata['numero_sweeps'] == 2
+    assert metadata['rayos_por_sweep'] == 36
+    assert metadata['numero_gates'] == 50
+    assert metadata['paso_gate_m'] == 1000.0
+    assert metadata['longitud_onda_cm'] == pytest.approx(5.3)
+    assert metadata['inicio_volumen'].isoformat() == '2024-05-01T12:00:00'
+
+
+def test_sweeps_recuperan_geometria_y_datos(volumen_sintetico):
+    ruta, sweeps = volumen_sintetico
+
+    with VolumenIRIS(ruta) as volumen:
+        assert len(volumen) == 2
+        for indice, (angulo, crudo) in enumerate(sweeps):
+            sweep = volumen.sweep(indice)
+            assert sweep.forma == (36, 50)
+            assert sweep.angulo_fijo == pytest.approx(angulo, abs=0.01)
+            np.testing.assert_allclose(sweep.elevacion, angulo, atol=0.01)
+            np.testing.assert_allclose(sweep.azimut, np.arange(36) * 10.0 + 5.0, atol=0.01)
+            np.testing.assert_array_equal(sweep.rango_m, np.arange(50) * 1000.0)
+            np.testing.assert_array_equal(volumen.crudo('DBZ', indice), crudo)
+
+        dbz = volumen.momento('DBZ', 1)
+        np.testing.assert_allclose(dbz[:, :40], (sweeps[1][1][:, :40] - 64) / 2.0)
+        assert np.isnan(dbz[:, 40:]).all()
+
+
+def test_rayos_de_dos_bytes_en_varios_registros(tmp_path):
+    # 360 rayos x 100 gates de 2 bytes: el sweep ocupa varios registros de 6144 bytes
+    crudo = np.random.default_rng(3).integers(1, 65535, size=(360, 100), dtype=np.uint16)
+    ruta = escribir_raw_iris(tmp_path / 'dbz2.RAW', [(0.5, crudo)], tipo=9)
+
+    sweep = DecodificadorIRIS.desde_archivo(ruta).leer_sweep(0)
+
+    np.testing.assert_array_equal(sweep.crudo['DBZ'], crudo)
+    np.testing.assert_allclose(sweep.momento('DBZ'), (crudo.astype(np.float64) - 32768) / 100.0,
+                               rtol=1e-6)
+
+
+def test_gz_se_descomprime_una_vez_a_sidecar(volumen_sintetico, tmp_path):
+    ruta, sweeps = volumen_sintetico
+    comprimido = tmp_path / (ruta.name + '.gz')
+    comprimido.write_bytes(gzip.compress(ruta.read_bytes()))
+    cache = tmp_path / 'cache'
+
+    with VolumenIRIS(comprimido, cache) as volumen:
+        np.testing.assert_array_equal(volumen.crudo('DBZ', 0), sweeps[0][1])
+
+    sidecar = ruta_descomprimida(comprimido, cache)
+    assert sidecar.read_bytes() == ruta.read_bytes()
+    modificado = sidecar.stat().st_mtime_ns
+
+    with VolumenIRIS(comprimido, cache) as volumen:
+        assert volumen.n_sweeps == 2
+    assert sidecar.stat().st_mtime_ns == modificado
+
+
+def test_rechaza_archivos_que_no_son_iris(tmp_path):
+    ruta = tmp_path / 'otro.bin'
+    ruta.write_bytes(b'\x01' * 3 * 6144)
+
+    with pytest.raises(ValueError):
+        DecodificadorIRIS.desde_archivo(ruta)
@@ -0,0 +1,48 @@
+"""
+Tests del mosaico nacional sobre volúmenes IRIS sintéticos
+"""
+import numpy as np
+import pytest
+
+from iris_sintetico import escribir_raw_iris
+from src.processors.radar_mosaico import MosaicoNacional
+
+LIMITES = {'lat_min': 1.9, 'lat_max': 2.5, 'lon_min': -77.2, 'lon_max': -76.6}
+
+
+@pytest.fixture
+def radar_en_montaña(tmp_path):
+    """Radar a 3000 m (2980 m de terreno + 20 m de antena) con 20 dBZ en el sweep
+    bajo y 40 dBZ en el alto"""
+    sweeps = [(0.5, np.full((360, 100), 64 + 2 * 20, dtype=np.uint8)),
+              (10.0, np.full((360, 100), 64 + 2 * 40, dtype=np.uint8))]
+    return escribir_raw_iris(tmp_path / 'MUN240501120000.RAWABCD', sweeps,
+                             latitud=2.2, longitud=-76.9,
+                             altura_sitio_m=2980, altura_antena_m=20)
+
+
+def _componer(ruta, altura_msl, metodo='maximo'):
+    with MosaicoNacional(resolucion_grados=0.02, altura_msl=altura_msl, metodo=metodo,
+                         alcance_km=50.0, max_workers=1, limites=LIMITES) as mosaico:
+        return mosaico.componer({'munchique': ruta})
+
+
+def test_cappi_se_mide_desde_la_altura_msl_de_la_antena(radar_en_montaña):
+    # A la altura de la antena todo el CAPPI cae por debajo del sweep más bajo
+    resultado = _componer(radar_en_montaña, altura_msl=3000.0)
+
+    datos = resultado['datos']
+    assert resultado['radares'] == ['munchique']
+    assert np.count_nonzero(~np.isnan(datos)) > 100
+    assert np.nanmin(datos) == pytest.approx(20.0)
+    assert np.nanmax(datos) == pytest.approx(20.0)
+
+
+def test_cappi_alto_mezcla_los_sweeps_superiores(radar_en_montaña):
+    resultado = _componer(radar_en_montaña, altura_msl=3000.0 + 2000.0, metodo='distancia')
+
+    datos = resultado['datos']
+    # Cerca del radar 2 km queda por encima del sweep de 10°; lejos, entre ambos sweeps
+    assert np.nanmax(datos) == pytest.approx(40.0)
+    assert np.nanmin(datos) < 40.0
+    assert np.nanmin(datos) >= 20.0